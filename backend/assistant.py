@@ -1,163 +1,681 @@
 import os
 import json
-import pickle
 import datetime
-import sqlite3
-from flask import Flask, request, jsonify
-from dotenv import load_dotenv
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
-from google.auth.transport.requests import Request
-from langchain_google_genai import ChatGoogleGenerativeAI
-
+from concurrent.futures import ThreadPoolExecutor
+from flask import Blueprint, Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
+from intent_classifier import IntentClassifier
+from time_parser import local_now
+from llm_cache import has_json_object
+import llm_client
+from llm_client import model, cached_model
+from resilient_llm import LLMUnavailable, LLM_LOCAL_FALLBACKS, UNAVAILABLE_MESSAGE
+from notes_store import insert_or_update_notes, append_note_points, get_notes, search_notes
+from notes_store import apply_note_writes, store_stats
+from calendar_client import insert_event, insert_events, patch_event
+import conversation_store
+from conversation_store import load_conversation, record_turn, valid_session_id, is_follow_up, reply_text
+import calendar_outbox
+import calendar_mirror
+from metrics import init_app, stage, set_intent, intent_label, record_llm_usage, LLM_PARSE_FAILURES
+from calendar_api import calendar_api
 
-app = Flask(__name__)
-CORS(app) 
-# Load environment variables
-load_dotenv()
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
+# The Gemini client and response cache are shared process-wide (llm_client)
+ANALYSIS_PROMPT_VERSION = "v4"
 
-# Initialize LLM
-model = ChatGoogleGenerativeAI(model='gemini-1.5-pro', google_api_key=GOOGLE_API_KEY)
+# "two_step" classifies first and answers general chat with a second call;
+# "fused" asks for the intent and the chat answer in a single call
+ASSISTANT_MODE = os.getenv("ASSISTANT_MODE", "two_step")
 
-# Flask app
-app = Flask(__name__)
+# Local fast path that answers obvious requests without a Gemini round trip
+intent_classifier = IntentClassifier(threshold=float(os.getenv("INTENT_CONFIDENCE_THRESHOLD", "0.8")))
 
-# Calendar SCOPES
-SCOPES = ['https://www.googleapis.com/auth/calendar']
-CLIENT_SECRET_FILE = 'backend/credentials.json'
-CREDENTIALS_PICKLE = 'token.pickle'
+# /assistant and friends; served on their own below or together with every other route by service.py
+assistant_api = Blueprint('assistant', __name__)
 
 # ---------- Notes Functions ----------
-def create_connection():
-    return sqlite3.connect('notes.db')
-
-def create_table():
-    conn = create_connection()
-    cursor = conn.cursor()
-    cursor.execute('''CREATE TABLE IF NOT EXISTS notes (topic TEXT PRIMARY KEY, points TEXT)''')
-    conn.commit()
-    conn.close()
-
-def insert_or_update_notes(topic, points):
-    conn = create_connection()
-    cursor = conn.cursor()
-    cursor.execute('''INSERT OR REPLACE INTO notes (topic, points) VALUES (?, ?)''', (topic, json.dumps(points)))
-    conn.commit()
-    conn.close()
-
-def get_notes(topic):
-    conn = create_connection()
-    cursor = conn.cursor()
-    cursor.execute('''SELECT points FROM notes WHERE topic = ?''', (topic,))
-    result = cursor.fetchone()
-    conn.close()
-    if result:
-        return json.loads(result[0])
-    return None
-
-create_table()
+# Pooled, WAL-mode access lives in notes_store; the schema is created on first use
 
 # ---------- Google Calendar Functions ----------
-def get_credentials():
-    credentials = None
-    if os.path.exists(CREDENTIALS_PICKLE):
-        with open(CREDENTIALS_PICKLE, 'rb') as token:
-            credentials = pickle.load(token)
-    if not credentials or not credentials.valid:
-        if credentials and credentials.expired and credentials.refresh_token:
-            credentials.refresh(Request())
-        else:
-            flow = InstalledAppFlow.from_client_secrets_file(CLIENT_SECRET_FILE, SCOPES)
-            credentials = flow.run_local_server(port=0)
-        with open(CREDENTIALS_PICKLE, 'wb') as token:
-            pickle.dump(credentials, token)
-    return credentials
-
-def create_event(summary, start_time, end_time):
-    credentials = get_credentials()
-    service = build('calendar', 'v3', credentials=credentials)
-    event = {
+# Credentials and the built service are cached process-wide in calendar_client
+def build_event(summary, start_time, end_time):
+    return {
         'summary': summary,
         'start': {'dateTime': start_time.isoformat(), 'timeZone': 'Asia/Kolkata'},
         'end': {'dateTime': end_time.isoformat(), 'timeZone': 'Asia/Kolkata'},
         'reminders': {'useDefault': False, 'overrides': [{'method': 'popup', 'minutes': 10}]}
     }
-    event_result = service.events().insert(calendarId='primary', body=event).execute()
-    return event_result
+
+def create_event(summary, start_time, end_time):
+    return insert_event(build_event(summary, start_time, end_time))
+
+def create_events(events):
+    # events is a list of (summary, start_time, end_time); one batch HTTP exchange for all of them
+    return insert_events([build_event(*event) for event in events])
+
+def parse_event_times(event):
+    start_time = datetime.datetime.strptime(event["start"], "%Y-%m-%d %H:%M")
+    end_time = datetime.datetime.strptime(event["end"], "%Y-%m-%d %H:%M")
+    return event["title"], start_time, end_time
 
 # ---------- LLM Classification ----------
-def analyze_user_prompt(prompt):
-    analysis_prompt = f"""
+FUSED_CHAT_SECTION = """
+Otherwise it's general conversation. Answer the message yourself and output:
+{
+  "action": "chat",
+  "answer": "your complete answer to the user"
+}
+"""
+
+# Only offered when the session has an event to move
+UPDATE_EVENT_SECTION = """
+If it asks to move or change the calendar event from the conversation, output its new details:
+{
+  "action": "calendar",
+  "event_action": "update",
+  "event_id": "event_id of that event",
+  "events": [
+    {
+      "title": "Event title",
+      "start": "2025-04-29 18:00",
+      "end": "2025-04-29 19:00"
+    }
+  ]
+}
+"""
+
+def build_analysis_prompt(prompt, fused=False, conversation=None):
+    # conversation adds the session's context block; without one the prompt is the stateless one
+    chat_section = FUSED_CHAT_SECTION if fused else ""
+    update_section = UPDATE_EVENT_SECTION if conversation and conversation.entities.get("last_event") else ""
+    context = conversation.render() if conversation else ""
+    return f"""
 You are a helpful assistant. Analyze the user's message and return the intent.
+It is now {local_now().strftime("%A %Y-%m-%d %H:%M")} in Asia/Kolkata.
 
 If it's about notes, output:
 {{
   "action": "note",
-  "note_action": "add" or "retrieve",
+  "note_action": "add", "append" or "retrieve",
   "topic": "topic name"
 }}
 
-If it's about scheduling a calendar event, output:
+If it's about scheduling one or more calendar events, output one entry per event:
 {{
   "action": "calendar",
-  "title": "Event title",
-  "start": "2025-04-29 17:00",
-  "end": "2025-04-29 18:00"
+  "events": [
+    {{
+      "title": "Event title",
+      "start": "2025-04-29 17:00",
+      "end": "2025-04-29 18:00"
+    }}
+  ]
 }}
-
-User message: "{prompt}"
+{chat_section}{update_section}
+{context}User message: "{prompt}"
 
 Respond ONLY in JSON.
 """
-    response = model.invoke(analysis_prompt)
+
+def parse_analysis(content):
     try:
-        json_start = response.content.index('{')
-        json_end = response.content.rindex('}') + 1
-        return json.loads(response.content[json_start:json_end])
+        json_start = content.index('{')
+        json_end = content.rindex('}') + 1
+        return json.loads(content[json_start:json_end])
     except Exception as e:
         return {"error": f"LLM parsing error: {str(e)}"}
 
+def analysis_request(prompt, mode=None, conversation=None):
+    # The prompt text and cache template version for the given mode
+    fused = (mode or ASSISTANT_MODE) == "fused"
+    version = ANALYSIS_PROMPT_VERSION + ("-fused" if fused else "")
+    return build_analysis_prompt(prompt, fused=fused, conversation=conversation), version
+
+def analysis_cache_key(prompt, conversation=None):
+    # The same message means something else after different turns
+    return conversation.render() + prompt if conversation else prompt
+
+def fused_answer(decision):
+    answer = decision.get("answer")
+    if decision.get("action") not in ("note", "calendar") and isinstance(answer, str) and answer.strip():
+        return answer.strip()
+    return None
+
+def analysis_call(prompt, mode=None, conversation=None):
+    # The prompt and cached_model keyword arguments for the classification call
+    analysis_prompt, version = analysis_request(prompt, mode, conversation)
+    return analysis_prompt, {"prompt_type": "intent", "template_version": version,
+                             "cache_key": analysis_cache_key(prompt, conversation), "validate": has_json_object}
+
+def read_analysis(response):
+    record_llm_usage("llm_classify", response)
+    with stage("parse_analysis"):
+        decision = parse_analysis(response.content)
+    if "error" in decision:
+        LLM_PARSE_FAILURES.inc(stage="llm_classify")
+    return decision
+
+def analyze_user_prompt(prompt, mode=None, conversation=None):
+    analysis_prompt, options = analysis_call(prompt, mode, conversation)
+    with stage("llm_classify"):
+        response = cached_model.invoke(analysis_prompt, **options)
+    return read_analysis(response)
+
+def local_decision(prompt):
+    # The fast path's best guess regardless of confidence, for when no model tier answers.
+    # A note without a topic or a calendar request without a time can't be acted on, so those
+    # become chat (which then says the model is unavailable).
+    decision = intent_classifier.predict(prompt)
+    if decision["action"] == "note" and not decision.get("topic"):
+        return {"action": "chat"}
+    if decision["action"] == "calendar" and not (decision.get("start") or decision.get("events")):
+        return {"action": "chat"}
+    return decision
+
+def fast_path_decision(prompt, conversation=None):
+    with stage("intent_fast_path"):
+        decision = intent_classifier.classify(prompt)
+        if decision is None and conversation:
+            # "add another point to that": below the threshold alone, but the session has a topic
+            candidate = intent_classifier.predict(prompt)
+            if candidate.get("reference"):
+                decision = candidate
+    if decision is not None and conversation:
+        # Within a session, a note about "that" takes the last topic; other follow-ups ("move it
+        # to 6pm") and references with nothing to point at need the model and the history
+        decision, resolved = conversation.resolve(decision)
+        if not resolved or (decision["action"] != "note" and is_follow_up(prompt)):
+            return None
+    return decision
+
+def classify_locally(prompt, error):
+    print("Classifying locally:", error)
+    LLM_LOCAL_FALLBACKS.inc(stage="llm_classify")
+    return local_decision(prompt)
+
+def model_decision(decision, conversation=None):
+    # A decision from the model (or its local stand-in) with the session's references filled in
+    if conversation:
+        decision, _ = conversation.resolve(decision)
+    return decision
+
+def classify_user_prompt(prompt, conversation=None):
+    decision = fast_path_decision(prompt, conversation)
+    if decision is None:
+        try:
+            decision = analyze_user_prompt(prompt, conversation=conversation)
+        except LLMUnavailable as e:
+            decision = classify_locally(prompt, e)
+        decision = model_decision(decision, conversation)
+    set_intent(intent_label(decision))
+    return decision
+
+def chat_unavailable(error, stage_name="llm_chat"):
+    print("Chat answer unavailable:", error)
+    LLM_LOCAL_FALLBACKS.inc(stage=stage_name)
+    return UNAVAILABLE_MESSAGE
+
+def read_chat(response):
+    record_llm_usage("llm_chat", response)
+    return response.content.strip()
+
+def chat_answer(user_input, conversation=None):
+    try:
+        with stage("llm_chat"):
+            response = model.invoke(chat_prompt(user_input, conversation), prompt_type="chat")
+    except LLMUnavailable as e:
+        return chat_unavailable(e)
+    return read_chat(response)
+
 # ---------- Unified Route ----------
-@app.route('/assistant', methods=['POST'])
+# The steps between the model calls are shared with assistant_asgi.py, which awaits the same
+# calls (ainvoke/astream) in between; only that waiting differs between the two apps.
+NO_MESSAGE = {"response": "Please provide a message."}
+
+def decision_result(decision, payload, idempotency_key=None):
+    # What /assistant answers without a chat call: the note or calendar outcome, or the answer a
+    # fused classification already carried. None when the message still needs a chat answer.
+    result = respond_to_decision(decision, payload, idempotency_key)
+    if result is None:
+        answer = fused_answer(decision)
+        if answer is not None:
+            result = {"response": answer}
+    return result
+
+@assistant_api.route('/assistant', methods=['POST'])
 def assistant():
-    user_input = request.json.get("message")
+    payload = request.json
+    user_input = payload.get("message")
     if not user_input:
-        return jsonify({"response": "Please provide a message."})
+        return jsonify(NO_MESSAGE)
 
-    decision = analyze_user_prompt(user_input)
+    conversation = load_session(payload)
+    decision = classify_user_prompt(user_input, conversation)
     if "error" in decision:
         return jsonify({"response": decision["error"]})
 
+    result = decision_result(decision, payload, request.headers.get("Idempotency-Key"))
+    if result is None:
+        result = {"response": chat_answer(user_input, conversation)}
+    remember_turn(conversation, user_input, decision, result)
+    return jsonify(result)
+
+def chat_prompt(user_input, conversation=None):
+    context = conversation.render() if conversation else ""
+    return f"{context}User message: {user_input}"
+
+# ---------- Conversation Context ----------
+# A request with a session_id gets that session's recent turns, summary and last topic/event
+# in its prompts (conversation_store); requests without one stay stateless.
+def load_session(payload):
+    # The conversation for the payload's session_id, or None
+    session_id = payload.get("session_id")
+    if not valid_session_id(session_id):
+        return None
+    try:
+        with stage("conversation_load"):
+            return load_conversation(session_id)
+    except Exception as e:
+        print("Conversation unavailable:", e)
+        return None
+
+def turn_entities(decision, result):
+    # What a later turn can refer back to: the note topic used, the event scheduled or moved
+    result = result if isinstance(result, dict) else {}
+    if decision.get("action") == "note" and decision.get("topic"):
+        return {"last_topic": result.get("topic") or decision["topic"]}
+    if decision.get("action") == "calendar":
+        events = decision.get("events") or [decision]
+        outcomes = result.get("events") or [result]
+        for event, outcome in reversed(list(zip(events, outcomes))):
+            event_id = outcome.get("event_id") or outcome.get("job_id")
+            if event_id:
+                return {"last_event": {"id": event_id, "title": event.get("title"),
+                                       "start": event.get("start"), "end": event.get("end")}}
+    return {}
+
+def remember_turn(conversation, user_input, decision, result):
+    if conversation is None:
+        return
+    try:
+        with stage("conversation_save"):
+            record_turn(conversation.session_id, user_input, reply_text(result), turn_entities(decision, result))
+    except Exception as e:
+        print("Could not save conversation turn:", e)
+
+# Note and calendar branches of /assistant; returns None when the message is general chat.
+# Shared with the async entry point (assistant_asgi.py) so both serve identical JSON.
+def respond_to_decision(decision, payload, idempotency_key=None):
     if decision.get("action") == "note":
         topic = decision.get("topic")
         note_action = decision.get("note_action")
         if note_action == "add":
-            points = request.json.get("points")
+            points = payload.get("points")
             if not points:
-                return jsonify({"response": "Please include points to add."})
+                return {"response": "Please include points to add."}
             insert_or_update_notes(topic, points)
-            return jsonify({"response": f"Note added for topic '{topic}'."})
+            return note_write_response(note_action, topic)
+        elif note_action == "append":
+            points = payload.get("points")
+            if not points:
+                return {"response": "Please include points to add."}
+            count = append_note_points(topic, points)
+            return note_write_response(note_action, topic, count)
         elif note_action == "retrieve":
             note = get_notes(topic)
-            return jsonify({"response": note if note else f"No note found for '{topic}'."})
+            if not note and topic:
+                # The topic guess missed, so fall back to the best full-text match
+                matches = search_notes(topic, limit=1)
+                if matches:
+                    return {"response": matches[0]["points"], "topic": matches[0]["topic"]}
+            return {"response": note if note else f"No note found for '{topic}'."}
         else:
-            return jsonify({"response": "Invalid note action."})
+            return {"response": "Invalid note action."}
 
     elif decision.get("action") == "calendar":
+        if decision.get("event_action") == "update":
+            return move_event(decision)
+        events = decision.get("events") or [decision]
+        # With the outbox on, events are queued and the response never waits on the Calendar API
+        return calendar_response(events, schedule_events(events, idempotency_scope(payload, idempotency_key)))
+
+    return None
+
+def note_write_response(note_action, topic, count=None):
+    if note_action == "append":
+        return {"response": f"Added to '{topic}', which now has {count} points."}
+    return {"response": f"Note added for topic '{topic}'."}
+
+def move_event(decision):
+    # Moves an existing event (a session's last one) to the new times; attendees etc. are kept
+    event_id = decision.get("event_id")
+    if not event_id:
+        return {"response": "Which event should I change?"}
+    try:
+        event = (decision.get("events") or [decision])[0]
+        body = build_event(*parse_event_times(event))
+        fields = {key: body[key] for key in ("summary", "start", "end")}
+        if calendar_outbox.enabled():
+            queued = move_queued_event(event_id, fields)
+            if queued is not None:
+                return queued
+        updated = patch_event(event_id, fields)
+    except Exception as e:
+        return {"response": f"Error updating event: {str(e)}"}
+    calendar_mirror.record_events([updated])
+    return {"response": "Event updated.", "event_id": event_id, "event_link": updated.get("htmlLink")}
+
+def move_queued_event(job_id, fields):
+    # A session's last event id is an outbox job id until the worker has sent it: an unsent
+    # job is changed in place, one in flight or failed can't be moved yet. None: patch the event.
+    queued = calendar_outbox.update_queued_event(job_id, fields)
+    if queued is not None:
+        calendar_mirror.record_events([queued])
+        return {"response": "Event updated.", "event_id": job_id, "job_id": job_id,
+                "status_url": calendar_outbox.status_url(job_id)}
+    job = calendar_outbox.get_job(job_id)
+    if job is not None and job["status"] == "sending":
+        return {"response": "That event is still being created. Please try again in a moment.",
+                "job_id": job_id, "status_url": calendar_outbox.status_url(job_id)}
+    if job is not None and job["status"] == "failed":
+        return {"response": f"That event was never created, so it can't be moved: {job['error']}",
+                "job_id": job_id, "status_url": calendar_outbox.status_url(job_id)}
+    return None
+
+def idempotency_scope(payload, idempotency_key=None):
+    # What makes a resubmitted message recognizable to the outbox: the client's Idempotency-Key
+    # header, or else its session for a few minutes (calendar_outbox.session_scope). Without
+    # either, every submit queues new jobs.
+    if idempotency_key:
+        return f"key:{idempotency_key}"
+    session_id = payload.get("session_id")
+    return calendar_outbox.session_scope(session_id) if valid_session_id(session_id) else None
+
+
+def schedule_events(events, scope=None):
+    return schedule_event_groups([events], [scope])[0]
+
+def schedule_event_groups(groups, scopes=None):
+    # groups is a list of event lists; every parsable event across all groups goes out
+    # in one insert_events call, and each group gets its own summary back. Events that overlap
+    # something already on the calendar (per the local mirror) still go in, with a warning.
+    # scopes (one per group, see idempotency_scope) let the outbox drop resubmitted events.
+    scopes = scopes or [None] * len(groups)
+    results = [[None] * len(events) for events in groups]
+    pending = []
+    for group_index, events in enumerate(groups):
+        for index, event in enumerate(events):
+            try:
+                pending.append((group_index, index, parse_event_times(event)))
+            except Exception as e:
+                results[group_index][index] = {"title": event.get("title"), "status": "failed",
+                                               "error": f"Error creating event: {str(e)}"}
+
+    bodies = [build_event(*parsed) for _, _, parsed in pending]
+    conflicts = calendar_mirror.find_conflicts(bodies)
+    scheduled = []
+    if calendar_outbox.enabled():
+        try:
+            keys = [calendar_outbox.event_idempotency_key(scopes[group_index], body) if scopes[group_index] else None
+                    for (group_index, _, _), body in zip(pending, bodies)]
+            job_ids = calendar_outbox.enqueue_events(bodies, idempotency_keys=keys) if pending else []
+        except Exception as e:
+            job_ids = [e] * len(pending)
+        for (group_index, index, parsed), body, job_id in zip(pending, bodies, job_ids):
+            if isinstance(job_id, Exception):
+                results[group_index][index] = {"title": parsed[0], "status": "failed",
+                                               "error": f"Error queueing event: {str(job_id)}"}
+            else:
+                results[group_index][index] = {"title": parsed[0], "status": "queued", "job_id": job_id,
+                                               "status_url": calendar_outbox.status_url(job_id)}
+                # The job id becomes the event id, so the next mirror sync updates this same row
+                scheduled.append(dict(body, id=job_id))
+    else:
+        try:
+            created = insert_events(bodies) if pending else []
+        except Exception as e:
+            created = [{"error": str(e)}] * len(pending)
+        for (group_index, index, parsed), result in zip(pending, created):
+            if "error" in result:
+                results[group_index][index] = {"title": parsed[0], "status": "failed",
+                                               "error": f"Error creating event: {result['error']}"}
+            else:
+                results[group_index][index] = {"title": parsed[0], "status": "created",
+                                               "event_id": result["event"].get("id"),
+                                               "event_link": result["event"].get("htmlLink")}
+                scheduled.append(result["event"])
+    calendar_mirror.record_events(scheduled)
+
+    for (group_index, index, _), found in zip(pending, conflicts):
+        if found and results[group_index][index]["status"] != "failed":
+            results[group_index][index]["conflicts"] = found
+            results[group_index][index]["warning"] = calendar_mirror.conflict_warning(found)
+
+    summaries = []
+    for group in results:
+        created = sum(result["status"] == "created" for result in group)
+        queued = sum(result["status"] == "queued" for result in group)
+        verb, count = ("Queued", queued) if queued else ("Created", created)
+        summaries.append({"response": f"{verb} {count} of {len(group)} events.", "events": group})
+    return summaries
+
+def calendar_response(events, summary):
+    # A single event gets the same flat shape /assistant has always returned for one event
+    if len(events) != 1:
+        return summary
+    event = summary["events"][0]
+    if event["status"] == "created":
+        response = {"response": "Event created.", "event_link": event["event_link"], "event_id": event["event_id"]}
+    elif event["status"] == "queued":
+        response = {"response": "Event queued.", "job_id": event["job_id"], "status_url": event["status_url"]}
+    else:
+        return {"response": event["error"]}
+    if "conflicts" in event:
+        response.update(warning=event["warning"], conflicts=event["conflicts"])
+    return response
+
+# ---------- Batch Route ----------
+# Replays many messages at once: classification and chat answers fan out over a shared,
+# bounded thread pool, note writes share one SQLite transaction, and calendar events from
+# every message go out as batched insert requests. Throughput follows BATCH_CONCURRENCY.
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+BATCH_MAX_MESSAGES = int(os.getenv("BATCH_MAX_MESSAGES", "500"))
+batch_executor = ThreadPoolExecutor(max_workers=BATCH_CONCURRENCY, thread_name_prefix="assistant-batch")
+
+def answer_message(decision, payload):
+    # Everything /assistant does after classification, minus grouped note writes and calendar
+    result = decision_result(decision, payload)
+    return result if result is not None else {"response": chat_answer(payload["message"])}
+
+def run_batch(payloads, idempotency_key=None):
+    # payloads is a list of {"message": ..., "points": [...]}; results come back in input order.
+    # A batch resubmitted with the same Idempotency-Key queues each calendar message once.
+    results = [None] * len(payloads)
+
+    def classify(payload):
+        if not isinstance(payload, dict) or not payload.get("message"):
+            return {"error": "Please provide a message."}
+        return classify_user_prompt(payload["message"])
+
+    decisions = []
+    for index, future in enumerate([batch_executor.submit(classify, payload) for payload in payloads]):
+        try:
+            decisions.append(future.result())
+        except Exception as e:
+            decisions.append(None)
+            results[index] = {"error": f"An error occurred: {str(e)}"}
+
+    note_writes, calendar_groups, scopes, remaining = [], [], [], []
+    for index, (payload, decision) in enumerate(zip(payloads, decisions)):
+        if decision is None:
+            continue
+        if "error" in decision:
+            results[index] = {"response": decision["error"]}
+        elif decision.get("action") == "note" and decision.get("note_action") in ("add", "append"):
+            if payload.get("points"):
+                note_writes.append((index, (decision["note_action"], decision.get("topic"), payload["points"])))
+            else:
+                results[index] = {"response": "Please include points to add."}
+        elif decision.get("action") == "calendar":
+            calendar_groups.append((index, decision.get("events") or [decision]))
+            scopes.append(idempotency_scope(payload, idempotency_key and f"{idempotency_key}:{index}"))
+        else:
+            remaining.append(index)
+
+    if note_writes:
+        try:
+            counts = apply_note_writes([write for _, write in note_writes])
+        except Exception as e:
+            counts = [e] * len(note_writes)
+        for (index, (note_action, topic, _)), count in zip(note_writes, counts):
+            if isinstance(count, Exception):
+                results[index] = {"error": f"An error occurred: {str(count)}"}
+            else:
+                results[index] = note_write_response(note_action, topic, count)
+
+    if calendar_groups:
+        summaries = schedule_event_groups([events for _, events in calendar_groups], scopes)
+        for (index, events), summary in zip(calendar_groups, summaries):
+            results[index] = calendar_response(events, summary)
+
+    futures = [(index, batch_executor.submit(answer_message, decisions[index], payloads[index])) for index in remaining]
+    for index, future in futures:
+        try:
+            results[index] = future.result()
+        except Exception as e:
+            results[index] = {"error": f"An error occurred: {str(e)}"}
+    return results
+
+def batch_payloads(body):
+    # (payloads, None) for a valid /assistant/batch body, else (None, error response)
+    payloads = (body or {}).get("messages")
+    if not isinstance(payloads, list) or not payloads:
+        return None, {"response": "Please provide a list of messages."}
+    if len(payloads) > BATCH_MAX_MESSAGES:
+        return None, {"response": f"At most {BATCH_MAX_MESSAGES} messages per batch."}
+    # Plain strings are accepted as messages without points
+    return [{"message": payload} if isinstance(payload, str) else payload for payload in payloads], None
+
+@assistant_api.route('/assistant/batch', methods=['POST'])
+def assistant_batch():
+    payloads, error = batch_payloads(request.json)
+    if error:
+        return jsonify(error), 400
+    return jsonify({"results": run_batch(payloads, request.headers.get("Idempotency-Key"))})
+
+# ---------- Streaming Route ----------
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+STREAM_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+# Appended when the model stalls part-way through a streamed answer
+ANSWER_CUT_OFF = " … (the answer was cut off, please ask again)"
+
+class StreamReply:
+    # One /assistant/stream response. Each step returns the events to send, so this route and
+    # the async one differ only in how they wait for the classification and the chat chunks.
+    def __init__(self, payload, idempotency_key=None):
+        self.payload = payload
+        self.message = payload.get("message")
+        self.idempotency_key = idempotency_key
+        self.conversation = None
+        self.decision = None
+        self.result = None
+        self.text = []
+
+    def missing_message(self):
+        return [sse_event("answer", NO_MESSAGE), sse_event("done", {})]
+
+    def opening(self, conversation, decision):
+        # The "decision" event, then the answer unless it has to be streamed from the model
+        self.conversation, self.decision = conversation, decision
+        events = [sse_event("decision", {key: value for key, value in decision.items() if key != "answer"})]
+        if "error" in decision:
+            return events + [sse_event("answer", {"response": decision["error"]})]
+        answer = fused_answer(decision)
+        self.result = respond_to_decision(decision, self.payload, self.idempotency_key)
+        if self.result is not None:
+            return events + [sse_event("answer", self.result)]
+        if answer is not None:
+            self.result = {"response": answer}
+            return events + [sse_event("token", {"text": answer})]
+        return events
+
+    def needs_chat(self):
+        return self.result is None and "error" not in self.decision
+
+    def chat_prompt(self):
+        return chat_prompt(self.message, self.conversation)
+
+    def token(self, text):
+        self.text.append(text)
+        return sse_event("token", {"text": text})
+
+    def unavailable(self, error):
+        if self.text:
+            # Part of the answer is already on screen: say it stopped rather than start over
+            print("Chat answer cut off:", error)
+            return sse_event("token", {"text": ANSWER_CUT_OFF})
+        return self.token(chat_unavailable(error, "llm_chat_stream"))
+
+    def remember(self):
+        if "error" not in self.decision:
+            result = self.result if self.result is not None else {"response": "".join(self.text)}
+            remember_turn(self.conversation, self.message, self.decision, result)
+
+    def failed(self, error):
+        return sse_event("error", {"response": f"An error occurred: {str(error)}"})
+
+# Same flow as /assistant, sent as Server-Sent Events: a "decision" event with the classification,
+# then either one "answer" event (notes, calendar, errors) or the chat answer as "token" events,
+# and finally "done".
+@assistant_api.route('/assistant/stream', methods=['POST'])
+def assistant_stream():
+    reply = StreamReply(request.json or {}, request.headers.get("Idempotency-Key"))
+
+    def generate():
+        if not reply.message:
+            yield from reply.missing_message()
+            return
         try:
-            start_time = datetime.datetime.strptime(decision["start"], "%Y-%m-%d %H:%M")
-            end_time = datetime.datetime.strptime(decision["end"], "%Y-%m-%d %H:%M")
-            title = decision["title"]
-            event = create_event(title, start_time, end_time)
-            return jsonify({"response": "Event created.", "event_link": event.get("htmlLink")})
+            conversation = load_session(reply.payload)
+            yield from reply.opening(conversation, classify_user_prompt(reply.message, conversation))
+            if reply.needs_chat():
+                try:
+                    with stage("llm_chat_stream"):
+                        for chunk in model.stream(reply.chat_prompt(), prompt_type="chat"):
+                            if chunk.content:
+                                yield reply.token(chunk.content)
+                except LLMUnavailable as e:
+                    yield reply.unavailable(e)
+            reply.remember()
         except Exception as e:
-            return jsonify({"response": f"Error creating event: {str(e)}"})
+            yield reply.failed(e)
+        yield sse_event("done", {})
 
-    return jsonify({"response": model.invoke(f"User message: {user_input}").content.strip()})
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers=STREAM_HEADERS)
 
+def assistant_stats_snapshot():
+    stats = {"intent_fast_path": intent_classifier.stats(), "llm_cache": cached_model.stats(),
+             "llm": llm_client.model.stats(), "notes_store": store_stats(),
+             "conversations": dict(conversation_store.conversation_store.stats)}
+    if calendar_outbox.enabled():
+        stats["calendar_outbox"] = calendar_outbox.outbox.stats()
+    if calendar_mirror.enabled():
+        stats["calendar_mirror"] = dict(calendar_mirror.mirror.stats, last_synced=calendar_mirror.mirror.last_synced())
+    return stats
 
+@assistant_api.route('/assistant/stats', methods=['GET'])
+def assistant_stats():
+    return jsonify(assistant_stats_snapshot())
+
+
+# ---------- Standalone App ----------
+app = Flask(__name__)
+CORS(app)
+init_app(app)  # per-stage timings and /metrics
+app.register_blueprint(assistant_api)
+app.register_blueprint(calendar_api)
 
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
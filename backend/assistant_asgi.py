@@ -0,0 +1,163 @@
+import asyncio
+from quart import Quart, Response, g, request, jsonify
+
+import assistant
+from assistant import analysis_call, read_analysis, classify_locally, model_decision, fast_path_decision
+from assistant import chat_prompt, chat_unavailable, read_chat, decision_result, load_session, remember_turn
+from assistant import batch_payloads, run_batch, assistant_stats_snapshot, StreamReply, sse_event
+from assistant import NO_MESSAGE, STREAM_HEADERS
+from calendar_api import start_calendar_outbox, job_status, free_busy
+import calendar_mirror
+from metrics import METRICS_CONTENT_TYPE, registry, stage, set_intent, intent_label, start_trace, finish_trace
+from resilient_llm import LLMUnavailable
+
+# Async entry point for the /assistant routes. Serve with an ASGI server, e.g.
+#   cd backend && hypercorn assistant_asgi:app --bind 0.0.0.0:5000
+# LLM calls are awaited (model.ainvoke/astream), so a slow Gemini response no longer pins a
+# worker thread. SQLite and Google Calendar have no async drivers here, so those branches run
+# in the default thread pool via asyncio.to_thread and never block the event loop. Everything
+# between the model calls is assistant.py's own code, so the two apps answer alike.
+
+app = Quart(__name__)
+
+
+@app.before_serving
+async def start_calendar_mirror():
+    calendar_mirror.start()
+
+
+# ---------- Metrics ----------
+# Same series as the Flask app; asyncio.to_thread copies the context, so thread-pool stages
+# land on the request's trace too
+@app.before_request
+async def start_request_trace():
+    if request.path != '/metrics':
+        g.metrics_trace = start_trace()
+    start_calendar_outbox()
+
+
+@app.after_request
+async def finish_request_trace(response):
+    token = g.pop('metrics_trace', None)
+    if token is not None:
+        finish_trace(token, request.url_rule.rule if request.url_rule else "unmatched",
+                     request.method, response.status_code)
+    return response
+
+
+@app.route('/metrics', methods=['GET'])
+async def metrics():
+    # This process's series only, as on the Flask app (see metrics.py)
+    return Response(registry.render(), content_type=METRICS_CONTENT_TYPE)
+
+
+# ---------- LLM Classification ----------
+async def analyze_user_prompt(prompt, mode=None, conversation=None):
+    analysis_prompt, options = analysis_call(prompt, mode, conversation)
+    with stage("llm_classify"):
+        response = await assistant.cached_model.ainvoke(analysis_prompt, **options)
+    return read_analysis(response)
+
+
+async def classify_user_prompt(prompt, conversation=None):
+    decision = fast_path_decision(prompt, conversation)
+    if decision is None:
+        try:
+            decision = await analyze_user_prompt(prompt, conversation=conversation)
+        except LLMUnavailable as e:
+            decision = classify_locally(prompt, e)
+        decision = model_decision(decision, conversation)
+    set_intent(intent_label(decision))
+    return decision
+
+
+async def chat_answer(user_input, conversation=None):
+    try:
+        with stage("llm_chat"):
+            response = await assistant.model.ainvoke(chat_prompt(user_input, conversation), prompt_type="chat")
+    except LLMUnavailable as e:
+        return chat_unavailable(e)
+    return read_chat(response)
+
+
+# ---------- Unified Route ----------
+@app.route('/assistant', methods=['POST'])
+async def assistant_route():
+    payload = await request.get_json()
+    user_input = payload.get("message")
+    if not user_input:
+        return jsonify(NO_MESSAGE)
+
+    conversation = await asyncio.to_thread(load_session, payload)
+    decision = await classify_user_prompt(user_input, conversation)
+    if "error" in decision:
+        return jsonify({"response": decision["error"]})
+
+    result = await asyncio.to_thread(decision_result, decision, payload, request.headers.get("Idempotency-Key"))
+    if result is None:
+        result = {"response": await chat_answer(user_input, conversation)}
+    await asyncio.to_thread(remember_turn, conversation, user_input, decision, result)
+    return jsonify(result)
+
+
+@app.route('/assistant/batch', methods=['POST'])
+async def assistant_batch():
+    # The fan-out already runs on assistant.batch_executor, so just keep it off the event loop
+    payloads, error = batch_payloads(await request.get_json())
+    if error:
+        return jsonify(error), 400
+    return jsonify({"results": await asyncio.to_thread(run_batch, payloads, request.headers.get("Idempotency-Key"))})
+
+
+# ---------- Streaming Route ----------
+# The Flask app's Server-Sent Events, with the chat answer read from model.astream
+@app.route('/assistant/stream', methods=['POST'])
+async def assistant_stream():
+    reply = StreamReply((await request.get_json()) or {}, request.headers.get("Idempotency-Key"))
+
+    async def generate():
+        if not reply.message:
+            for event in reply.missing_message():
+                yield event
+            return
+        try:
+            conversation = await asyncio.to_thread(load_session, reply.payload)
+            decision = await classify_user_prompt(reply.message, conversation)
+            for event in await asyncio.to_thread(reply.opening, conversation, decision):
+                yield event
+            if reply.needs_chat():
+                try:
+                    with stage("llm_chat_stream"):
+                        async for chunk in assistant.model.astream(reply.chat_prompt(), prompt_type="chat"):
+                            if chunk.content:
+                                yield reply.token(chunk.content)
+                except LLMUnavailable as e:
+                    yield reply.unavailable(e)
+            await asyncio.to_thread(reply.remember)
+        except Exception as e:
+            yield reply.failed(e)
+        yield sse_event("done", {})
+
+    return Response(generate(), mimetype='text/event-stream', headers=STREAM_HEADERS)
+
+
+# ---------- Calendar Routes ----------
+@app.route('/calendar/jobs/<job_id>', methods=['GET'])
+async def calendar_job_status(job_id):
+    body, status = await asyncio.to_thread(job_status, job_id)
+    return jsonify(body), status
+
+
+@app.route('/calendar/free_busy', methods=['GET'])
+async def calendar_free_busy():
+    body, status = await asyncio.to_thread(free_busy, request.args)
+    return jsonify(body), status
+
+
+@app.route('/assistant/stats', methods=['GET'])
+async def assistant_stats():
+    return jsonify(await asyncio.to_thread(assistant_stats_snapshot))
+
+
+if __name__ == '__main__':
+    app.run(debug=True)
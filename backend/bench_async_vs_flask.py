@@ -0,0 +1,193 @@
+import os
+import json
+import time
+import socket
+import asyncio
+import argparse
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Keep the benchmark away from the real notes.db / llm_cache.db and from Gemini
+_tmp = tempfile.mkdtemp(prefix='bench-asgi-')
+os.environ.setdefault("NOTES_DB", os.path.join(_tmp, 'notes.db'))
+os.environ.setdefault("LLM_CACHE_DB", os.path.join(_tmp, 'llm_cache.db'))
+os.environ.setdefault("GOOGLE_API_KEY", "bench")
+
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+from hypercorn.config import Config
+from hypercorn.asyncio import serve
+
+import assistant
+import assistant_asgi
+from fake_llm import FakeChatModel
+
+CHAT_MESSAGE = "What is the capital of France?"
+CONCURRENCY_LEVELS = [8, 32, 128, 256]
+
+
+# ---------- Servers ----------
+class QuietHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    # Like gunicorn's gthread worker: a fixed number of threads serve requests
+    request_queue_size = 1024
+
+    def __init__(self, host, port, app, threads):
+        super().__init__(host, port, app, handler=QuietHandler)
+        self.executor = ThreadPoolExecutor(max_workers=threads)
+
+    def process_request(self, request, client_address):
+        self.executor.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+def start_flask(threads):
+    server = PooledWSGIServer('127.0.0.1', 0, assistant.app, threads)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server.server_address[1], server.shutdown
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_asgi():
+    port = free_port()
+    config = Config()
+    config.bind = [f"127.0.0.1:{port}"]
+    config.backlog = 1024
+    config.accesslog = None
+    loop = asyncio.new_event_loop()
+    stop = asyncio.Event()
+
+    def run():
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(serve(assistant_asgi.app, config, shutdown_trigger=stop.wait))
+
+    threading.Thread(target=run, daemon=True).start()
+    # Wait until hypercorn is accepting connections
+    for _ in range(100):
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.1).close()
+            break
+        except OSError:
+            time.sleep(0.05)
+    return port, lambda: loop.call_soon_threadsafe(stop.set)
+
+
+# ---------- Client ----------
+async def post_json(port, path, payload, timeout):
+    body = json.dumps(payload).encode('utf-8')
+    start = time.perf_counter()
+    reader, writer = await asyncio.wait_for(asyncio.open_connection('127.0.0.1', port), timeout)
+    writer.write((f"POST {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nContent-Type: application/json\r\n"
+                  f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n").encode('utf-8') + body)
+    await writer.drain()
+    data = await asyncio.wait_for(reader.read(), timeout)
+    writer.close()
+    head, _, content = data.partition(b'\r\n\r\n')
+    status = int(head.split(b' ', 2)[1])
+    if b'chunked' in head.lower():
+        content = _dechunk(content)
+    return status, json.loads(content or b'null'), time.perf_counter() - start
+
+
+def _dechunk(content):
+    out = b''
+    while content:
+        size_line, _, rest = content.partition(b'\r\n')
+        size = int(size_line, 16)
+        if size == 0:
+            break
+        out += rest[:size]
+        content = rest[size + 2:]
+    return out
+
+
+async def run_wave(port, concurrency, timeout):
+    async def one():
+        try:
+            status, _, latency = await post_json(port, '/assistant', {"message": CHAT_MESSAGE}, timeout)
+            return latency if status == 200 else None
+        except Exception:
+            return None
+
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*(one() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    ok = sorted(latency for latency in latencies if latency is not None)
+    return {
+        "concurrency": concurrency,
+        "ok": len(ok),
+        "errors": concurrency - len(ok),
+        "wall_seconds": round(elapsed, 3),
+        "requests_per_sec": round(len(ok) / elapsed, 1),
+        "p50_ms": round(ok[len(ok) // 2] * 1000) if ok else None,
+        "p95_ms": round(ok[min(len(ok) - 1, int(len(ok) * 0.95))] * 1000) if ok else None,
+    }
+
+
+async def verify_identical(flask_port, asgi_port):
+    payloads = [
+        {"message": "add note on Benchmarks", "points": ["one", "two"]},
+        {"message": "show my notes for Benchmarks"},
+        {"message": "show my notes for Nothing Here"},
+        {"message": CHAT_MESSAGE},
+        {"message": ""},
+    ]
+    for payload in payloads:
+        _, flask_body, _ = await post_json(flask_port, '/assistant', payload, 30)
+        _, asgi_body, _ = await post_json(asgi_port, '/assistant', payload, 30)
+        if flask_body != asgi_body:
+            raise SystemExit(f"Responses differ for {payload}: {flask_body} != {asgi_body}")
+
+
+async def main(args):
+    fake = FakeChatModel(latency=args.llm_latency)
+    assistant.model = fake
+    assistant.cached_model.model = fake
+
+    flask_port, stop_flask = start_flask(args.flask_threads)
+    asgi_port, stop_asgi = start_asgi()
+    await verify_identical(flask_port, asgi_port)
+    print("Flask and ASGI responses are identical.")
+
+    results = {"llm_latency": args.llm_latency, "flask_threads": args.flask_threads, "flask": [], "asgi": []}
+    for concurrency in args.concurrency:
+        results["flask"].append(await run_wave(flask_port, concurrency, args.timeout))
+        results["asgi"].append(await run_wave(asgi_port, concurrency, args.timeout))
+
+    print(f"fake LLM latency {args.llm_latency}s, Flask with {args.flask_threads} threads")
+    print(f"{'concurrency':>12} {'flask req/s':>12} {'flask p95':>10} {'asgi req/s':>12} {'asgi p95':>10}")
+    for flask_row, asgi_row in zip(results["flask"], results["asgi"]):
+        print(f"{flask_row['concurrency']:>12} {flask_row['requests_per_sec']:>12} {str(flask_row['p95_ms']):>10}"
+              f" {asgi_row['requests_per_sec']:>12} {str(asgi_row['p95_ms']):>10}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    stop_flask()
+    stop_asgi()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Concurrent slow-LLM /assistant requests: Flask vs ASGI")
+    parser.add_argument('--llm-latency', type=float, default=1.0)
+    parser.add_argument('--flask-threads', type=int, default=8)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=CONCURRENCY_LEVELS)
+    parser.add_argument('--timeout', type=float, default=120.0)
+    parser.add_argument('--json', help="also save results to this file")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,95 @@
+import os
+import json
+import time
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+# Keep the benchmark away from the real notes.db / llm_cache.db, Gemini and Google Calendar
+_tmp = tempfile.mkdtemp(prefix='bench-batch-')
+os.environ.setdefault("NOTES_DB", os.path.join(_tmp, 'notes.db'))
+os.environ.setdefault("LLM_CACHE_DB", os.path.join(_tmp, 'llm_cache.db'))
+os.environ.setdefault("CALENDAR_OUTBOX_DB", os.path.join(_tmp, 'calendar_outbox.db'))
+os.environ.setdefault("CALENDAR_MIRROR_DB", os.path.join(_tmp, 'calendar_mirror.db'))
+os.environ.setdefault("GOOGLE_API_KEY", "bench")
+
+from google.auth.credentials import AnonymousCredentials
+
+import assistant
+import calendar_client
+from fake_llm import FakeChatModel
+from fake_calendar_server import start_fake_calendar_server
+
+CONCURRENCY_LEVELS = [1, 4, 8, 16, 32]
+
+
+def build_messages(count):
+    # An inbox-like mix: mostly chat, plus note writes and meetings the fast path recognises
+    messages = []
+    for i in range(count):
+        kind = i % 4
+        if kind == 0:
+            messages.append({"message": f"add note on Inbox {i}", "points": [f"point {i}"]})
+        elif kind == 1:
+            messages.append({"message": f"schedule sync {i} tomorrow at 3pm"})
+        else:
+            messages.append({"message": f"Summarise email thread number {i} for me"})
+    return messages
+
+
+def run_serial(client, messages):
+    start = time.perf_counter()
+    for payload in messages:
+        client.post('/assistant', json=payload)
+    return time.perf_counter() - start
+
+
+def run_batched(client, messages, concurrency):
+    assistant.batch_executor = ThreadPoolExecutor(max_workers=concurrency)
+    start = time.perf_counter()
+    response = client.post('/assistant/batch', json={"messages": messages})
+    elapsed = time.perf_counter() - start
+    assistant.batch_executor.shutdown()
+    results = response.get_json()["results"]
+    errors = sum("error" in result for result in results)
+    return elapsed, errors
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="One request per message vs /assistant/batch")
+    parser.add_argument('--messages', type=int, default=64)
+    parser.add_argument('--llm-latency', type=float, default=0.2)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=CONCURRENCY_LEVELS)
+    parser.add_argument('--json', help="also save results to this file")
+    args = parser.parse_args()
+
+    server = start_fake_calendar_server()
+    calendar_client.calendar_client = calendar_client.CalendarClient(
+        token_file=None, credentials=AnonymousCredentials(), api_endpoint=server.api_endpoint)
+    fake = FakeChatModel(latency=args.llm_latency)
+    assistant.model = fake
+    assistant.cached_model.model = fake
+    client = assistant.app.test_client()
+    messages = build_messages(args.messages)
+
+    assistant.cached_model.clear()
+    serial = run_serial(client, messages)
+    results = {"messages": args.messages, "llm_latency": args.llm_latency,
+               "serial": {"seconds": round(serial, 3), "messages_per_sec": round(len(messages) / serial, 1)},
+               "batch": []}
+    for concurrency in args.concurrency:
+        # Cold cache for every run so each message really reaches the model
+        assistant.cached_model.clear()
+        elapsed, errors = run_batched(client, messages, concurrency)
+        results["batch"].append({"concurrency": concurrency, "seconds": round(elapsed, 3), "errors": errors,
+                                 "messages_per_sec": round(len(messages) / elapsed, 1)})
+
+    print(f"{len(messages)} messages, fake LLM latency {args.llm_latency}s")
+    print(f"{'mode':>12} {'seconds':>9} {'msg/s':>8} {'errors':>7}")
+    print(f"{'serial':>12} {results['serial']['seconds']:>9} {results['serial']['messages_per_sec']:>8} {'-':>7}")
+    for row in results["batch"]:
+        print(f"{'batch x' + str(row['concurrency']):>12} {row['seconds']:>9} {row['messages_per_sec']:>8} {row['errors']:>7}")
+    print(f"calendar batch requests: {server.calendar.stats['batch_requests']}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,137 @@
+import os
+import time
+import random
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+
+# Checks the calendar mirror against the fake Calendar server (full sync, incremental sync,
+# deletes, expired sync tokens) and times conflict and free/busy queries against the mirror
+# versus listing the calendar over the API.
+#   python bench_calendar_mirror.py --events 5000 --queries 2000
+
+_tmp = tempfile.mkdtemp(prefix='bench-mirror-')
+os.environ.setdefault("CALENDAR_MIRROR_DB", os.path.join(_tmp, 'calendar_mirror.db'))
+
+from google.auth.credentials import AnonymousCredentials
+
+import calendar_client
+from calendar_mirror import CalendarMirror, event_interval, to_timestamp
+from fake_calendar_server import start_fake_calendar_server
+
+START = datetime(2025, 1, 1, 8, 0)
+
+
+def make_event(rng, index):
+    start = START + timedelta(days=rng.randrange(365), minutes=15 * rng.randrange(48))
+    end = start + timedelta(minutes=rng.choice([15, 30, 45, 60, 90, 120]))
+    event = {"summary": f"Event {index}",
+             "start": {"dateTime": start.isoformat(), "timeZone": "Asia/Kolkata"},
+             "end": {"dateTime": end.isoformat(), "timeZone": "Asia/Kolkata"}}
+    if index % 20 == 0:
+        event["transparency"] = "transparent"
+    return event
+
+
+def random_window(rng):
+    start = START + timedelta(days=rng.randrange(365), minutes=rng.randrange(24 * 60))
+    return start, start + timedelta(minutes=rng.choice([30, 60, 240, 24 * 60]))
+
+
+def expected_overlaps(calendar, start, end):
+    # Brute force over everything the fake server holds
+    start_ts, end_ts = to_timestamp(start), to_timestamp(end)
+    found = set()
+    for event in calendar.list_events('primary'):
+        if event.get("transparency") == "transparent":
+            continue
+        s, e = event_interval(event)
+        if s < end_ts and e > start_ts:
+            found.add(event["id"])
+    return found
+
+
+def api_overlaps(start, end):
+    # What a conflict check costs without the mirror: list the calendar and scan it
+    start_ts, end_ts = to_timestamp(start), to_timestamp(end)
+    found, page_token = [], None
+    while True:
+        page = calendar_client.list_events('primary', page_token=page_token)
+        for event in page.get("items", []):
+            s, e = event_interval(event)
+            if s < end_ts and e > start_ts and event.get("transparency") != "transparent":
+                found.append(event)
+        page_token = page.get("nextPageToken")
+        if not page_token:
+            return found
+
+
+def check(mirror, calendar, rng, queries=200):
+    for _ in range(queries):
+        start, end = random_window(rng)
+        got = {event["event_id"] for event in mirror.overlapping(start, end)}
+        assert got == expected_overlaps(calendar, start, end), (start, end)
+
+
+def timed_queries(fn, windows):
+    start = time.perf_counter()
+    for window in windows:
+        fn(*window)
+    return (time.perf_counter() - start) / len(windows) * 1e6
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Calendar mirror correctness and query latency")
+    parser.add_argument('--events', type=int, default=2000)
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    server = start_fake_calendar_server()
+    calendar = server.calendar
+    calendar_client.calendar_client = calendar_client.CalendarClient(
+        token_file=None, credentials=AnonymousCredentials(), api_endpoint=server.api_endpoint)
+    # The whole generated year, not just the last HISTORY_DAYS, so it can be checked against the server
+    mirror = CalendarMirror(db_path=os.environ["CALENDAR_MIRROR_DB"], history_days=None)
+
+    for index in range(args.events):
+        calendar.insert('primary', make_event(rng, index))
+
+    start = time.perf_counter()
+    mirror.sync()
+    print(f"full sync of {args.events} events: {time.perf_counter() - start:.2f}s")
+    check(mirror, calendar, rng)
+
+    # Incremental: new events and deletions arrive through the sync token
+    ids = [event["id"] for event in calendar.list_events('primary')]
+    for event_id in rng.sample(ids, 50):
+        calendar.delete('primary', event_id)
+    for index in range(args.events, args.events + 50):
+        calendar.insert('primary', make_event(rng, index))
+    assert mirror.sync() == 100
+    assert mirror.stats["full_syncs"] == 1
+    check(mirror, calendar, rng)
+
+    # Expired token: the server answers 410 and the mirror starts over
+    calendar.delete('primary', ids[-1])
+    calendar.expire_sync_tokens()
+    mirror.sync()
+    assert mirror.stats["full_syncs"] == 2
+    check(mirror, calendar, rng)
+
+    # Locally recorded events count straight away
+    local = dict(make_event(rng, -1), id="localevent1")
+    mirror.record_event(local)
+    assert "localevent1" in {event["event_id"] for event in mirror.overlapping(*event_interval(local))}
+    print("mirror matches the server after incremental, deleting and expired-token syncs")
+
+    windows = [random_window(rng) for _ in range(args.queries)]
+    overlap_us = timed_queries(mirror.overlapping, windows)
+    free_busy_us = timed_queries(mirror.free_busy, windows)
+    api_us = timed_queries(api_overlaps, windows[:20])
+    print(f"{'query':>22} {'us/query':>12}")
+    print(f"{'mirror overlapping':>22} {overlap_us:>12.1f}")
+    print(f"{'mirror free_busy':>22} {free_busy_us:>12.1f}")
+    print(f"{'API list + scan':>22} {api_us:>12.1f}")
+    server.shutdown()
@@ -0,0 +1,113 @@
+import os
+import re
+import json
+import time
+import argparse
+import tempfile
+
+# Keep the benchmark away from the real databases, Gemini and Google Calendar
+_tmp = tempfile.mkdtemp(prefix='bench-conversation-')
+os.environ.setdefault("NOTES_DB", os.path.join(_tmp, 'notes.db'))
+os.environ.setdefault("LLM_CACHE_DB", os.path.join(_tmp, 'llm_cache.db'))
+os.environ.setdefault("CONVERSATION_DB", os.path.join(_tmp, 'conversations.db'))
+os.environ.setdefault("CALENDAR_MIRROR_DB", os.path.join(_tmp, 'calendar_mirror.db'))
+os.environ.setdefault("CALENDAR_OUTBOX", "0")
+os.environ.setdefault("GOOGLE_API_KEY", "bench")
+
+from google.auth.credentials import AnonymousCredentials
+
+import assistant
+import calendar_client
+from conversation_store import estimate_tokens
+from fake_llm import FakeChatModel
+from fake_calendar_server import start_fake_calendar_server
+
+# Follow-ups within a session ("add another point to that", "move it to 6pm") resolved through
+# /assistant, and prompt size per turn as a session grows: bounded by the history budget,
+# against the full transcript an unbounded history would send.
+#   python bench_conversation.py --turns 200
+
+
+class PromptRecorder:
+    # Wraps a model and remembers the size of every prompt sent to it
+    def __init__(self, model):
+        self.model = model
+        self.prompt_tokens = []
+
+    def invoke(self, prompt, **kwargs):
+        self.prompt_tokens.append(estimate_tokens(prompt))
+        return self.model.invoke(prompt, **kwargs)
+
+    def stream(self, prompt, **kwargs):
+        self.prompt_tokens.append(estimate_tokens(prompt))
+        return self.model.stream(prompt, **kwargs)
+
+
+def respond(prompt):
+    # The analysis prompt asks for JSON; "move it to 6pm" gets the last event moved
+    if "Respond ONLY in JSON" not in prompt:
+        return "Sure, here is a longer answer so that every turn adds a realistic amount of history to the session."
+    event = re.search(r'Last calendar event: "(?P<title>[^"]*)" from (?P<day>\S+) \S+ to .*?\(event_id (?P<id>\w+)\)', prompt)
+    if event and 'User message: "move it to 6pm"' in prompt:
+        return json.dumps({"action": "calendar", "event_action": "update", "event_id": event["id"],
+                           "events": [{"title": event["title"], "start": f"{event['day']} 18:00", "end": f"{event['day']} 19:00"}]})
+    return '{"action": "chat"}'
+
+
+def check_follow_ups(client, server):
+    session = {"session_id": "follow-ups"}
+    client.post('/assistant', json=dict(session, message="add note on groceries", points=["milk"]))
+    result = client.post('/assistant', json=dict(session, message="add another point to that", points=["bread"])).get_json()
+    assert "groceries" in result["response"], result
+    assert assistant.get_notes("groceries") == ["milk", "bread"], assistant.get_notes("groceries")
+
+    created = client.post('/assistant', json=dict(session, message="schedule demo with sam tomorrow at 5pm")).get_json()
+    assert created.get("event_id"), created
+    moved = client.post('/assistant', json=dict(session, message="move it to 6pm")).get_json()
+    assert moved.get("event_id") == created["event_id"], moved
+    event = server.calendar.get('primary', created["event_id"])[1]
+    assert event["start"]["dateTime"][11:16] == "18:00", event
+
+    # Without a session nothing is carried over
+    stateless = client.post('/assistant', json={"message": "add another point to that", "points": ["x"]}).get_json()
+    assert "groceries" not in stateless["response"], stateless
+    print("follow-ups: 'that' resolved to the last note topic, 'move it to 6pm' moved the event just created")
+
+
+def grow_session(client, recorder, turns):
+    # Chat turns that all reach the model; returns prompt tokens per turn and the full transcript's size
+    rows, transcript = [], 0
+    for turn in range(1, turns + 1):
+        message = f"Tell me something interesting about topic number {turn}, in a sentence or two"
+        before = len(recorder.prompt_tokens)
+        start = time.perf_counter()
+        reply = client.post('/assistant', json={"session_id": "long", "message": message}).get_json()["response"]
+        elapsed = time.perf_counter() - start
+        transcript += estimate_tokens(f"User: {message}\nAssistant: {reply}\n")
+        rows.append((turn, max(recorder.prompt_tokens[before:]), transcript, elapsed))
+    return rows
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Conversation follow-ups and prompt size per turn")
+    parser.add_argument('--turns', type=int, default=200)
+    args = parser.parse_args()
+
+    server = start_fake_calendar_server()
+    calendar_client.calendar_client = calendar_client.CalendarClient(
+        token_file=None, credentials=AnonymousCredentials(), api_endpoint=server.api_endpoint)
+    recorder = PromptRecorder(FakeChatModel(latency=0.0, responses=[(r".*", respond)]))
+    assistant.model = recorder
+    assistant.cached_model.model = recorder
+    client = assistant.app.test_client()
+
+    check_follow_ups(client, server)
+
+    rows = grow_session(client, recorder, args.turns)
+    print(f"\n{'turn':>6} {'prompt tokens':>14} {'unbounded history':>18} {'request ms':>11}")
+    for turn, prompt_tokens, transcript, elapsed in rows:
+        if turn in (1, 2, 5, 10) or turn % 50 == 0:
+            print(f"{turn:>6} {prompt_tokens:>14} {transcript:>18} {elapsed * 1000:>11.2f}")
+    stats = assistant.conversation_store.conversation_store.stats
+    print(f"\n{stats['compacted_turns']} turns folded into the summary; "
+          f"largest prompt {max(row[1] for row in rows)} tokens over {args.turns} turns")
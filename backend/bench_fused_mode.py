@@ -0,0 +1,129 @@
+import os
+import json
+import time
+import argparse
+import tempfile
+import statistics
+
+# Keep the benchmark away from the real notes.db / llm_cache.db
+_tmp = tempfile.mkdtemp(prefix='bench-fused-')
+os.environ.setdefault("NOTES_DB", os.path.join(_tmp, 'notes.db'))
+os.environ.setdefault("LLM_CACHE_DB", os.path.join(_tmp, 'llm_cache.db'))
+os.environ.setdefault("GOOGLE_API_KEY", "bench")
+
+from google.auth.credentials import AnonymousCredentials
+
+import assistant
+import calendar_client
+from fake_llm import FakeChatModel
+from fake_calendar_server import start_fake_calendar_server
+
+RECORDED_PROMPTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_data', 'fused_prompts.json')
+
+
+class UsageRecorder:
+    # Wraps a model and remembers the token usage of every call
+    def __init__(self, model):
+        self.model = model
+        self.calls = []
+
+    def invoke(self, prompt, **kwargs):
+        response = self.model.invoke(prompt, **kwargs)
+        usage = getattr(response, 'usage_metadata', None) or {}
+        self.calls.append((usage.get('input_tokens', 0), usage.get('output_tokens', 0)))
+        return response
+
+
+def replay_model(records, latency, latency_per_token):
+    # Plays back the recorded outputs for whichever prompt the assistant sends
+    by_message = {record["message"]: record for record in records}
+
+    def respond(prompt):
+        for message, record in by_message.items():
+            if f'User message: "{message}"' in prompt:
+                return record["fused_analysis"] if '"answer"' in prompt else record["two_step_analysis"]
+            if prompt == assistant.chat_prompt(message):
+                return record["chat_answer"]
+        return '{"action": "chat"}'
+
+    return FakeChatModel(latency=latency, latency_per_token=latency_per_token, responses=[(r".*", respond)])
+
+
+def run_mode(mode, records, model, repeat):
+    assistant.ASSISTANT_MODE = mode
+    recorder = UsageRecorder(model)
+    assistant.model = recorder
+    assistant.cached_model.model = recorder
+    client = assistant.app.test_client()
+
+    rows = []
+    for _ in range(repeat):
+        # Every round trip must reach the model, so start from a cold cache
+        assistant.cached_model.clear()
+        for record in records:
+            calls_before = len(recorder.calls)
+            start = time.perf_counter()
+            client.post('/assistant', json={"message": record["message"], "points": ["recorded point"]})
+            elapsed = time.perf_counter() - start
+            calls = recorder.calls[calls_before:]
+            rows.append({
+                "intent": record["intent"],
+                "latency_ms": elapsed * 1000,
+                "llm_calls": len(calls),
+                "input_tokens": sum(call[0] for call in calls),
+                "output_tokens": sum(call[1] for call in calls),
+            })
+    return rows
+
+
+def summarize(rows):
+    def block(subset):
+        latencies = sorted(row["latency_ms"] for row in subset)
+        return {
+            "requests": len(subset),
+            "mean_latency_ms": round(statistics.mean(latencies), 1),
+            "p95_latency_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 1),
+            "llm_calls": sum(row["llm_calls"] for row in subset),
+            "input_tokens": sum(row["input_tokens"] for row in subset),
+            "output_tokens": sum(row["output_tokens"] for row in subset),
+        }
+
+    chat = [row for row in rows if row["intent"] == "chat"]
+    return {"all": block(rows), "chat": block(chat) if chat else None}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Fused vs two-step classification on a recorded prompt set")
+    parser.add_argument('--prompts', default=RECORDED_PROMPTS)
+    parser.add_argument('--llm-latency', type=float, default=0.8, help="fixed seconds per fake LLM call")
+    parser.add_argument('--latency-per-token', type=float, default=0.004, help="extra seconds per output token")
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--live', action='store_true', help="use the real Gemini client instead of the replay model")
+    parser.add_argument('--json', help="also save results to this file")
+    args = parser.parse_args()
+
+    with open(args.prompts) as f:
+        records = json.load(f)
+
+    # Calendar intents go to a local fake server, never to Google
+    server = start_fake_calendar_server()
+    calendar_client.calendar_client = calendar_client.CalendarClient(
+        token_file=None, credentials=AnonymousCredentials(), api_endpoint=server.api_endpoint)
+    # Force every message through the LLM so the two modes are compared fairly
+    assistant.intent_classifier.threshold = 2.0
+
+    live_model = assistant.model
+    results = {}
+    for mode in ("two_step", "fused"):
+        model = live_model if args.live else replay_model(records, args.llm_latency, args.latency_per_token)
+        results[mode] = summarize(run_mode(mode, records, model, args.repeat))
+
+    print(f"{'mode':>10} {'scope':>6} {'mean ms':>9} {'p95 ms':>9} {'calls':>6} {'in tok':>7} {'out tok':>8}")
+    for mode, summary in results.items():
+        for scope, block in summary.items():
+            if block:
+                print(f"{mode:>10} {scope:>6} {block['mean_latency_ms']:>9} {block['p95_latency_ms']:>9} "
+                      f"{block['llm_calls']:>6} {block['input_tokens']:>7} {block['output_tokens']:>8}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,169 @@
+import os
+import sys
+import json
+import signal
+import argparse
+import tempfile
+import subprocess
+
+# Memory of the backend deployed as three separate apps (notes, scheduling, assistant) versus
+# the consolidated service.py, both as single processes and as forked worker pools: separate
+# apps without preloading (every worker imports everything itself) against service.py forked
+# from a preloaded master, the way gunicorn.conf.py runs it. Every process is warmed up first
+# (Gemini client built, Calendar service built, notes DB opened, a few requests served), then
+# measured while all of them are alive. Linux only (reads /proc/<pid>/smaps_rollup).
+#   python bench_memory.py --workers 4
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+SEPARATE_APPS = ["notes", "schedule", "assistant"]
+
+
+# ---------- Child Side ----------
+def build_app(layout):
+    from flask import Flask
+    from metrics import init_app
+    if layout == "service":
+        import service
+        return service.app
+    if layout == "assistant":
+        import assistant
+        return assistant.app
+    app = Flask(layout)
+    init_app(app)
+    if layout == "notes":
+        from notes_api import notes_api
+        app.register_blueprint(notes_api)
+    else:
+        from schedule_api import schedule_api
+        from calendar_api import calendar_api
+        app.register_blueprint(schedule_api)
+        app.register_blueprint(calendar_api)
+    return app
+
+
+def warm_up(layout, app):
+    # What each process holds after serving its first real requests
+    import llm_client
+    llm_client.gemini.get()
+    if layout != "notes":
+        from google.auth.credentials import AnonymousCredentials
+        import calendar_client
+        calendar_client.calendar_client = calendar_client.CalendarClient(token_file=None, credentials=AnonymousCredentials())
+        calendar_client.get_calendar_service()
+    client = app.test_client()
+    if layout != "schedule":
+        import notes_store
+        notes_store.insert_or_update_notes(f"warm-up {os.getpid()}", ["point"])
+        client.get('/view_all_notes')
+    if layout in ("assistant", "service"):
+        client.get('/assistant/stats')
+    client.get('/metrics')
+
+
+def run_child(layout, workers, preload):
+    # Prints {"pids": [...]} once every process is warm, then waits for stdin to close
+    if workers == 0:
+        warm_up(layout, build_app(layout))
+        print(json.dumps({"pids": [os.getpid()]}), flush=True)
+        sys.stdin.read()
+        return
+
+    app = None
+    if preload:
+        import service
+        service.preload()
+        app = build_app(layout)
+    ready_read, ready_write = os.pipe()
+    children = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            os.close(ready_read)
+            warm_up(layout, app or build_app(layout))
+            os.write(ready_write, b"r")
+            signal.pause()
+            os._exit(0)
+        children.append(pid)
+    os.close(ready_write)
+    received = 0
+    while received < workers:
+        received += len(os.read(ready_read, workers))
+    print(json.dumps({"pids": [os.getpid()] + children}), flush=True)
+    sys.stdin.read()
+    for pid in children:
+        os.kill(pid, signal.SIGTERM)
+        os.waitpid(pid, 0)
+
+
+# ---------- Parent Side ----------
+def memory_kb(pid):
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].endswith(':') and parts[1].isdigit():
+                values[parts[0][:-1]] = int(parts[1])
+    return {"rss": values.get("Rss", 0), "pss": values.get("Pss", 0),
+            "uss": values.get("Private_Clean", 0) + values.get("Private_Dirty", 0)}
+
+
+def measure(children_args):
+    # Starts every child, measures all their processes together, then stops them
+    tmp = tempfile.mkdtemp(prefix='bench-memory-')
+    env = dict(os.environ, GOOGLE_API_KEY=os.environ.get("GOOGLE_API_KEY", "bench-memory"),
+               NOTES_DB=os.path.join(tmp, 'notes.db'), LLM_CACHE_DB=os.path.join(tmp, 'llm_cache.db'),
+               CALENDAR_OUTBOX="0", CALENDAR_MIRROR="0")
+    procs = [subprocess.Popen([sys.executable, os.path.abspath(__file__), "--child"] + args, cwd=BACKEND_DIR, env=env,
+                              stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+             for args in children_args]
+    try:
+        pids = []
+        for proc in procs:
+            line = proc.stdout.readline()
+            if not line:
+                raise SystemExit(f"child {proc.args[3:]} failed to start")
+            pids.extend(json.loads(line)["pids"])
+        totals = {"processes": len(pids), "rss": 0, "pss": 0, "uss": 0}
+        for pid in pids:
+            for key, value in memory_kb(pid).items():
+                totals[key] += value
+        return totals
+    finally:
+        for proc in procs:
+            proc.stdin.close()
+            proc.wait(timeout=60)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory of three separate apps vs the consolidated service")
+    parser.add_argument('--workers', type=int, default=2, help="workers per app for the forked layouts")
+    parser.add_argument('--json', help="also save results to this file")
+    parser.add_argument('--child', nargs=3, metavar=("LAYOUT", "WORKERS", "PRELOAD"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        layout, workers, preload = args.child
+        run_child(layout, int(workers), preload == "preload")
+        return
+
+    n = args.workers
+    scenarios = {
+        "three apps, 1 process each": [[name, "0", "-"] for name in SEPARATE_APPS],
+        "service.py, 1 process": [["service", "0", "-"]],
+        f"three apps, {n} workers each": [[name, str(n), "-"] for name in SEPARATE_APPS],
+        f"service.py, {n} workers, preloaded": [["service", str(n), "preload"]],
+    }
+    results = {}
+    print(f"{'layout':>34} {'procs':>6} {'RSS MB':>8} {'PSS MB':>8} {'USS MB':>8}")
+    for name, children in scenarios.items():
+        totals = measure(children)
+        results[name] = totals
+        print(f"{name:>34} {totals['processes']:>6} {totals['rss'] / 1024:>8.1f} {totals['pss'] / 1024:>8.1f} "
+              f"{totals['uss'] / 1024:>8.1f}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import threading
+import subprocess
+
+from notes_store import NotesStore
+
+# Retrieve latency and throughput of get_notes with and without the read cache, on a skewed
+# workload where a few hot topics get most lookups. Also checks coherency: a lookup after a
+# write, from this process or another one, sees the write.
+#   python bench_notes_cache.py --topics 2000 --points 20 --lookups 20000
+
+
+def seed(store, topics, points):
+    store.insert_or_update_many((f"topic {i}", [f"point {j} of topic {i}" for j in range(points)])
+                                for i in range(topics))
+
+
+def skewed_topics(rng, topics, count, skew):
+    # Zipf-like: the topic ranked r is picked with weight 1 / r^skew
+    weights = [1.0 / (rank ** skew) for rank in range(1, topics + 1)]
+    return [f"topic {i}" for i in rng.choices(range(topics), weights=weights, k=count)]
+
+
+def latency(store, lookups):
+    samples = []
+    for topic in lookups:
+        start = time.perf_counter()
+        store.get_notes(topic)
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return {"p50_us": samples[len(samples) // 2] * 1e6, "p99_us": samples[int(len(samples) * 0.99)] * 1e6}
+
+
+def throughput(store, lookups, threads):
+    chunks = [lookups[i::threads] for i in range(threads)]
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(chunk):
+        barrier.wait()
+        for topic in chunk:
+            store.get_notes(topic)
+
+    workers = [threading.Thread(target=worker, args=(chunk,)) for chunk in chunks]
+    for worker_thread in workers:
+        worker_thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for worker_thread in workers:
+        worker_thread.join()
+    return len(lookups) / (time.perf_counter() - start)
+
+
+def check_coherency(db_path):
+    store = NotesStore(db_path=db_path)
+    store.insert_or_update_notes("coherency", ["first"])
+    assert store.get_notes("coherency") == ["first"]
+    assert store.get_notes("coherency") == ["first"]  # now cached
+
+    store.append_note_points("coherency", ["second"])
+    assert store.get_notes("coherency") == ["first", "second"]
+
+    # A write from another process (another gunicorn worker, say)
+    subprocess.run([sys.executable, os.path.abspath(__file__), "--write", db_path, "coherency", "third"], check=True)
+    assert store.get_notes("coherency") == ["third"], store.get_notes("coherency")
+
+    # A miss is cached too, until the topic is created
+    assert store.get_notes("not yet") is None
+    subprocess.run([sys.executable, os.path.abspath(__file__), "--write", db_path, "not yet", "here now"], check=True)
+    assert store.get_notes("not yet") == ["here now"]
+    print("coherency: writes from this process and from another one are seen by the next lookup")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="get_notes with and without the read cache")
+    parser.add_argument('--topics', type=int, default=2000)
+    parser.add_argument('--points', type=int, default=20)
+    parser.add_argument('--lookups', type=int, default=20000)
+    parser.add_argument('--skew', type=float, default=1.1, help="Zipf exponent of topic popularity")
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--cache-size', type=int, default=512)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--write', nargs=3, metavar=("DB", "TOPIC", "POINT"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.write:
+        db_path, topic, point = args.write
+        NotesStore(db_path=db_path).insert_or_update_notes(topic, [point])
+        sys.exit(0)
+
+    tmp = tempfile.mkdtemp(prefix='bench-notes-cache-')
+    check_coherency(os.path.join(tmp, 'coherency.db'))
+
+    db_path = os.path.join(tmp, 'notes.db')
+    seed(NotesStore(db_path=db_path, cache_size=0), args.topics, args.points)
+    lookups = skewed_topics(random.Random(args.seed), args.topics, args.lookups, args.skew)
+
+    print(f"\n{'store':>10} {'p50 us':>9} {'p99 us':>9} {'lookups/s':>11} {'hit ratio':>10} {'cache KB':>9}")
+    for cache_size in (0, args.cache_size):
+        store = NotesStore(db_path=db_path, cache_size=cache_size)
+        store.get_notes("topic 0")  # opens the pool (and the cache's watcher) outside the timings
+        single = latency(store, lookups)
+        rate = throughput(store, lookups, args.threads)
+        cache = store.stats().get("cache", {})
+        print(f"{'cached' if cache_size else 'uncached':>10} {single['p50_us']:>9.1f} {single['p99_us']:>9.1f} "
+              f"{rate:>11.0f} {cache.get('hit_ratio', 0.0):>10.3f} {cache.get('bytes', 0) / 1024:>9.1f}")
+        store.close()
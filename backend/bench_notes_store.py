@@ -0,0 +1,101 @@
+import os
+import json
+import time
+import sqlite3
+import argparse
+import tempfile
+import threading
+
+from notes_store import NotesStore
+
+WRITER_COUNTS = [1, 2, 4, 8, 16, 32]
+
+
+# ---------- Baseline: the old connect-per-call code ----------
+def naive_create_table(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.execute('''CREATE TABLE IF NOT EXISTS notes (topic TEXT PRIMARY KEY, points TEXT)''')
+    conn.commit()
+    conn.close()
+
+
+def naive_insert(db_path, topic, points):
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    cursor.execute('''INSERT OR REPLACE INTO notes (topic, points) VALUES (?, ?)''', (topic, json.dumps(points)))
+    conn.commit()
+    conn.close()
+
+
+# ---------- Runner ----------
+def run_writers(writers, ops_per_writer, write):
+    errors = []
+    barrier = threading.Barrier(writers + 1)
+
+    def worker(worker_id):
+        barrier.wait()
+        for i in range(ops_per_writer):
+            try:
+                write(worker_id, i)
+            except sqlite3.OperationalError as e:
+                errors.append(str(e))
+
+    threads = [threading.Thread(target=worker, args=(w,)) for w in range(writers)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return (writers * ops_per_writer - len(errors)) / elapsed, len(errors)
+
+
+def bench(ops_per_writer, batch_size):
+    points = ["first point", "second point", "third point"]
+    results = []
+    for writers in WRITER_COUNTS:
+        with tempfile.TemporaryDirectory() as tmp:
+            naive_db = os.path.join(tmp, 'naive.db')
+            naive_create_table(naive_db)
+            naive_ops, naive_errors = run_writers(
+                writers, ops_per_writer,
+                lambda w, i: naive_insert(naive_db, f"topic-{w}-{i}", points))
+
+            store = NotesStore(os.path.join(tmp, 'pooled.db'), pool_size=min(writers, 8))
+            store.create_table()
+            pooled_ops, pooled_errors = run_writers(
+                writers, ops_per_writer,
+                lambda w, i: store.insert_or_update_notes(f"topic-{w}-{i}", points))
+
+            batches = max(1, ops_per_writer // batch_size)
+            batched_ops, batched_errors = run_writers(
+                writers, batches,
+                lambda w, i: store.insert_or_update_many(
+                    (f"batch-{w}-{i}-{j}", points) for j in range(batch_size)))
+            store.close()
+
+        results.append({
+            "writers": writers,
+            "naive_ops_per_sec": round(naive_ops),
+            "pooled_ops_per_sec": round(pooled_ops),
+            "batched_ops_per_sec": round(batched_ops * batch_size),
+            "errors": {"naive": naive_errors, "pooled": pooled_errors, "batched": batched_errors},
+        })
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Notes store write throughput at 1-32 concurrent writers")
+    parser.add_argument('--ops', type=int, default=200, help="writes per writer")
+    parser.add_argument('--batch-size', type=int, default=50)
+    parser.add_argument('--json', help="also save results to this file")
+    args = parser.parse_args()
+
+    results = bench(args.ops, args.batch_size)
+    print(f"{'writers':>8} {'naive':>12} {'pooled':>12} {'batched':>12}  (ops/sec)")
+    for row in results:
+        print(f"{row['writers']:>8} {row['naive_ops_per_sec']:>12} {row['pooled_ops_per_sec']:>12} {row['batched_ops_per_sec']:>12}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,94 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+
+# Keep the route check away from the real notes.db / llm_cache.db
+_tmp = tempfile.mkdtemp(prefix='bench-transfer-')
+os.environ.setdefault("NOTES_DB", os.path.join(_tmp, 'notes.db'))
+os.environ.setdefault("LLM_CACHE_DB", os.path.join(_tmp, 'llm_cache.db'))
+os.environ.setdefault("GOOGLE_API_KEY", "bench")
+os.environ.setdefault("CALENDAR_OUTBOX", "0")
+os.environ.setdefault("CALENDAR_MIRROR", "0")
+
+# Throughput and peak memory of notes_cli.py import / export at growing sizes (peak RSS should
+# stay flat as the note count grows), a byte-for-byte round trip, an idempotent merge, and the
+# /notes/import and /notes/export routes.
+#   python bench_notes_transfer.py --notes 200000 --points 5
+
+CLI = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'notes_cli.py')
+
+
+def write_jsonl(path, notes, points):
+    # Sorted topics in the export's own formatting, so an export of the import matches byte for byte
+    with open(path, 'w', encoding='utf-8') as f:
+        for i in range(notes):
+            record = {"topic": f"topic {i:08d}", "points": [f"point {j} of note {i}, with some text" for j in range(points)]}
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def run_cli(*args):
+    # Returns (seconds, peak RSS in MB) of one notes_cli.py run
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, CLI] + list(args), stderr=subprocess.PIPE)
+    _, status, usage = os.wait4(proc.pid, 0)
+    elapsed = time.perf_counter() - start
+    stderr = proc.stderr.read().decode()
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    if proc.returncode:
+        raise SystemExit(f"notes_cli.py {' '.join(args)} failed:\n{stderr}")
+    return elapsed, usage.ru_maxrss / 1024, stderr.strip()
+
+
+def check_routes():
+    from service import app
+    client = app.test_client()
+    body = "\n".join([
+        json.dumps({"topic": "groceries", "points": ["milk", "eggs"]}),
+        "not json",
+        json.dumps({"topic": "", "points": ["x"]}),
+        json.dumps({"topic": "quote", "points": "a single string note"}),
+    ]) + "\n"
+    result = client.post('/notes/import', data=body, content_type='application/x-ndjson').get_json()
+    assert result["notes"] == 2 and result["skipped"] == 2, result
+    assert [error["line"] for error in result["errors"]] == [2, 3], result
+
+    merge = json.dumps({"topic": "groceries", "points": ["eggs", "bread"]}) + "\n"
+    result = client.post('/notes/import?mode=merge', data=merge).get_json()
+    assert result["points"] == 1, result
+
+    lines = client.get('/notes/export').get_data(as_text=True).splitlines()
+    exported = dict((record["topic"], record["points"]) for record in map(json.loads, lines))
+    assert exported == {"groceries": ["milk", "eggs", "bread"], "quote": "a single string note"}, exported
+    print("routes: import skips bad lines with their numbers, merge adds only new points, export round-trips")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Bulk JSONL import/export throughput and memory")
+    parser.add_argument('--notes', type=int, default=100000, help="notes in the largest run")
+    parser.add_argument('--points', type=int, default=5)
+    args = parser.parse_args()
+
+    check_routes()
+
+    print(f"\n{'notes':>9} {'step':>13} {'seconds':>8} {'notes/s':>9} {'MB/s':>7} {'peak RSS MB':>12}")
+    for notes in (args.notes // 4, args.notes):
+        tmp = tempfile.mkdtemp(prefix='bench-transfer-')
+        source, exported, db = (os.path.join(tmp, name) for name in ('in.jsonl', 'out.jsonl', 'notes.db'))
+        write_jsonl(source, notes, args.points)
+        megabytes = os.path.getsize(source) / 2 ** 20
+
+        steps = [("import", ("--db", db, "import", source)),
+                 ("export", ("--db", db, "export", "-o", exported)),
+                 ("merge again", ("--db", db, "import", source, "--mode", "merge"))]
+        for name, cli_args in steps:
+            elapsed, rss, summary = run_cli(*cli_args)
+            print(f"{notes:>9} {name:>13} {elapsed:>8.2f} {notes / elapsed:>9.0f} {megabytes / elapsed:>7.1f} {rss:>12.1f}")
+            if name == "merge again":
+                assert "(0 points written" in summary, summary
+        with open(source, 'rb') as a, open(exported, 'rb') as b:
+            assert a.read() == b.read(), "export does not match the imported file"
+    print("\nexports matched their imports byte for byte; merging the same file again wrote nothing")
@@ -0,0 +1,164 @@
+import os
+import time
+import asyncio
+import argparse
+import tempfile
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+
+# Keep the benchmark away from the real notes.db / llm_cache.db
+_tmp = tempfile.mkdtemp(prefix='bench-resilient-')
+os.environ.setdefault("NOTES_DB", os.path.join(_tmp, 'notes.db'))
+os.environ.setdefault("LLM_CACHE_DB", os.path.join(_tmp, 'llm_cache.db'))
+os.environ.setdefault("GOOGLE_API_KEY", "bench")
+os.environ.setdefault("CALENDAR_OUTBOX", "0")
+os.environ.setdefault("CALENDAR_MIRROR", "0")
+
+from fake_llm import FakeChatModel
+from resilient_llm import ResilientChatModel, LLMUnavailable, LLMTimeout, UNAVAILABLE_MESSAGE
+
+# Checks deadlines, hedging, circuit breaking and the local fallback of resilient_llm against
+# latency-injecting fake models, then compares tail latency with and without hedging on a
+# model where a few percent of calls are very slow.
+#   python bench_resilient_llm.py --calls 400 --slow-rate 0.03 --slow-latency 1.5
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def check_deadline():
+    slow = FakeChatModel(latency=2.0)
+    client = ResilientChatModel([("primary", slow)], deadlines={"intent": 0.2}, hedge=False)
+    start = time.perf_counter()
+    try:
+        client.invoke("anything", prompt_type="intent")
+        raise AssertionError("a 2s call beat a 0.2s deadline")
+    except LLMTimeout:
+        pass
+    elapsed = time.perf_counter() - start
+    assert elapsed < 0.4, elapsed
+    print(f"deadline: 2s model call abandoned after {elapsed * 1000:.0f}ms")
+
+
+def check_breaker():
+    primary = FakeChatModel(latency=0.005, failure_rate=1.0, default_response="primary")
+    fallback = FakeChatModel(latency=0.005, default_response="fallback")
+    client = ResilientChatModel([("primary", primary), ("fallback", fallback)], hedge=False,
+                                breaker_options={"window": 10, "min_calls": 5, "cooldown": 0.3})
+
+    # Every call still gets an answer: failed primary attempts fail over within the same call
+    answers = [client.invoke("hello").content for _ in range(20)]
+    assert answers == ["fallback"] * 20, answers
+    assert client.tiers[0].breaker.state == "open"
+    tripped_after = primary.calls
+    assert tripped_after == 5, tripped_after  # the open breaker stops calls to the failing tier
+
+    # After the cooldown one trial call goes to the primary; once it succeeds the breaker closes
+    primary.failure_rate = 0.0
+    time.sleep(0.35)
+    assert client.invoke("hello").content == "primary"
+    assert client.tiers[0].breaker.state == "closed"
+
+    # With both tiers down the caller gets LLMUnavailable straight away
+    primary.failure_rate = fallback.failure_rate = 1.0
+    for _ in range(10):
+        try:
+            client.invoke("hello")
+        except LLMUnavailable:
+            pass
+    elapsed = timed(lambda: assert_unavailable(client))
+    assert elapsed < 0.05, elapsed
+    print(f"breaker: primary tripped after {tripped_after} failures, traffic went to the fallback, "
+          f"closed again after a good trial; with both tiers open calls fail in {elapsed * 1000:.1f}ms")
+
+
+def assert_unavailable(client):
+    try:
+        client.invoke("hello")
+        raise AssertionError("expected LLMUnavailable")
+    except LLMUnavailable:
+        pass
+
+
+def check_local_fallback():
+    # Both tiers down: /assistant and /handle_note still answer from the local path
+    import assistant
+    import llm_client
+    from service import app
+    down = FakeChatModel(latency=0.001, failure_rate=1.0)
+    client = ResilientChatModel([("primary", down)], hedge=False, breaker_options={"min_calls": 1})
+    assistant.model = client
+    llm_client.cached_model.model = client
+    http = app.test_client()
+
+    response = http.post('/assistant', json={"message": "what do you think about the weather"}).get_json()
+    assert response["response"] == UNAVAILABLE_MESSAGE, response
+    response = http.post('/handle_note', json={"message": "add a note on groceries", "points": ["milk"]}).get_json()
+    assert response["response"] == "Note added for topic 'groceries'!", response
+    print("local fallback: chat answers with a notice, note actions are decided by the rule patterns")
+
+
+def check_async_hedge():
+    model = FakeChatModel(latency=0.01, slow_rate=0.5, slow_latency=1.0, seed=3)
+    client = ResilientChatModel([("primary", model)], default_hedge_delay=0.05, max_hedge_ratio=1.0)
+
+    async def call():
+        start = time.perf_counter()
+        await client.ainvoke("hello", prompt_type="chat")
+        return time.perf_counter() - start
+
+    async def run():
+        return await asyncio.gather(*(call() for _ in range(20)))
+
+    samples = asyncio.run(run())
+    stats = client.stats()
+    slow_calls = sum(1 for elapsed in samples if elapsed > 0.5)
+    # Every slow first attempt is hedged; the call is only slow when its hedge was slow too
+    assert stats["hedges_won"] > 0 and slow_calls == stats["hedges_fired"] - stats["hedges_won"], (stats, samples)
+    print(f"async: 20 calls with half the attempts 1s slow: {stats['hedges_fired']} hedged, "
+          f"{stats['hedges_won']} rescued, {slow_calls} still slow")
+
+
+def tail_latency(client, calls, concurrency):
+    def call(_):
+        start = time.perf_counter()
+        client.invoke("hello", prompt_type="chat")
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return list(executor.map(call, range(calls)))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Deadlines, hedging and circuit breaking in resilient_llm")
+    parser.add_argument('--calls', type=int, default=400)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--latency', type=float, default=0.05, help="typical model latency (s)")
+    parser.add_argument('--slow-rate', type=float, default=0.03, help="share of calls that are slow")
+    parser.add_argument('--slow-latency', type=float, default=1.5, help="extra latency of a slow call (s)")
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    check_deadline()
+    check_breaker()
+    check_local_fallback()
+    check_async_hedge()
+
+    print(f"\n{'client':>10} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8} {'hedged':>7} {'won':>5}")
+    for hedge in (False, True):
+        model = FakeChatModel(latency=args.latency, jitter=args.latency / 5, slow_rate=args.slow_rate,
+                              slow_latency=args.slow_latency, seed=args.seed)
+        client = ResilientChatModel([("primary", model)], hedge=hedge, default_hedge_delay=args.latency * 3)
+        samples = tail_latency(client, args.calls, args.concurrency)
+        stats = client.stats()
+        print(f"{'hedged' if hedge else 'plain':>10} {statistics.median(samples) * 1000:>8.1f} "
+              f"{percentile(samples, 0.95) * 1000:>8.1f} {percentile(samples, 0.99) * 1000:>8.1f} "
+              f"{max(samples) * 1000:>8.1f} {stats['hedges_fired']:>7} {stats['hedges_won']:>5}")
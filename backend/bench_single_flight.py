@@ -0,0 +1,147 @@
+import os
+import time
+import asyncio
+import argparse
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Keep the benchmark away from the real notes.db / llm_cache.db
+_tmp = tempfile.mkdtemp(prefix='bench-single-flight-')
+os.environ.setdefault("NOTES_DB", os.path.join(_tmp, 'notes.db'))
+os.environ.setdefault("LLM_CACHE_DB", os.path.join(_tmp, 'llm_cache.db'))
+os.environ.setdefault("GOOGLE_API_KEY", "bench")
+os.environ.setdefault("CALENDAR_OUTBOX", "0")
+os.environ.setdefault("CALENDAR_MIRROR", "0")
+
+from fake_llm import FakeChatModel
+from single_flight import SingleFlight
+
+# Checks request coalescing: N identical concurrent /assistant requests that miss the fast path
+# make exactly one model call, identical concurrent get_notes lookups make one read, errors
+# reach every waiter, and a lookup that starts after a write never shares a read from before it.
+#   python bench_single_flight.py --requests 32
+
+# Misses the local fast path, so classification needs the model
+MESSAGE = "remind me what we decided about the garden project"
+ANALYSIS = '{"action": "note", "note_action": "retrieve", "topic": "garden project"}'
+
+
+def concurrently(n, fn):
+    barrier = threading.Barrier(n)
+
+    def run(index):
+        barrier.wait()
+        try:
+            return fn(index)
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=n) as executor:
+        return list(executor.map(run, range(n)))
+
+
+def check_errors(n):
+    flight = SingleFlight("check")
+    calls = []
+    error = ValueError("boom")
+
+    def fail():
+        calls.append(1)
+        time.sleep(0.1)
+        raise error
+
+    results = concurrently(n, lambda _: flight.do("key", fail))
+    assert len(calls) == 1 and all(result is error for result in results), (calls, results)
+    # Nothing is remembered once the call is over
+    assert flight.do("key", lambda: "fresh") == ("fresh", False)
+    print(f"errors: {n} waiters all got the one ValueError; the next call ran fresh")
+
+
+def check_async(n):
+    flight = SingleFlight("check")
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        return "answer"
+
+    async def run():
+        return await asyncio.gather(*(flight.ado("key", fetch) for _ in range(n)))
+
+    results = asyncio.run(run())
+    assert len(calls) == 1 and {result for result, _ in results} == {"answer"}, (calls, results)
+    assert sum(shared for _, shared in results) == n - 1
+    print(f"async: {n} concurrent coroutines, 1 fetch")
+
+
+def check_assistant(n, latency):
+    import assistant
+    import llm_client
+    from service import app
+    assert assistant.intent_classifier.classify(MESSAGE) is None, "message must miss the fast path"
+    fake = FakeChatModel(latency=latency, responses=[(r"Analyze the user's message", ANALYSIS)])
+    assistant.model = fake
+    llm_client.cached_model.model = fake
+    llm_client.cached_model.clear()
+
+    start = time.perf_counter()
+    responses = concurrently(n, lambda _: app.test_client().post('/assistant', json={"message": MESSAGE}).get_json())
+    elapsed = time.perf_counter() - start
+    assert fake.calls == 1, fake.calls
+    assert all(response == responses[0] for response in responses), responses
+    print(f"/assistant: {n} identical concurrent requests, {fake.calls} model call, "
+          f"{elapsed * 1000:.0f}ms total with a {latency * 1000:.0f}ms model")
+
+
+def check_notes(n):
+    from notes_store import NotesStore
+    # Without the read cache, so every lookup reaches the read being coalesced
+    store = NotesStore(db_path=os.path.join(_tmp, 'coalesce.db'), cache_size=0)
+    store.insert_or_update_notes("garden project", ["plant tomatoes"])
+    read = store._read_notes
+    reads = []
+
+    def slow_read(topic):
+        reads.append(topic)
+        time.sleep(0.1)
+        return read(topic)
+
+    store._read_notes = slow_read
+    results = concurrently(n, lambda _: store.get_notes("garden project"))
+    assert len(reads) == 1 and all(result == ["plant tomatoes"] for result in results), (reads, results)
+    print(f"get_notes: {n} identical concurrent lookups, {len(reads)} read")
+
+    # A read in flight when a write commits is not shared with lookups that start afterwards
+    started, release = threading.Event(), threading.Event()
+
+    def blocked_read(topic):
+        value = read(topic)
+        if not started.is_set():
+            started.set()
+            release.wait()
+        return value
+
+    store._read_notes = blocked_read
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        before = executor.submit(store.get_notes, "garden project")
+        started.wait()
+        store.insert_or_update_notes("garden project", ["plant peppers"])
+        after = store.get_notes("garden project")
+        release.set()
+        assert before.result() == ["plant tomatoes"] and after == ["plant peppers"], (before.result(), after)
+    store._read_notes = read
+    print("get_notes: a lookup after a write skipped the read that was in flight before it")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Request coalescing for LLM classification and note lookups")
+    parser.add_argument('--requests', type=int, default=32, help="identical concurrent callers")
+    parser.add_argument('--llm-latency', type=float, default=0.3)
+    args = parser.parse_args()
+
+    check_errors(args.requests)
+    check_async(args.requests)
+    check_assistant(args.requests, args.llm_latency)
+    check_notes(args.requests)
@@ -0,0 +1,261 @@
+import os
+import re
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import threading
+import http.client
+from concurrent.futures import ThreadPoolExecutor
+
+# Load tests for /assistant, /handle_note, /view_all_notes and /schedule_event against local
+# stand-ins: fake_llm for Gemini, fake_calendar_server for Google Calendar and a seeded notes.db.
+#   python bench_suite.py --json results.json
+#   python bench_suite.py --compare results.json     # flag p95 regressions against a saved run
+_tmp = tempfile.mkdtemp(prefix='bench-suite-')
+os.environ.setdefault("LLM_CACHE_DB", os.path.join(_tmp, 'llm_cache.db'))
+os.environ.setdefault("CALENDAR_OUTBOX_DB", os.path.join(_tmp, 'calendar_outbox.db'))
+os.environ.setdefault("CALENDAR_MIRROR_DB", os.path.join(_tmp, 'calendar_mirror.db'))
+os.environ.setdefault("GOOGLE_API_KEY", "bench")
+
+parser = argparse.ArgumentParser(description="Throughput and latency percentiles per endpoint and concurrency")
+parser.add_argument('--notes-db', default=os.path.join(_tmp, 'notes.db'), help="reused if already seeded")
+parser.add_argument('--topics', type=int, default=20000)
+parser.add_argument('--points-per-topic', type=int, default=10)
+parser.add_argument('--llm-latency', type=float, default=0.3)
+parser.add_argument('--llm-jitter', type=float, default=0.05)
+parser.add_argument('--calendar-latency', type=float, default=0.05)
+parser.add_argument('--server-threads', type=int, default=16)
+parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+parser.add_argument('--requests', type=int, default=200, help="requests per scenario and concurrency level")
+parser.add_argument('--scenarios', nargs='+', help="subset of scenario names to run")
+parser.add_argument('--seed', type=int, default=7)
+parser.add_argument('--json', help="save results to this file")
+parser.add_argument('--compare', help="earlier results file to compare against")
+parser.add_argument('--max-regression', type=float, default=20.0, help="allowed p95 increase in percent")
+args = parser.parse_args() if __name__ == '__main__' else parser.parse_args([])
+os.environ["NOTES_DB"] = args.notes_db
+
+from google.auth.credentials import AnonymousCredentials
+
+import app as notes_calendar
+import assistant
+import calendar_client
+import llm_client
+from notes_store import NotesStore
+from fake_llm import FakeChatModel
+from fake_calendar_server import start_fake_calendar_server
+from bench_async_vs_flask import PooledWSGIServer
+
+
+# ---------- Seed Data ----------
+def topic_name(index):
+    return f"Topic {index:06d}"
+
+
+def seed_notes_db(path, topics, points_per_topic, batch_size=1000):
+    store = NotesStore(path, pool_size=1)
+    store.create_table(migrate_in_background=False)
+    with store.connection() as conn:
+        existing = conn.execute("SELECT COUNT(*) FROM notes").fetchone()[0]
+    if existing >= topics:
+        store.close()
+        return existing
+    rng = random.Random(0)
+    words = ["budget", "design", "review", "launch", "hiring", "roadmap", "latency", "customer", "retro", "sync"]
+    for start in range(existing, topics, batch_size):
+        batch = []
+        for index in range(start, min(topics, start + batch_size)):
+            points = [f"{rng.choice(words)} item {index}-{n} {rng.choice(words)}" for n in range(points_per_topic)]
+            batch.append((topic_name(index), points))
+        store.insert_or_update_many(batch)
+    store.close()
+    return topics
+
+
+# ---------- Canned LLM Outputs ----------
+def quoted_message(prompt):
+    match = re.search(r'(?:User message|User\'s message|User input): "(.*?)"', prompt, re.DOTALL)
+    return match.group(1) if match else ""
+
+
+def note_decision(prompt):
+    message = quoted_message(prompt)
+    topic = message.split(" on ", 1)[-1].split(" for ", 1)[-1].split(" #", 1)[0]
+    action = "retrieve" if message.startswith("show") else "add"
+    return json.dumps({"action": action, "topic": topic})
+
+
+def analysis(prompt):
+    message = quoted_message(prompt)
+    if message.startswith("show"):
+        return json.dumps({"action": "note", "note_action": "retrieve", "topic": message.split(" for ", 1)[-1]})
+    return json.dumps({"action": "chat"})
+
+
+def event_extraction(prompt):
+    title = quoted_message(prompt)[:40] or "Bench event"
+    return json.dumps({"events": [{"title": title, "start_time": "2025-05-01T10:00:00", "duration_minutes": 30}]})
+
+
+CANNED_RESPONSES = [
+    (r"helps manage notes", note_decision),
+    (r"extracts event information", event_extraction),
+    (r"Analyze the user's message", analysis),
+]
+
+
+# ---------- Scenarios ----------
+# name -> (server, method, path builder, payload builder); builders take a random.Random
+def build_scenarios(topics):
+    pick = lambda rng: topic_name(rng.randrange(topics))
+    return {
+        "assistant_chat": ("assistant", "POST", lambda rng: "/assistant",
+                           lambda rng: {"message": f"Explain topic {rng.randrange(10 ** 9)} in one line"}),
+        "assistant_note_retrieve": ("assistant", "POST", lambda rng: "/assistant",
+                                    lambda rng: {"message": f"show my notes for {pick(rng)}"}),
+        "handle_note_add": ("notes", "POST", lambda rng: "/handle_note",
+                            lambda rng: {"message": f"add note on Bench {rng.randrange(10 ** 9)}",
+                                         "points": ["first", "second", "third"]}),
+        "handle_note_retrieve": ("notes", "POST", lambda rng: "/handle_note",
+                                 lambda rng: {"message": f"show notes for {pick(rng)} #{rng.randrange(10 ** 9)}"}),
+        "view_all_notes_page": ("notes", "GET",
+                                lambda rng: f"/view_all_notes?limit=100&after_topic={pick(rng).replace(' ', '%20')}",
+                                lambda rng: None),
+        "schedule_event": ("calendar", "POST", lambda rng: "/schedule_event",
+                           lambda rng: {"message": f"Bench sync {rng.randrange(10 ** 9)} tomorrow at 10"}),
+    }
+
+
+def start_server(flask_app, threads):
+    server = PooledWSGIServer('127.0.0.1', 0, flask_app, threads)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# ---------- Driver ----------
+def send(port, method, path, payload):
+    body = json.dumps(payload).encode('utf-8') if payload is not None else None
+    headers = {"Content-Type": "application/json"} if body else {}
+    start = time.perf_counter()
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=120)
+    try:
+        conn.request(method, path, body=body, headers=headers)
+        response = conn.getresponse()
+        response.read()
+        ok = response.status == 200
+    except Exception:
+        ok = False
+    finally:
+        conn.close()
+    return ok, time.perf_counter() - start
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def run_level(port, scenario, concurrency, total, seed):
+    _, method, path_for, payload_for = scenario
+    rng = random.Random(seed)
+    requests = [(path_for(rng), payload_for(rng)) for _ in range(total)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(lambda request: send(port, method, *request), requests))
+    elapsed = time.perf_counter() - start
+    latencies = sorted(latency for ok, latency in outcomes if ok)
+    ms = lambda value: round(value * 1000, 1) if value is not None else None
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": total - len(latencies),
+        "requests_per_sec": round(len(latencies) / elapsed, 1),
+        "p50_ms": ms(percentile(latencies, 0.50)),
+        "p95_ms": ms(percentile(latencies, 0.95)),
+        "p99_ms": ms(percentile(latencies, 0.99)),
+    }
+
+
+def compare(baseline, current, max_regression):
+    # Prints p95 and throughput deltas per scenario/concurrency; returns the regressions
+    regressions = []
+    print(f"\n{'scenario':>24} {'conc':>5} {'p95 before':>11} {'p95 now':>9} {'change':>8} {'req/s change':>13}")
+    for name, rows in current["results"].items():
+        before_rows = {row["concurrency"]: row for row in baseline.get("results", {}).get(name, [])}
+        for row in rows:
+            before = before_rows.get(row["concurrency"])
+            if not before or not before["p95_ms"] or row["p95_ms"] is None:
+                continue
+            change = (row["p95_ms"] - before["p95_ms"]) / before["p95_ms"] * 100
+            rps_change = ((row["requests_per_sec"] - before["requests_per_sec"]) / before["requests_per_sec"] * 100
+                          if before["requests_per_sec"] else 0.0)
+            print(f"{name:>24} {row['concurrency']:>5} {before['p95_ms']:>11} {row['p95_ms']:>9} "
+                  f"{change:>+7.1f}% {rps_change:>+12.1f}%")
+            if change > max_regression:
+                regressions.append((name, row["concurrency"], round(change, 1)))
+    return regressions
+
+
+def main():
+    print(f"Seeding {args.topics} topics into {args.notes_db} ...")
+    seed_notes_db(args.notes_db, args.topics, args.points_per_topic)
+
+    calendar_server = start_fake_calendar_server(latency=args.calendar_latency)
+    calendar_client.calendar_client = calendar_client.CalendarClient(
+        token_file=None, credentials=AnonymousCredentials(), api_endpoint=calendar_server.api_endpoint)
+
+    fake = FakeChatModel(latency=args.llm_latency, jitter=args.llm_jitter, responses=CANNED_RESPONSES, seed=args.seed)
+    assistant.model = fake
+    llm_client.cached_model.model = fake
+    # Measure the LLM path, not the local fast path or the response cache
+    assistant.intent_classifier.threshold = 2.0
+
+    servers = {
+        "assistant": start_server(assistant.app, args.server_threads),
+        "notes": start_server(notes_calendar.app, args.server_threads),
+        "calendar": start_server(notes_calendar.app, args.server_threads),
+    }
+    scenarios = build_scenarios(args.topics)
+    names = args.scenarios or list(scenarios)
+
+    results = {
+        "meta": {
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "config": {key: value for key, value in vars(args).items() if key not in ("json", "compare")},
+        },
+        "results": {},
+    }
+    print(f"{'scenario':>24} {'conc':>5} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for name in names:
+        scenario = scenarios[name]
+        port = servers[scenario[0]].server_address[1]
+        results["results"][name] = []
+        for concurrency in args.concurrency:
+            row = run_level(port, scenario, concurrency, args.requests, args.seed)
+            results["results"][name].append(row)
+            print(f"{name:>24} {concurrency:>5} {row['requests_per_sec']:>8} {str(row['p50_ms']):>8} "
+                  f"{str(row['p95_ms']):>8} {str(row['p99_ms']):>8} {row['errors']:>7}")
+
+    for server in servers.values():
+        server.shutdown()
+    calendar_server.shutdown()
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), results, args.max_regression)
+        if regressions:
+            print(f"\np95 regressions over {args.max_regression}%: {regressions}")
+            raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+import os
+import json
+import time
+import argparse
+from datetime import datetime
+
+from time_parser import parse_events
+
+# Accuracy and throughput of the time parser on a labeled corpus of scheduling messages.
+# A message labeled with events must come back with the same start times, durations and
+# titles; a message labeled null must be left to the LLM (returning anything is a false
+# resolve, the costly kind of mistake).
+#   python bench_time_parser.py
+#   python bench_time_parser.py --verbose --json results.json
+
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_data', 'time_expressions.json')
+
+
+def simplify(events):
+    if events is None:
+        return None
+    return [{"title": event["title"], "start": event["start"].strftime("%Y-%m-%d %H:%M"),
+             "duration_minutes": int((event["end"] - event["start"]).total_seconds() // 60)} for event in events]
+
+
+def evaluate(cases, now):
+    counts = {"cases": len(cases), "resolvable": 0, "resolved": 0, "times_correct": 0, "titles_correct": 0,
+              "deferred_correctly": 0, "false_resolves": 0, "missed": 0}
+    mistakes = []
+    for case in cases:
+        expected, got = case["events"], simplify(parse_events(case["message"], now=now))
+        if expected is None:
+            if got is None:
+                counts["deferred_correctly"] += 1
+            else:
+                counts["false_resolves"] += 1
+                mistakes.append((case["message"], expected, got))
+            continue
+        counts["resolvable"] += 1
+        if got is None:
+            counts["missed"] += 1
+            mistakes.append((case["message"], expected, got))
+            continue
+        counts["resolved"] += 1
+        strip_titles = lambda events: [dict(event, title=None) for event in events]
+        times_ok = strip_titles(got) == strip_titles(expected)
+        counts["times_correct"] += times_ok
+        counts["titles_correct"] += got == expected
+        if got != expected:
+            mistakes.append((case["message"], expected, got))
+    return counts, mistakes
+
+
+def throughput(messages, now, seconds=2.0):
+    count, start = 0, time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        for message in messages:
+            parse_events(message, now=now)
+        count += len(messages)
+    return count / (time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Time parser accuracy and throughput on a labeled corpus")
+    parser.add_argument('--corpus', default=CORPUS)
+    parser.add_argument('--seconds', type=float, default=2.0, help="how long to run the throughput loop")
+    parser.add_argument('--verbose', action='store_true', help="print every mismatch")
+    parser.add_argument('--json', help="also save results to this file")
+    args = parser.parse_args()
+
+    with open(args.corpus) as f:
+        corpus = json.load(f)
+    now = datetime.fromisoformat(corpus["now"])
+    counts, mistakes = evaluate(corpus["cases"], now)
+    rate = throughput([case["message"] for case in corpus["cases"]], now, args.seconds)
+
+    resolvable, resolved = counts["resolvable"], counts["resolved"]
+    results = dict(counts,
+                   coverage=round(resolved / resolvable, 3) if resolvable else 0.0,
+                   time_accuracy=round(counts["times_correct"] / resolved, 3) if resolved else 0.0,
+                   title_accuracy=round(counts["titles_correct"] / resolved, 3) if resolved else 0.0,
+                   messages_per_sec=round(rate),
+                   us_per_message=round(1e6 / rate, 1))
+    for key, value in results.items():
+        print(f"{key:>20}: {value}")
+    if args.verbose:
+        for message, expected, got in mistakes:
+            print(f"\n{message!r}\n  expected {expected}\n  got      {got}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
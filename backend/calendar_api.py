@@ -0,0 +1,46 @@
+from flask import Blueprint, request, jsonify
+
+import calendar_outbox
+import calendar_mirror
+
+# Calendar routes shared by the scheduling and assistant blueprints: outbox job status and
+# free/busy answered from the local mirror
+calendar_api = Blueprint('calendar', __name__)
+
+
+@calendar_api.before_app_request
+def start_calendar_outbox():
+    # Picks up jobs left over from a previous run; a no-op once the worker is running
+    if calendar_outbox.enabled():
+        calendar_outbox.outbox.ensure_started()
+
+
+# ---------- Handlers ----------
+# (body, status) for each route; assistant_asgi.py serves the same ones from a thread
+def job_status(job_id):
+    job = calendar_outbox.get_job(job_id)
+    if job is None:
+        return {"response": f"No calendar job '{job_id}'."}, 404
+    return job, 200
+
+
+def free_busy(args):
+    # Answered from the local mirror: ?start=2025-03-10T09:00&end=2025-03-10T18:00
+    if not calendar_mirror.enabled():
+        return {"response": "Calendar mirror is disabled."}, 404
+    try:
+        return calendar_mirror.mirror.free_busy(args["start"], args["end"]), 200
+    except (KeyError, ValueError):
+        return {"response": "Pass start and end as ISO date-times."}, 400
+
+
+@calendar_api.route('/calendar/jobs/<job_id>', methods=['GET'])
+def calendar_job_status(job_id):
+    body, status = job_status(job_id)
+    return jsonify(body), status
+
+
+@calendar_api.route('/calendar/free_busy', methods=['GET'])
+def calendar_free_busy():
+    body, status = free_busy(request.args)
+    return jsonify(body), status
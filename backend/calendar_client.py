@@ -0,0 +1,230 @@
+import os
+import pickle
+import tempfile
+import threading
+from urllib.parse import urljoin
+from datetime import datetime, timedelta, timezone
+
+from metrics import timed
+
+# googleapiclient, google_auth_oauthlib and httplib2 are imported on first use, so importing
+# this module (and every app that uses it) stays cheap until an event is actually created
+
+SCOPES = ['https://www.googleapis.com/auth/calendar']
+CLIENT_SECRET_FILE = os.getenv("GOOGLE_CLIENT_SECRET_FILE", 'backend/credentials.json')
+CREDENTIALS_PICKLE = os.getenv("GOOGLE_TOKEN_FILE", 'token.pickle')
+# Point these at a local fake server (see fake_calendar_server.py) for tests and benchmarks
+API_ENDPOINT = os.getenv("CALENDAR_API_ENDPOINT")
+BATCH_URI = 'https://www.googleapis.com/batch/calendar/v3'
+# Google recommends keeping batches at or below 50 calls
+MAX_BATCH_SIZE = 50
+
+# Refresh this long before the access token actually expires
+REFRESH_MARGIN = timedelta(minutes=5)
+
+
+class AuthorizationRequired(Exception):
+    # No usable token, and the browser sign-in cannot run from this thread
+    pass
+
+
+class CalendarClient:
+    def __init__(self, client_secret_file=CLIENT_SECRET_FILE, token_file=CREDENTIALS_PICKLE,
+                 scopes=SCOPES, credentials=None, api_endpoint=API_ENDPOINT):
+        self.client_secret_file = client_secret_file
+        self.token_file = token_file
+        self.scopes = scopes
+        self.api_endpoint = api_endpoint
+        self.batch_uri = urljoin(api_endpoint, '/batch/calendar/v3') if api_endpoint else BATCH_URI
+        self._credentials = credentials
+        self._service = None
+        self._lock = threading.RLock()
+        self._local = threading.local()
+
+    # ---------- Credentials ----------
+    def _needs_refresh(self, credentials):
+        if not credentials.valid:
+            return True
+        expiry = getattr(credentials, 'expiry', None)
+        # google-auth keeps expiry as a naive datetime in UTC, so compare it with a naive UTC now
+        # (datetime.utcnow() is deprecated; an aware now() can't be subtracted from it)
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        return expiry is not None and expiry - now < REFRESH_MARGIN
+
+    def _load_token(self):
+        if self.token_file and os.path.exists(self.token_file):
+            with open(self.token_file, 'rb') as token:
+                return pickle.load(token)
+        return None
+
+    def _save_token(self, credentials):
+        if not self.token_file:
+            return
+        # Write to a temp file in the same directory and rename, so readers never see half a token
+        directory = os.path.dirname(os.path.abspath(self.token_file))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.token-', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as token:
+                pickle.dump(credentials, token)
+                token.flush()
+                os.fsync(token.fileno())
+            os.replace(tmp_path, self.token_file)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+
+    @timed("calendar.get_credentials")
+    def get_credentials(self):
+        credentials = self._credentials
+        if credentials is not None and not self._needs_refresh(credentials):
+            return credentials
+
+        with self._lock:
+            credentials = self._credentials or self._load_token()
+            if credentials is None or self._needs_refresh(credentials):
+                if credentials and credentials.refresh_token:
+                    from google.auth.transport.requests import Request
+                    credentials.refresh(Request())
+                else:
+                    if threading.current_thread() is not threading.main_thread():
+                        # The sign-in blocks until someone finishes it in a browser; a request
+                        # or background thread fails instead of hanging on it
+                        raise AuthorizationRequired("Google Calendar is not authorized; "
+                                                    "run `python calendar_client.py` once to sign in.")
+                    from google_auth_oauthlib.flow import InstalledAppFlow
+                    flow = InstalledAppFlow.from_client_secrets_file(self.client_secret_file, self.scopes)
+                    credentials = flow.run_local_server(port=0)
+                self._save_token(credentials)
+            self._credentials = credentials
+            return credentials
+
+    # ---------- Service ----------
+    def _authorized_http(self):
+        # httplib2 is not thread-safe, so each thread (and each forked worker) keeps its own
+        # authorized transport, and its kept-alive connection, across requests. A new one is
+        # made only when get_credentials() hands out a different credentials object.
+        credentials = self.get_credentials()
+        local = self._local
+        if getattr(local, 'credentials', None) is not credentials or local.pid != os.getpid():
+            import httplib2
+            import google_auth_httplib2
+            local.http = google_auth_httplib2.AuthorizedHttp(credentials, http=httplib2.Http())
+            local.credentials, local.pid = credentials, os.getpid()
+        return local.http
+
+    def _build_request(self, http, *args, **kwargs):
+        from googleapiclient.http import HttpRequest
+        return HttpRequest(self._authorized_http(), *args, **kwargs)
+
+    def get_service(self):
+        if self._service is None:
+            with self._lock:
+                if self._service is None:
+                    from googleapiclient.discovery import build
+                    # The discovery document ships with googleapiclient, so no fetch or parse per request
+                    client_options = {"api_endpoint": self.api_endpoint} if self.api_endpoint else None
+                    self._service = build('calendar', 'v3', credentials=self.get_credentials(),
+                                          static_discovery=True, cache_discovery=False,
+                                          requestBuilder=self._build_request, client_options=client_options)
+        return self._service
+
+    @timed("calendar.insert_event")
+    def insert_event(self, event, calendar_id='primary'):
+        return self.get_service().events().insert(calendarId=calendar_id, body=event).execute()
+
+    @timed("calendar.get_event")
+    def get_event(self, event_id, calendar_id='primary'):
+        return self.get_service().events().get(calendarId=calendar_id, eventId=event_id).execute()
+
+    @timed("calendar.patch_event")
+    def patch_event(self, event_id, changes, calendar_id='primary'):
+        # Only the fields in changes are replaced
+        return self.get_service().events().patch(calendarId=calendar_id, eventId=event_id, body=changes).execute()
+
+    @timed("calendar.list_events")
+    def list_events(self, calendar_id='primary', sync_token=None, page_token=None, max_results=250, time_min=None):
+        # One page of events.list; pass the previous nextSyncToken to get only what changed
+        # (cancelled events included). An expired sync token raises HttpError 410. time_min
+        # (RFC 3339) bounds a full listing; the sync token it ends with keeps that bound.
+        kwargs = {"calendarId": calendar_id, "singleEvents": True, "showDeleted": sync_token is not None,
+                  "maxResults": max_results}
+        if sync_token:
+            kwargs["syncToken"] = sync_token
+        elif time_min:
+            kwargs["timeMin"] = time_min
+        if page_token:
+            kwargs["pageToken"] = page_token
+        return self.get_service().events().list(**kwargs).execute()
+
+    @timed("calendar.insert_events")
+    def insert_events(self, events, calendar_id='primary'):
+        # One HTTP exchange per MAX_BATCH_SIZE events; results come back in input order
+        from googleapiclient.http import BatchHttpRequest
+        service = self.get_service()
+        results = [None] * len(events)
+
+        def callback(request_id, response, exception):
+            if exception is not None:
+                results[int(request_id)] = {"error": getattr(exception, 'reason', None) or str(exception),
+                                            "status": http_status(exception)}
+            else:
+                results[int(request_id)] = {"event": response}
+
+        for offset in range(0, len(events), MAX_BATCH_SIZE):
+            chunk = range(offset, min(offset + MAX_BATCH_SIZE, len(events)))
+            batch = BatchHttpRequest(callback=callback, batch_uri=self.batch_uri)
+            for index in chunk:
+                batch.add(service.events().insert(calendarId=calendar_id, body=events[index]), request_id=str(index))
+            try:
+                batch.execute()
+            except Exception as e:
+                # The whole exchange failed, so every event without an answer failed with it
+                for index in chunk:
+                    if results[index] is None:
+                        results[index] = {"error": str(e)}
+        return results
+
+
+def http_status(exception):
+    # HTTP status of a googleapiclient HttpError, None for transport errors
+    resp = getattr(exception, 'resp', None)
+    status = getattr(resp, 'status', None)
+    return int(status) if status is not None else None
+
+
+# ---------- Process-Wide Client ----------
+calendar_client = CalendarClient()
+
+
+def get_credentials():
+    return calendar_client.get_credentials()
+
+
+def get_calendar_service():
+    return calendar_client.get_service()
+
+
+def insert_event(event, calendar_id='primary'):
+    return calendar_client.insert_event(event, calendar_id)
+
+
+def insert_events(events, calendar_id='primary'):
+    return calendar_client.insert_events(events, calendar_id)
+
+
+def get_event(event_id, calendar_id='primary'):
+    return calendar_client.get_event(event_id, calendar_id)
+
+
+def patch_event(event_id, changes, calendar_id='primary'):
+    return calendar_client.patch_event(event_id, changes, calendar_id)
+
+
+def list_events(calendar_id='primary', sync_token=None, page_token=None, max_results=250, time_min=None):
+    return calendar_client.list_events(calendar_id, sync_token, page_token, max_results, time_min)
+
+
+if __name__ == '__main__':
+    # One-off sign-in: opens the browser flow and saves the token the app then reuses
+    get_credentials()
+    print("Google Calendar authorized; token saved to", CREDENTIALS_PICKLE)
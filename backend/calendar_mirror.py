@@ -0,0 +1,327 @@
+import os
+import math
+import time
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import calendar_client
+from calendar_client import http_status
+
+# Local SQLite mirror of one Google calendar for conflict checks and free/busy answers without
+# an API call. A background thread keeps it current with incremental events.list syncs (sync
+# tokens); events we create are recorded straight away so they count before the next sync.
+# Opt-in (CALENDAR_MIRROR=1); the sync thread is started with the app (start()), never from a
+# request.
+#
+# Intervals are indexed with an R*Tree (rtree_i32 over whole minutes since the epoch), which
+# narrows an overlap query to a handful of candidates; the exact second-level check runs on
+# those rows only.
+
+DB_PATH = os.getenv("CALENDAR_MIRROR_DB", "calendar_mirror.db")
+ENABLED = os.getenv("CALENDAR_MIRROR", "0") == "1"  # CALENDAR_MIRROR=1 turns on conflict warnings
+SYNC_INTERVAL = float(os.getenv("CALENDAR_MIRROR_SYNC_INTERVAL", "60"))
+# A full sync lists events ending after this many days ago, not the calendar's whole history
+HISTORY_DAYS = float(os.getenv("CALENDAR_MIRROR_HISTORY_DAYS", "30"))
+PAGE_SIZE = 250
+# How long an event we recorded ourselves survives full syncs that do not list it yet
+# (it may still be waiting in the outbox)
+LOCAL_TTL = 3600.0
+DEFAULT_TZ = ZoneInfo("Asia/Kolkata")
+
+SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS mirror_events (
+        id INTEGER PRIMARY KEY,
+        event_id TEXT NOT NULL UNIQUE,
+        summary TEXT,
+        start_ts INTEGER NOT NULL,
+        end_ts INTEGER NOT NULL,
+        busy INTEGER NOT NULL DEFAULT 1,
+        html_link TEXT,
+        local_until REAL)''',
+    '''CREATE VIRTUAL TABLE IF NOT EXISTS mirror_index USING rtree_i32(id, start_min, end_min)''',
+    '''CREATE TABLE IF NOT EXISTS mirror_sync (calendar_id TEXT PRIMARY KEY, sync_token TEXT, synced_at REAL)''',
+]
+UPSERT_EVENT_SQL = '''INSERT INTO mirror_events (event_id, summary, start_ts, end_ts, busy, html_link, local_until)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(event_id) DO UPDATE SET summary = excluded.summary, start_ts = excluded.start_ts,
+        end_ts = excluded.end_ts, busy = excluded.busy, html_link = COALESCE(excluded.html_link, html_link),
+        local_until = excluded.local_until
+    RETURNING id'''
+UPSERT_INDEX_SQL = '''INSERT OR REPLACE INTO mirror_index (id, start_min, end_min) VALUES (?, ?, ?)'''
+SELECT_EVENT_ID_SQL = '''SELECT id FROM mirror_events WHERE event_id = ?'''
+DELETE_EVENT_SQL = '''DELETE FROM mirror_events WHERE id = ?'''
+DELETE_INDEX_SQL = '''DELETE FROM mirror_index WHERE id = ?'''
+# A full sync is written page by page; the ids it listed go in a temp table, and once the last
+# page is in, rows it did not list (except our own not-yet-listed events) are swept
+CREATE_SEEN_SQL = '''CREATE TEMP TABLE IF NOT EXISTS mirror_seen (event_id TEXT PRIMARY KEY)'''
+INSERT_SEEN_SQL = '''INSERT OR IGNORE INTO mirror_seen (event_id) VALUES (?)'''
+CLEAR_SEEN_SQL = '''DELETE FROM mirror_seen'''
+SWEEP_EVENTS_SQL = '''DELETE FROM mirror_events WHERE event_id NOT IN (SELECT event_id FROM mirror_seen)
+    AND (local_until IS NULL OR local_until < ?)'''
+SWEEP_INDEX_SQL = '''DELETE FROM mirror_index WHERE id NOT IN (SELECT id FROM mirror_events)'''
+OVERLAP_SQL = '''SELECT e.event_id, e.summary, e.start_ts, e.end_ts, e.html_link
+    FROM mirror_index i JOIN mirror_events e ON e.id = i.id
+    WHERE i.start_min < ? AND i.end_min > ? AND e.start_ts < ? AND e.end_ts > ? AND e.busy = 1
+    ORDER BY e.start_ts'''
+SELECT_SYNC_SQL = '''SELECT sync_token, synced_at FROM mirror_sync WHERE calendar_id = ?'''
+SAVE_SYNC_SQL = '''INSERT OR REPLACE INTO mirror_sync (calendar_id, sync_token, synced_at) VALUES (?, ?, ?)'''
+
+
+# ---------- Time Handling ----------
+def to_timestamp(value, tz=DEFAULT_TZ):
+    # datetime or ISO string; naive values are local to the calendar's time zone
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=tz)
+    return int(value.timestamp())
+
+
+def event_interval(event):
+    # (start_ts, end_ts) of a Calendar API event body; all-day events span whole local days
+    start, end = event.get("start") or {}, event.get("end") or {}
+    if "dateTime" in start:
+        tz = ZoneInfo(start["timeZone"]) if start.get("timeZone") else DEFAULT_TZ
+        return to_timestamp(start["dateTime"], tz), to_timestamp(end["dateTime"], tz)
+    if "date" in start:
+        return to_timestamp(start["date"] + "T00:00:00"), to_timestamp(end["date"] + "T00:00:00")
+    return None
+
+
+def format_ts(ts, tz=DEFAULT_TZ):
+    return datetime.fromtimestamp(ts, tz).isoformat()
+
+
+class CalendarMirror:
+    def __init__(self, db_path=DB_PATH, calendar_id='primary', sync_interval=SYNC_INTERVAL,
+                 history_days=HISTORY_DAYS, page_size=PAGE_SIZE):
+        self.db_path = db_path
+        self.calendar_id = calendar_id
+        self.sync_interval = sync_interval
+        self.history_days = history_days  # None lists the whole calendar
+        self.page_size = page_size
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._worker = None
+        self._pid = None
+        self.stats = {"syncs": 0, "full_syncs": 0, "changes": 0, "sync_errors": 0}
+
+    # ---------- Storage ----------
+    def _conn(self):
+        # One connection per thread (and per process), so reads never wait on each other
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, isolation_level=None, timeout=5.0, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            for statement in SCHEMA:
+                conn.execute(statement)
+            conn.execute(CREATE_SEEN_SQL)
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def _upsert(self, conn, event, local_until=None):
+        interval = event_interval(event)
+        if interval is None:
+            return
+        start_ts, end_ts = interval
+        busy = int(event.get("transparency") != "transparent")
+        row_id = conn.execute(UPSERT_EVENT_SQL, (event["id"], event.get("summary"), start_ts, end_ts, busy,
+                                                 event.get("htmlLink"), local_until)).fetchone()[0]
+        conn.execute(UPSERT_INDEX_SQL, (row_id, start_ts // 60, math.ceil(end_ts / 60)))
+
+    def _delete(self, conn, event_id):
+        row = conn.execute(SELECT_EVENT_ID_SQL, (event_id,)).fetchone()
+        if row:
+            conn.execute(DELETE_EVENT_SQL, row)
+            conn.execute(DELETE_INDEX_SQL, row)
+
+    def _apply(self, events, local_until=None, full=False):
+        # One transaction per page; a full sync also notes which events it has listed
+        conn = self._conn()
+        with self._write_lock:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if full:
+                    conn.executemany(INSERT_SEEN_SQL, [(event["id"],) for event in events])
+                for event in events:
+                    if event.get("status") == "cancelled":
+                        self._delete(conn, event["id"])
+                    else:
+                        self._upsert(conn, event, local_until)
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def record_event(self, event):
+        # Called for events we create or queue, so they show up before the next sync
+        self._apply([event], local_until=time.time() + LOCAL_TTL)
+
+    # ---------- Sync ----------
+    def sync(self):
+        # Pulls every change since the last sync token; falls back to a full sync when the token
+        # has expired (HTTP 410). Returns the number of changed events.
+        with self._sync_lock:
+            row = self._conn().execute(SELECT_SYNC_SQL, (self.calendar_id,)).fetchone()
+            token = row[0] if row else None
+            try:
+                changes, next_token = self._pull(token)
+            except Exception as e:
+                if token is None or http_status(e) != 410:
+                    raise
+                token = None
+                changes, next_token = self._pull(None)
+            if token is None:
+                self.stats["full_syncs"] += 1
+            with self._write_lock:
+                self._conn().execute(SAVE_SYNC_SQL, (self.calendar_id, next_token, time.time()))
+            self.stats["syncs"] += 1
+            self.stats["changes"] += changes
+            return changes
+
+    def _pull(self, sync_token):
+        # Writes each page as it arrives, so memory stays at one page however big the calendar.
+        # Without a token this is a full listing, bounded by history_days, which replaces the
+        # mirror once complete. A failed pull leaves the token alone, so the next one redoes it.
+        full = sync_token is None
+        time_min = None
+        if full and self.history_days is not None:
+            time_min = (datetime.now(DEFAULT_TZ) - timedelta(days=self.history_days)).isoformat()
+        conn = self._conn()
+        conn.execute(CLEAR_SEEN_SQL)
+        changes, page_token = 0, None
+        while True:
+            page = calendar_client.list_events(self.calendar_id, sync_token=sync_token, page_token=page_token,
+                                               max_results=self.page_size, time_min=time_min)
+            items = page.get("items", [])
+            self._apply(items, full=full)
+            changes += len(items)
+            page_token = page.get("nextPageToken")
+            if not page_token:
+                break
+        if full:
+            with self._write_lock:
+                conn.execute("BEGIN IMMEDIATE")
+                conn.execute(SWEEP_EVENTS_SQL, (time.time(),))
+                conn.execute(SWEEP_INDEX_SQL)
+                conn.execute(CLEAR_SEEN_SQL)
+                conn.execute("COMMIT")
+        return changes, page.get("nextSyncToken")
+
+    def last_synced(self):
+        row = self._conn().execute(SELECT_SYNC_SQL, (self.calendar_id,)).fetchone()
+        return row[1] if row else None
+
+    def ensure_started(self):
+        # Background sync loop, one per process; see start()
+        if self._worker is not None and self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._worker is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._stopping.clear()
+                self._worker = threading.Thread(target=self._run, name="calendar-mirror", daemon=True)
+                self._worker.start()
+
+    def stop(self, timeout=None):
+        self._stopping.set()
+        if self._worker is not None:
+            self._worker.join(timeout)
+        self._worker = None
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                self.sync()
+            except Exception as e:
+                self.stats["sync_errors"] += 1
+                print("Calendar mirror sync error:", e)
+            self._stopping.wait(self.sync_interval)
+
+    # ---------- Queries ----------
+    def overlapping(self, start, end):
+        # Busy events overlapping [start, end); datetimes, ISO strings or epoch seconds
+        start_ts = start if isinstance(start, (int, float)) else to_timestamp(start)
+        end_ts = end if isinstance(end, (int, float)) else to_timestamp(end)
+        rows = self._conn().execute(OVERLAP_SQL, (math.ceil(end_ts / 60), int(start_ts) // 60, end_ts, start_ts))
+        return [{"event_id": event_id, "title": summary, "start": format_ts(s), "end": format_ts(e), "event_link": link}
+                for event_id, summary, s, e, link in rows]
+
+    def is_free(self, start, end):
+        return not self.overlapping(start, end)
+
+    def free_busy(self, start, end):
+        # Merged busy blocks and the free gaps between them, clipped to [start, end)
+        start_ts, end_ts = to_timestamp(start), to_timestamp(end)
+        rows = self._conn().execute(OVERLAP_SQL, (math.ceil(end_ts / 60), start_ts // 60, end_ts, start_ts))
+        busy = []
+        for _, _, s, e, _ in rows:
+            s, e = max(s, start_ts), min(e, end_ts)
+            if busy and s <= busy[-1][1]:
+                busy[-1][1] = max(busy[-1][1], e)
+            else:
+                busy.append([s, e])
+        free, cursor = [], start_ts
+        for s, e in busy:
+            if s > cursor:
+                free.append((cursor, s))
+            cursor = e
+        if cursor < end_ts:
+            free.append((cursor, end_ts))
+        return {
+            "busy": [{"start": format_ts(s), "end": format_ts(e)} for s, e in busy],
+            "free": [{"start": format_ts(s), "end": format_ts(e)} for s, e in free],
+        }
+
+
+# ---------- Process-Wide Mirror ----------
+mirror = CalendarMirror()
+
+
+def enabled():
+    return ENABLED
+
+
+def start():
+    # Called once per serving process at startup (service.py, gunicorn's post_fork, the ASGI
+    # app's before_serving), so requests only ever read the mirror
+    if ENABLED:
+        mirror.ensure_started()
+
+
+def find_conflicts(events):
+    # Conflicts for each Calendar API event body, before it is inserted. Never raises: a mirror
+    # problem must not stop scheduling, so it just means no warnings.
+    if not ENABLED:
+        return [[] for _ in events]
+    conflicts = []
+    for event in events:
+        try:
+            interval = event_interval(event)
+            conflicts.append(mirror.overlapping(*interval) if interval else [])
+        except Exception as e:
+            print("Calendar mirror lookup failed:", e)
+            conflicts.append([])
+    return conflicts
+
+
+def record_events(events):
+    if not ENABLED:
+        return
+    for event in events:
+        try:
+            mirror.record_event(event)
+        except Exception as e:
+            print("Calendar mirror update failed:", e)
+
+
+def conflict_warning(conflicts):
+    titles = ", ".join(f"'{conflict['title']}'" for conflict in conflicts[:3])
+    more = f" and {len(conflicts) - 3} more" if len(conflicts) > 3 else ""
+    return f"Overlaps with {titles}{more}."
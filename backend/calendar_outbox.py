@@ -0,0 +1,294 @@
+import os
+import json
+import time
+import uuid
+import random
+import sqlite3
+import hashlib
+import threading
+from contextlib import contextmanager
+
+import calendar_client
+from metrics import registry
+
+# Durable write-behind queue for Google Calendar inserts. Requests store the validated event
+# and return a job id straight away; a background worker sends due jobs in batches, retries
+# transient failures with exponential backoff and records each job's state for /calendar/jobs.
+#
+# Every job's id doubles as the Google event id, so a retry after a lost response cannot create
+# a second event: the API answers 409 and the job is marked done.
+
+ENABLED = os.getenv("CALENDAR_OUTBOX", "1") != "0"  # CALENDAR_OUTBOX=0 creates events inline again
+DB_PATH = os.getenv("CALENDAR_OUTBOX_DB", "calendar_outbox.db")
+MAX_ATTEMPTS = int(os.getenv("CALENDAR_OUTBOX_MAX_ATTEMPTS", "8"))
+BATCH_SIZE = calendar_client.MAX_BATCH_SIZE
+BASE_DELAY = 2.0
+MAX_DELAY = 300.0
+LEASE_SECONDS = 120.0
+# Without an Idempotency-Key, a session's resubmits are only merged within the same window of
+# this many seconds: the same title and time asked for later is a new request
+SESSION_DEDUP_SECONDS = float(os.getenv("CALENDAR_OUTBOX_SESSION_DEDUP_SECONDS", "300"))
+# Client errors that will fail the same way on every retry
+PERMANENT_STATUSES = {400, 401, 403, 404}
+
+CREATE_JOBS_SQL = '''CREATE TABLE IF NOT EXISTS calendar_jobs (
+    id TEXT PRIMARY KEY,
+    calendar_id TEXT NOT NULL,
+    body TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    lease_until REAL,
+    last_error TEXT,
+    event_link TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL)'''
+CREATE_DUE_INDEX_SQL = '''CREATE INDEX IF NOT EXISTS calendar_jobs_due ON calendar_jobs (status, next_attempt_at)'''
+INSERT_JOB_SQL = '''INSERT OR IGNORE INTO calendar_jobs
+    (id, calendar_id, body, status, next_attempt_at, created_at, updated_at) VALUES (?, ?, ?, 'pending', ?, ?, ?)'''
+# Due pending jobs, plus jobs whose sender died while holding the lease
+SELECT_DUE_SQL = '''SELECT id, calendar_id, body, attempts FROM calendar_jobs
+    WHERE (status = 'pending' AND next_attempt_at <= ?) OR (status = 'sending' AND lease_until <= ?)
+    ORDER BY next_attempt_at LIMIT ?'''
+CLAIM_JOB_SQL = '''UPDATE calendar_jobs SET status = 'sending', lease_until = ?, attempts = attempts + 1,
+    updated_at = ? WHERE id = ?'''
+FINISH_JOB_SQL = '''UPDATE calendar_jobs SET status = ?, lease_until = NULL, next_attempt_at = ?, last_error = ?,
+    event_link = COALESCE(?, event_link), updated_at = ? WHERE id = ?'''
+SELECT_JOB_SQL = '''SELECT id, status, attempts, last_error, event_link, body, created_at, updated_at
+    FROM calendar_jobs WHERE id = ?'''
+SELECT_PENDING_BODY_SQL = '''SELECT body FROM calendar_jobs WHERE status = 'pending' AND id = ?'''
+UPDATE_BODY_SQL = '''UPDATE calendar_jobs SET body = ?, updated_at = ? WHERE id = ?'''
+COUNT_STATUS_SQL = '''SELECT status, COUNT(*) FROM calendar_jobs GROUP BY status'''
+
+JOBS_FINISHED = registry.counter("calendar_outbox_jobs_total", "Calendar outbox jobs by final state.", ["status"])
+SEND_ATTEMPTS = registry.counter("calendar_outbox_attempts_total", "Calendar insert attempts by outcome.", ["outcome"])
+
+
+def job_id_for(idempotency_key):
+    # Google event ids allow base32hex characters (0-9, a-v); hex digests fit
+    return hashlib.sha256(idempotency_key.encode('utf-8')).hexdigest()[:32]
+
+
+def session_scope(session_id, now=None):
+    # A double submit lands in the same window; asking again minutes later (say, after moving
+    # the first event) does not
+    window = int((time.time() if now is None else now) // SESSION_DEDUP_SECONDS)
+    return f"session:{session_id}:{window}"
+
+
+def event_idempotency_key(scope, event):
+    # The same event submitted again under the same scope (a client's Idempotency-Key, or its
+    # session) maps to the same job, so a double submit queues it once
+    fields = {"summary": (event.get("summary") or "").strip().casefold(), "start": event.get("start"),
+              "end": event.get("end")}
+    return f"{scope}:{json.dumps(fields, sort_keys=True)}"
+
+
+def backoff_delay(attempts):
+    # Exponential backoff with jitter: ~2s, 4s, 8s, ... capped at MAX_DELAY
+    return min(MAX_DELAY, BASE_DELAY * 2 ** (attempts - 1)) * random.uniform(0.5, 1.0)
+
+
+class CalendarOutbox:
+    def __init__(self, db_path=DB_PATH, max_attempts=MAX_ATTEMPTS, batch_size=BATCH_SIZE, poll_interval=1.0):
+        self.db_path = db_path
+        self.max_attempts = max_attempts
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self._schema_ready = False
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._worker = None
+        self._pid = None
+
+    # ---------- Storage ----------
+    @contextmanager
+    def _connect(self):
+        # Short-lived connections: cheap with SQLite, and safe across threads and forks
+        conn = sqlite3.connect(self.db_path, isolation_level=None, timeout=5.0)
+        try:
+            if not self._schema_ready:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(CREATE_JOBS_SQL)
+                conn.execute(CREATE_DUE_INDEX_SQL)
+                self._schema_ready = True
+            conn.execute("PRAGMA synchronous=NORMAL")
+            yield conn
+        finally:
+            conn.close()
+
+    # ---------- Producer API ----------
+    def enqueue(self, event, calendar_id='primary', idempotency_key=None):
+        return self.enqueue_many([event], calendar_id, [idempotency_key])[0]
+
+    def enqueue_many(self, events, calendar_id='primary', idempotency_keys=None):
+        # One transaction for all events; returns one job id per event, in order. Resubmitting
+        # the same idempotency key returns the existing job instead of queueing a duplicate.
+        keys = idempotency_keys or [None] * len(events)
+        now = time.time()
+        job_ids = []
+        rows = []
+        for event, key in zip(events, keys):
+            job_id = job_id_for(key) if key else uuid.uuid4().hex
+            job_ids.append(job_id)
+            rows.append((job_id, calendar_id, json.dumps(dict(event, id=job_id)), now, now, now))
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(INSERT_JOB_SQL, rows)
+            conn.execute("COMMIT")
+        self.ensure_started()
+        self._wakeup.set()
+        return job_ids
+
+    def get_job(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute(SELECT_JOB_SQL, (job_id,)).fetchone()
+        if row is None:
+            return None
+        job_id, status, attempts, last_error, event_link, body, created_at, updated_at = row
+        return {
+            "job_id": job_id,
+            "status": status,
+            "title": json.loads(body).get("summary"),
+            "attempts": attempts,
+            "event_link": event_link,
+            "error": last_error,
+            "created_at": created_at,
+            "updated_at": updated_at,
+        }
+
+    def update_queued(self, job_id, fields):
+        # Changes an event that has not been sent yet and returns its new body; None once the
+        # job is being sent or has finished, when only the event itself can change
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(SELECT_PENDING_BODY_SQL, (job_id,)).fetchone()
+            body = dict(json.loads(row[0]), **fields) if row else None
+            if body is not None:
+                conn.execute(UPDATE_BODY_SQL, (json.dumps(body), time.time(), job_id))
+            conn.execute("COMMIT")
+        return body
+
+    def stats(self):
+        with self._connect() as conn:
+            return dict(conn.execute(COUNT_STATUS_SQL).fetchall())
+
+    # ---------- Worker ----------
+    def ensure_started(self):
+        # Starts the sender thread once per process (a forked worker gets its own)
+        if self._worker is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._worker is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._stopping.clear()
+                self._worker = threading.Thread(target=self._run, name="calendar-outbox", daemon=True)
+                self._worker.start()
+
+    def stop(self, timeout=None):
+        self._stopping.set()
+        self._wakeup.set()
+        if self._worker is not None:
+            self._worker.join(timeout)
+        self._worker = None
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                sent = self.process_due()
+            except Exception as e:
+                print("Calendar outbox error:", e)
+                sent = 0
+            if not sent:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+
+    def _claim(self):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(SELECT_DUE_SQL, (now, now, self.batch_size)).fetchall()
+            for job_id, _, _, _ in rows:
+                conn.execute(CLAIM_JOB_SQL, (now + LEASE_SECONDS, now, job_id))
+            conn.execute("COMMIT")
+        return [(job_id, calendar_id, json.loads(body), attempts + 1) for job_id, calendar_id, body, attempts in rows]
+
+    def process_due(self):
+        # Sends one batch of due jobs; returns how many were attempted
+        jobs = self._claim()
+        if not jobs:
+            return 0
+        by_calendar = {}
+        for job in jobs:
+            by_calendar.setdefault(job[1], []).append(job)
+
+        updates = []
+        for calendar_id, calendar_jobs in by_calendar.items():
+            try:
+                results = calendar_client.insert_events([body for _, _, body, _ in calendar_jobs], calendar_id)
+            except Exception as e:
+                # Credentials or transport trouble before anything was sent
+                results = [{"error": str(e)}] * len(calendar_jobs)
+            now = time.time()
+            for (job_id, _, body, attempts), result in zip(calendar_jobs, results):
+                updates.append(self._outcome(job_id, calendar_id, attempts, result, now))
+
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(FINISH_JOB_SQL, updates)
+            conn.execute("COMMIT")
+        return len(jobs)
+
+    def _outcome(self, job_id, calendar_id, attempts, result, now):
+        # Row for FINISH_JOB_SQL: (status, next_attempt_at, last_error, event_link, updated_at, id)
+        if "error" not in result:
+            SEND_ATTEMPTS.inc(outcome="created")
+            JOBS_FINISHED.inc(status="done")
+            return ("done", now, None, result["event"].get("htmlLink"), now, job_id)
+        status_code = result.get("status")
+        if status_code == 409:
+            # An earlier attempt already created it; the id is ours, so look the event up
+            SEND_ATTEMPTS.inc(outcome="duplicate")
+            JOBS_FINISHED.inc(status="done")
+            try:
+                link = calendar_client.get_event(job_id, calendar_id).get("htmlLink")
+            except Exception:
+                link = None
+            return ("done", now, None, link, now, job_id)
+        if status_code in PERMANENT_STATUSES or attempts >= self.max_attempts:
+            SEND_ATTEMPTS.inc(outcome="failed")
+            JOBS_FINISHED.inc(status="failed")
+            return ("failed", now, result["error"], None, now, job_id)
+        SEND_ATTEMPTS.inc(outcome="retry")
+        return ("pending", now + backoff_delay(attempts), result["error"], None, now, job_id)
+
+    def drain(self, timeout=30.0):
+        # Sends everything that is due right now (tests, benchmarks and shutdown hooks)
+        deadline = time.time() + timeout
+        while time.time() < deadline and self.process_due():
+            pass
+
+
+# ---------- Process-Wide Outbox ----------
+outbox = CalendarOutbox()
+
+
+def enabled():
+    return ENABLED
+
+
+def enqueue_events(events, calendar_id='primary', idempotency_keys=None):
+    return outbox.enqueue_many(events, calendar_id, idempotency_keys)
+
+
+def get_job(job_id):
+    return outbox.get_job(job_id)
+
+
+def update_queued_event(job_id, fields):
+    return outbox.update_queued(job_id, fields)
+
+
+def status_url(job_id):
+    return f"/calendar/jobs/{job_id}"
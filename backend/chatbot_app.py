@@ -1,11 +1,13 @@
+import queue
 import streamlit as st
 import requests
 from streamlit_webrtc import webrtc_streamer, AudioProcessorBase
-import speech_recognition as sr
 import av
-import numpy as np
+from speech_pipeline import SpeechPipeline, make_recognizer
 
 API_URL = "http://localhost:5000/assistant"  # Update this if hosted elsewhere
+# The backend gives up on the model well before this (resilient_llm deadlines)
+REQUEST_TIMEOUT = 60
 
 st.set_page_config(page_title="Pratham AI Assistant", page_icon="🤖")
 
@@ -22,36 +24,46 @@ if "voice_transcript" not in st.session_state:
 if "user_input" not in st.session_state:
     st.session_state.user_input = ""
 
+# Filled by the speech pipeline's worker thread, drained by this script
+if "transcripts" not in st.session_state:
+    st.session_state.transcripts = queue.Queue()
+
 # ---------------- Audio Processor ----------------
+# Frames are only queued here; buffering, VAD and recognition run in speech_pipeline's threads
 class AudioToTextProcessor(AudioProcessorBase):
-    def __init__(self) -> None:
-        self.recognizer = sr.Recognizer()
+    def __init__(self, transcripts) -> None:
+        self.pipeline = SpeechPipeline(make_recognizer(), transcripts=transcripts).start()
 
-    def recv(self, frame: av.AudioFrame) -> av.AudioFrame:
-        audio = frame.to_ndarray()
-        audio_bytes = audio.tobytes()
-        audio_data = sr.AudioData(audio_bytes, frame.sample_rate, 2)
-
-        try:
-            text = self.recognizer.recognize_google(audio_data)
-            st.session_state.voice_transcript += " " + text  # Accumulate text
-        except sr.UnknownValueError:
-            pass
-        except sr.RequestError as e:
-            st.session_state.voice_transcript += f"[Error: {e}]"
+    def _feed(self, frame: av.AudioFrame) -> None:
+        self.pipeline.feed(frame.to_ndarray(), frame.sample_rate, len(frame.layout.channels))
 
+    def recv(self, frame: av.AudioFrame) -> av.AudioFrame:
+        self._feed(frame)
         return frame
 
+    async def recv_queued(self, frames):
+        for frame in frames:
+            self._feed(frame)
+        return frames
+
+    def on_ended(self):
+        # Recognize the last utterance when the user presses Stop
+        self.pipeline.stop(timeout=10)
+
 # ---------------- Voice Input Section ----------------
 st.markdown("### 🎙️ Voice Input (Click Start and then Stop):")
 webrtc_ctx = webrtc_streamer(
     key="speech",
-    audio_processor_factory=AudioToTextProcessor,
+    audio_processor_factory=lambda transcripts=st.session_state.transcripts: AudioToTextProcessor(transcripts),
     media_stream_constraints={"video": False, "audio": True},
     async_processing=True,
 )
 
 # ---------------- Sync transcript to the input ----------------
+while not st.session_state.transcripts.empty():
+    item = st.session_state.transcripts.get_nowait()
+    st.session_state.voice_transcript += " " + (item.get("text") or f"[Error: {item['error']}]")
+
 if not webrtc_ctx.state.playing and st.session_state.voice_transcript:
     st.session_state.user_input = st.session_state.voice_transcript.strip()
     st.session_state.voice_transcript = ""
@@ -77,7 +89,7 @@ if submitted and user_input:
 
     try:
         data = {"message": user_input, "points": note_points}
-        res = requests.post(API_URL, json=data)
+        res = requests.post(API_URL, json=data, timeout=REQUEST_TIMEOUT)
 
         if res.status_code == 200:
             result = res.json().get("response", "🤖 No response from assistant.")
@@ -0,0 +1,86 @@
+import os
+import sys
+import argparse
+import tempfile
+import subprocess
+
+# Import-time budget check for the backend modules, based on `python -X importtime`.
+# Fails (exit 1) when a module takes longer than its budget to import, pulls in one of the
+# heavy clients that must only load on first use, or prints anything while importing.
+#   python check_import_time.py
+#   python check_import_time.py --runs 5 --scale 1.5    # slower CI machines
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Cumulative import time budgets in milliseconds
+BUDGETS_MS = {
+    "notes_store": 150,
+    "calendar_client": 150,
+    "llm_cache": 150,
+    "assistant": 600,
+    "app": 600,
+    "service": 600,
+}
+
+# Loaded lazily by the modules above; importing any of them at startup is a regression
+LAZY_MODULES = ["langchain_google_genai", "langchain_core", "googleapiclient", "google_auth_oauthlib", "httplib2"]
+
+
+def measure(module):
+    # Returns (cumulative import time in ms, names of all imported modules, stdout)
+    env = dict(os.environ, GOOGLE_API_KEY=os.environ.get("GOOGLE_API_KEY", "budget-check"))
+    tmp = tempfile.mkdtemp(prefix='import-time-')
+    env.setdefault("NOTES_DB", os.path.join(tmp, 'notes.db'))
+    env.setdefault("LLM_CACHE_DB", os.path.join(tmp, 'llm_cache.db'))
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=BACKEND_DIR, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise SystemExit(f"import {module} failed:\n{result.stderr}")
+
+    total_us, imported = None, set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue  # the header line
+        name = name.strip()
+        imported.add(name)
+        if name == module:
+            total_us = int(cumulative)
+    return total_us / 1000, imported, result.stdout
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fail when backend import time regresses")
+    parser.add_argument('--runs', type=int, default=3, help="best of N runs per module")
+    parser.add_argument('--scale', type=float, default=1.0, help="multiply every budget, e.g. for slow machines")
+    parser.add_argument('modules', nargs='*', default=list(BUDGETS_MS))
+    args = parser.parse_args()
+
+    failures = []
+    print(f"{'module':>16} {'best ms':>9} {'budget ms':>10}")
+    for module in args.modules:
+        runs = [measure(module) for _ in range(args.runs)]
+        best = min(ms for ms, _, _ in runs)
+        budget = BUDGETS_MS.get(module, 600) * args.scale
+        print(f"{module:>16} {best:>9.1f} {budget:>10.0f}")
+        if best > budget:
+            failures.append(f"{module} imports in {best:.0f} ms, budget is {budget:.0f} ms")
+        _, imported, stdout = runs[0]
+        eager = [name for name in LAZY_MODULES if name in imported]
+        if eager:
+            failures.append(f"{module} eagerly imports {', '.join(eager)}")
+        if stdout.strip():
+            failures.append(f"{module} prints at import: {stdout.strip()[:80]!r}")
+
+    if failures:
+        print("\nImport-time budget exceeded:")
+        for failure in failures:
+            print(f"  - {failure}")
+        raise SystemExit(1)
+    print("\nAll modules within budget.")
+
+
+if __name__ == '__main__':
+    main()
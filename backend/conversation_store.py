@@ -0,0 +1,277 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import threading
+
+# Per-session conversation state for /assistant: the most recent turns verbatim, a running
+# summary of older ones, and the entities follow-ups refer to (the last note topic, the last
+# calendar event). Kept in SQLite so every worker process sees the same session.
+#
+# History is token-budgeted when a turn is recorded: once the verbatim turns outgrow
+# HISTORY_TOKENS, the oldest are folded into one summary line each, and the summary keeps only
+# its newest SUMMARY_TOKENS. The context a prompt gets is therefore bounded however long a
+# session runs. Summaries are built locally (no extra model call per turn).
+
+DB_PATH = os.getenv("CONVERSATION_DB", "conversations.db")
+HISTORY_TOKENS = int(os.getenv("CONVERSATION_HISTORY_TOKENS", "400"))
+SUMMARY_TOKENS = int(os.getenv("CONVERSATION_SUMMARY_TOKENS", "150"))
+SESSION_TTL = float(os.getenv("CONVERSATION_TTL", str(7 * 24 * 3600)))
+MAX_SESSION_ID = 128
+# Longest stretch of a message or reply kept verbatim, and within a summary line
+TURN_CHARS = 400
+SUMMARY_CHARS = 80
+PRUNE_EVERY = 256
+
+SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS conversation_sessions (
+        session_id TEXT PRIMARY KEY,
+        summary TEXT NOT NULL DEFAULT '',
+        entities TEXT NOT NULL DEFAULT '{}',
+        turns INTEGER NOT NULL DEFAULT 0,
+        compacted INTEGER NOT NULL DEFAULT 0,
+        updated_at REAL NOT NULL)''',
+    '''CREATE TABLE IF NOT EXISTS conversation_turns (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        session_id TEXT NOT NULL,
+        message TEXT NOT NULL,
+        reply TEXT NOT NULL,
+        tokens INTEGER NOT NULL,
+        created_at REAL NOT NULL)''',
+    '''CREATE INDEX IF NOT EXISTS conversation_turns_session ON conversation_turns (session_id, id)''',
+    '''CREATE INDEX IF NOT EXISTS conversation_sessions_updated ON conversation_sessions (updated_at)''',
+]
+SELECT_SESSION_SQL = '''SELECT summary, entities, turns, compacted, updated_at FROM conversation_sessions WHERE session_id = ?'''
+SELECT_TURNS_SQL = '''SELECT id, message, reply, tokens FROM conversation_turns WHERE session_id = ? ORDER BY id'''
+INSERT_TURN_SQL = '''INSERT INTO conversation_turns (session_id, message, reply, tokens, created_at) VALUES (?, ?, ?, ?, ?)'''
+DELETE_TURNS_SQL = '''DELETE FROM conversation_turns WHERE session_id = ? AND id <= ?'''
+UPSERT_SESSION_SQL = '''INSERT INTO conversation_sessions (session_id, summary, entities, turns, compacted, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT(session_id) DO UPDATE SET summary = excluded.summary, entities = excluded.entities,
+        turns = excluded.turns, compacted = excluded.compacted, updated_at = excluded.updated_at'''
+EXPIRED_TURNS_SQL = '''DELETE FROM conversation_turns WHERE session_id IN
+    (SELECT session_id FROM conversation_sessions WHERE updated_at < ?)'''
+EXPIRED_SESSIONS_SQL = '''DELETE FROM conversation_sessions WHERE updated_at < ?'''
+DELETE_SESSION_TURNS_SQL = '''DELETE FROM conversation_turns WHERE session_id = ?'''
+DELETE_SESSION_SQL = '''DELETE FROM conversation_sessions WHERE session_id = ?'''
+
+# Topics that point back at an earlier one ("add another point to that")
+REFERENCE_TOPIC = re.compile(r"^(?:it|that|this|them|those|same|the same|(?:that|this|the same|the last|my last)\s+(?:one|note|topic|list))$")
+# Words that make a message lean on earlier turns
+FOLLOW_UP_PATTERN = re.compile(r"\b(?:it|that|this|them|those|same|again|instead|also|move|reschedule|push|postpone|"
+                               r"prepone|shift|change|cancel|rename)\b", re.IGNORECASE)
+
+
+def estimate_tokens(text):
+    # About four characters per token, like fake_llm.count_tokens
+    return max(1, len(text) // 4)
+
+
+def shorten(text, limit):
+    text = re.sub(r"\s+", " ", str(text)).strip()
+    return text if len(text) <= limit else text[:limit - 3].rstrip() + "..."
+
+
+def reply_text(result):
+    # The text a turn's reply is remembered by; notes come back as a list of points
+    response = result.get("response") if isinstance(result, dict) else result
+    if isinstance(response, list):
+        return "; ".join(str(point) for point in response)
+    if isinstance(response, dict):
+        return json.dumps(response, ensure_ascii=False)
+    return str(response or "")
+
+
+def is_follow_up(message):
+    return bool(FOLLOW_UP_PATTERN.search(message))
+
+
+def is_reference(topic):
+    return bool(REFERENCE_TOPIC.match(re.sub(r"\s+", " ", topic.strip(" \"'.,?!").lower())))
+
+
+def valid_session_id(session_id):
+    return isinstance(session_id, str) and 0 < len(session_id.strip()) <= MAX_SESSION_ID
+
+
+class Conversation:
+    def __init__(self, session_id, summary="", turns=(), entities=None, compacted=0):
+        self.session_id = session_id
+        self.summary = summary
+        self.turns = list(turns)  # (message, reply), oldest first
+        self.entities = entities or {}
+        self.compacted = compacted
+
+    def __bool__(self):
+        return bool(self.summary or self.turns or self.entities)
+
+    def render(self):
+        # The context block placed in front of a prompt; empty for a new session
+        if not self:
+            return ""
+        lines = ["Conversation so far, oldest first (\"it\", \"that\" and the like refer to it):"]
+        if self.summary:
+            lines.append("Earlier turns, summarized:")
+            lines.extend(self.summary.splitlines())
+        for message, reply in self.turns:
+            lines.append(f"User: {message}")
+            lines.append(f"Assistant: {reply}")
+        topic = self.entities.get("last_topic")
+        if topic:
+            lines.append(f"Last note topic: {topic}")
+        event = self.entities.get("last_event")
+        if event:
+            lines.append(f"Last calendar event: \"{event.get('title')}\" from {event.get('start')} to {event.get('end')} "
+                         f"(event_id {event.get('id')})")
+        return "\n".join(lines) + "\n"
+
+    def resolve(self, decision):
+        # A copy of decision with a pronoun topic or a missing event id filled in from the session.
+        # Returns (decision, resolved); resolved is False when a reference had nothing to point at.
+        decision = dict(decision)
+        decision.pop("reference", None)
+        if decision.get("action") == "note":
+            topic = decision.get("topic")
+            if not topic or is_reference(topic):
+                if not self.entities.get("last_topic"):
+                    return decision, False
+                decision["topic"] = self.entities["last_topic"]
+        elif decision.get("action") == "calendar" and decision.get("event_action") == "update":
+            event = self.entities.get("last_event") or {}
+            if not decision.get("event_id"):
+                if not event.get("id"):
+                    return decision, False
+                decision["event_id"] = event["id"]
+            if event.get("title"):
+                # "Move it to 6pm" may come back without a title
+                decision["events"] = [dict(item, title=item.get("title") or event["title"])
+                                      for item in decision.get("events") or []]
+        return decision, True
+
+
+class ConversationStore:
+    def __init__(self, db_path=DB_PATH, history_tokens=HISTORY_TOKENS, summary_tokens=SUMMARY_TOKENS,
+                 ttl=SESSION_TTL):
+        self.db_path = db_path
+        self.history_tokens = history_tokens
+        self.summary_tokens = summary_tokens
+        self.ttl = ttl
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._writes = 0
+        self.stats = {"loads": 0, "turns": 0, "compactions": 0, "compacted_turns": 0}
+
+    # ---------- Storage ----------
+    def _conn(self):
+        # One connection per thread (and per process), like calendar_mirror
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, isolation_level=None, timeout=5.0, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            for statement in SCHEMA:
+                conn.execute(statement)
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def load(self, session_id):
+        conn = self._conn()
+        row = conn.execute(SELECT_SESSION_SQL, (session_id,)).fetchone()
+        self.stats["loads"] += 1
+        # A session idle for longer than the TTL is over, whether or not it has been pruned yet
+        if row is None or self._expired(row[4]):
+            return Conversation(session_id)
+        summary, entities, _, compacted, _ = row
+        turns = [(message, reply) for _, message, reply, _ in conn.execute(SELECT_TURNS_SQL, (session_id,))]
+        return Conversation(session_id, summary, turns, json.loads(entities), compacted)
+
+    def record_turn(self, session_id, message, reply, entities=None):
+        # Appends a turn, merges entities (a None value removes one) and compacts what no
+        # longer fits the history budget, all in one transaction
+        message, reply = shorten(message, TURN_CHARS), shorten(reply, TURN_CHARS)
+        now = time.time()
+        conn = self._conn()
+        with self._write_lock:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(SELECT_SESSION_SQL, (session_id,)).fetchone()
+                if row and self._expired(row[4], now):
+                    # Starts over rather than folding the stale turns into the new session
+                    conn.execute(DELETE_SESSION_TURNS_SQL, (session_id,))
+                    row = None
+                summary, stored, turns, compacted, _ = row if row else ("", "{}", 0, 0, now)
+                merged = json.loads(stored)
+                for key, value in (entities or {}).items():
+                    if value is None:
+                        merged.pop(key, None)
+                    else:
+                        merged[key] = value
+                conn.execute(INSERT_TURN_SQL, (session_id, message, reply, estimate_tokens(message + reply), now))
+                summary, folded = self._compact(conn, session_id, summary)
+                conn.execute(UPSERT_SESSION_SQL, (session_id, summary, json.dumps(merged, ensure_ascii=False),
+                                                  turns + 1, compacted + folded, now))
+                self._writes += 1
+                if self._writes % PRUNE_EVERY == 0:
+                    self._prune(conn, now)
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+        self.stats["turns"] += 1
+        if folded:
+            self.stats["compactions"] += 1
+            self.stats["compacted_turns"] += folded
+
+    def _compact(self, conn, session_id, summary):
+        # Keeps the newest turns that fit history_tokens (always at least the latest) and folds
+        # the rest into the summary. Returns (summary, turns folded).
+        rows = conn.execute(SELECT_TURNS_SQL, (session_id,)).fetchall()
+        kept_tokens, cut = 0, len(rows)
+        for index in range(len(rows) - 1, -1, -1):
+            kept_tokens += rows[index][3]
+            if kept_tokens > self.history_tokens and index < len(rows) - 1:
+                break
+            cut = index
+        older = rows[:cut]
+        if not older:
+            return summary, 0
+        lines = summary.splitlines() if summary else []
+        lines.extend(f"- {shorten(message, SUMMARY_CHARS)} -> {shorten(reply, SUMMARY_CHARS)}" for _, message, reply, _ in older)
+        # Oldest summary lines go first once the summary is over its own budget
+        while len(lines) > 1 and estimate_tokens("\n".join(lines)) > self.summary_tokens:
+            lines.pop(0)
+        conn.execute(DELETE_TURNS_SQL, (session_id, older[-1][0]))
+        return "\n".join(lines), len(older)
+
+    def _expired(self, updated_at, now=None):
+        return updated_at < (now or time.time()) - self.ttl
+
+    def _prune(self, conn, now):
+        cutoff = now - self.ttl
+        conn.execute(EXPIRED_TURNS_SQL, (cutoff,))
+        conn.execute(EXPIRED_SESSIONS_SQL, (cutoff,))
+
+    def clear(self, session_id):
+        conn = self._conn()
+        with self._write_lock:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(DELETE_SESSION_TURNS_SQL, (session_id,))
+            conn.execute(DELETE_SESSION_SQL, (session_id,))
+            conn.execute("COMMIT")
+
+
+# ---------- Process-Wide Store ----------
+conversation_store = ConversationStore()
+
+
+def load_conversation(session_id):
+    return conversation_store.load(session_id)
+
+
+def record_turn(session_id, message, reply, entities=None):
+    conversation_store.record_turn(session_id, message, reply, entities)
+
+
+def clear_conversation(session_id):
+    conversation_store.clear(session_id)
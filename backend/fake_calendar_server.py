@@ -0,0 +1,245 @@
+import re
+import json
+import time
+import uuid
+import random
+import argparse
+import threading
+from datetime import datetime
+from zoneinfo import ZoneInfo
+from collections import Counter, OrderedDict
+from urllib.parse import urlsplit, parse_qs
+from email.parser import Parser
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# A local stand-in for the Google Calendar v3 API, good enough for googleapiclient:
+# events insert/get/patch/delete, paged list with sync tokens, and batch requests (multipart/mixed).
+
+EVENTS_PATH = re.compile(r"^/calendar/v3/calendars/(?P<calendar>[^/?]+)/events(?:\?.*)?$")
+EVENT_PATH = re.compile(r"^/calendar/v3/calendars/(?P<calendar>[^/?]+)/events/(?P<event>[^/?]+)(?:\?.*)?$")
+
+
+def ends_after(event, time_min):
+    # timeMin filters on the event's end; naive times are in the event's own time zone
+    end = event.get('end') or {}
+    ends = datetime.fromisoformat(end.get('dateTime') or end.get('date', '') + 'T00:00:00')
+    if ends.tzinfo is None:
+        ends = ends.replace(tzinfo=ZoneInfo(end.get('timeZone') or 'UTC'))
+    return ends > time_min
+
+
+class FakeCalendar:
+    # error_rate: share of inserts answered with a transient 503, for retry testing
+    def __init__(self, latency=0.0, fail_summaries=(), error_rate=0.0, seed=None):
+        self.latency = latency
+        self.fail_summaries = set(fail_summaries)
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self.calendars = {}
+        self.stats = Counter()
+        self._lock = threading.Lock()
+        # Every change gets a sequence number; a sync token is the sequence it was issued at
+        self.sequence = 0
+        self.min_sync_token = 0
+        self._changed = {}
+
+    def insert(self, calendar_id, body):
+        summary = body.get('summary', '')
+        if summary in self.fail_summaries:
+            return 400, {"error": {"code": 400, "message": f"Rejected event '{summary}'"}}
+        if 'start' not in body or 'end' not in body:
+            return 400, {"error": {"code": 400, "message": "Missing start or end time."}}
+        with self._lock:
+            if self.error_rate and self._random.random() < self.error_rate:
+                self.stats["transient_errors"] += 1
+                return 503, {"error": {"code": 503, "message": "Backend Error"}}
+            events = self.calendars.setdefault(calendar_id, OrderedDict())
+            event_id = body.get('id') or uuid.uuid4().hex
+            if event_id in events:
+                return 409, {"error": {"code": 409, "message": "The requested identifier already exists."}}
+            event = dict(body, id=event_id, status='confirmed', kind='calendar#event',
+                         htmlLink=f"https://calendar.example/event?eid={event_id}")
+            events[event_id] = event
+            self._touch(calendar_id, event_id)
+            self.stats["inserts"] += 1
+        return 200, event
+
+    def _touch(self, calendar_id, event_id):
+        self.sequence += 1
+        self._changed[(calendar_id, event_id)] = self.sequence
+
+    def patch(self, calendar_id, event_id, body):
+        with self._lock:
+            event = self.calendars.get(calendar_id, {}).get(event_id)
+            if event is None or event['status'] == 'cancelled':
+                return 404, {"error": {"code": 404, "message": "Not Found"}}
+            event.update({key: value for key, value in body.items() if key not in ('id', 'htmlLink', 'kind')})
+            self._touch(calendar_id, event_id)
+            self.stats["patches"] += 1
+            return 200, dict(event)
+
+    def delete(self, calendar_id, event_id):
+        with self._lock:
+            event = self.calendars.get(calendar_id, {}).get(event_id)
+            if event is None or event['status'] == 'cancelled':
+                return 410 if event else 404, {"error": {"code": 410 if event else 404, "message": "Not Found"}}
+            event['status'] = 'cancelled'
+            self._touch(calendar_id, event_id)
+        return 204, b''
+
+    def expire_sync_tokens(self):
+        # Forces clients back to a full sync, like Google does after long gaps
+        with self._lock:
+            self.min_sync_token = self.sequence + 1
+
+    def list_page(self, calendar_id, sync_token=None, page_token=None, max_results=250, time_min=None):
+        with self._lock:
+            events = list(self.calendars.get(calendar_id, {}).values())
+            if sync_token is not None:
+                if int(sync_token) < self.min_sync_token:
+                    return 410, {"error": {"code": 410, "message": "Sync token is no longer valid, a full sync is required.",
+                                           "errors": [{"reason": "fullSyncRequired"}]}}
+                changed = [(self._changed[(calendar_id, event['id'])], event) for event in events]
+                items = [event for seq, event in sorted(changed, key=lambda pair: pair[0]) if seq > int(sync_token)]
+            else:
+                items = [event for event in events if event['status'] != 'cancelled']
+                if time_min:
+                    items = [event for event in items if ends_after(event, datetime.fromisoformat(time_min))]
+            offset = int(page_token or 0)
+            page = [dict(event) for event in items[offset:offset + max_results]]
+            response = {"kind": "calendar#events", "items": page}
+            if offset + max_results < len(items):
+                response["nextPageToken"] = str(offset + max_results)
+            else:
+                response["nextSyncToken"] = str(self.sequence)
+            self.stats["list_pages"] += 1
+        return 200, response
+
+    def get(self, calendar_id, event_id):
+        with self._lock:
+            event = self.calendars.get(calendar_id, {}).get(event_id)
+        if event is None:
+            return 404, {"error": {"code": 404, "message": "Not Found"}}
+        return 200, event
+
+    def list_events(self, calendar_id):
+        with self._lock:
+            return [event for event in self.calendars.get(calendar_id, {}).values() if event['status'] != 'cancelled']
+
+
+class FakeCalendarHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def calendar(self):
+        return self.server.calendar
+
+    def _read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+
+    def _send(self, status, payload, content_type='application/json'):
+        body = payload if isinstance(payload, bytes) else json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _dispatch(self, method, path, body):
+        match = EVENTS_PATH.match(path)
+        if match and method == 'POST':
+            return self.calendar.insert(match.group('calendar'), json.loads(body or b'{}'))
+        if match and method == 'GET':
+            query = {key: values[-1] for key, values in parse_qs(urlsplit(path).query).items()}
+            return self.calendar.list_page(match.group('calendar'), query.get('syncToken'), query.get('pageToken'),
+                                           int(query.get('maxResults', 250)), query.get('timeMin'))
+        match = EVENT_PATH.match(path)
+        if match and method == 'GET':
+            return self.calendar.get(match.group('calendar'), match.group('event'))
+        if match and method == 'PATCH':
+            return self.calendar.patch(match.group('calendar'), match.group('event'), json.loads(body or b'{}'))
+        if match and method == 'DELETE':
+            return self.calendar.delete(match.group('calendar'), match.group('event'))
+        return 404, {"error": {"code": 404, "message": f"Not found: {method} {path}"}}
+
+    def do_GET(self):
+        with self.calendar._lock:
+            self.calendar.stats["http_requests"] += 1
+        time.sleep(self.calendar.latency)
+        self._send(*self._dispatch('GET', self.path, b''))
+
+    def do_DELETE(self):
+        with self.calendar._lock:
+            self.calendar.stats["http_requests"] += 1
+        time.sleep(self.calendar.latency)
+        self._send(*self._dispatch('DELETE', self.path, b''))
+
+    def do_PATCH(self):
+        body = self._read_body()
+        with self.calendar._lock:
+            self.calendar.stats["http_requests"] += 1
+        time.sleep(self.calendar.latency)
+        self._send(*self._dispatch('PATCH', self.path, body))
+
+    def do_POST(self):
+        body = self._read_body()
+        with self.calendar._lock:
+            self.calendar.stats["http_requests"] += 1
+        time.sleep(self.calendar.latency)
+        if self.path.startswith('/batch/'):
+            self._handle_batch(body)
+        else:
+            self._send(*self._dispatch('POST', self.path, body))
+
+    def _handle_batch(self, body):
+        with self.calendar._lock:
+            self.calendar.stats["batch_requests"] += 1
+        message = Parser().parsestr(f"Content-Type: {self.headers['Content-Type']}\r\n\r\n" + body.decode('utf-8'))
+        boundary = uuid.uuid4().hex
+        parts = []
+        for part in message.get_payload():
+            request_line, _, rest = part.get_payload().partition('\n')
+            method, path, _ = request_line.strip().split(' ', 2)
+            _, _, part_body = rest.replace('\r\n', '\n').partition('\n\n')
+            status, payload = self._dispatch(method, path, part_body.encode('utf-8'))
+            content = json.dumps(payload)
+            content_id = part['Content-ID'].strip()[1:-1]
+            parts.append(
+                f"--{boundary}\r\nContent-Type: application/http\r\nContent-ID: <response-{content_id}>\r\n\r\n"
+                f"HTTP/1.1 {status} {'OK' if status < 300 else 'Error'}\r\n"
+                f"Content-Type: application/json; charset=UTF-8\r\nContent-Length: {len(content)}\r\n\r\n"
+                f"{content}\r\n"
+            )
+        response = ''.join(parts) + f"--{boundary}--\r\n"
+        self._send(200, response.encode('utf-8'), content_type=f'multipart/mixed; boundary={boundary}')
+
+
+def start_fake_calendar_server(host='127.0.0.1', port=0, latency=0.0, fail_summaries=(), error_rate=0.0, seed=None):
+    server = ThreadingHTTPServer((host, port), FakeCalendarHandler)
+    server.daemon_threads = True
+    server.calendar = FakeCalendar(latency=latency, fail_summaries=fail_summaries, error_rate=error_rate, seed=seed)
+    server.base_url = f"http://{host}:{server.server_address[1]}/"
+    # What CalendarClient(api_endpoint=...) expects
+    server.api_endpoint = server.base_url + 'calendar/v3/'
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Local fake Google Calendar API")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8085)
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds added to every HTTP exchange")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="share of inserts that fail with 503")
+    args = parser.parse_args()
+
+    server = start_fake_calendar_server(args.host, args.port, args.latency, error_rate=args.error_rate)
+    print(f"Fake Calendar API on {server.base_url} (set CALENDAR_API_ENDPOINT={server.api_endpoint})")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
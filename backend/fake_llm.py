@@ -0,0 +1,97 @@
+import re
+import time
+import random
+import asyncio
+import threading
+
+# A stand-in for ChatGoogleGenerativeAI with configurable latency and canned outputs,
+# for load tests and benchmarks that must not hit Gemini.
+
+DEFAULT_RESPONSE = "This is a canned answer from the fake model."
+
+
+class FakeResponse:
+    def __init__(self, content, input_tokens=0, output_tokens=0):
+        self.content = content
+        self.usage_metadata = {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+        }
+
+
+def count_tokens(text):
+    # Rough Gemini-like estimate: about four characters per token
+    return max(1, len(text) // 4)
+
+
+class FakeChatModel:
+    # responses: list of (regex, content) checked in order against the prompt
+    # latency_per_token adds generation time proportional to the output length
+    # slow_rate of calls take slow_latency longer, for a long tail like Gemini's
+    def __init__(self, latency=0.5, jitter=0.0, responses=None, default_response=DEFAULT_RESPONSE,
+                 failure_rate=0.0, seed=None, stream_chunk_size=12, latency_per_token=0.0,
+                 slow_rate=0.0, slow_latency=0.0):
+        self.latency = latency
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.latency_per_token = latency_per_token
+        self.jitter = jitter
+        self.responses = [(re.compile(pattern, re.IGNORECASE | re.DOTALL), content)
+                          for pattern, content in (responses or [])]
+        self.default_response = default_response
+        self.failure_rate = failure_rate
+        self.stream_chunk_size = stream_chunk_size
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def _delay(self, response):
+        with self._lock:
+            self.calls += 1
+            jitter = self._random.uniform(-self.jitter, self.jitter) if self.jitter else 0.0
+            failed = self._random.random() < self.failure_rate
+            slow = self.slow_latency if self.slow_rate and self._random.random() < self.slow_rate else 0.0
+        generation = self.latency_per_token * response.usage_metadata["output_tokens"]
+        return max(0.0, self.latency + jitter + generation + slow), failed
+
+    def _respond(self, prompt):
+        text = prompt if isinstance(prompt, str) else str(prompt)
+        for pattern, content in self.responses:
+            if pattern.search(text):
+                content = content(text) if callable(content) else content
+                break
+        else:
+            content = self.default_response
+        return FakeResponse(content, count_tokens(text), count_tokens(content))
+
+    def invoke(self, prompt, **kwargs):
+        response = self._respond(prompt)
+        delay, failed = self._delay(response)
+        time.sleep(delay)
+        if failed:
+            raise RuntimeError("Injected fake model failure")
+        return response
+
+    async def ainvoke(self, prompt, **kwargs):
+        response = self._respond(prompt)
+        delay, failed = self._delay(response)
+        await asyncio.sleep(delay)
+        if failed:
+            raise RuntimeError("Injected fake model failure")
+        return response
+
+    def stream(self, prompt, **kwargs):
+        # Time to first chunk is the configured latency; the rest trickles out quickly
+        response = self.invoke(prompt, **kwargs)
+        content = response.content
+        for start in range(0, len(content), self.stream_chunk_size):
+            yield FakeResponse(content[start:start + self.stream_chunk_size])
+            time.sleep(0.005)
+
+    async def astream(self, prompt, **kwargs):
+        response = await self.ainvoke(prompt, **kwargs)
+        content = response.content
+        for start in range(0, len(content), self.stream_chunk_size):
+            yield FakeResponse(content[start:start + self.stream_chunk_size])
+            await asyncio.sleep(0.005)
@@ -0,0 +1,34 @@
+import os
+import multiprocessing
+
+# Production launcher for service.py:
+#   gunicorn -c gunicorn.conf.py service:app
+# The app is imported once in the master (preload_app) together with the heavy client
+# libraries, then the workers are forked from it and share those pages copy-on-write.
+# The async /assistant app (assistant_asgi.py) is served by hypercorn, not this file:
+#   hypercorn --workers 4 --bind 0.0.0.0:5000 assistant_asgi:app
+
+bind = os.getenv("SERVICE_BIND", "0.0.0.0:5000")
+workers = int(os.getenv("SERVICE_WORKERS", str(min(4, multiprocessing.cpu_count()))))
+worker_class = os.getenv("SERVICE_WORKER_CLASS", "gthread")
+threads = int(os.getenv("SERVICE_THREADS", "8"))
+# LLM calls can take a while; the SSE stream holds its connection for the whole answer
+timeout = int(os.getenv("SERVICE_TIMEOUT", "120"))
+keepalive = 5
+preload_app = True
+accesslog = "-"
+
+
+def on_starting(server):
+    import service
+    service.preload()
+    server.log.info("Preloaded %s", ", ".join(service.PRELOAD_MODULES))
+
+
+def post_fork(server, worker):
+    # Nothing was opened in the master: notes_store's pool and the calendar outbox check the
+    # pid and start their connections and threads in each worker on first use. The calendar
+    # mirror (when enabled) starts here, not on a request.
+    import calendar_mirror
+    calendar_mirror.start()
+    server.log.info("Worker %s forked from preloaded master", worker.pid)
@@ -0,0 +1,244 @@
+import re
+import math
+import threading
+from collections import Counter
+
+from time_parser import parse_events
+
+# Decisions below this confidence fall through to the LLM
+CONFIDENCE_THRESHOLD = 0.8
+
+# ---------- Rule Grammars ----------
+NOTE_WORD = r"notes?"
+TOPIC_PREP = r"(?:on|about|for|regarding|titled|called|named)"
+
+NOTE_ADD_PATTERNS = [
+    re.compile(rf"^(?:please\s+)?(?:add|save|create|make|write|take|store|new)\s+(?:a\s+|an\s+|the\s+|my\s+)?(?:new\s+)?{NOTE_WORD}\s+{TOPIC_PREP}\s+(?P<topic>.+)$"),
+    re.compile(rf"^(?:please\s+)?(?:note\s+down|jot\s+down)\s+(?:points?\s+)?(?:{TOPIC_PREP}\s+)?(?P<topic>.+)$"),
+    re.compile(rf"^(?:please\s+)?(?:add|save|store)\s+(?P<topic>.+?)\s+(?:to|in|into)\s+(?:my\s+)?{NOTE_WORD}$"),
+]
+
+NOTE_APPEND_PATTERNS = [
+    re.compile(rf"^(?:please\s+)?(?:add|append|put)\s+(?:a\s+|another\s+|more\s+|new\s+|these\s+|this\s+)?(?:points?\s+)?(?:to|onto|into|under)\s+(?:my\s+|the\s+)?(?:{NOTE_WORD}\s+{TOPIC_PREP}\s+)?(?P<topic>.+?)(?:\s+{NOTE_WORD})?$"),
+    re.compile(rf"^(?:please\s+)?(?:append|extend|update)\s+(?:my\s+|the\s+)?(?:{NOTE_WORD}\s+{TOPIC_PREP}\s+)(?P<topic>.+)$"),
+]
+
+NOTE_RETRIEVE_PATTERNS = [
+    re.compile(rf"^(?:please\s+)?(?:show|get|retrieve|fetch|display|read|open|view|list|find|give)\s+(?:me\s+)?(?:all\s+)?(?:my\s+|the\s+)?{NOTE_WORD}\s+{TOPIC_PREP}\s+(?P<topic>.+)$"),
+    re.compile(rf"^what\s+(?:are|were|is)\s+(?:my\s+|the\s+)?{NOTE_WORD}\s+{TOPIC_PREP}\s+(?P<topic>.+)$"),
+    re.compile(rf"^(?:show|get|retrieve|fetch|display|read|open|view)\s+(?:me\s+)?(?:my\s+|the\s+)?(?P<topic>.+?)\s+{NOTE_WORD}$"),
+]
+
+# "add this to my calendar" is scheduling, not a note called "calendar"
+CALENDAR_TARGET = re.compile(r"^(?:my\s+|the\s+)?(?:calendar|schedule|agenda|diary|events?)$")
+# Topics that are only an article or pronoun ("show me the notes", "add a point to that").
+# Pronouns are kept as references, which a conversation can resolve to its last topic.
+ARTICLE_TOPIC = re.compile(r"^(?:the|a|an|my|me|all|some|your)$")
+REFERENCE_TOPIC = re.compile(r"^(?:it|that|this|them|these|those|same|the same|(?:that|this)\s+(?:one|note|list))$")
+
+CALENDAR_VERB = re.compile(r"\b(?:schedule|book|set\s+up|arrange|plan|add|create|put|remind\s+me)\b")
+CALENDAR_NOUN = re.compile(r"\b(?:meeting|call|event|appointment|interview|standup|stand-up|sync|review|session|reminder|lunch|dinner|catch[\s-]?up|demo)\b")
+
+QUESTION_START = re.compile(r"^(?:what|who|why|how|when|where|which|explain|tell\s+me|describe|define|can\s+you|could\s+you|is|are|do|does|hi|hello|hey)\b")
+# "don't schedule a meeting tomorrow at 5" and "cancel the call at 3" must not book anything
+NEGATION = re.compile(r"\b(?:don['\u2019]?t|do\s+not|never|cancel|not)\b")
+NOTE_OR_CALENDAR_CUE = re.compile(r"\b(?:notes?|schedule|calendar|meeting|appointment|remind|event|book)\b")
+
+# ---------- Seed Examples For The In-Process Model ----------
+SEED_EXAMPLES = [
+    ("add note on machine learning", "note_add"),
+    ("save a note about the project kickoff", "note_add"),
+    ("create notes for grocery shopping", "note_add"),
+    ("write down points for the sprint retro", "note_add"),
+    ("remember these points about python decorators", "note_add"),
+    ("store this under my travel notes", "note_add"),
+    ("show my notes for machine learning", "note_retrieve"),
+    ("what did i note about the project kickoff", "note_retrieve"),
+    ("get my grocery shopping notes", "note_retrieve"),
+    ("read back my points on python decorators", "note_retrieve"),
+    ("fetch the notes about travel", "note_retrieve"),
+    ("what are my notes on the sprint retro", "note_retrieve"),
+    ("schedule meeting tomorrow at 5", "calendar"),
+    ("book a call with the client on friday", "calendar"),
+    ("set up a review session at 3 pm today", "calendar"),
+    ("put lunch with sam on my calendar", "calendar"),
+    ("remind me about the dentist appointment tomorrow", "calendar"),
+    ("arrange an interview next monday morning", "calendar"),
+    ("what is the capital of france", "chat"),
+    ("explain how transformers work", "chat"),
+    ("tell me a joke", "chat"),
+    ("how are you doing today", "chat"),
+    ("who wrote pride and prejudice", "chat"),
+    ("give me tips to improve my sleep", "chat"),
+]
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9']+")
+
+
+def clean_message(message):
+    return re.sub(r"\s+", " ", message.strip()).strip(" .!?")
+
+
+def normalize_message(message):
+    return clean_message(message).lower()
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+# ---------- Small Trained Model ----------
+class NaiveBayesIntentModel:
+    def __init__(self, examples=SEED_EXAMPLES, alpha=1.0):
+        self.alpha = alpha
+        self.label_counts = Counter()
+        self.token_counts = {}
+        self.vocabulary = set()
+        self.fit(examples)
+
+    def fit(self, examples):
+        for text, label in examples:
+            tokens = tokenize(text)
+            self.label_counts[label] += 1
+            self.token_counts.setdefault(label, Counter()).update(tokens)
+            self.vocabulary.update(tokens)
+        self._totals = {label: sum(counts.values()) for label, counts in self.token_counts.items()}
+
+    def predict(self, text):
+        tokens = [t for t in tokenize(text) if t in self.vocabulary]
+        if not tokens:
+            return None, 0.0
+        total_examples = sum(self.label_counts.values())
+        vocab_size = len(self.vocabulary)
+        scores = {}
+        for label, count in self.label_counts.items():
+            score = math.log(count / total_examples)
+            denominator = self._totals[label] + self.alpha * vocab_size
+            counts = self.token_counts[label]
+            for token in tokens:
+                score += math.log((counts[token] + self.alpha) / denominator)
+            scores[label] = score
+        best = max(scores, key=scores.get)
+        # Softmax over log scores gives a posterior we can use as confidence
+        peak = scores[best]
+        norm = sum(math.exp(s - peak) for s in scores.values())
+        return best, 1.0 / norm
+
+
+# ---------- Classifier ----------
+class IntentClassifier:
+    def __init__(self, threshold=CONFIDENCE_THRESHOLD, use_model=True):
+        self.threshold = threshold
+        self.model = NaiveBayesIntentModel() if use_model else None
+        self._lock = threading.Lock()
+        self._stats = Counter()
+
+    def predict(self, message, now=None):
+        # A question mark is gone once the message is cleaned, so it is noted first
+        question = message.rstrip().endswith("?")
+        message = clean_message(message)
+        text = message.lower()
+        if len(text) != len(message):
+            message = text
+        if not text:
+            return {"action": "chat", "confidence": 0.0}
+
+        for pattern in NOTE_APPEND_PATTERNS:
+            match = pattern.match(text)
+            if match and not CALENDAR_TARGET.match(match.group('topic').strip()):
+                return self._note_decision("append", message[match.start('topic'):match.end('topic')], 0.9)
+        for pattern in NOTE_ADD_PATTERNS:
+            match = pattern.match(text)
+            if match:
+                return self._note_decision("add", message[match.start('topic'):match.end('topic')], 0.95)
+        for pattern in NOTE_RETRIEVE_PATTERNS:
+            match = pattern.match(text)
+            if match:
+                return self._note_decision("retrieve", message[match.start('topic'):match.end('topic')], 0.95)
+
+        if CALENDAR_VERB.search(text) or CALENDAR_NOUN.search(text):
+            decision = self._calendar_decision(message, text, now, question)
+            if decision:
+                return decision
+
+        if QUESTION_START.match(text) and not NOTE_OR_CALENDAR_CUE.search(text):
+            return {"action": "chat", "confidence": 0.85}
+
+        if self.model:
+            return self._model_decision(message, text, now, question)
+        return {"action": "chat", "confidence": 0.0}
+
+    def classify(self, message, now=None):
+        decision = self.predict(message, now=now)
+        hit = decision["confidence"] >= self.threshold
+        with self._lock:
+            self._stats["hits" if hit else "misses"] += 1
+            if hit:
+                self._stats["hits_" + decision["action"]] += 1
+        return decision if hit else None
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        hits = stats.get("hits", 0)
+        misses = stats.get("misses", 0)
+        total = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": hits / total if total else 0.0,
+            "hits_by_action": {key[5:]: value for key, value in stats.items() if key.startswith("hits_")},
+            "threshold": self.threshold,
+        }
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats.clear()
+
+    def _note_decision(self, note_action, topic, confidence):
+        topic = topic.strip(" \"'.,") if topic else ""
+        if not topic or ARTICLE_TOPIC.match(topic.lower()):
+            return {"action": "note", "note_action": note_action, "topic": None, "confidence": 0.3}
+        if REFERENCE_TOPIC.match(re.sub(r"\s+", " ", topic.lower())):
+            # Below the threshold: only a conversation's last topic makes this actionable
+            return {"action": "note", "note_action": note_action, "topic": topic, "reference": True, "confidence": 0.3}
+        return {"action": "note", "note_action": note_action, "topic": topic, "confidence": confidence}
+
+    def _calendar_decision(self, message, text, now, question=False):
+        if question or QUESTION_START.match(text):
+            # "when is the review tomorrow at 5", "how do I schedule a meeting at 5pm in outlook?"
+            # and "can you add a meeting at 5" may or may not want an event booked: the LLM decides
+            return None
+        if NEGATION.search(text):
+            # Not booking, or undoing a booking: the LLM decides
+            return None
+        events = parse_events(message, now=now)
+        if not events:
+            # Looks like scheduling but the date/time needs the LLM
+            return None
+        # A noun alone ("call me at 5", "a review of my essay at 5pm") is not enough to book
+        # anything without the LLM; it takes a scheduling verb too
+        confidence = 0.9 if CALENDAR_VERB.search(text) and CALENDAR_NOUN.search(text) else 0.75
+        entries = [{
+            "title": event["title"] or "Event",
+            "start": event["start"].strftime("%Y-%m-%d %H:%M"),
+            "end": event["end"].strftime("%Y-%m-%d %H:%M"),
+        } for event in events]
+        if len(entries) == 1:
+            return {"action": "calendar", **entries[0], "confidence": confidence}
+        return {"action": "calendar", "events": entries, "confidence": confidence}
+
+    def _model_decision(self, message, text, now, question=False):
+        label, probability = self.model.predict(text)
+        # The model only picks the intent, so it never outranks a rule match
+        confidence = round(probability * 0.85, 3)
+        # No known word at all: nothing to go on, so the model gets the message
+        if label is None or label == "chat":
+            return {"action": "chat", "confidence": confidence}
+        if label == "calendar":
+            decision = self._calendar_decision(message, text, now, question)
+            return decision or {"action": "calendar", "confidence": 0.0}
+        match = re.search(rf"\b{TOPIC_PREP}\s+(?P<topic>.+)$", text)
+        if not match:
+            return {"action": "note", "note_action": label[5:], "topic": None, "confidence": 0.0}
+        return self._note_decision(label[5:], message[match.start('topic'):match.end('topic')], confidence)
@@ -0,0 +1,39 @@
+import threading
+
+# Stand-in for an object that is expensive to build (heavy imports, API clients). The factory
+# runs once, on first use, under a lock; attribute reads and writes go to the built object,
+# so `model.invoke(...)` works the same whether or not the model has been built yet.
+
+_UNSET = object()
+
+
+class Lazy:
+    def __init__(self, factory):
+        object.__setattr__(self, "_factory", factory)
+        object.__setattr__(self, "_lock", threading.Lock())
+        object.__setattr__(self, "_value", _UNSET)
+
+    def get(self):
+        value = self._value
+        if value is _UNSET:
+            with self._lock:
+                value = self._value
+                if value is _UNSET:
+                    value = self._factory()
+                    object.__setattr__(self, "_value", value)
+        return value
+
+    @property
+    def initialized(self):
+        return self._value is not _UNSET
+
+    def prefetch(self):
+        # Build in the background, e.g. while a CLI waits for input
+        threading.Thread(target=self.get, daemon=True).start()
+        return self
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self.get(), name, value)
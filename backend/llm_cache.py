@@ -0,0 +1,287 @@
+import os
+import re
+import time
+import asyncio
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+import pytz
+
+from single_flight import SingleFlight
+
+india_tz = pytz.timezone('Asia/Kolkata')
+
+CACHE_DB = 'llm_cache.db'
+
+# Seconds a cached response stays valid, per prompt type
+DEFAULT_TTLS = {
+    "note_decision": 7 * 24 * 3600,
+    "intent": 7 * 24 * 3600,
+    "event_extraction": 24 * 3600,
+    "default": 24 * 3600,
+}
+
+# Prompts of these types resolve dates against "now" ("at 5pm", "on 12 march"), so their
+# answers are only good for the day they were made, whatever the wording
+DATE_KEYED_TYPES = ("intent", "event_extraction")
+
+# Prompts mentioning these depend on the current date
+TIME_RELATIVE_PATTERN = re.compile(
+    r"\b(?:today|tomorrow|yesterday|next|this|coming|last|in\s+\d+|weekend|"
+    r"mon(?:day)?|tue(?:s|sday)?|wed(?:nesday)?|thu(?:rs|rsday)?|fri(?:day)?|sat(?:urday)?|sun(?:day)?)\b",
+    re.IGNORECASE,
+)
+
+# Prompts mentioning these depend on the time of day ("meeting in 2 hours" means 11:00 at 09:00
+# and 17:00 at 15:00), so their answers are never cached
+TIME_OF_DAY_PATTERN = re.compile(
+    r"\b(?:now|later|tonight|soon|"
+    r"in\s+(?:an?|half\s+an|a\s+few|a\s+couple\s+of|\d+)\s+(?:mins?|minutes?|hrs?|hours?)|in\s+\d+\s*(?:m|h))\b",
+    re.IGNORECASE,
+)
+
+# Clock times; one with no date ("meeting at 5pm") means today until it passes and tomorrow
+# after, so the key also records which of them have passed
+CLOCK_TIME_PATTERN = re.compile(
+    r"\b(?P<hour>\d{1,2})(?:[:.](?P<minute>\d{2}))?\s*(?P<ampm>[ap])\.?m\b|"
+    r"\b(?P<hour24>\d{1,2})[:.](?P<minute24>\d{2})\b|\bat\s+(?P<bare>\d{1,2})\b|\b(?P<word>noon|midday|midnight)\b",
+    re.IGNORECASE,
+)
+
+
+class CachedResponse:
+    # coalesced: shared from another caller's in-flight request (carries no token usage either)
+    def __init__(self, content, cached=False, coalesced=False):
+        self.content = content
+        self.cached = cached
+        self.coalesced = coalesced
+
+
+def normalize_prompt(text):
+    return re.sub(r"\s+", " ", text.strip().lower())
+
+
+def is_time_relative(text):
+    return bool(TIME_RELATIVE_PATTERN.search(text))
+
+
+def is_time_of_day_relative(text):
+    return bool(TIME_OF_DAY_PATTERN.search(text))
+
+
+def clock_times(text):
+    # (hour, minute) for every clock time in text; one without am/pm counts both ways
+    times = set()
+    for match in CLOCK_TIME_PATTERN.finditer(text):
+        if match.group('ampm'):
+            hour = int(match.group('hour')) % 12 + (12 if match.group('ampm').lower() == 'p' else 0)
+            times.add((hour, int(match.group('minute') or 0)))
+        elif match.group('word'):
+            times.add((0, 0) if match.group('word').lower() == "midnight" else (12, 0))
+        else:
+            hour = int(match.group('hour24') or match.group('bare'))
+            minute = int(match.group('minute24') or 0)
+            times.update((candidate, minute) for candidate in (hour, hour + 12) if candidate < 24)
+    return sorted((hour, minute) for hour, minute in times if hour < 24 and minute < 60)
+
+
+def is_date_keyed(prompt_type, text):
+    return prompt_type in DATE_KEYED_TYPES or is_time_relative(text)
+
+
+class CachedChatModel:
+    # time_relative: "date_key" keys such prompts on today's date, "bypass" never caches them.
+    # Prompts relative to the time of day are never cached either way.
+    def __init__(self, model, db_path=CACHE_DB, max_entries=1024, max_db_entries=100000,
+                 ttls=None, time_relative="date_key"):
+        self.model = model
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.max_db_entries = max_db_entries
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.time_relative = time_relative
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()  # the memory tier and stats; SQLite I/O happens outside it
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "bypassed": 0}
+        self._writes = 0
+        self._local = threading.local()
+        self._schema_ready = False
+        # Concurrent misses for the same key make one model call between them
+        self._flight = SingleFlight("llm_cache")
+
+    def _conn(self):
+        # One connection per thread (and per process), like calendar_mirror, opened on first
+        # lookup rather than at import; with WAL, threads read the disk tier side by side
+        if not self.db_path:
+            return None
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=5.0, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            if not self._schema_ready:
+                conn.execute('''CREATE TABLE IF NOT EXISTS llm_cache (
+                    key TEXT PRIMARY KEY, prompt_type TEXT, content TEXT,
+                    expires_at REAL, last_access REAL)''')
+                conn.execute('''CREATE INDEX IF NOT EXISTS llm_cache_last_access ON llm_cache (last_access)''')
+                conn.commit()
+                self._schema_ready = True
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def __getattr__(self, name):
+        # Anything we don't wrap (stream, ainvoke, ...) goes straight to the client
+        return getattr(self.model, name)
+
+    def _model_kwargs(self, prompt_type, kwargs):
+        # A resilient client (resilient_llm) picks its deadline and hedge delay by prompt type
+        if getattr(self.model, "per_prompt_type", False):
+            return dict(kwargs, prompt_type=prompt_type)
+        return kwargs
+
+    # ---------- Keys ----------
+    def make_key(self, prompt, prompt_type="default", template_version="v1", cache_key=None):
+        text = cache_key if cache_key is not None else prompt
+        parts = [prompt_type, template_version, normalize_prompt(text)]
+        if is_time_of_day_relative(text) or (is_time_relative(text) and self.time_relative == "bypass"):
+            return None
+        if is_date_keyed(prompt_type, text):
+            now = datetime.now(india_tz)
+            parts.append(now.strftime("%Y-%m-%d"))
+            if not is_time_relative(text):
+                # A cached "today 17:00" for "meeting at 5pm" is wrong once 17:00 has passed
+                parts.extend("passed" if (hour, minute) <= (now.hour, now.minute) else "ahead"
+                             for hour, minute in clock_times(text))
+        return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+    def _expiry(self, prompt_type, text):
+        now = time.time()
+        expires_at = now + self.ttls.get(prompt_type, self.ttls["default"])
+        if is_date_keyed(prompt_type, text):
+            # Date-keyed entries are useless after midnight anyway
+            tomorrow = datetime.now(india_tz).date() + timedelta(days=1)
+            midnight = india_tz.localize(datetime.combine(tomorrow, datetime.min.time())).timestamp()
+            expires_at = min(expires_at, midnight)
+        return expires_at
+
+    # ---------- Tiers ----------
+    def _get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                content, expires_at = entry
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    return content
+                del self._memory[key]
+
+        # A disk read never holds up memory hits in other threads
+        conn = self._conn()
+        if conn is not None:
+            row = conn.execute('''SELECT content, expires_at FROM llm_cache WHERE key = ?''', (key,)).fetchone()
+            if row and row[1] > now:
+                conn.execute('''UPDATE llm_cache SET last_access = ? WHERE key = ?''', (now, key))
+                conn.commit()
+                with self._lock:
+                    self._remember(key, row[0], row[1])
+                    self._stats["disk_hits"] += 1
+                return row[0]
+        with self._lock:
+            self._stats["misses"] += 1
+        return None
+
+    def _remember(self, key, content, expires_at):
+        self._memory[key] = (content, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _put(self, key, prompt_type, content, expires_at):
+        with self._lock:
+            self._remember(key, content, expires_at)
+            self._writes += 1
+            evict = self._writes % 256 == 0
+        conn = self._conn()
+        if conn is None:
+            return
+        conn.execute('''INSERT OR REPLACE INTO llm_cache (key, prompt_type, content, expires_at, last_access)
+                        VALUES (?, ?, ?, ?, ?)''', (key, prompt_type, content, expires_at, time.time()))
+        if evict:
+            self._evict_disk(conn)
+        conn.commit()
+
+    def _evict_disk(self, conn):
+        conn.execute('''DELETE FROM llm_cache WHERE expires_at <= ?''', (time.time(),))
+        conn.execute('''DELETE FROM llm_cache WHERE key IN (
+                          SELECT key FROM llm_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?)''',
+                     (self.max_db_entries,))
+
+    # ---------- Public API ----------
+    def invoke(self, prompt, prompt_type="default", template_version="v1", cache_key=None, validate=None, **kwargs):
+        key = self.make_key(prompt, prompt_type, template_version, cache_key)
+        if key is None:
+            with self._lock:
+                self._stats["bypassed"] += 1
+            return self.model.invoke(prompt, **self._model_kwargs(prompt_type, kwargs))
+
+        content = self._get(key)
+        if content is not None:
+            return CachedResponse(content, cached=True)
+
+        def fetch():
+            response = self.model.invoke(prompt, **self._model_kwargs(prompt_type, kwargs))
+            # Only remember responses the caller could actually use
+            if validate is None or validate(response.content):
+                text = cache_key if cache_key is not None else prompt
+                self._put(key, prompt_type, response.content, self._expiry(prompt_type, text))
+            return response
+
+        response, shared = self._flight.do(key, fetch)
+        return CachedResponse(response.content, coalesced=True) if shared else response
+
+    async def ainvoke(self, prompt, prompt_type="default", template_version="v1", cache_key=None, validate=None, **kwargs):
+        key = self.make_key(prompt, prompt_type, template_version, cache_key)
+        if key is None:
+            with self._lock:
+                self._stats["bypassed"] += 1
+            return await self.model.ainvoke(prompt, **self._model_kwargs(prompt_type, kwargs))
+
+        # The SQLite tier is blocking I/O, so keep it off the event loop
+        content = await asyncio.to_thread(self._get, key)
+        if content is not None:
+            return CachedResponse(content, cached=True)
+
+        async def fetch():
+            response = await self.model.ainvoke(prompt, **self._model_kwargs(prompt_type, kwargs))
+            if validate is None or validate(response.content):
+                text = cache_key if cache_key is not None else prompt
+                await asyncio.to_thread(self._put, key, prompt_type, response.content, self._expiry(prompt_type, text))
+            return response
+
+        response, shared = await self._flight.ado(key, fetch)
+        return CachedResponse(response.content, coalesced=True) if shared else response
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        conn = self._conn()
+        if conn is not None:
+            conn.execute('''DELETE FROM llm_cache''')
+            conn.commit()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+        stats["coalesced"] = self._flight.stats()["followers"]
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_ratio"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
+
+
+def has_json_object(content):
+    return '{' in content and '}' in content
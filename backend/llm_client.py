@@ -0,0 +1,47 @@
+import os
+from dotenv import load_dotenv
+
+from lazy import Lazy
+from llm_cache import CachedChatModel
+from resilient_llm import ResilientChatModel
+
+# The Gemini clients and response cache every route shares. One per process: the notes,
+# scheduling and assistant routes all go through these, so a process serving all of them
+# loads langchain once and warms one cache. langchain is imported on the first call.
+#
+# `model` puts deadlines, hedging and a circuit breaker (resilient_llm) in front of Gemini Pro,
+# failing over to the faster fallback model; `cached_model` adds the response cache on top.
+
+load_dotenv()
+GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
+MODEL_NAME = os.getenv("GEMINI_MODEL", "gemini-1.5-pro")
+FALLBACK_MODEL_NAME = os.getenv("GEMINI_FALLBACK_MODEL", "gemini-1.5-flash")  # empty disables the fallback tier
+
+# The client's own limits only bound abandoned attempts; callers wait for their deadline at most
+CLIENT_TIMEOUT = float(os.getenv("LLM_CLIENT_TIMEOUT", "30"))
+CLIENT_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "1"))
+
+
+def parse_deadlines(text):
+    # "intent=4,chat=15" -> {"intent": 4.0, "chat": 15.0}
+    deadlines = {}
+    for item in filter(None, (part.strip() for part in text.split(','))):
+        prompt_type, _, seconds = item.partition('=')
+        deadlines[prompt_type.strip()] = float(seconds)
+    return deadlines
+
+
+def build_model(name=MODEL_NAME):
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    return ChatGoogleGenerativeAI(model=name, google_api_key=GOOGLE_API_KEY,
+                                  timeout=CLIENT_TIMEOUT, max_retries=CLIENT_MAX_RETRIES)
+
+
+gemini = Lazy(build_model)
+tiers = [("primary", gemini)]
+if FALLBACK_MODEL_NAME:
+    tiers.append(("fallback", Lazy(lambda: build_model(FALLBACK_MODEL_NAME))))
+
+model = ResilientChatModel(tiers, deadlines=parse_deadlines(os.getenv("LLM_DEADLINES", "")),
+                           hedge=os.getenv("LLM_HEDGING", "1") != "0")
+cached_model = CachedChatModel(model, db_path=os.getenv("LLM_CACHE_DB", "llm_cache.db"))
@@ -0,0 +1,265 @@
+import os
+import json
+import time
+import bisect
+import threading
+import contextvars
+from functools import wraps
+from contextlib import contextmanager
+
+# Per-stage latency histograms, LLM token and parse-failure counters, and an optional per-request
+# trace log, exposed on /metrics in the Prometheus text format. Kept dependency-free: recording
+# is a perf_counter pair, a bisect and a dict update under a lock.
+#
+# Inside a Flask request, stage timings are buffered on the request's trace and observed when the
+# request finishes, so every stage is labelled with the intent the request turned out to have.
+# Outside a request (scripts, worker threads) they are observed right away with intent "none".
+#
+# The registry lives in the process. Under gunicorn every worker keeps its own, and a scrape of
+# /metrics reports only the worker that happened to answer it.
+
+TRACE_LOG = os.getenv("TRACE_LOG")  # path for one JSON line per request; unset disables tracing
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+# ---------- Metric Types ----------
+def _label_text(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values)) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _number(value):
+    return repr(float(value)) if value != float('inf') else "+Inf"
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            lines.append(f"{self.name}{_label_text(self.labelnames, key)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((key, list(counts), total) for key, (counts, total) in self._series.items())
+        for key, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_label_text(self.labelnames, key, ('le', _number(bound)))} {cumulative}")
+            lines.append(f"{self.name}_sum{_label_text(self.labelnames, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_label_text(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def counter(self, name, documentation, labelnames=()):
+        metric = Counter(name, documentation, labelnames)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+REQUEST_SECONDS = registry.histogram("assistant_request_seconds", "End-to-end request latency.",
+                                     ["endpoint", "intent", "status"])
+STAGE_SECONDS = registry.histogram("assistant_stage_seconds", "Time spent in each stage of a request.",
+                                   ["stage", "intent"])
+STAGE_ERRORS = registry.counter("assistant_stage_errors_total", "Stages that raised an exception.", ["stage"])
+LLM_TOKENS = registry.counter("assistant_llm_tokens_total", "LLM tokens reported by the model.", ["stage", "kind"])
+LLM_PARSE_FAILURES = registry.counter("assistant_llm_parse_failures_total",
+                                      "LLM responses that could not be parsed as the expected JSON.", ["stage"])
+
+
+# ---------- Stage Timing ----------
+_trace = contextvars.ContextVar("assistant_trace", default=None)
+
+
+def set_intent(intent):
+    trace = _trace.get()
+    if trace is not None:
+        trace["intent"] = intent
+
+
+def intent_label(decision):
+    # "note_add", "calendar", "chat", ... for a classifier decision
+    if not decision or "error" in decision:
+        return "error"
+    action = decision.get("action") or "chat"
+    return f"note_{decision.get('note_action')}" if action == "note" else action
+
+
+def _record(name, elapsed, failed):
+    if failed:
+        STAGE_ERRORS.inc(stage=name)
+    trace = _trace.get()
+    if trace is None or trace["finished"]:
+        STAGE_SECONDS.observe(elapsed, stage=name, intent="none")
+    else:
+        trace["spans"].append((name, elapsed, failed))
+
+
+@contextmanager
+def stage(name):
+    start = time.perf_counter()
+    failed = False
+    try:
+        yield
+    except BaseException:
+        failed = True
+        raise
+    finally:
+        _record(name, time.perf_counter() - start, failed)
+
+
+def timed(name):
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_llm_usage(stage_name, response):
+    # Cached responses carry no usage metadata and are not counted
+    usage = getattr(response, "usage_metadata", None)
+    if usage:
+        LLM_TOKENS.inc(usage.get("input_tokens", 0), stage=stage_name, kind="input")
+        LLM_TOKENS.inc(usage.get("output_tokens", 0), stage=stage_name, kind="output")
+
+
+# ---------- Request Tracing ----------
+_trace_lock = threading.Lock()
+_trace_file = None
+
+
+def _write_trace(entry):
+    global _trace_file
+    with _trace_lock:
+        if _trace_file is None:
+            _trace_file = open(TRACE_LOG, "a", buffering=1)
+        _trace_file.write(json.dumps(entry) + "\n")
+
+
+def start_trace():
+    return _trace.set({"start": time.perf_counter(), "intent": "none", "spans": [], "finished": False})
+
+
+def finish_trace(token, endpoint, method, status):
+    trace = _trace.get()
+    try:
+        _trace.reset(token)
+    except ValueError:
+        _trace.set(None)
+    if trace is None or trace["finished"]:
+        return
+    trace["finished"] = True
+    elapsed = time.perf_counter() - trace["start"]
+    intent = trace["intent"]
+    REQUEST_SECONDS.observe(elapsed, endpoint=endpoint, intent=intent, status=str(status))
+    for name, seconds, _ in trace["spans"]:
+        STAGE_SECONDS.observe(seconds, stage=name, intent=intent)
+    if TRACE_LOG:
+        _write_trace({
+            "ts": round(time.time(), 3),
+            "endpoint": endpoint,
+            "method": method,
+            "status": status,
+            "intent": intent,
+            "ms": round(elapsed * 1000, 2),
+            "spans": [dict({"stage": name, "ms": round(seconds * 1000, 2)}, **({"error": True} if failed else {}))
+                      for name, seconds, failed in trace["spans"]],
+        })
+
+
+def init_app(app):
+    # Times every request on a Flask app and serves the registry on /metrics
+    from flask import Response, g, request
+
+    @app.before_request
+    def _start_request_trace():
+        if request.path != '/metrics':
+            g._metrics_trace = start_trace()
+
+    @app.after_request
+    def _finish_request_trace(response):
+        token = g.pop('_metrics_trace', None)
+        if token is not None:
+            endpoint, method = request.url_rule.rule if request.url_rule else "unmatched", request.method
+            if response.is_streamed:
+                # A streamed body (and the stages in it) runs after this hook, so the request
+                # is only done, and its intent known, once the body has been sent
+                response.call_on_close(lambda: finish_trace(token, endpoint, method, response.status_code))
+            else:
+                finish_trace(token, endpoint, method, response.status_code)
+        return response
+
+    @app.teardown_request
+    def _abandon_request_trace(exc):
+        # Only reached with a live trace when the view raised
+        token = g.pop('_metrics_trace', None)
+        if token is not None:
+            finish_trace(token, request.url_rule.rule if request.url_rule else "unmatched", request.method, 500)
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        # This worker's series only: with SERVICE_WORKERS > 1, successive scrapes land on different
+        # workers, so run one worker per scraped port (more threads instead) for exact counts
+        return Response(registry.render(), content_type=METRICS_CONTENT_TYPE)
+
+    return app
@@ -0,0 +1,190 @@
+from flask import Blueprint, Response, request, jsonify
+import json
+
+from llm_cache import has_json_object
+from llm_client import cached_model
+from notes_store import (insert_or_update_notes, append_note_points, get_notes, get_note_points,
+                         get_all_notes, iter_notes, search_notes, import_notes, IMPORT_MODES, IMPORT_CHUNK_SIZE)
+from notes_jsonl import export_jsonl, parse_jsonl, new_error_log
+from metrics import stage, record_llm_usage, LLM_PARSE_FAILURES
+from intent_classifier import IntentClassifier
+from resilient_llm import LLMUnavailable, LLM_LOCAL_FALLBACKS
+
+# Note routes: /handle_note lets the LLM pick add/append/retrieve, the rest are plain reads
+# and writes over notes_store's pooled, WAL-mode SQLite access (schema created on first use)
+notes_api = Blueprint('notes', __name__)
+NOTE_DECISION_PROMPT_VERSION = "v2"
+
+# Rule patterns only; used to decide when no model tier answers
+note_rules = IntentClassifier(use_model=False)
+
+def decide_locally(user_input):
+    decision = note_rules.predict(user_input)
+    if decision["action"] != "note" or not decision.get("topic"):
+        return None
+    return {"action": decision["note_action"], "topic": decision["topic"]}
+
+def ask_llm_to_decide(user_input):
+    prompt = f"""
+You are a helpful AI assistant that helps manage notes.
+
+User's message: "{user_input}"
+
+Your task:
+- Decide if the user wants to **ADD** a new note, **APPEND** points to an existing note, or **RETRIEVE** a note.
+- Extract the **topic name** they are referring to.
+
+Strictly output ONLY valid JSON like:
+{{
+  "action": "add", "append" or "retrieve",
+  "topic": "topic name"
+}}
+
+Do not add any explanation or text outside the JSON.
+"""
+    try:
+        with stage("llm_note_decision"):
+            response = cached_model.invoke(prompt, prompt_type="note_decision", template_version=NOTE_DECISION_PROMPT_VERSION,
+                                           cache_key=user_input, validate=has_json_object)
+    except LLMUnavailable as e:
+        print("Deciding note action locally:", e)
+        LLM_LOCAL_FALLBACKS.inc(stage="llm_note_decision")
+        return decide_locally(user_input)
+    record_llm_usage("llm_note_decision", response)
+    content = response.content.strip()
+
+    # Extract JSON part safely
+    try:
+        json_start = content.index('{')
+        json_end = content.rindex('}') + 1
+        json_content = content[json_start:json_end]
+        decision = json.loads(json_content)
+        return decision
+    except Exception as e:
+        print("Error parsing LLM response:", e)
+        LLM_PARSE_FAILURES.inc(stage="llm_note_decision")
+        return None
+
+
+@notes_api.route('/handle_note', methods=['POST'])
+def handle_note():
+    user_input = request.json.get('message')
+    if not user_input:
+        return jsonify({"response": "No input received."})
+    
+    decision = ask_llm_to_decide(user_input)
+    if not decision:
+        return jsonify({"response": "Sorry, couldn't understand the request."})
+    
+    action = decision.get("action")
+    topic = decision.get("topic")
+    
+    if action == "add":
+        points = request.json.get("points")
+        if not points:
+            return jsonify({"response": "No points provided. Please include points for the note."})
+        insert_or_update_notes(topic, points)
+        return jsonify({"response": f"Note added for topic '{topic}'!"})
+    
+    elif action == "append":
+        points = request.json.get("points")
+        if not points:
+            return jsonify({"response": "No points provided. Please include points to append."})
+        count = append_note_points(topic, points)
+        return jsonify({"response": f"Added to '{topic}', which now has {count} points."})
+    
+    elif action == "retrieve":
+        note = get_notes(topic)
+        if note:
+            return jsonify({"response": f"Here are your notes for '{topic}':", "points": note})
+        else:
+            return jsonify({"response": f"No note found for topic: {topic}"})
+    
+    else:
+        return jsonify({"response": "Sorry, couldn't understand your intent."})
+
+@notes_api.route('/append_note', methods=['POST'])
+def append_note():
+    topic = request.json.get('topic')
+    points = request.json.get('points')
+    if not topic or not points:
+        return jsonify({"response": "Please provide a topic and the points to append."})
+    count = append_note_points(topic, points)
+    return jsonify({"response": f"Added to '{topic}', which now has {count} points.", "count": count})
+
+@notes_api.route('/note_points', methods=['GET'])
+def note_points():
+    topic = request.args.get('topic')
+    if not topic:
+        return jsonify({"response": "Please provide a topic."})
+    start = max(request.args.get('start', default=0, type=int), 0)
+    limit = request.args.get('limit', type=int)
+    points = get_note_points(topic, start, limit)
+    if points is None:
+        return jsonify({"response": f"No note found for topic: {topic}"})
+    return jsonify({"response": f"Points for '{topic}':", "points": points})
+
+MAX_NOTES_PAGE_SIZE = 1000
+
+@notes_api.route('/view_all_notes', methods=['GET'])
+def view_all_notes():
+    limit = request.args.get('limit', type=int)
+    after_topic = request.args.get('after_topic')
+
+    # Streaming mode: one JSON object per line, read a chunk of topics at a time with the
+    # connection back in the pool between chunks
+    if request.args.get('format') == 'ndjson':
+        def generate():
+            for topic, points in iter_notes(after_topic, limit):
+                yield json.dumps({"topic": topic, "points": points}) + "\n"
+        return Response(generate(), mimetype='application/x-ndjson')
+
+    if limit is not None or after_topic is not None:
+        limit = min(max(limit or MAX_NOTES_PAGE_SIZE, 1), MAX_NOTES_PAGE_SIZE)
+        page = list(iter_notes(after_topic, limit))
+        next_after_topic = page[-1][0] if len(page) == limit else None
+        if not page:
+            return jsonify({"response": "No notes found.", "notes": {}, "next_after_topic": None})
+        return jsonify({"response": "Here are your notes:", "notes": dict(page), "next_after_topic": next_after_topic})
+
+    notes_dict = get_all_notes()
+    
+    if notes_dict:
+        return jsonify({"response": "Here are all your notes:", "notes": notes_dict})
+    else:
+        return jsonify({"response": "No notes found."})
+
+@notes_api.route('/search_notes', methods=['GET'])
+def search_notes_route():
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({"response": "Please provide a search query.", "results": []})
+    limit = min(max(request.args.get('limit', default=10, type=int), 1), 100)
+
+    results = search_notes(query, limit)
+    if results:
+        return jsonify({"response": f"Found {len(results)} notes matching '{query}':", "results": results})
+    else:
+        return jsonify({"response": f"No notes match '{query}'.", "results": []})
+
+# ---------- Bulk Export / Import ----------
+# JSON Lines in both directions, no LLM involved; notes_cli.py does the same against notes.db
+@notes_api.route('/notes/export', methods=['GET'])
+def export_notes():
+    # Streamed a chunk of topics at a time; after_topic resumes an interrupted export
+    after_topic = request.args.get('after_topic')
+    headers = {"Content-Disposition": 'attachment; filename="notes.jsonl"'}
+    return Response(export_jsonl(iter_notes(after_topic)), mimetype='application/x-ndjson', headers=headers)
+
+@notes_api.route('/notes/import', methods=['POST'])
+def import_notes_route():
+    # The raw body is JSON Lines, read a line at a time and written a chunk per transaction
+    mode = request.args.get('mode', 'upsert')
+    if mode not in IMPORT_MODES:
+        return jsonify({"response": f"mode must be one of: {', '.join(IMPORT_MODES)}."}), 400
+    chunk_size = min(max(request.args.get('chunk_size', default=IMPORT_CHUNK_SIZE, type=int), 1), 10000)
+
+    errors = new_error_log()
+    totals = import_notes(parse_jsonl(request.stream, errors), mode, chunk_size)
+    return jsonify({"response": f"Imported {totals['notes']} notes ({totals['points']} points written).",
+                    "mode": mode, **totals, "skipped": errors["count"], "errors": errors["first"]})
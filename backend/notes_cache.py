@@ -0,0 +1,93 @@
+import sys
+import threading
+from collections import OrderedDict
+
+# Bounded LRU of decoded notes, topic -> points (None for a topic that does not exist), kept
+# in front of notes_store so hot topics skip SQLite and point assembly. Bounded by entry count
+# and by an estimate of the bytes held. Invalidation is driven by NotesStore, which watches
+# for commits from any connection or process; this class only holds and evicts entries.
+
+MISSING = object()
+
+
+def estimate_size(topic, value):
+    size = sys.getsizeof(topic) + sys.getsizeof(value)
+    if isinstance(value, list):
+        size += sum(sys.getsizeof(item) for item in value)
+    elif isinstance(value, dict):
+        size += sum(sys.getsizeof(key) + sys.getsizeof(item) for key, item in value.items())
+    return size
+
+
+def _copy(value):
+    # Callers get their own list or dict, so the cached one can't be changed under us
+    if isinstance(value, list):
+        return list(value)
+    if isinstance(value, dict):
+        return dict(value)
+    return value
+
+
+class NotesCache:
+    def __init__(self, max_entries=512, max_bytes=16 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # topic -> (value, size)
+        self._bytes = 0
+        # Bumped by every invalidation, so a read that raced one doesn't store what it read
+        self.generation = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "invalidations": 0, "evictions": 0}
+
+    def get(self, topic):
+        # The cached value, or MISSING
+        with self._lock:
+            entry = self._entries.get(topic)
+            if entry is None:
+                self._stats["misses"] += 1
+                return MISSING
+            self._entries.move_to_end(topic)
+            self._stats["hits"] += 1
+        return _copy(entry[0])
+
+    def put(self, topic, value, generation=None):
+        # generation: self.generation from before the value was read
+        size = estimate_size(topic, value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            old = self._entries.pop(topic, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[topic] = (_copy(value), size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+                self._stats["evictions"] += 1
+
+    def invalidate(self, topics):
+        with self._lock:
+            self.generation += 1
+            for topic in topics:
+                entry = self._entries.pop(topic, None)
+                if entry is not None:
+                    self._bytes -= entry[1]
+                    self._stats["invalidations"] += 1
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._stats["invalidations"] += len(self._entries)
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats, entries=len(self._entries), bytes=self._bytes,
+                         max_entries=self.max_entries, max_bytes=self.max_bytes)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
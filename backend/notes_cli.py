@@ -0,0 +1,70 @@
+import sys
+import time
+import argparse
+
+from notes_store import NotesStore, DB_PATH, IMPORT_MODES, IMPORT_CHUNK_SIZE
+from notes_jsonl import export_jsonl, parse_jsonl, new_error_log
+
+# Bulk export and import of notes as JSON Lines, straight against the SQLite file, so no
+# server (or LLM) is needed. Same format as /notes/export and /notes/import.
+#   python notes_cli.py export -o backup.jsonl
+#   python notes_cli.py import backup.jsonl --mode merge
+#   python notes_cli.py export | python notes_cli.py --db copy.db import -
+
+IO_BUFFER = 1024 * 1024
+
+
+def export_command(store, args):
+    count = 0
+
+    def counted(notes):
+        nonlocal count
+        for note in notes:
+            count += 1
+            yield note
+
+    out = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8', buffering=IO_BUFFER)
+    try:
+        for chunk in export_jsonl(counted(store.iter_notes(args.after_topic))):
+            out.write(chunk)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return f"exported {count} notes"
+
+
+def import_command(store, args):
+    errors = new_error_log()
+    source = sys.stdin.buffer if args.input == '-' else open(args.input, 'rb', buffering=IO_BUFFER)
+    try:
+        totals = store.import_notes(parse_jsonl(source, errors), args.mode, args.chunk_size)
+    finally:
+        if source is not sys.stdin.buffer:
+            source.close()
+    for error in errors["first"]:
+        print(f"line {error['line']}: {error['error']}", file=sys.stderr)
+    return f"imported {totals['notes']} notes ({totals['points']} points written, {errors['count']} lines skipped)"
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Export or import notes as JSON Lines")
+    parser.add_argument('--db', default=DB_PATH, help="notes database (default: NOTES_DB or notes.db)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    export_parser = commands.add_parser('export', help="write every note as JSON Lines")
+    export_parser.add_argument('-o', '--output', default='-', help="file to write, - for stdout")
+    export_parser.add_argument('--after-topic', help="resume after this topic")
+
+    import_parser = commands.add_parser('import', help="load notes from JSON Lines")
+    import_parser.add_argument('input', help="file to read, - for stdin")
+    import_parser.add_argument('--mode', choices=IMPORT_MODES, default='upsert',
+                               help="upsert replaces a topic's points, merge adds the ones it lacks")
+    import_parser.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE, help="notes per transaction")
+    args = parser.parse_args()
+
+    # The read cache only matters to a long-running server
+    store = NotesStore(db_path=args.db, cache_size=0)
+    start = time.perf_counter()
+    summary = export_command(store, args) if args.command == 'export' else import_command(store, args)
+    print(f"{summary} in {time.perf_counter() - start:.2f}s", file=sys.stderr)
+    store.close()
@@ -0,0 +1,52 @@
+import json
+
+# Notes as JSON Lines: one {"topic": ..., "points": [...]} object per line, the same shape as
+# /view_all_notes?format=ndjson. Shared by /notes/export, /notes/import and notes_cli.py; both
+# directions work one line at a time, so memory does not grow with the number of notes.
+
+EXPORT_CHUNK_BYTES = 64 * 1024
+MAX_REPORTED_ERRORS = 20
+
+
+def export_jsonl(notes):
+    # notes is an iterable of (topic, points); yields text in chunks of about EXPORT_CHUNK_BYTES
+    buffer, size = [], 0
+    for topic, points in notes:
+        line = json.dumps({"topic": topic, "points": points}, ensure_ascii=False) + "\n"
+        buffer.append(line)
+        size += len(line)
+        if size >= EXPORT_CHUNK_BYTES:
+            yield "".join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield "".join(buffer)
+
+
+def new_error_log():
+    return {"count": 0, "first": []}
+
+
+def parse_jsonl(lines, errors):
+    # lines is an iterable of str or bytes lines (a file, request.stream). Yields (topic, points);
+    # bad lines are skipped, counted in errors and the first few kept with their line numbers.
+    for number, line in enumerate(lines, 1):
+        try:
+            if isinstance(line, bytes):
+                line = line.decode("utf-8")
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if not isinstance(record, dict) or "topic" not in record or "points" not in record:
+                raise ValueError('expected an object with "topic" and "points"')
+            topic, points = record["topic"], record["points"]
+            if not isinstance(topic, str) or not topic.strip():
+                raise ValueError("topic must be a non-empty string")
+            if points is None:
+                raise ValueError("points must not be null")
+        except ValueError as e:
+            errors["count"] += 1
+            if len(errors["first"]) < MAX_REPORTED_ERRORS:
+                errors["first"].append({"line": number, "error": str(e)})
+            continue
+        yield topic, points
@@ -0,0 +1,659 @@
+import os
+import re
+import json
+import queue
+import sqlite3
+import threading
+from itertools import count, groupby, islice
+from contextlib import contextmanager
+
+from metrics import timed
+from notes_cache import NotesCache, MISSING
+from single_flight import SingleFlight
+
+DB_PATH = os.getenv("NOTES_DB", "notes.db")
+POOL_SIZE = int(os.getenv("NOTES_DB_POOL_SIZE", "8"))
+CACHE_SIZE = int(os.getenv("NOTES_CACHE_SIZE", "512"))  # topics; 0 disables the cache
+CACHE_MAX_BYTES = int(os.getenv("NOTES_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+CHANGE_LOG_KEEP = 10000
+CHANGE_LOG_PRUNE_EVERY = 256
+IMPORT_MODES = ("upsert", "merge")
+IMPORT_CHUNK_SIZE = 1000  # notes per transaction
+ITER_CHUNK_SIZE = 200  # topics per read when listing notes
+IMPORT_BATCH_PARAMS = 500  # topics per IN (...) lookup
+
+PRAGMAS = [
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16000",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA foreign_keys=ON",
+]
+
+# Statements are kept as constants so sqlite3's statement cache reuses them.
+# notes.points only holds legacy JSON blobs that the online migration has not reached yet;
+# everything else lives one row per point in note_points. Both tables have an explicit
+# INTEGER PRIMARY KEY, which VACUUM never renumbers, and note_points.topic_id and the search
+# index refer to those columns.
+UPSERT_TOPIC_SQL = '''INSERT INTO notes (topic, points, scalar) VALUES (?, NULL, ?)
+                      ON CONFLICT(topic) DO UPDATE SET points = NULL, scalar = excluded.scalar'''
+ENSURE_TOPIC_SQL = '''INSERT INTO notes (topic, points, scalar) VALUES (?, NULL, 0)
+                      ON CONFLICT(topic) DO NOTHING'''
+SELECT_TOPIC_SQL = '''SELECT id, points, scalar FROM notes WHERE topic = ?'''
+CLEAR_TOPIC_FLAGS_SQL = '''UPDATE notes SET points = NULL, scalar = ? WHERE id = ?'''
+DELETE_POINTS_SQL = '''DELETE FROM note_points WHERE topic_id = ?'''
+INSERT_POINT_SQL = '''INSERT INTO note_points (topic_id, seq, text, is_json) VALUES (?, ?, ?, ?)'''
+NEXT_SEQ_SQL = '''SELECT coalesce(max(seq), -1) + 1 FROM note_points WHERE topic_id = ?'''
+SELECT_POINTS_SQL = '''SELECT text, is_json FROM note_points WHERE topic_id = ? ORDER BY seq'''
+SELECT_POINT_RANGE_SQL = '''SELECT seq, text, created_at FROM note_points
+                            WHERE topic_id = ? AND seq >= ? ORDER BY seq LIMIT ?'''
+# One keyset chunk of topics off the topic index, with their points in order
+SELECT_NOTES_PAGE_SQL = '''SELECT n.topic, n.points, n.scalar, p.text, p.is_json
+                           FROM (SELECT id, topic, points, scalar FROM notes ORDER BY topic LIMIT ?) n
+                           LEFT JOIN note_points p ON p.topic_id = n.id
+                           ORDER BY n.topic, p.seq'''
+SELECT_NOTES_AFTER_SQL = '''SELECT n.topic, n.points, n.scalar, p.text, p.is_json
+                            FROM (SELECT id, topic, points, scalar FROM notes WHERE topic > ? ORDER BY topic LIMIT ?) n
+                            LEFT JOIN note_points p ON p.topic_id = n.id
+                            ORDER BY n.topic, p.seq'''
+SELECT_LEGACY_BATCH_SQL = '''SELECT id, points FROM notes
+                             WHERE id > ? AND points IS NOT NULL ORDER BY id LIMIT ?'''
+# Every write logs its topic, so caches in any process can drop just the topics that changed
+LOG_CHANGE_SQL = '''INSERT INTO note_changes (topic) VALUES (?)'''
+SELECT_CHANGES_SQL = '''SELECT id, topic FROM note_changes WHERE id > ? ORDER BY id'''
+CHANGE_RANGE_SQL = '''SELECT min(id), coalesce(max(id), 0) FROM note_changes'''
+PRUNE_CHANGES_SQL = '''DELETE FROM note_changes WHERE id <= (SELECT max(id) FROM note_changes) - ?'''
+# Bulk import looks topics up a batch at a time; {} is filled with one ? per topic
+SELECT_TOPIC_ROWS_SQL = '''SELECT topic, id, points, scalar FROM notes WHERE topic IN ({})'''
+SELECT_POINTS_OF_SQL = '''SELECT topic_id, seq, text, is_json FROM note_points WHERE topic_id IN ({})'''
+# Bulk import turns the per-point index trigger off around its inserts and indexes the new
+# rows in one statement; with nothing deleted in between, they are the rows above the old maximum
+SUSPEND_FTS_SQL = '''INSERT INTO notes_fts_suspended (flag) VALUES (1)'''
+RESUME_FTS_SQL = '''DELETE FROM notes_fts_suspended'''
+MAX_POINT_ID_SQL = '''SELECT coalesce(max(id), 0) FROM note_points'''
+INDEX_POINTS_AFTER_SQL = '''INSERT INTO notes_fts (rowid, topic, point)
+                            SELECT id, topic, point FROM note_points_text WHERE id > ?'''
+SEARCH_NOTES_SQL = '''SELECT topic, point, snippet(notes_fts, -1, '[', ']', '...', 12), rank
+                        FROM notes_fts WHERE notes_fts MATCH ? ORDER BY rank LIMIT ?'''
+
+# ---------- Schema Migrations ----------
+def _create_schema(conn):
+    # The current layout. notes_fts is an external-content index over note_points_text, keyed
+    # on note_points.id; points are deleted before their topic, so the delete trigger can still
+    # hand the index the exact text it indexed.
+    conn.execute('''CREATE TABLE notes (
+                        id INTEGER PRIMARY KEY,
+                        topic TEXT NOT NULL UNIQUE,
+                        points TEXT,
+                        scalar INTEGER NOT NULL DEFAULT 0)''')
+    conn.execute('''CREATE TABLE note_points (
+                        id INTEGER PRIMARY KEY,
+                        topic_id INTEGER NOT NULL REFERENCES notes (id),
+                        seq INTEGER NOT NULL,
+                        text TEXT NOT NULL,
+                        created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ', 'now')),
+                        is_json INTEGER NOT NULL DEFAULT 0,
+                        UNIQUE (topic_id, seq))''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS note_changes (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        topic TEXT NOT NULL)''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS notes_fts_suspended (flag INTEGER)''')
+    conn.execute('''CREATE VIEW note_points_text AS
+                        SELECT p.id AS id, n.topic AS topic, p.text AS point
+                        FROM note_points p JOIN notes n ON n.id = p.topic_id''')
+    conn.execute('''CREATE VIRTUAL TABLE notes_fts USING fts5(
+                        topic, point, content='note_points_text', content_rowid='id',
+                        tokenize='unicode61 remove_diacritics 2', prefix='2 3')''')
+    conn.execute('''INSERT INTO notes_fts(notes_fts, rank) VALUES ('rank', 'bm25(5.0, 1.0)')''')
+    conn.execute('''CREATE TRIGGER notes_delete_points BEFORE DELETE ON notes BEGIN
+                        DELETE FROM note_points WHERE topic_id = old.id;
+                    END''')
+    conn.execute('''CREATE TRIGGER note_points_fts_insert AFTER INSERT ON note_points
+                        WHEN NOT EXISTS (SELECT 1 FROM notes_fts_suspended) BEGIN
+                        INSERT INTO notes_fts(rowid, topic, point)
+                        VALUES (new.id, (SELECT topic FROM notes WHERE id = new.topic_id), new.text);
+                    END''')
+    conn.execute('''CREATE TRIGGER note_points_fts_delete AFTER DELETE ON note_points BEGIN
+                        INSERT INTO notes_fts(notes_fts, rowid, topic, point)
+                        VALUES ('delete', old.id, (SELECT topic FROM notes WHERE id = old.topic_id), old.text);
+                    END''')
+
+
+def _migrate_baseline(conn):
+    # A new database, or one from before any migration (topic plus JSON blob), goes straight
+    # to the current layout. The blobs are carried over for migrate_legacy_notes() to explode.
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'notes'").fetchone()
+    if exists:
+        conn.execute('''ALTER TABLE notes RENAME TO notes_baseline''')
+    _create_schema(conn)
+    if exists:
+        conn.execute('''INSERT INTO notes (topic, points) SELECT topic, points FROM notes_baseline''')
+        conn.execute('''DROP TABLE notes_baseline''')
+
+
+# (user_version, step) pairs, applied in order to databases below that version. Version 0 is
+# the original topic plus JSON blob table (or no database at all).
+MIGRATIONS = [
+    (1, _migrate_baseline),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+SEARCH_TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def build_match_query(query):
+    query = query.strip()
+    # A quoted query is a phrase search, anything else is an AND of prefix terms
+    if len(query) > 1 and query[0] == query[-1] == '"':
+        phrase = " ".join(SEARCH_TOKEN_PATTERN.findall(query[1:-1]))
+        return f'"{phrase}"' if phrase else None
+    terms = SEARCH_TOKEN_PATTERN.findall(query)
+    if not terms:
+        return None
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def _point_matches(point, terms):
+    words = [word.lower() for word in SEARCH_TOKEN_PATTERN.findall(point)]
+    return all(any(word.startswith(term) for word in words) for term in terms)
+
+
+def _as_list(points):
+    # A plain string note is stored as a single point and flagged as scalar
+    return points if isinstance(points, list) else [points]
+
+
+def _encode_points(points):
+    # (text, is_json) per point; the text is what search indexes
+    return [(point, 0) if isinstance(point, str) else (json.dumps(point), 1) for point in _as_list(points)]
+
+
+def _decode_point(text, is_json):
+    return json.loads(text) if is_json else text
+
+
+def _assemble(points, scalar):
+    if scalar and len(points) == 1:
+        return points[0]
+    return points
+
+
+def _decode_note(rows):
+    # rows: one topic's (topic, points, scalar, text, is_json) rows from SELECT_NOTES_PAGE_SQL
+    first = next(rows)
+    if first[1] is not None:
+        return json.loads(first[1])
+    points = [_decode_point(first[3], first[4])] if first[3] is not None else []
+    points.extend(_decode_point(row[3], row[4]) for row in rows)
+    return _assemble(points, first[2])
+
+
+def _write_points(conn, topic_id, points, start_seq=0):
+    conn.executemany(INSERT_POINT_SQL, ((topic_id, start_seq + i, text, is_json)
+                                        for i, (text, is_json) in enumerate(points)))
+
+
+class NotesStore:
+    def __init__(self, db_path=DB_PATH, pool_size=POOL_SIZE, cache_size=CACHE_SIZE, cache_bytes=CACHE_MAX_BYTES):
+        self.db_path = db_path
+        self.pool_size = pool_size
+        # Decoded notes for hot topics. Kept coherent with every writer, in this process or
+        # another, through a dedicated connection: its PRAGMA data_version moves whenever any
+        # other connection commits, and then the change log says which topics to drop.
+        self._cache = NotesCache(cache_size, cache_bytes) if cache_size > 0 else None
+        self._watch_lock = threading.Lock()
+        self._changes_logged = 0
+        self._schema_ready = False
+        self._schema_lock = threading.RLock()
+        self._creating_schema = False
+        # Identical concurrent topic lookups share one read. The key carries the number of
+        # commits so far, so a lookup that starts after a write never joins a read from before it.
+        self._reads = SingleFlight("notes.get_notes")
+        self._commit_counter = count(1)
+        self._commits = 0
+        self._reset_pool()
+
+    def _reset_pool(self):
+        self._pid = os.getpid()
+        self._pool = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._watcher = None
+        if self._cache is not None:
+            self._cache.clear()
+
+    def _open(self):
+        conn = sqlite3.connect(self.db_path, isolation_level=None, check_same_thread=False,
+                               cached_statements=64)
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    # ---------- Pool ----------
+    def _ensure_schema(self):
+        # The schema is created on first use rather than at import; other threads wait here
+        with self._schema_lock:
+            if not (self._schema_ready or self._creating_schema):
+                self.create_table()
+
+    @contextmanager
+    def connection(self):
+        if not self._schema_ready:
+            self._ensure_schema()
+        if os.getpid() != self._pid:
+            # Connections must never cross a fork
+            self._reset_pool()
+        conn = None
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                if self._created < self.pool_size:
+                    self._created += 1
+                    conn = self._open()
+            if conn is None:
+                conn = self._pool.get()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._pool.put(conn)
+
+    @contextmanager
+    def transaction(self):
+        with self.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except Exception:
+                conn.rollback()
+                raise
+            conn.commit()
+            self._commits = next(self._commit_counter)
+
+    def stats(self):
+        stats = {"coalesced_reads": self._reads.stats()}
+        if self._cache is not None:
+            stats["cache"] = self._cache.stats()
+        return stats
+
+    def close(self):
+        with self._watch_lock:
+            if self._watcher is not None:
+                self._watcher.close()
+                self._watcher = None
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
+        with self._lock:
+            self._created = 0
+
+    # ---------- Notes ----------
+    def create_table(self, migrate_in_background=True):
+        with self._schema_lock:
+            self._creating_schema = True
+            try:
+                with self.transaction() as conn:
+                    version = conn.execute("PRAGMA user_version").fetchone()[0]
+                    for target, migrate in MIGRATIONS:
+                        if version < target:
+                            migrate(conn)
+                            conn.execute(f"PRAGMA user_version = {target}")
+                    has_legacy = conn.execute(SELECT_LEGACY_BATCH_SQL, (0, 1)).fetchone() is not None
+            finally:
+                self._creating_schema = False
+            self._schema_ready = True
+        if has_legacy:
+            if migrate_in_background:
+                threading.Thread(target=self.migrate_legacy_notes, daemon=True).start()
+            else:
+                self.migrate_legacy_notes()
+
+    def migrate_legacy_notes(self, batch_size=500):
+        # Online migration: short transactions so requests keep flowing in between.
+        # Readers and writers handle not-yet-migrated rows themselves.
+        last_id = 0
+        while True:
+            with self.transaction() as conn:
+                rows = conn.execute(SELECT_LEGACY_BATCH_SQL, (last_id, batch_size)).fetchall()
+                for topic_id, blob in rows:
+                    self._explode_legacy(conn, topic_id, blob)
+            if len(rows) < batch_size:
+                return
+            last_id = rows[-1][0]
+
+    def _explode_legacy(self, conn, topic_id, blob):
+        points = json.loads(blob)
+        conn.execute(DELETE_POINTS_SQL, (topic_id,))
+        _write_points(conn, topic_id, _encode_points(points))
+        conn.execute(CLEAR_TOPIC_FLAGS_SQL, (int(not isinstance(points, list)), topic_id))
+
+    def _replace_points(self, conn, topic, points):
+        conn.execute(UPSERT_TOPIC_SQL, (topic, int(not isinstance(points, list))))
+        topic_id = conn.execute(SELECT_TOPIC_SQL, (topic,)).fetchone()[0]
+        conn.execute(DELETE_POINTS_SQL, (topic_id,))
+        _write_points(conn, topic_id, _encode_points(points))
+        self._log_change(conn, topic)
+
+    def _log_change(self, conn, topic):
+        conn.execute(LOG_CHANGE_SQL, (topic,))
+        self._changes_logged += 1
+        if self._changes_logged % CHANGE_LOG_PRUNE_EVERY == 0:
+            conn.execute(PRUNE_CHANGES_SQL, (CHANGE_LOG_KEEP,))
+
+    @timed("notes.insert_or_update_notes")
+    def insert_or_update_notes(self, topic, points):
+        with self.transaction() as conn:
+            self._replace_points(conn, topic, points)
+
+    @timed("notes.insert_or_update_many")
+    def insert_or_update_many(self, notes):
+        # notes is an iterable of (topic, points); everything lands in one transaction
+        with self.transaction() as conn:
+            for topic, points in notes:
+                self._replace_points(conn, topic, points)
+
+    @timed("notes.append_note_points")
+    def append_note_points(self, topic, points):
+        with self.transaction() as conn:
+            return self._append_points(conn, topic, points)
+
+    def _append_points(self, conn, topic, points):
+        # O(1) per point: only the new rows are written, never the whole note
+        texts = _encode_points(points)
+        conn.execute(ENSURE_TOPIC_SQL, (topic,))
+        topic_id, blob, scalar = conn.execute(SELECT_TOPIC_SQL, (topic,)).fetchone()
+        if blob is not None:
+            self._explode_legacy(conn, topic_id, blob)
+        if blob is not None or scalar:
+            conn.execute(CLEAR_TOPIC_FLAGS_SQL, (0, topic_id))
+        next_seq = conn.execute(NEXT_SEQ_SQL, (topic_id,)).fetchone()[0]
+        _write_points(conn, topic_id, texts, next_seq)
+        self._log_change(conn, topic)
+        return next_seq + len(texts)
+
+    @timed("notes.apply_note_writes")
+    def apply_note_writes(self, writes):
+        # writes is a list of (note_action, topic, points) with note_action "add" or "append".
+        # One transaction for all of them, with a savepoint per write so a bad item fails alone.
+        # Returns, per write, the topic's point count afterwards or the exception it raised.
+        results = []
+        with self.transaction() as conn:
+            for note_action, topic, points in writes:
+                conn.execute("SAVEPOINT note_write")
+                try:
+                    if note_action == "append":
+                        count = self._append_points(conn, topic, points)
+                    else:
+                        self._replace_points(conn, topic, points)
+                        count = len(_as_list(points))
+                except Exception as e:
+                    conn.execute("ROLLBACK TO note_write")
+                    count = e
+                conn.execute("RELEASE note_write")
+                results.append(count)
+        return results
+
+    # ---------- Bulk Import ----------
+    @timed("notes.import_notes")
+    def import_notes(self, notes, mode="upsert", chunk_size=IMPORT_CHUNK_SIZE):
+        # notes is an iterable of (topic, points), consumed chunk_size at a time with one
+        # transaction per chunk, so memory stays flat and other writers get in between chunks.
+        # "upsert" replaces each topic's points; "merge" appends the points a topic doesn't
+        # already have, so importing the same file twice changes nothing.
+        if mode not in IMPORT_MODES:
+            raise ValueError(f"mode must be one of {', '.join(IMPORT_MODES)}")
+        write = self._import_upsert if mode == "upsert" else self._import_merge
+        totals = {"notes": 0, "points": 0, "chunks": 0}
+        notes = iter(notes)
+        while True:
+            records = list(islice(notes, chunk_size))
+            if not records:
+                return totals
+            chunk = {}
+            for topic, points in records:
+                if mode == "merge" and topic in chunk:
+                    points = _as_list(chunk[topic]) + _as_list(points)
+                chunk[topic] = points
+            with self.transaction() as conn:
+                totals["points"] += write(conn, chunk)
+                conn.executemany(LOG_CHANGE_SQL, ((topic,) for topic in chunk))
+                conn.execute(PRUNE_CHANGES_SQL, (CHANGE_LOG_KEEP,))
+            totals["notes"] += len(records)
+            totals["chunks"] += 1
+
+    def _topic_rows(self, conn, topics):
+        rows = {}
+        for start in range(0, len(topics), IMPORT_BATCH_PARAMS):
+            batch = topics[start:start + IMPORT_BATCH_PARAMS]
+            for topic, topic_id, blob, scalar in conn.execute(SELECT_TOPIC_ROWS_SQL.format(",".join("?" * len(batch))),
+                                                              batch):
+                rows[topic] = (topic_id, blob, scalar)
+        return rows
+
+    def _import_upsert(self, conn, chunk):
+        conn.executemany(UPSERT_TOPIC_SQL, ((topic, int(not isinstance(points, list))) for topic, points in chunk.items()))
+        rows = self._topic_rows(conn, list(chunk))
+        conn.executemany(DELETE_POINTS_SQL, ((rows[topic][0],) for topic in chunk))
+        inserts = [(rows[topic][0], seq, text, is_json) for topic, points in chunk.items()
+                   for seq, (text, is_json) in enumerate(_encode_points(points))]
+        self._bulk_insert_points(conn, inserts)
+        return len(inserts)
+
+    def _import_merge(self, conn, chunk):
+        rows = self._topic_rows(conn, list(chunk))
+        new = {topic: points for topic, points in chunk.items() if topic not in rows}
+        written = self._import_upsert(conn, new) if new else 0
+        existing = [topic for topic in chunk if topic in rows]
+        for topic in existing:
+            topic_id, blob, _ = rows[topic]
+            if blob is not None:
+                self._explode_legacy(conn, topic_id, blob)
+
+        ids = [rows[topic][0] for topic in existing]
+        have, next_seq = {}, {}
+        for start in range(0, len(ids), IMPORT_BATCH_PARAMS):
+            batch = ids[start:start + IMPORT_BATCH_PARAMS]
+            for topic_id, seq, text, is_json in conn.execute(SELECT_POINTS_OF_SQL.format(",".join("?" * len(batch))),
+                                                             batch):
+                have.setdefault(topic_id, set()).add((text, is_json))
+                next_seq[topic_id] = max(next_seq.get(topic_id, 0), seq + 1)
+
+        inserts, grown = [], []
+        for topic in existing:
+            topic_id, blob, scalar = rows[topic]
+            seen, seq = have.setdefault(topic_id, set()), next_seq.get(topic_id, 0)
+            for point in _encode_points(chunk[topic]):
+                if point not in seen:
+                    seen.add(point)
+                    inserts.append((topic_id, seq) + point)
+                    seq += 1
+            if seq != next_seq.get(topic_id, 0) and (blob is not None or scalar):
+                grown.append((0, topic_id))
+        # A scalar note that gained points becomes a list, as with append
+        conn.executemany(CLEAR_TOPIC_FLAGS_SQL, grown)
+        self._bulk_insert_points(conn, inserts)
+        return written + len(inserts)
+
+    def _bulk_insert_points(self, conn, inserts):
+        # One notes_fts pass for the whole batch instead of a trigger run per point
+        conn.execute(SUSPEND_FTS_SQL)
+        last_id = conn.execute(MAX_POINT_ID_SQL).fetchone()[0]
+        conn.executemany(INSERT_POINT_SQL, inserts)
+        conn.execute(INDEX_POINTS_AFTER_SQL, (last_id,))
+        conn.execute(RESUME_FTS_SQL)
+
+    # ---------- Read Cache ----------
+    def _sync_cache(self):
+        # Drops cached topics that any other connection (a pool connection here, or another
+        # worker process) has written since the last look. Writes are seen no other way, so
+        # insert_or_update_notes and friends invalidate through here too.
+        if not self._schema_ready:
+            self._ensure_schema()
+        if os.getpid() != self._pid:
+            self._reset_pool()
+        with self._watch_lock:
+            if self._watcher is None:
+                self._watcher = self._open()
+                self._data_version = self._watcher.execute("PRAGMA data_version").fetchone()[0]
+                self._seen_change = self._watcher.execute(CHANGE_RANGE_SQL).fetchone()[1]
+                self._cache.clear()
+                return
+            data_version = self._watcher.execute("PRAGMA data_version").fetchone()[0]
+            if data_version == self._data_version:
+                return
+            self._data_version = data_version
+            oldest, latest = self._watcher.execute(CHANGE_RANGE_SQL).fetchone()
+            if oldest is not None and oldest > self._seen_change + 1:
+                # The log was pruned past what we have seen, so anything may have changed
+                self._cache.clear()
+            else:
+                self._cache.invalidate(topic for _, topic in self._watcher.execute(SELECT_CHANGES_SQL,
+                                                                                   (self._seen_change,)))
+            self._seen_change = max(self._seen_change, latest)
+
+    @timed("notes.get_notes")
+    def get_notes(self, topic):
+        if self._cache is not None:
+            self._sync_cache()
+            value = self._cache.get(topic)
+            if value is not MISSING:
+                return value
+            generation = self._cache.generation
+        value = self._reads.do((topic, self._commits), lambda: self._read_notes(topic))[0]
+        if self._cache is not None:
+            # Not stored if an invalidation ran meanwhile; a write that no sync has seen yet
+            # is dropped by the next one
+            self._cache.put(topic, value, generation)
+        return value
+
+    def _read_notes(self, topic):
+        with self.connection() as conn:
+            result = conn.execute(SELECT_TOPIC_SQL, (topic,)).fetchone()
+            if not result:
+                return None
+            topic_id, blob, scalar = result
+            if blob is not None:
+                return json.loads(blob)
+            points = [_decode_point(*row) for row in conn.execute(SELECT_POINTS_SQL, (topic_id,))]
+        return _assemble(points, scalar)
+
+    @timed("notes.get_note_points")
+    def get_note_points(self, topic, start=0, limit=None):
+        with self.connection() as conn:
+            result = conn.execute(SELECT_TOPIC_SQL, (topic,)).fetchone()
+            if not result:
+                return None
+            topic_id, blob, _ = result
+            if blob is not None:
+                points = [text for text, _ in _encode_points(json.loads(blob))]
+                end = None if limit is None else start + limit
+                return [{"seq": seq, "text": text, "created_at": None}
+                        for seq, text in enumerate(points)][start:end]
+            rows = conn.execute(SELECT_POINT_RANGE_SQL, (topic_id, start, -1 if limit is None else limit)).fetchall()
+        return [{"seq": seq, "text": text, "created_at": created_at} for seq, text, created_at in rows]
+
+    @timed("notes.get_all_notes")
+    def get_all_notes(self):
+        return dict(self.iter_notes())
+
+    def iter_notes(self, after_topic=None, limit=None, chunk_size=ITER_CHUNK_SIZE):
+        # Keyset pagination in chunks of topics. Each chunk is read and its connection goes back
+        # to the pool before anything is yielded, so a slow consumer (a streaming response)
+        # never holds one; memory stays at one chunk.
+        remaining = limit
+        while remaining is None or remaining > 0:
+            size = chunk_size if remaining is None else min(chunk_size, remaining)
+            with self.connection() as conn:
+                if after_topic is None:
+                    rows = conn.execute(SELECT_NOTES_PAGE_SQL, (size,)).fetchall()
+                else:
+                    rows = conn.execute(SELECT_NOTES_AFTER_SQL, (after_topic, size)).fetchall()
+            count = 0
+            for after_topic, topic_rows in groupby(rows, key=lambda row: row[0]):
+                yield after_topic, _decode_note(topic_rows)
+                count += 1
+            if count < size:
+                return
+            if remaining is not None:
+                remaining -= count
+
+    @timed("notes.search_notes")
+    def search_notes(self, query, limit=10):
+        match = build_match_query(query)
+        if not match:
+            return []
+        terms = [term.lower() for term in SEARCH_TOKEN_PATTERN.findall(query)]
+        with self.connection() as conn:
+            # Hits are per point; over-fetch and fold them into per-topic results
+            rows = conn.execute(SEARCH_NOTES_SQL, (match, limit * 20)).fetchall()
+        results = {}
+        for topic, text, snippet, rank in rows:
+            result = results.get(topic)
+            if result is None:
+                if len(results) == limit:
+                    continue
+                result = results[topic] = {"topic": topic, "snippet": snippet, "score": round(-rank, 6),
+                                           "matched_points": []}
+            if _point_matches(text, terms):
+                result["matched_points"].append(text)
+        for result in results.values():
+            result["points"] = self.get_notes(result["topic"])
+        return list(results.values())
+
+
+# ---------- Default Store ----------
+store = NotesStore()
+
+
+def create_table():
+    store.create_table()
+
+
+def insert_or_update_notes(topic, points):
+    store.insert_or_update_notes(topic, points)
+
+
+def insert_or_update_many(notes):
+    store.insert_or_update_many(notes)
+
+
+def append_note_points(topic, points):
+    return store.append_note_points(topic, points)
+
+
+def apply_note_writes(writes):
+    return store.apply_note_writes(writes)
+
+
+def get_notes(topic):
+    return store.get_notes(topic)
+
+
+def get_note_points(topic, start=0, limit=None):
+    return store.get_note_points(topic, start, limit)
+
+
+def get_all_notes():
+    return store.get_all_notes()
+
+
+def iter_notes(after_topic=None, limit=None, chunk_size=ITER_CHUNK_SIZE):
+    return store.iter_notes(after_topic, limit, chunk_size)
+
+
+def search_notes(query, limit=10):
+    return store.search_notes(query, limit)
+
+
+def import_notes(notes, mode="upsert", chunk_size=IMPORT_CHUNK_SIZE):
+    return store.import_notes(notes, mode, chunk_size)
+
+
+def store_stats():
+    return store.stats()
@@ -0,0 +1,501 @@
+import os
+import time
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from metrics import registry
+
+# Deadlines, hedged requests and circuit breakers around the chat model clients.
+#
+# Every call gets the deadline of its prompt type. If the first attempt is still running once
+# that prompt type's recent p95 latency has passed, an identical request is sent and whichever
+# answers first wins (at most max_hedge_ratio of calls are hedged, so a slow model is not hit
+# with double the load). Each model tier (Gemini Pro, then a faster fallback model) has a
+# circuit breaker that opens when the tier's recent error rate spikes and sends traffic to the
+# next tier until a trial call succeeds again. A tier with a fallback behind it gets only
+# failover_share of the time left, so when it times out the fallback still has the rest. When
+# no tier answers within the deadline the call raises LLMUnavailable (LLMTimeout if the last
+# tier ran out of time) and the caller takes its local, deterministic path.
+#
+# Streams get their deadline for the first chunk only, then an idle timeout between chunks, so a
+# long answer read by a slow client runs to the end.
+#
+# Attempts run on a small thread pool, so a request thread is released as soon as its deadline
+# passes. A timeout counts against the tier's breaker when it fires; the abandoned attempt
+# finishes in the background (the client's own timeout bounds it) and only adds its latency.
+# Attempts still queued for a worker when the deadline passes or another attempt wins are
+# cancelled, so they never reach the model.
+
+# Seconds a caller waits for an answer; prompt types with a local fallback give up sooner
+DEFAULT_DEADLINES = {
+    "intent": 6.0,
+    "note_decision": 6.0,
+    "event_extraction": 8.0,
+    "chat": 20.0,
+    "default": 15.0,
+}
+
+UNAVAILABLE_MESSAGE = "I can't reach the language model right now. Please try again in a moment."
+
+# Returned by next() once a stream has no more chunks
+_END_OF_STREAM = object()
+
+LLM_ATTEMPTS = registry.counter("llm_attempts_total", "Model calls by tier and outcome (ok, error, timeout).",
+                                ["tier", "prompt_type", "outcome"])
+LLM_HEDGES = registry.counter("llm_hedges_total", "Hedged duplicate requests fired, and those that answered first.",
+                              ["prompt_type", "result"])
+LLM_CIRCUIT_OPENS = registry.counter("llm_circuit_opens_total", "Times a model tier's circuit breaker opened.", ["tier"])
+LLM_LOCAL_FALLBACKS = registry.counter("llm_local_fallbacks_total",
+                                       "Requests answered by the local path because no model tier could.", ["stage"])
+
+
+class LLMUnavailable(Exception):
+    pass
+
+
+class LLMTimeout(LLMUnavailable, TimeoutError):
+    pass
+
+
+# ---------- Circuit Breaker ----------
+class CircuitBreaker:
+    # closed: calls go through; open: the tier is skipped until the cooldown passes;
+    # half_open: one trial call decides whether it closes again
+    def __init__(self, name, window=20, min_calls=10, error_rate=0.5, cooldown=30.0):
+        self.name = name
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.cooldown = cooldown
+        self.state = "closed"
+        self._outcomes = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._trial = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.cooldown:
+                self.state, self._trial = "half_open", False
+            if self.state == "half_open":
+                if self._trial:
+                    return False
+                self._trial = True
+                return True
+            return self.state == "closed"
+
+    def record(self, ok):
+        with self._lock:
+            if self.state == "half_open":
+                if ok:
+                    self.state = "closed"
+                    self._outcomes.clear()
+                else:
+                    self._open()
+            elif self.state == "closed":
+                self._outcomes.append(ok)
+                failures = self._outcomes.count(False)
+                if len(self._outcomes) >= self.min_calls and failures >= self.error_rate * len(self._outcomes):
+                    self._open()
+
+    def _open(self):
+        self.state = "open"
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+        LLM_CIRCUIT_OPENS.inc(tier=self.name)
+
+
+class _Outcome:
+    # Each attempt reports to its tier's breaker once: itself when it returns, or the caller
+    # when the tier's deadline fires first
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._claimed = False
+
+    def claim(self):
+        with self._lock:
+            first = not self._claimed
+            self._claimed = True
+            return first
+
+
+class ModelTier:
+    def __init__(self, name, model, breaker):
+        self.name = name
+        self.model = model
+        self.breaker = breaker
+        self.latencies = {}  # prompt_type -> recent attempt durations
+
+
+# ---------- Resilient Client ----------
+class ResilientChatModel:
+    # Tells CachedChatModel to pass prompt_type through to invoke()
+    per_prompt_type = True
+
+    # tiers: list of (name, model) in order of preference
+    def __init__(self, tiers, deadlines=None, hedge=True, hedge_quantile=0.95, min_samples=20,
+                 default_hedge_delay=2.0, min_hedge_delay=0.05, max_hedge_ratio=0.1, pool_size=32,
+                 breaker_options=None, failover_share=0.6, stream_idle_timeout=10.0):
+        self.tiers = [ModelTier(name, model, CircuitBreaker(name, **(breaker_options or {}))) for name, model in tiers]
+        self.deadlines = dict(DEFAULT_DEADLINES, **(deadlines or {}))
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.min_samples = min_samples
+        self.default_hedge_delay = default_hedge_delay
+        self.min_hedge_delay = min_hedge_delay
+        self.max_hedge_ratio = max_hedge_ratio
+        self.pool_size = pool_size
+        self.failover_share = failover_share
+        self.stream_idle_timeout = stream_idle_timeout
+        self._stats = {"calls": 0, "hedges_fired": 0, "hedges_won": 0, "timeouts": 0, "unavailable": 0}
+        self._lock = threading.Lock()
+        self._executor = None
+        self._executor_pid = None
+
+    def __getattr__(self, name):
+        # Anything we don't wrap goes to the preferred tier's client
+        return getattr(self.tiers[0].model, name)
+
+    def _pool(self):
+        # Threads do not survive a fork, so every worker process starts its own pool
+        if self._executor_pid != os.getpid():
+            with self._lock:
+                if self._executor_pid != os.getpid():
+                    self._executor = ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix="llm")
+                    self._executor_pid = os.getpid()
+        return self._executor
+
+    # ---------- Policy ----------
+    def deadline_for(self, prompt_type):
+        return self.deadlines.get(prompt_type, self.deadlines["default"])
+
+    def tier_expires(self, tier, expires):
+        # A tier with a usable fallback behind it gets failover_share of the time left; the
+        # last one gets all of it
+        later = self.tiers[self.tiers.index(tier) + 1:]
+        if not any(fallback.breaker.state != "open" for fallback in later):
+            return expires
+        now = time.monotonic()
+        return now + (expires - now) * self.failover_share
+
+    def hedge_delay(self, tier, prompt_type):
+        # The tier's recent p95 for this prompt type, until there are enough samples a fixed delay
+        with self._lock:
+            samples = sorted(tier.latencies.get(prompt_type, ()))
+        if len(samples) < self.min_samples:
+            return self.default_hedge_delay
+        return max(self.min_hedge_delay, samples[min(len(samples) - 1, int(self.hedge_quantile * len(samples)))])
+
+    def _take_hedge(self, prompt_type):
+        with self._lock:
+            if self._stats["hedges_fired"] >= self.max_hedge_ratio * self._stats["calls"]:
+                return False
+            self._stats["hedges_fired"] += 1
+        LLM_HEDGES.inc(prompt_type=prompt_type, result="fired")
+        return True
+
+    def _hedge_won(self, prompt_type):
+        with self._lock:
+            self._stats["hedges_won"] += 1
+        LLM_HEDGES.inc(prompt_type=prompt_type, result="won")
+
+    def _count(self, key):
+        with self._lock:
+            self._stats[key] += 1
+
+    def _record(self, tier, prompt_type, outcome, elapsed=None):
+        # outcome None: the breaker already heard about this attempt, only keep its latency
+        if outcome is not None:
+            LLM_ATTEMPTS.inc(tier=tier.name, prompt_type=prompt_type, outcome=outcome)
+            tier.breaker.record(outcome == "ok")
+        if elapsed is not None:
+            with self._lock:
+                tier.latencies.setdefault(prompt_type, deque(maxlen=200)).append(elapsed)
+
+    def _tiers(self, expires):
+        # Tiers whose breaker lets a call through, while there is time left to make one
+        for tier in self.tiers:
+            if time.monotonic() >= expires:
+                return
+            if tier.breaker.allow():
+                yield tier
+
+    def _unavailable(self, error):
+        self._count("unavailable")
+        if error is None:
+            return LLMUnavailable("every model tier is unavailable")
+        return LLMUnavailable(f"model call failed: {error}")
+
+    def _timed_out(self, tier, prompt_type, outcomes, budget):
+        # Counted against the tier now, not when the abandoned attempts eventually return
+        for outcome in outcomes:
+            if outcome.claim():
+                self._record(tier, prompt_type, "timeout")
+        self._count("timeouts")
+        return LLMTimeout(f"{tier.name} model did not answer within {budget:.3g}s")
+
+    # ---------- Sync ----------
+    def _attempt(self, tier, prompt, prompt_type, outcome, kwargs):
+        start = time.perf_counter()
+        try:
+            response = tier.model.invoke(prompt, **kwargs)
+        except Exception:
+            if outcome.claim():
+                self._record(tier, prompt_type, "error")
+            raise
+        self._record(tier, prompt_type, "ok" if outcome.claim() else None, time.perf_counter() - start)
+        return response
+
+    def _invoke_tier(self, tier, prompt, prompt_type, expires, kwargs):
+        pool = self._pool()
+        budget = expires - time.monotonic()
+        outcomes = {}
+
+        def submit():
+            outcome = _Outcome()
+            future = pool.submit(self._attempt, tier, prompt, prompt_type, outcome, kwargs)
+            outcomes[future] = outcome
+            return future
+
+        pending = {submit()}
+        hedge, error = None, None
+        hedge_at = time.monotonic() + self.hedge_delay(tier, prompt_type) \
+            if self.hedge and tier.breaker.state == "closed" else None
+        try:
+            while pending:
+                wake = expires if hedge_at is None else min(expires, hedge_at)
+                done, pending = wait(pending, timeout=max(0.0, wake - time.monotonic()), return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future.exception() is None:
+                        if future is hedge:
+                            self._hedge_won(prompt_type)
+                        return future.result()
+                    error = future.exception()
+                if not pending:
+                    break
+                now = time.monotonic()
+                if now >= expires:
+                    # Only attempts that reached the model count against it; queued ones are dropped
+                    running = [future for future in pending if not future.cancel()]
+                    raise self._timed_out(tier, prompt_type, [outcomes[future] for future in running], budget)
+                if hedge_at is not None and now >= hedge_at:
+                    hedge_at = None
+                    if self._take_hedge(prompt_type):
+                        hedge = submit()
+                        pending.add(hedge)
+            raise error
+        finally:
+            # A hedge still waiting for a worker when the other attempt answers is not sent
+            for future in pending:
+                future.cancel()
+
+    def invoke(self, prompt, prompt_type="default", deadline=None, **kwargs):
+        deadline = deadline or self.deadline_for(prompt_type)
+        expires = time.monotonic() + deadline
+        self._count("calls")
+        error = None
+        for tier in self._tiers(expires):
+            try:
+                return self._invoke_tier(tier, prompt, prompt_type, self.tier_expires(tier, expires), kwargs)
+            except Exception as e:
+                # Failed or timed out: try the next tier with whatever is left of the deadline
+                error = e
+        if isinstance(error, LLMTimeout):
+            self._count("unavailable")
+            raise error
+        raise self._unavailable(error) from error
+
+    def _open_stream(self, tier, prompt, kwargs):
+        return iter(tier.model.stream(prompt, **kwargs))
+
+    def _wait_chunk(self, future, expires, error):
+        done, _ = wait([future], timeout=max(0.0, expires - time.monotonic()))
+        if not done:
+            future.cancel()
+            raise LLMTimeout(error)
+        return future.result()
+
+    def _stream_failed(self, tier, prompt_type, error, started):
+        # Until the first chunk a timeout or error counts against the tier like invoke()'s do.
+        # After it the tier has answered: a stall is the caller's problem, not the breaker's.
+        if isinstance(error, LLMTimeout):
+            self._count("timeouts")
+            self._record(tier, prompt_type, "ok" if started else "timeout")
+        else:
+            self._record(tier, prompt_type, "error")
+
+    def stream(self, prompt, prompt_type="chat", deadline=None, idle_timeout=None, **kwargs):
+        # Not hedged: two streams would each send half an answer. The prompt type's deadline
+        # covers the first chunk only, split between tiers like invoke()'s, so a tier that
+        # fails or times out before its first chunk falls through to the next one. After that
+        # each chunk gets idle_timeout from when it is asked for, so a long answer is never cut
+        # off, and the time a slow client keeps us waiting at yield is not counted. Every chunk
+        # is pulled on the pool, so a stalled model releases the request thread like invoke()
+        # does. The tier's breaker hears once per stream.
+        deadline = deadline or self.deadline_for(prompt_type)
+        idle_timeout = idle_timeout or self.stream_idle_timeout
+        expires = time.monotonic() + deadline
+        pool = self._pool()
+        error = None
+        for tier in self._tiers(expires):
+            first_chunk_by = self.tier_expires(tier, expires)
+            started = False
+            try:
+                chunks = self._wait_chunk(pool.submit(self._open_stream, tier, prompt, kwargs), first_chunk_by,
+                                          f"{tier.name} model did not start streaming within {deadline:g}s")
+                while True:
+                    if started:
+                        chunk = self._wait_chunk(pool.submit(next, chunks, _END_OF_STREAM),
+                                                 time.monotonic() + idle_timeout,
+                                                 f"{tier.name} model stopped streaming for {idle_timeout:g}s")
+                    else:
+                        chunk = self._wait_chunk(pool.submit(next, chunks, _END_OF_STREAM), first_chunk_by,
+                                                 f"{tier.name} model did not start streaming within {deadline:g}s")
+                    if chunk is _END_OF_STREAM:
+                        break
+                    started = True
+                    yield chunk
+            except GeneratorExit:
+                # The caller stopped reading (a closed SSE connection) after the tier had answered
+                self._record(tier, prompt_type, "ok")
+                raise
+            except Exception as e:
+                self._stream_failed(tier, prompt_type, e, started)
+                if started:
+                    raise
+                error = e
+                continue
+            self._record(tier, prompt_type, "ok")
+            return
+        if isinstance(error, LLMTimeout):
+            self._count("unavailable")
+            raise error
+        raise self._unavailable(error) from error
+
+    # ---------- Async ----------
+    async def _aattempt(self, tier, prompt, prompt_type, outcome, kwargs):
+        # Cancellation (a losing hedge, or past the deadline, which the caller records) passes through
+        start = time.perf_counter()
+        try:
+            response = await tier.model.ainvoke(prompt, **kwargs)
+        except Exception:
+            if outcome.claim():
+                self._record(tier, prompt_type, "error")
+            raise
+        self._record(tier, prompt_type, "ok" if outcome.claim() else None, time.perf_counter() - start)
+        return response
+
+    async def _ainvoke_tier(self, tier, prompt, prompt_type, expires, kwargs):
+        budget = expires - time.monotonic()
+        outcomes = {}
+
+        def start():
+            outcome = _Outcome()
+            task = asyncio.ensure_future(self._aattempt(tier, prompt, prompt_type, outcome, kwargs))
+            outcomes[task] = outcome
+            return task
+
+        pending = {start()}
+        hedge, error = None, None
+        hedge_at = time.monotonic() + self.hedge_delay(tier, prompt_type) \
+            if self.hedge and tier.breaker.state == "closed" else None
+        try:
+            while pending:
+                wake = expires if hedge_at is None else min(expires, hedge_at)
+                done, pending = await asyncio.wait(pending, timeout=max(0.0, wake - time.monotonic()),
+                                                   return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self._hedge_won(prompt_type)
+                        return task.result()
+                    error = task.exception()
+                if not pending:
+                    break
+                now = time.monotonic()
+                if now >= expires:
+                    raise self._timed_out(tier, prompt_type, [outcomes[task] for task in pending], budget)
+                if hedge_at is not None and now >= hedge_at:
+                    hedge_at = None
+                    if self._take_hedge(prompt_type):
+                        hedge = start()
+                        pending.add(hedge)
+            raise error
+        finally:
+            # Unlike threads, coroutines can be stopped: drop the loser and anything past the deadline
+            for task in pending:
+                task.cancel()
+
+    async def ainvoke(self, prompt, prompt_type="default", deadline=None, **kwargs):
+        deadline = deadline or self.deadline_for(prompt_type)
+        expires = time.monotonic() + deadline
+        self._count("calls")
+        error = None
+        for tier in self._tiers(expires):
+            try:
+                return await self._ainvoke_tier(tier, prompt, prompt_type, self.tier_expires(tier, expires), kwargs)
+            except Exception as e:
+                error = e
+        if isinstance(error, LLMTimeout):
+            self._count("unavailable")
+            raise error
+        raise self._unavailable(error) from error
+
+    async def astream(self, prompt, prompt_type="chat", deadline=None, idle_timeout=None, **kwargs):
+        # stream() for the event loop: same failover, first-chunk deadline and idle timeout, but
+        # each chunk is awaited, and a model that stalls is cancelled instead of left on the pool
+        deadline = deadline or self.deadline_for(prompt_type)
+        idle_timeout = idle_timeout or self.stream_idle_timeout
+        expires = time.monotonic() + deadline
+        error = None
+        for tier in self._tiers(expires):
+            first_chunk_by = self.tier_expires(tier, expires)
+            started = False
+            chunks = None
+            try:
+                chunks = tier.model.astream(prompt, **kwargs).__aiter__()
+                while True:
+                    timeout = idle_timeout if started else max(0.0, first_chunk_by - time.monotonic())
+                    try:
+                        chunk = await asyncio.wait_for(chunks.__anext__(), timeout)
+                    except StopAsyncIteration:
+                        break
+                    except asyncio.TimeoutError:
+                        if started:
+                            raise LLMTimeout(f"{tier.name} model stopped streaming for {idle_timeout:g}s") from None
+                        raise LLMTimeout(f"{tier.name} model did not start streaming within {deadline:g}s") from None
+                    started = True
+                    yield chunk
+            except GeneratorExit:
+                # The caller stopped reading (a closed SSE connection) after the tier had answered
+                self._record(tier, prompt_type, "ok")
+                raise
+            except Exception as e:
+                self._stream_failed(tier, prompt_type, e, started)
+                if started:
+                    raise
+                error = e
+                continue
+            finally:
+                if chunks is not None and hasattr(chunks, "aclose"):
+                    await chunks.aclose()
+            self._record(tier, prompt_type, "ok")
+            return
+        if isinstance(error, LLMTimeout):
+            self._count("unavailable")
+            raise error
+        raise self._unavailable(error) from error
+
+    # ---------- Stats ----------
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            prompt_types = {tier.name: list(tier.latencies) for tier in self.tiers}
+        stats["hedge_win_ratio"] = stats["hedges_won"] / stats["hedges_fired"] if stats["hedges_fired"] else 0.0
+        stats["tiers"] = {tier.name: {
+            "state": tier.breaker.state,
+            "hedge_after_ms": {prompt_type: round(self.hedge_delay(tier, prompt_type) * 1000, 1)
+                               for prompt_type in prompt_types[tier.name]},
+        } for tier in self.tiers}
+        return stats
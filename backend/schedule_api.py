@@ -0,0 +1,206 @@
+from flask import Blueprint, request, jsonify
+import json
+from datetime import datetime, timedelta
+
+from calendar_client import insert_event, insert_events
+import calendar_outbox
+import calendar_mirror
+from llm_cache import has_json_object
+from llm_client import cached_model
+from metrics import stage, record_llm_usage, LLM_PARSE_FAILURES
+from resilient_llm import LLMUnavailable, LLM_LOCAL_FALLBACKS
+from time_parser import parse_event_details, local_now
+
+# /schedule_event: events are extracted from free text (time parser first, LLM as fallback)
+# and queued in the calendar outbox, or created inline when the outbox is off
+schedule_api = Blueprint('schedule', __name__)
+EVENT_EXTRACTION_PROMPT_VERSION = "v3"
+
+# ----------------- Calendar -----------------
+# Credentials are held in memory and refreshed ahead of expiry by calendar_client,
+# which also reuses one built service object across requests
+def create_event(event_details):
+    from google.auth import exceptions
+    try:
+        return insert_event(event_details)
+    except exceptions.GoogleAuthError as error:
+        return {"error": f"An error occurred: {error}"}
+
+def create_events(event_details_list):
+    # All events go out in one batch HTTP exchange; results keep the input order
+    from google.auth import exceptions
+    try:
+        results = insert_events(event_details_list)
+    except exceptions.GoogleAuthError as error:
+        return [{"error": f"An error occurred: {error}"} for _ in event_details_list]
+    return [result.get("event", result) for result in results]
+
+def with_conflicts(result, conflicts):
+    # Overlaps found in the local calendar mirror before the insert; the event is still created
+    if conflicts:
+        result.update(warning=calendar_mirror.conflict_warning(conflicts), conflicts=conflicts)
+    return result
+
+# ----------------- LLM Prompt Logic -----------------
+def extract_event_details(user_input):
+    # The rule-based time parser resolves most messages in-process; only the ones it cannot
+    # fully resolve cost an LLM call
+    with stage("time_parser"):
+        events = parse_event_details(user_input)
+    return events or extract_event_details_with_llm(user_input)
+
+def extract_event_details_with_llm(user_input):
+    prompt = f"""
+You are a helpful assistant that extracts event information from a user message.
+The message may describe several events (e.g. "standup 9am, review 2pm, gym 7pm").
+It is now {local_now().strftime("%A %Y-%m-%d %H:%M")} in Asia/Kolkata.
+
+User input: "{user_input}"
+
+For every event, extract the following fields:
+- title (e.g., 'Project Meeting')
+- start_time (ISO 8601 format preferred, assume Asia/Kolkata timezone if not specified)
+- duration_minutes (duration of the meeting in minutes)
+
+
+If any information is missing, use the following defaults:
+- start_time: tomorrow at 10:00 AM
+- duration_minutes: 60
+- title: Use user's input as the title
+- if year is not specified, use the next upcoming occurrence of that date
+
+
+Return the response in strict JSON format, with one entry per event:
+{{
+  "events": [
+    {{
+      "title": "...",
+      "start_time": "...",
+      "duration_minutes": ...
+    }}
+  ]
+}}
+"""
+    with stage("llm_event_extraction"):
+        response = cached_model.invoke(prompt, prompt_type="event_extraction", template_version=EVENT_EXTRACTION_PROMPT_VERSION,
+                                       cache_key=user_input, validate=has_json_object)
+    record_llm_usage("llm_event_extraction", response)
+    try:
+        json_start = response.content.index('{')
+        json_end = response.content.rindex('}') + 1
+        parsed = json.loads(response.content[json_start:json_end])
+    except Exception as e:
+        print("LLM parsing error:", e)
+        LLM_PARSE_FAILURES.inc(stage="llm_event_extraction")
+        return None
+    events = parsed.get("events") if "events" in parsed else [parsed]
+    return [event for event in events if isinstance(event, dict)] or None
+
+def build_event_details(parsed, user_input):
+    title = parsed.get("title", user_input)
+    start_time_str = parsed.get("start_time")
+    duration_minutes = parsed.get("duration_minutes", 60)
+
+    if start_time_str:
+        start_time = datetime.fromisoformat(start_time_str)
+    else:
+        start_time = datetime.now() + timedelta(days=1, hours=10)  # default 10 AM tomorrow
+
+    end_time = start_time + timedelta(minutes=duration_minutes)
+
+    return {
+        'summary': title,
+        'start': {
+            'dateTime': start_time.isoformat(),
+            'timeZone': 'Asia/Kolkata',
+        },
+        'end': {
+            'dateTime': end_time.isoformat(),
+            'timeZone': 'Asia/Kolkata',
+        },
+    }
+
+# ----------------- Flask Endpoint -----------------
+@schedule_api.route('/schedule_event', methods=['POST'])
+def schedule_event():
+    try:
+        user_input = request.json.get('message')
+        if not user_input:
+            return jsonify({"response": "Please provide a message with the event details."})
+
+        # Structured event data for every event in the message (the LLM is the fallback)
+        try:
+            parsed_events = extract_event_details(user_input)
+        except LLMUnavailable as e:
+            # The time parser already had its go, so ask for something it can resolve
+            print("Event extraction unavailable:", e)
+            LLM_LOCAL_FALLBACKS.inc(stage="llm_event_extraction")
+            return jsonify({"response": "Couldn't work out that date right now. "
+                                        "Please give an exact day and time, like 'tomorrow at 3pm'."})
+        if not parsed_events:
+            return jsonify({"response": "Could not understand your input. Please try again."})
+
+        if calendar_outbox.enabled():
+            return jsonify(queue_events(parsed_events, user_input, request.headers.get('Idempotency-Key')))
+
+        if len(parsed_events) == 1:
+            details = build_event_details(parsed_events[0], user_input)
+            conflicts = calendar_mirror.find_conflicts([details])[0]
+            event = create_event(details)
+            if 'error' in event:
+                return jsonify({"response": event['error']})
+
+            calendar_mirror.record_events([event])
+            return jsonify(with_conflicts({"response": "Event created!", "event_link": event.get('htmlLink')}, conflicts))
+
+        results = [None] * len(parsed_events)
+        pending = []
+        for index, parsed in enumerate(parsed_events):
+            try:
+                pending.append((index, build_event_details(parsed, user_input)))
+            except (TypeError, ValueError) as e:
+                results[index] = {"title": parsed.get("title", user_input), "status": "failed", "error": str(e)}
+
+        conflicts = calendar_mirror.find_conflicts([details for _, details in pending])
+        created = create_events([details for _, details in pending]) if pending else []
+        for (index, details), event, found in zip(pending, created, conflicts):
+            if 'error' in event:
+                results[index] = {"title": details['summary'], "status": "failed", "error": event['error']}
+            else:
+                results[index] = with_conflicts({"title": details['summary'], "status": "created",
+                                                 "event_link": event.get('htmlLink')}, found)
+        calendar_mirror.record_events([event for event in created if 'error' not in event])
+
+        succeeded = sum(result["status"] == "created" for result in results)
+        return jsonify({"response": f"Created {succeeded} of {len(results)} events.", "events": results})
+
+    except Exception as e:
+        return jsonify({"response": f"An error occurred: {str(e)}"})
+
+def queue_events(parsed_events, user_input, idempotency_key=None):
+    # Hands the events to the calendar outbox and answers right away with job ids.
+    # A retried request with the same Idempotency-Key header gets the same jobs back.
+    results = [None] * len(parsed_events)
+    pending = []
+    for index, parsed in enumerate(parsed_events):
+        try:
+            pending.append((index, build_event_details(parsed, user_input)))
+        except (TypeError, ValueError) as e:
+            results[index] = {"title": parsed.get("title", user_input), "status": "failed", "error": str(e)}
+
+    keys = [f"{idempotency_key}:{index}" if idempotency_key else None for index, _ in pending]
+    conflicts = calendar_mirror.find_conflicts([details for _, details in pending])
+    job_ids = calendar_outbox.enqueue_events([details for _, details in pending], idempotency_keys=keys) if pending else []
+    for (index, details), job_id, found in zip(pending, job_ids, conflicts):
+        results[index] = with_conflicts({"title": details['summary'], "status": "queued", "job_id": job_id,
+                                         "status_url": calendar_outbox.status_url(job_id)}, found)
+    # The job id becomes the event id, so the next mirror sync updates these same rows
+    calendar_mirror.record_events([dict(details, id=job_id) for (_, details), job_id in zip(pending, job_ids)])
+
+    if len(results) == 1:
+        if results[0]["status"] == "failed":
+            return {"response": f"An error occurred: {results[0]['error']}"}
+        response = {"response": "Event queued!", "job_id": results[0]["job_id"], "status_url": results[0]["status_url"]}
+        return with_conflicts(response, results[0].get("conflicts"))
+    queued = sum(result["status"] == "queued" for result in results)
+    return {"response": f"Queued {queued} of {len(results)} events.", "events": results}
@@ -0,0 +1,44 @@
+import importlib
+from flask import Flask
+from flask_cors import CORS
+
+from metrics import init_app
+from notes_api import notes_api
+from schedule_api import schedule_api
+from calendar_api import calendar_api
+from assistant import assistant_api
+import calendar_mirror
+
+# Single entry point for the whole backend: notes, scheduling, calendar and /assistant routes
+# in one process, over one Gemini client and response cache (llm_client), one notes
+# connection pool (notes_store) and one Calendar client (calendar_client).
+#   python service.py                              # development server
+#   gunicorn -c gunicorn.conf.py service:app       # production, workers forked from a preloaded master
+
+# Client libraries every worker ends up loading. Importing them in the master before the
+# fork shares their pages across workers instead of loading them once per worker.
+PRELOAD_MODULES = ["langchain_google_genai", "googleapiclient.discovery", "googleapiclient.http",
+                   "google_auth_httplib2", "httplib2", "google.auth.transport.requests"]
+
+
+def create_app():
+    app = Flask(__name__)
+    CORS(app)
+    init_app(app)  # per-stage timings and /metrics
+    for blueprint in (notes_api, schedule_api, calendar_api, assistant_api):
+        app.register_blueprint(blueprint)
+    return app
+
+
+def preload():
+    # Imports only: gRPC channels, HTTP connections and SQLite handles do not survive a fork,
+    # so each worker still opens its own on first use
+    for name in PRELOAD_MODULES:
+        importlib.import_module(name)
+
+
+app = create_app()
+
+if __name__ == '__main__':
+    calendar_mirror.start()
+    app.run(debug=True)
@@ -0,0 +1,87 @@
+import asyncio
+import threading
+
+from metrics import registry
+
+# Request coalescing: while a computation for a key is in flight, identical callers wait for
+# it and share its result (or its exception) instead of starting their own. Nothing is kept
+# once it finishes; a later caller starts a fresh computation. Shared results are the same
+# object for every caller, so they must be treated as read-only.
+
+SINGLE_FLIGHT_CALLS = registry.counter("single_flight_calls_total",
+                                       "Coalesced lookups: leaders ran the computation, followers shared it.",
+                                       ["group", "role"])
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self, name):
+        self.name = name
+        self._calls = {}
+        self._tasks = {}
+        self._lock = threading.Lock()
+        self._stats = {"leaders": 0, "followers": 0}
+
+    def _join(self, table, key, make):
+        with self._lock:
+            entry = table.get(key)
+            leader = entry is None
+            if leader:
+                entry = table[key] = make()
+            self._stats["leaders" if leader else "followers"] += 1
+        SINGLE_FLIGHT_CALLS.inc(group=self.name, role="leader" if leader else "follower")
+        return entry, leader
+
+    def _leave(self, table, key):
+        with self._lock:
+            del table[key]
+
+    def do(self, key, fn):
+        # Returns (result, shared); shared is True for callers that waited on someone else's call
+        call, leader = self._join(self._calls, key, _Call)
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            self._leave(self._calls, key)
+            call.done.set()
+        return call.result, False
+
+    async def ado(self, key, fn):
+        # Async twin of do(): fn is a coroutine function. Keyed per event loop. It runs as a
+        # task of its own that every caller, the leader included, awaits through a shield, so
+        # a caller being cancelled (its client went away) never cancels it for the others.
+        loop = asyncio.get_running_loop()
+        key = (id(loop), key)
+        task, leader = self._join(self._tasks, key, lambda: self._start(loop, key, fn))
+        return await asyncio.shield(task), not leader
+
+    def _start(self, loop, key, fn):
+        task = loop.create_task(fn())
+        task.add_done_callback(lambda task: self._finished(key, task))
+        return task
+
+    def _finished(self, key, task):
+        self._leave(self._tasks, key)
+        if not task.cancelled():
+            task.exception()  # retrieved here, so no "never retrieved" warning once every caller left
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats, in_flight=len(self._calls) + len(self._tasks))
+        total = stats["leaders"] + stats["followers"]
+        stats["shared_ratio"] = stats["followers"] / total if total else 0.0
+        return stats
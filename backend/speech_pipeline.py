@@ -0,0 +1,367 @@
+import os
+import json
+import time
+import wave
+import queue
+import argparse
+import threading
+from collections import deque
+
+import numpy as np
+
+try:
+    import webrtcvad
+except ImportError:
+    webrtcvad = None
+
+# Turns the ~20 ms WebRTC audio frames into whole utterances before anything is recognized.
+# recv() on the media thread only queues raw frames; a worker thread downmixes and resamples
+# them to 16 kHz mono int16 in a ring buffer, a voice-activity detector cuts utterances, and a
+# second worker sends each utterance to the recognizer. Transcripts come out of a queue.Queue
+# that the Streamlit script drains, so the audio threads never touch st.session_state.
+
+SAMPLE_RATE = 16000
+VAD_FRAME_MS = 30
+SPEECH_RECOGNIZER = os.getenv("SPEECH_RECOGNIZER", "google")
+VOSK_MODEL_PATH = os.getenv("VOSK_MODEL_PATH", "models/vosk")
+
+
+# ---------- Buffering ----------
+class RingBuffer:
+    # Fixed-size int16 ring; when full, the oldest samples are overwritten
+    def __init__(self, capacity):
+        self.buffer = np.zeros(capacity, dtype=np.int16)
+        self.capacity = capacity
+        self.start = 0
+        self.size = 0
+        self.overwritten = 0
+
+    def write(self, samples):
+        if len(samples) > self.capacity:
+            self.overwritten += len(samples) - self.capacity
+            samples = samples[-self.capacity:]
+        end = (self.start + self.size) % self.capacity
+        first = min(len(samples), self.capacity - end)
+        self.buffer[end:end + first] = samples[:first]
+        self.buffer[:len(samples) - first] = samples[first:]
+        overflow = max(0, self.size + len(samples) - self.capacity)
+        self.overwritten += overflow
+        self.start = (self.start + overflow) % self.capacity
+        self.size = min(self.capacity, self.size + len(samples))
+
+    def read(self, count):
+        # Exactly count samples, or None if not enough are buffered yet
+        if self.size < count:
+            return None
+        indices = (self.start + np.arange(count)) % self.capacity
+        samples = self.buffer[indices]
+        self.start = (self.start + count) % self.capacity
+        self.size -= count
+        return samples
+
+    def drain(self):
+        return self.read(self.size)
+
+
+class Resampler:
+    # Streaming linear-interpolation resampler; keeps its phase across chunk boundaries
+    def __init__(self, target_rate=SAMPLE_RATE):
+        self.target_rate = target_rate
+        self.rate = None
+
+    def _reset(self, rate):
+        self.rate = rate
+        self.position = 0.0
+        self.previous = None
+        self.tail = np.zeros(0, dtype=np.float32)
+
+    def process(self, samples, rate):
+        if rate == self.target_rate:
+            return samples
+        if rate != self.rate:
+            self._reset(rate)
+        step = rate / self.target_rate
+        width = int(step)
+        if width > 1:
+            # Cheap anti-aliasing: box filter about one output sample wide, carried across chunks
+            history = np.concatenate((self.tail, samples))
+            if len(history) < width:
+                self.tail = history
+                return np.zeros(0, dtype=np.float32)
+            self.tail = history[len(history) - (width - 1):]
+            samples = np.convolve(history, np.ones(width) / width, mode='valid')
+        if self.previous is not None:
+            samples = np.concatenate(([self.previous], samples))
+        positions = np.arange(self.position, len(samples) - 1, step)
+        out = np.interp(positions, np.arange(len(samples)), samples)
+        next_position = (positions[-1] + step) if len(positions) else self.position
+        # The last input sample becomes index 0 of the next chunk
+        self.position = next_position - (len(samples) - 1)
+        self.previous = samples[-1]
+        return out
+
+
+def to_mono_float(samples, channels):
+    # av frames are packed (1, n * channels) or planar (channels, n), int16 or float
+    samples = np.asarray(samples)
+    if samples.dtype.kind in 'iu':
+        samples = samples.astype(np.float32) / 32768.0
+    else:
+        samples = samples.astype(np.float32)
+    if channels > 1 and samples.ndim == 2 and samples.shape[0] == channels:
+        return samples.mean(axis=0)
+    samples = samples.reshape(-1)
+    if channels > 1:
+        samples = samples[:len(samples) - len(samples) % channels].reshape(-1, channels).mean(axis=1)
+    return samples
+
+
+def to_int16(samples):
+    return (np.clip(samples, -1.0, 1.0) * 32767).astype(np.int16)
+
+
+# ---------- Voice Activity ----------
+class EnergyVAD:
+    # Speech when a frame is margin_db above the adaptive noise floor (and above min_db)
+    def __init__(self, margin_db=12.0, min_db=-50.0, noise_adapt=0.05):
+        self.margin_db = margin_db
+        self.min_db = min_db
+        self.noise_adapt = noise_adapt
+        self.noise_floor = None
+
+    def is_speech(self, frame):
+        rms = np.sqrt(np.mean(frame.astype(np.float64) ** 2)) / 32768.0
+        level = 20 * np.log10(max(rms, 1e-10))
+        if self.noise_floor is None:
+            self.noise_floor = level
+        speech = level > max(self.min_db, self.noise_floor + self.margin_db)
+        if not speech:
+            self.noise_floor += self.noise_adapt * (level - self.noise_floor)
+        return speech
+
+
+class WebRtcVAD:
+    # Needs the optional webrtcvad package; frames must be 10, 20 or 30 ms at 16 kHz
+    def __init__(self, aggressiveness=2):
+        if webrtcvad is None:
+            raise RuntimeError("webrtcvad is not installed (pip install webrtcvad)")
+        self.vad = webrtcvad.Vad(aggressiveness)
+
+    def is_speech(self, frame):
+        return self.vad.is_speech(frame.tobytes(), SAMPLE_RATE)
+
+
+def make_vad(name=None):
+    name = name or os.getenv("SPEECH_VAD", "webrtc" if webrtcvad is not None else "energy")
+    return WebRtcVAD() if name == "webrtc" else EnergyVAD()
+
+
+class UtteranceSegmenter:
+    # Collects VAD frames into utterances: a short pre-roll so the first syllable is kept,
+    # an end after hangover_ms of silence, and a hard cut at max_seconds
+    def __init__(self, vad, frame_ms=VAD_FRAME_MS, pre_roll_ms=300, start_ms=90, hangover_ms=600,
+                 min_speech_ms=250, max_seconds=15.0):
+        self.vad = vad
+        self.frame_ms = frame_ms
+        self.start_frames = max(1, start_ms // frame_ms)
+        self.hangover_frames = max(1, hangover_ms // frame_ms)
+        self.min_speech_frames = max(1, min_speech_ms // frame_ms)
+        self.max_frames = int(max_seconds * 1000 // frame_ms)
+        self.pre_roll = deque(maxlen=max(self.start_frames, pre_roll_ms // frame_ms))
+        self.recent = deque(maxlen=self.start_frames)
+        self.frames = None
+        self.speech_frames = 0
+        self.silence = 0
+
+    def push(self, frame):
+        # Returns a finished utterance (int16 array) or None
+        speech = self.vad.is_speech(frame)
+        if self.frames is None:
+            self.pre_roll.append(frame)
+            self.recent.append(speech)
+            if len(self.recent) == self.start_frames and all(self.recent):
+                self.frames = list(self.pre_roll)
+                self.speech_frames = self.start_frames
+                self.silence = 0
+                self.pre_roll.clear()
+                self.recent.clear()
+            return None
+
+        self.frames.append(frame)
+        if speech:
+            self.speech_frames += 1
+            self.silence = 0
+        else:
+            self.silence += 1
+        if self.silence >= self.hangover_frames or len(self.frames) >= self.max_frames:
+            return self.flush()
+        return None
+
+    def flush(self):
+        frames, speech_frames = self.frames, self.speech_frames
+        self.frames, self.speech_frames, self.silence = None, 0, 0
+        if not frames or speech_frames < self.min_speech_frames:
+            return None
+        return np.concatenate(frames)
+
+
+# ---------- Recognizers ----------
+# A recognizer turns one utterance (16 kHz mono int16 PCM bytes) into text, "" if nothing was understood
+class GoogleRecognizer:
+    def __init__(self, language="en-US"):
+        import speech_recognition as sr
+        self.sr = sr
+        self.recognizer = sr.Recognizer()
+        self.language = language
+
+    def transcribe(self, pcm, sample_rate=SAMPLE_RATE):
+        try:
+            return self.recognizer.recognize_google(self.sr.AudioData(pcm, sample_rate, 2), language=self.language)
+        except self.sr.UnknownValueError:
+            return ""
+
+
+class SphinxRecognizer(GoogleRecognizer):
+    # Offline, through speech_recognition and pocketsphinx
+    def transcribe(self, pcm, sample_rate=SAMPLE_RATE):
+        try:
+            return self.recognizer.recognize_sphinx(self.sr.AudioData(pcm, sample_rate, 2), language=self.language)
+        except self.sr.UnknownValueError:
+            return ""
+
+
+class VoskRecognizer:
+    # Offline local engine; download a model from https://alphacephei.com/vosk/models
+    def __init__(self, model_path=VOSK_MODEL_PATH):
+        import vosk
+        self.vosk = vosk
+        self.model = vosk.Model(model_path)
+
+    def transcribe(self, pcm, sample_rate=SAMPLE_RATE):
+        recognizer = self.vosk.KaldiRecognizer(self.model, sample_rate)
+        recognizer.AcceptWaveform(pcm)
+        return json.loads(recognizer.FinalResult()).get("text", "")
+
+
+RECOGNIZERS = {
+    "google": GoogleRecognizer,
+    "sphinx": SphinxRecognizer,
+    "vosk": VoskRecognizer,
+}
+
+
+def make_recognizer(name=None):
+    name = name or SPEECH_RECOGNIZER
+    if name not in RECOGNIZERS:
+        raise ValueError(f"Unknown recognizer '{name}', expected one of {sorted(RECOGNIZERS)}")
+    return RECOGNIZERS[name]()
+
+
+# ---------- Pipeline ----------
+class SpeechPipeline:
+    def __init__(self, recognizer, transcripts=None, vad=None, buffer_seconds=30, max_pending_frames=500):
+        self.recognizer = recognizer
+        # Items are {"text": ..., "duration": seconds} or {"error": ...}
+        self.transcripts = transcripts if transcripts is not None else queue.Queue()
+        self.frame_samples = SAMPLE_RATE * VAD_FRAME_MS // 1000
+        self.ring = RingBuffer(SAMPLE_RATE * buffer_seconds)
+        self.resampler = Resampler()
+        self.segmenter = UtteranceSegmenter(vad or make_vad())
+        self._frames = queue.Queue(maxsize=max_pending_frames)
+        self._utterances = queue.Queue()
+        self._threads = []
+        self.stats = {"frames": 0, "dropped_frames": 0, "utterances": 0, "recognizer_calls": 0}
+
+    def start(self):
+        self._threads = [threading.Thread(target=self._segment_loop, daemon=True),
+                         threading.Thread(target=self._recognize_loop, daemon=True)]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def feed(self, samples, sample_rate, channels=1):
+        # Called from the media thread: never blocks, drops the frame if the worker is far behind
+        self.stats["frames"] += 1
+        try:
+            self._frames.put_nowait((np.array(samples, copy=True), sample_rate, channels))
+        except queue.Full:
+            self.stats["dropped_frames"] += 1
+
+    def stop(self, timeout=None):
+        # Recognizes whatever was being said when the stream ended, then stops the workers
+        self._frames.put(None)
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def get_transcripts(self):
+        items = []
+        while True:
+            try:
+                items.append(self.transcripts.get_nowait())
+            except queue.Empty:
+                return items
+
+    def _segment_loop(self):
+        while True:
+            item = self._frames.get()
+            if item is None:
+                break
+            samples, sample_rate, channels = item
+            mono = self.resampler.process(to_mono_float(samples, channels), sample_rate)
+            self.ring.write(to_int16(mono))
+            while True:
+                frame = self.ring.read(self.frame_samples)
+                if frame is None:
+                    break
+                utterance = self.segmenter.push(frame)
+                if utterance is not None:
+                    self._utterances.put(utterance)
+        utterance = self.segmenter.flush()
+        if utterance is not None:
+            self._utterances.put(utterance)
+        self._utterances.put(None)
+
+    def _recognize_loop(self):
+        while True:
+            utterance = self._utterances.get()
+            if utterance is None:
+                return
+            self.stats["utterances"] += 1
+            self.stats["recognizer_calls"] += 1
+            try:
+                text = self.recognizer.transcribe(utterance.tobytes(), SAMPLE_RATE)
+            except Exception as e:
+                self.transcripts.put({"error": str(e)})
+                continue
+            if text:
+                self.transcripts.put({"text": text, "duration": round(len(utterance) / SAMPLE_RATE, 2)})
+
+
+def read_wav(path):
+    with wave.open(path, 'rb') as wav:
+        if wav.getsampwidth() != 2:
+            raise ValueError("Only 16-bit PCM WAV files are supported")
+        frames = wav.readframes(wav.getnframes())
+        return np.frombuffer(frames, dtype=np.int16), wav.getframerate(), wav.getnchannels()
+
+
+if __name__ == '__main__':
+    # Offline check: play a WAV file through the pipeline in 20 ms frames, like WebRTC does
+    parser = argparse.ArgumentParser(description="Run a WAV file through the speech pipeline")
+    parser.add_argument('wav')
+    parser.add_argument('--recognizer', default=SPEECH_RECOGNIZER, choices=sorted(RECOGNIZERS))
+    parser.add_argument('--vad', choices=["energy", "webrtc"])
+    parser.add_argument('--realtime', action='store_true', help="sleep between frames like a live stream")
+    args = parser.parse_args()
+
+    samples, sample_rate, channels = read_wav(args.wav)
+    pipeline = SpeechPipeline(make_recognizer(args.recognizer), vad=make_vad(args.vad)).start()
+    chunk = sample_rate * channels // 50
+    for start in range(0, len(samples), chunk):
+        pipeline.feed(samples[start:start + chunk].reshape(1, -1), sample_rate, channels)
+        if args.realtime:
+            time.sleep(0.02)
+    pipeline.stop()
+    for item in pipeline.get_transcripts():
+        print(item.get("text") or f"[Error: {item['error']}]")
+    print(pipeline.stats)
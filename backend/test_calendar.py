@@ -2,18 +2,11 @@ import os
 import json
 import pickle
 import datetime
-from dotenv import load_dotenv
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
-from langchain_google_genai import ChatGoogleGenerativeAI
-
-# Load .env file for Gemini key
-load_dotenv()
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
+from llm_client import model
+from resilient_llm import LLMUnavailable
 
 # ------------------- Gemini Setup -------------------
-model = ChatGoogleGenerativeAI(model="gemini-1.5-pro", google_api_key=GOOGLE_API_KEY)
+# Shared client (llm_client): built on first use (or prefetched below), with a deadline and fallback model
 
 def extract_event_details(user_input):
     prompt = f"""
@@ -33,7 +26,11 @@ If information is missing, use defaults:
 - duration_hours = 1
 - title = entire user input
 """
-    response = model.invoke(prompt)
+    try:
+        response = model.invoke(prompt, prompt_type="event_extraction")
+    except LLMUnavailable as e:
+        print("Gemini is unavailable:", e)
+        return None
     try:
         content = response.content.strip()
         json_part = content[content.index('{'): content.rindex('}') + 1]
@@ -56,8 +53,10 @@ def get_credentials():
 
     if not credentials or not credentials.valid:
         if credentials and credentials.expired and credentials.refresh_token:
+            from google.auth.transport.requests import Request
             credentials.refresh(Request())
         else:
+            from google_auth_oauthlib.flow import InstalledAppFlow
             flow = InstalledAppFlow.from_client_secrets_file(CLIENT_SECRET_FILE, SCOPES)
             credentials = flow.run_local_server(port=0)
         with open(CREDENTIALS_PICKLE, 'wb') as token:
@@ -66,6 +65,7 @@ def get_credentials():
     return credentials
 
 def create_event(credentials, event_details):
+    from googleapiclient.discovery import build
     service = build('calendar', 'v3', credentials=credentials)
 
     event = {
@@ -93,6 +93,8 @@ def create_event(credentials, event_details):
 
 # ------------------- MAIN -------------------
 if __name__ == '__main__':
+    # Load Gemini while the user is typing
+    model.prefetch()
     user_input = input("What would you like to schedule? ")
 
     extracted = extract_event_details(user_input)
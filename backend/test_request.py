@@ -1,10 +1,16 @@
+import json
+import uuid
+import queue
 import streamlit as st
 import requests
 from streamlit_webrtc import webrtc_streamer, AudioProcessorBase
-import speech_recognition as sr
 import av
+from speech_pipeline import SpeechPipeline, make_recognizer
 
 API_URL = "http://localhost:5000/assistant"  # Change when deployed
+STREAM_URL = API_URL + "/stream"
+# Connect, and longest wait between streamed chunks; the backend's model deadlines are shorter
+REQUEST_TIMEOUT = (5, 60)
 
 st.set_page_config(page_title="Pratham AI Assistant", page_icon="🤖")
 
@@ -15,38 +21,63 @@ st.markdown("<hr>", unsafe_allow_html=True)
 if "messages" not in st.session_state:
     st.session_state.messages = []
 
+# One conversation on the backend per browser session, so follow-ups like "move it to 6pm" work
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+
+# Transcripts arrive here from the speech pipeline's worker thread
+if "transcripts" not in st.session_state:
+    st.session_state.transcripts = queue.Queue()
+
 # 🎤 Audio processor for converting mic input to text
+# Frames are only queued here; buffering, VAD and recognition run in speech_pipeline's threads
 class AudioToTextProcessor(AudioProcessorBase):
-    def __init__(self) -> None:
-        self.recognizer = sr.Recognizer()
-        self.audio = sr.AudioData(b'', 16000, 2)
-        self.transcript = ""
+    def __init__(self, transcripts) -> None:
+        self.pipeline = SpeechPipeline(make_recognizer(), transcripts=transcripts).start()
 
-    def recv(self, frame: av.AudioFrame) -> av.AudioFrame:
-        audio = frame.to_ndarray()
-        audio_bytes = audio.tobytes()
-        audio_data = sr.AudioData(audio_bytes, frame.sample_rate, 2)
-
-        try:
-            text = self.recognizer.recognize_google(audio_data)
-            self.transcript = text
-            st.session_state.voice_input = text
-        except sr.UnknownValueError:
-            self.transcript = ""
-        except sr.RequestError as e:
-            self.transcript = f"[Error: {e}]"
+    def _feed(self, frame: av.AudioFrame) -> None:
+        self.pipeline.feed(frame.to_ndarray(), frame.sample_rate, len(frame.layout.channels))
 
+    def recv(self, frame: av.AudioFrame) -> av.AudioFrame:
+        self._feed(frame)
         return frame
 
+    async def recv_queued(self, frames):
+        for frame in frames:
+            self._feed(frame)
+        return frames
+
+    def on_ended(self):
+        self.pipeline.stop(timeout=10)
+
+# Server-Sent Events from /assistant/stream as (event, data) pairs
+def iter_sse(response):
+    event, data = "message", []
+    for line in response.iter_lines(decode_unicode=True):
+        if line:
+            field, _, value = line.partition(":")
+            if field == "event":
+                event = value.strip()
+            elif field == "data":
+                data.append(value.strip())
+        elif data:
+            yield event, json.loads("\n".join(data))
+            event, data = "message", []
+
 # Voice input section
 st.markdown("### 🎙️ Or try voice input:")
 webrtc_streamer(
     key="speech",
-    audio_processor_factory=AudioToTextProcessor,
+    audio_processor_factory=lambda transcripts=st.session_state.transcripts: AudioToTextProcessor(transcripts),
     media_stream_constraints={"video": False, "audio": True},
     async_processing=True
 )
 
+# Latest recognized utterance becomes the default input
+while not st.session_state.transcripts.empty():
+    item = st.session_state.transcripts.get_nowait()
+    st.session_state.voice_input = item.get("text") or f"[Error: {item['error']}]"
+
 # Use transcript if available
 default_input = st.session_state.get("voice_input", "")
 
@@ -69,13 +100,23 @@ if submitted and user_input:
         response_area.markdown("🧠 Thinking...")
 
     try:
-        data = {"message": user_input, "points": note_points}
-        res = requests.post(API_URL, json=data)
-
-        if res.status_code == 200:
-            result = res.json().get("response", "🤖 No response from assistant.")
-        else:
-            result = "❌ Failed to get a valid response."
+        data = {"message": user_input, "points": note_points, "session_id": st.session_state.session_id}
+        result = "🤖 No response from assistant."
+        with requests.post(STREAM_URL, json=data, stream=True, timeout=REQUEST_TIMEOUT) as res:
+            if res.status_code == 200:
+                answer = ""
+                for event, payload in iter_sse(res):
+                    if event == "decision":
+                        response_area.markdown(f"🧠 Thinking... ({payload.get('action', 'chat')})")
+                    elif event == "token":
+                        # Render the answer as it arrives
+                        answer += payload["text"]
+                        response_area.markdown(answer + "▌")
+                        result = answer
+                    elif event in ("answer", "error"):
+                        result = payload.get("response", result)
+            else:
+                result = "❌ Failed to get a valid response."
     except Exception as e:
         result = f"⚠️ Error: {e}"
 
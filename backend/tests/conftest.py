@@ -0,0 +1,35 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Tests import the backend modules by sibling name, like the bench scripts do, and keep away
+# from the real databases, Gemini and Google Calendar
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_tmp = tempfile.mkdtemp(prefix='backend-tests-')
+os.environ.setdefault("NOTES_DB", os.path.join(_tmp, 'notes.db'))
+os.environ.setdefault("LLM_CACHE_DB", os.path.join(_tmp, 'llm_cache.db'))
+os.environ.setdefault("CONVERSATION_DB", os.path.join(_tmp, 'conversations.db'))
+os.environ.setdefault("CALENDAR_MIRROR_DB", os.path.join(_tmp, 'calendar_mirror.db'))
+os.environ.setdefault("CALENDAR_MIRROR_SYNC_INTERVAL", "3600")
+os.environ.setdefault("CALENDAR_OUTBOX", "0")
+os.environ.setdefault("GOOGLE_API_KEY", "test")
+
+
+@pytest.fixture
+def calendar_server():
+    # A fake Calendar API, with the process-wide client pointed at it for the test
+    from google.auth.credentials import AnonymousCredentials
+
+    import calendar_client
+    from fake_calendar_server import start_fake_calendar_server
+
+    server = start_fake_calendar_server()
+    previous = calendar_client.calendar_client
+    calendar_client.calendar_client = calendar_client.CalendarClient(
+        token_file=None, credentials=AnonymousCredentials(), api_endpoint=server.api_endpoint)
+    yield server
+    calendar_client.calendar_client = previous
+    server.shutdown()
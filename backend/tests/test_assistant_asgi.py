@@ -0,0 +1,106 @@
+import json
+import time
+import asyncio
+
+import pytest
+
+import assistant
+import assistant_asgi
+import conversation_store
+import notes_store
+from assistant import ANSWER_CUT_OFF
+from conversation_store import ConversationStore
+from fake_llm import FakeChatModel, FakeResponse
+from llm_cache import CachedChatModel
+from notes_store import NotesStore
+from resilient_llm import ResilientChatModel, UNAVAILABLE_MESSAGE
+
+CHAT_ANSWER = "A monad is a monoid in the category of endofunctors."
+
+
+@pytest.fixture
+def fake(tmp_path, monkeypatch):
+    # Classification says "chat" and every other prompt gets the same answer
+    fake = FakeChatModel(latency=0.0, default_response=CHAT_ANSWER, stream_chunk_size=8,
+                         responses=[(r"Analyze the user's message", '{"action": "chat"}')])
+    model = ResilientChatModel([("pro", fake)], hedge=False)
+    monkeypatch.setattr(assistant, "model", model)
+    monkeypatch.setattr(assistant, "cached_model", CachedChatModel(model, db_path=None))
+    notes = NotesStore(db_path=str(tmp_path / 'notes.db'), cache_size=0)
+    notes.insert_or_update_notes("groceries", ["milk", "bread"])
+    monkeypatch.setattr(notes_store, "store", notes)
+    monkeypatch.setattr(conversation_store, "conversation_store",
+                        ConversationStore(db_path=str(tmp_path / 'conversations.db')))
+    yield fake
+    notes.close()
+
+
+def flask_call(method, path, body=None):
+    response = getattr(assistant.app.test_client(), method)(path, json=body)
+    return response.status_code, response.get_data(as_text=True)
+
+
+def asgi_call(method, path, body=None):
+    async def call():
+        response = await getattr(assistant_asgi.app.test_client(), method)(path, json=body)
+        return response.status_code, await response.get_data(as_text=True)
+    return asyncio.run(call())
+
+
+def events(body):
+    # (event, data) pairs of a Server-Sent Events body
+    return [(block.split("\n")[0][len("event: "):], json.loads(block.split("\n")[1][len("data: "):]))
+            for block in body.strip().split("\n\n")]
+
+
+@pytest.mark.parametrize("method, path, body", [
+    ("post", "/assistant", {"message": "show me my groceries note"}),
+    ("post", "/assistant", {"message": "what is a monad"}),
+    ("post", "/assistant", {"message": "I love functional programming"}),
+    ("post", "/assistant", {}),
+    ("post", "/assistant/batch", {"messages": ["show me my groceries note", "what is a monad"]}),
+    ("post", "/assistant/batch", {"messages": []}),
+    ("post", "/assistant/stream", {"message": "show me my groceries note"}),
+    ("post", "/assistant/stream", {"message": "I love functional programming"}),
+    ("post", "/assistant/stream", {}),
+    ("get", "/calendar/jobs/unknown", None),
+    ("get", "/calendar/free_busy", None),
+])
+def test_both_apps_answer_alike(fake, method, path, body):
+    assert asgi_call(method, path, body) == flask_call(method, path, body)
+
+
+def test_async_stream_sends_the_chat_answer_in_chunks(fake):
+    # Not on the fast path, so classified by the model first
+    message = "I love functional programming"
+    status, body = asgi_call("post", "/assistant/stream", {"message": message, "session_id": "s1"})
+    sent = events(body)
+    assert status == 200
+    assert sent[0] == ("decision", {"action": "chat"}) and sent[-1] == ("done", {})
+    tokens = [data["text"] for event, data in sent if event == "token"]
+    assert len(tokens) > 1 and "".join(tokens) == CHAT_ANSWER
+    # The streamed answer is remembered like any other turn
+    assert conversation_store.load_conversation("s1").turns == [(message, CHAT_ANSWER)]
+
+
+def test_async_stream_without_a_model_says_so(fake):
+    fake.failure_rate = 1.0
+    _, body = asgi_call("post", "/assistant/stream", {"message": "I love functional programming"})
+    assert [data["text"] for event, data in events(body) if event == "token"] == [UNAVAILABLE_MESSAGE]
+
+
+@pytest.mark.parametrize("call", [flask_call, asgi_call])
+def test_stream_stalling_part_way_keeps_the_partial_answer(fake, monkeypatch, call):
+    def stream(prompt, **kwargs):
+        yield FakeResponse("A monad is")
+        time.sleep(1)
+
+    async def astream(prompt, **kwargs):
+        yield FakeResponse("A monad is")
+        await asyncio.sleep(1)
+
+    monkeypatch.setattr(fake, "stream", stream)
+    monkeypatch.setattr(fake, "astream", astream)
+    monkeypatch.setattr(assistant.model, "stream_idle_timeout", 0.1)
+    _, body = call("post", "/assistant/stream", {"message": "I love functional programming"})
+    assert [data["text"] for event, data in events(body) if event == "token"] == ["A monad is", ANSWER_CUT_OFF]
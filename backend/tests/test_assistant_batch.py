@@ -0,0 +1,79 @@
+import time
+
+import pytest
+
+import assistant
+import calendar_mirror
+import notes_store
+from fake_llm import FakeChatModel
+from llm_cache import CachedChatModel
+from notes_store import NotesStore
+from resilient_llm import ResilientChatModel, UNAVAILABLE_MESSAGE
+
+
+def answer_after(seconds, text):
+    def respond(prompt):
+        time.sleep(seconds)
+        return text
+    return respond
+
+
+def broken(prompt):
+    raise RuntimeError("model exploded")
+
+
+@pytest.fixture
+def fake(tmp_path, monkeypatch):
+    # Anything the fast path leaves to the model is chat; each chat message has its own answer
+    fake = FakeChatModel(latency=0.0, responses=[
+        (r"Analyze the user's message", '{"action": "chat"}'),
+        (r"what is a monad", answer_after(0.2, "a monoid")),
+        (r"what is a functor", answer_after(0.0, "a mapping")),
+        (r"tell me a secret", broken),
+    ])
+    model = ResilientChatModel([("pro", fake)], hedge=False)
+    monkeypatch.setattr(assistant, "model", model)
+    monkeypatch.setattr(assistant, "cached_model", CachedChatModel(model, db_path=None))
+    monkeypatch.setattr(calendar_mirror, "ENABLED", False)
+    notes = NotesStore(db_path=str(tmp_path / 'notes.db'), cache_size=0)
+    monkeypatch.setattr(notes_store, "store", notes)
+    yield fake
+    notes.close()
+
+
+def test_answers_come_back_in_input_order(fake):
+    # The slow answer is asked first, so it finishes last
+    results = assistant.run_batch([{"message": "what is a monad"}, {"message": "what is a functor"},
+                                   {"message": "add note on groceries", "points": ["milk"]}])
+    assert [result["response"] for result in results] == [
+        "a monoid", "a mapping", "Note added for topic 'groceries'."]
+
+
+def test_a_bad_item_fails_alone(fake):
+    results = assistant.run_batch([{"message": "what is a functor"}, 42, {"message": "tell me a secret"},
+                                   {"message": "add note on groceries"}, {"message": "what is a monad"}])
+    assert results == [
+        {"response": "a mapping"},
+        {"response": "Please provide a message."},
+        {"response": UNAVAILABLE_MESSAGE},
+        {"response": "Please include points to add."},
+        {"response": "a monoid"},
+    ]
+
+
+def test_calendar_messages_share_one_schedule_call(fake, calendar_server, monkeypatch):
+    calls = []
+    schedule_event_groups = assistant.schedule_event_groups
+
+    def counting(groups, scopes=None):
+        calls.append(groups)
+        return schedule_event_groups(groups, scopes)
+
+    monkeypatch.setattr(assistant, "schedule_event_groups", counting)
+    results = assistant.run_batch([{"message": "schedule meeting tomorrow at 5"}, {"message": "what is a functor"},
+                                   {"message": "book a call tomorrow at 9am"}])
+
+    assert len(calls) == 1 and [len(group) for group in calls[0]] == [1, 1]
+    assert [result["response"] for result in results] == ["Event created.", "a mapping", "Event created."]
+    assert calendar_server.calendar.stats["batch_requests"] == 1
+    assert sorted(event["summary"] for event in calendar_server.calendar.list_events('primary')) == ["Call", "Meeting"]
@@ -0,0 +1,61 @@
+from datetime import datetime, timedelta
+
+import calendar_client
+from calendar_client import MAX_BATCH_SIZE, insert_events
+
+START = datetime(2025, 6, 2, 9, 0)
+
+
+def make_event(index, summary=None):
+    start = START + timedelta(hours=index)
+    return {"summary": summary or f"Event {index}",
+            "start": {"dateTime": start.isoformat(), "timeZone": "Asia/Kolkata"},
+            "end": {"dateTime": (start + timedelta(minutes=30)).isoformat(), "timeZone": "Asia/Kolkata"}}
+
+
+def test_insert_events_uses_one_exchange_per_batch(calendar_server):
+    events = [make_event(index) for index in range(MAX_BATCH_SIZE + 10)]
+    results = insert_events(events)
+
+    assert calendar_server.calendar.stats["batch_requests"] == 2
+    assert calendar_server.calendar.stats["inserts"] == len(events)
+    # Results come back in input order
+    assert [result["event"]["summary"] for result in results] == [event["summary"] for event in events]
+    stored = calendar_server.calendar.list_events('primary')
+    assert len(stored) == len(events)
+
+
+def test_rejected_event_fails_alone(calendar_server):
+    calendar_server.calendar.fail_summaries.add("Bad event")
+    events = [make_event(0), make_event(1, "Bad event"), make_event(2)]
+    results = insert_events(events)
+
+    assert "event" in results[0] and "event" in results[2]
+    assert results[1]["status"] == 400 and "Bad event" in results[1]["error"]
+    assert len(calendar_server.calendar.list_events('primary')) == 2
+
+
+def test_insert_events_without_events_makes_no_request(calendar_server):
+    assert insert_events([]) == []
+    assert calendar_server.calendar.stats["http_requests"] == 0
+
+
+def test_unreachable_server_fails_every_event(calendar_server):
+    calendar_client.calendar_client.batch_uri = "http://127.0.0.1:9/batch/calendar/v3"
+    results = insert_events([make_event(0), make_event(1)])
+    assert all("error" in result for result in results)
+
+
+def test_schedule_events_sends_a_message_in_one_batch(calendar_server, monkeypatch):
+    import assistant
+    import calendar_mirror
+    monkeypatch.setattr(calendar_mirror, "ENABLED", False)
+    summary = assistant.schedule_events([
+        {"title": "Standup", "start": "2025-06-02 09:00", "end": "2025-06-02 09:15"},
+        {"title": "Lunch", "start": "2025-06-02 13:00", "end": "2025-06-02 14:00"},
+        {"title": "Broken", "start": "tomorrow", "end": "later"},
+    ])
+
+    assert summary["response"] == "Created 2 of 3 events."
+    assert [event["status"] for event in summary["events"]] == ["created", "created", "failed"]
+    assert calendar_server.calendar.stats["batch_requests"] == 1
@@ -0,0 +1,165 @@
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+import calendar_client
+import calendar_mirror
+from calendar_mirror import CalendarMirror
+
+
+def make_event(summary, start, end, **extra):
+    return dict({"summary": summary,
+                 "start": {"dateTime": f"2025-06-02T{start}:00", "timeZone": "Asia/Kolkata"},
+                 "end": {"dateTime": f"2025-06-02T{end}:00", "timeZone": "Asia/Kolkata"}}, **extra)
+
+
+@pytest.fixture
+def mirror(calendar_server, tmp_path, monkeypatch):
+    # A fresh mirror of the fake calendar, also used by calendar_mirror.find_conflicts. The
+    # events below are on fixed dates, so the full sync is not bounded to recent history.
+    mirror = CalendarMirror(db_path=str(tmp_path / 'calendar_mirror.db'), sync_interval=3600, history_days=None)
+    monkeypatch.setattr(calendar_mirror, "mirror", mirror)
+    monkeypatch.setattr(calendar_mirror, "ENABLED", True)
+    yield mirror
+    mirror.stop()
+
+
+def test_sync_finds_overlapping_events(calendar_server, mirror):
+    calendar = calendar_server.calendar
+    calendar.insert('primary', make_event("Standup", "09:00", "09:30"))
+    calendar.insert('primary', make_event("Focus", "10:00", "12:00", transparency="transparent"))
+    calendar.insert('primary', make_event("Lunch", "13:00", "14:00"))
+    assert mirror.sync() == 3
+
+    titles = lambda start, end: [event["title"] for event in
+                                 mirror.overlapping(f"2025-06-02T{start}:00+05:30", f"2025-06-02T{end}:00+05:30")]
+    assert titles("09:15", "13:30") == ["Standup", "Lunch"]
+    # Touching ends do not overlap, and free (transparent) events never conflict
+    assert titles("09:30", "13:00") == []
+    assert mirror.is_free("2025-06-02T10:00:00+05:30", "2025-06-02T11:00:00+05:30")
+
+
+def test_incremental_sync_applies_changes_and_deletes(calendar_server, mirror):
+    calendar = calendar_server.calendar
+    _, standup = calendar.insert('primary', make_event("Standup", "09:00", "09:30"))
+    mirror.sync()
+    calendar.patch('primary', standup["id"], {"start": {"dateTime": "2025-06-02T15:00:00", "timeZone": "Asia/Kolkata"},
+                                              "end": {"dateTime": "2025-06-02T15:30:00", "timeZone": "Asia/Kolkata"}})
+    assert mirror.sync() == 1
+    assert mirror.is_free("2025-06-02T09:00:00+05:30", "2025-06-02T09:30:00+05:30")
+    assert not mirror.is_free("2025-06-02T15:00:00+05:30", "2025-06-02T15:30:00+05:30")
+
+    calendar.delete('primary', standup["id"])
+    mirror.sync()
+    assert mirror.is_free("2025-06-02T15:00:00+05:30", "2025-06-02T15:30:00+05:30")
+
+
+def test_expired_sync_token_falls_back_to_full_sync(calendar_server, mirror):
+    calendar = calendar_server.calendar
+    calendar.insert('primary', make_event("Standup", "09:00", "09:30"))
+    mirror.sync()
+    calendar.expire_sync_tokens()
+    calendar.insert('primary', make_event("Lunch", "13:00", "14:00"))
+    mirror.sync()
+    assert mirror.stats["full_syncs"] == 2
+    assert len(mirror.overlapping("2025-06-02T00:00:00+05:30", "2025-06-03T00:00:00+05:30")) == 2
+
+
+def test_scheduling_warns_about_conflicts(calendar_server, mirror):
+    import assistant
+    calendar_server.calendar.insert('primary', make_event("Standup", "09:00", "09:30"))
+    mirror.sync()
+
+    summary = assistant.schedule_events([
+        {"title": "Review", "start": "2025-06-02 09:15", "end": "2025-06-02 10:00"},
+        {"title": "Lunch", "start": "2025-06-02 13:00", "end": "2025-06-02 14:00"},
+    ])
+    review, lunch = summary["events"]
+    # A conflict is a warning: the event is still created
+    assert review["status"] == "created" and review["warning"] == "Overlaps with 'Standup'."
+    assert [conflict["title"] for conflict in review["conflicts"]] == ["Standup"]
+    assert lunch["status"] == "created" and "conflicts" not in lunch
+    # Events just created count before the next sync
+    assert [event["title"] for event in mirror.overlapping("2025-06-02T13:30:00+05:30",
+                                                           "2025-06-02T13:45:00+05:30")] == ["Lunch"]
+
+
+def days_from_now(days, summary):
+    start = datetime.now().replace(microsecond=0) + timedelta(days=days)
+    return {"summary": summary,
+            "start": {"dateTime": start.isoformat(), "timeZone": "Asia/Kolkata"},
+            "end": {"dateTime": (start + timedelta(hours=1)).isoformat(), "timeZone": "Asia/Kolkata"}}
+
+
+def test_full_sync_skips_old_history(calendar_server, tmp_path):
+    calendar = calendar_server.calendar
+    for days, summary in [(-400, "Last year"), (-45, "Last month"), (-2, "This week"), (10, "Upcoming")]:
+        calendar.insert('primary', days_from_now(days, summary))
+    mirror = CalendarMirror(db_path=str(tmp_path / 'calendar_mirror.db'), history_days=30)
+    assert mirror.sync() == 2
+    start, end = datetime.now() - timedelta(days=500), datetime.now() + timedelta(days=30)
+    assert [event["title"] for event in mirror.overlapping(start, end)] == ["This week", "Upcoming"]
+
+
+def test_full_sync_writes_page_by_page(calendar_server, mirror, monkeypatch):
+    calendar = calendar_server.calendar
+    for index in range(25):
+        calendar.insert('primary', make_event(f"Event {index}", f"{8 + index // 4:02d}:{index % 4 * 15:02d}",
+                                              f"{8 + index // 4:02d}:{index % 4 * 15 + 10:02d}"))
+    mirror.sync()
+    # Replaces the mirror, including events that are gone from the calendar by now
+    for event in calendar.list_events('primary')[:5]:
+        calendar.delete('primary', event["id"])
+    calendar.expire_sync_tokens()
+
+    mirror.page_size = 10
+    pages = []
+    apply = mirror._apply
+    monkeypatch.setattr(mirror, "_apply", lambda events, **kwargs: pages.append(len(events)) or apply(events, **kwargs))
+    assert mirror.sync() == 20
+    assert pages == [10, 10]
+    assert len(mirror.overlapping("2025-06-02T00:00:00+05:30", "2025-06-03T00:00:00+05:30")) == 20
+
+
+def test_own_events_survive_a_full_sync_that_does_not_list_them_yet(calendar_server, mirror):
+    calendar_server.calendar.insert('primary', make_event("Standup", "09:00", "09:30"))
+    mirror.record_event(dict(make_event("Queued", "11:00", "11:30"), id="queuedevent1"))
+    mirror.sync()
+    titles = [event["title"] for event in mirror.overlapping("2025-06-02T00:00:00+05:30", "2025-06-03T00:00:00+05:30")]
+    assert titles == ["Standup", "Queued"]
+
+
+def test_conflict_checks_never_start_the_sync_thread(mirror, monkeypatch):
+    monkeypatch.setattr(mirror, "ensure_started", lambda: pytest.fail("started from a request"))
+    assert calendar_mirror.find_conflicts([make_event("Review", "09:00", "10:00")]) == [[]]
+
+
+def test_start_is_opt_in(mirror, monkeypatch):
+    started = []
+    monkeypatch.setattr(mirror, "ensure_started", lambda: started.append(1))
+    monkeypatch.setattr(calendar_mirror, "ENABLED", False)
+    calendar_mirror.start()
+    assert started == []
+    monkeypatch.setattr(calendar_mirror, "ENABLED", True)
+    calendar_mirror.start()
+    assert started == [1]
+
+
+def test_sign_in_never_runs_off_the_main_thread(tmp_path, monkeypatch):
+    from google_auth_oauthlib.flow import InstalledAppFlow
+    monkeypatch.setattr(InstalledAppFlow, "from_client_secrets_file",
+                        classmethod(lambda *args, **kwargs: pytest.fail("browser sign-in from a worker thread")))
+    client = calendar_client.CalendarClient(token_file=str(tmp_path / 'token.pickle'))
+    errors = []
+
+    def run():
+        try:
+            client.get_credentials()
+        except Exception as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    thread.join()
+    assert len(errors) == 1 and isinstance(errors[0], calendar_client.AuthorizationRequired)
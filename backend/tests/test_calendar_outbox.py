@@ -0,0 +1,188 @@
+import time
+
+import pytest
+
+import calendar_outbox
+from calendar_outbox import CalendarOutbox, job_id_for
+
+EVENT = {"summary": "Standup",
+         "start": {"dateTime": "2025-06-02T09:00:00", "timeZone": "Asia/Kolkata"},
+         "end": {"dateTime": "2025-06-02T09:15:00", "timeZone": "Asia/Kolkata"}}
+
+
+@pytest.fixture
+def outbox(tmp_path, monkeypatch):
+    # Jobs are sent by drain()/process_due() in the test, not by a background worker
+    outbox = CalendarOutbox(db_path=str(tmp_path / 'outbox.db'), max_attempts=3)
+    monkeypatch.setattr(outbox, "ensure_started", lambda: None)
+    return outbox
+
+
+def make_due(outbox):
+    # Skips the backoff so the next process_due() retries straight away
+    with outbox._connect() as conn:
+        conn.execute("UPDATE calendar_jobs SET next_attempt_at = 0")
+
+
+def test_queued_event_is_sent_once(outbox, calendar_server):
+    job_id = outbox.enqueue(EVENT)
+    assert outbox.get_job(job_id)["status"] == "pending"
+    outbox.drain()
+
+    job = outbox.get_job(job_id)
+    assert job["status"] == "done" and job["attempts"] == 1 and job["event_link"]
+    # The job id is the event id
+    assert [event["id"] for event in calendar_server.calendar.list_events('primary')] == [job_id]
+
+
+def test_same_idempotency_key_queues_one_job(outbox, calendar_server):
+    first = outbox.enqueue(EVENT, idempotency_key="submit-1")
+    second = outbox.enqueue(EVENT, idempotency_key="submit-1")
+    assert first == second == job_id_for("submit-1")
+    outbox.drain()
+    assert len(calendar_server.calendar.list_events('primary')) == 1
+
+
+def test_transient_errors_retry_with_backoff(outbox, calendar_server):
+    calendar_server.calendar.error_rate = 1.0
+    job_id = outbox.enqueue(EVENT)
+    assert outbox.process_due() == 1
+
+    job = outbox.get_job(job_id)
+    assert job["status"] == "pending" and job["attempts"] == 1 and "Backend Error" in job["error"]
+    # Backed off: nothing is due until the delay passes
+    assert outbox.process_due() == 0
+
+    calendar_server.calendar.error_rate = 0.0
+    make_due(outbox)
+    outbox.drain()
+    job = outbox.get_job(job_id)
+    assert job["status"] == "done" and job["attempts"] == 2 and job["error"] is None
+
+
+def test_retries_stop_at_max_attempts(outbox, calendar_server):
+    calendar_server.calendar.error_rate = 1.0
+    job_id = outbox.enqueue(EVENT)
+    for _ in range(outbox.max_attempts):
+        make_due(outbox)
+        outbox.process_due()
+
+    job = outbox.get_job(job_id)
+    assert job["status"] == "failed" and job["attempts"] == outbox.max_attempts
+    make_due(outbox)
+    assert outbox.process_due() == 0
+
+
+def test_rejected_event_fails_without_retrying(outbox, calendar_server):
+    calendar_server.calendar.fail_summaries.add("Standup")
+    job_id = outbox.enqueue(EVENT)
+    outbox.drain()
+
+    job = outbox.get_job(job_id)
+    assert job["status"] == "failed" and job["attempts"] == 1 and "Rejected" in job["error"]
+
+
+def test_conflict_means_an_earlier_attempt_created_it(outbox, calendar_server):
+    # The first attempt's response was lost after the event was created
+    job_id = outbox.enqueue(EVENT)
+    calendar_server.calendar.insert('primary', dict(EVENT, id=job_id))
+    outbox.drain()
+
+    job = outbox.get_job(job_id)
+    assert job["status"] == "done" and job["error"] is None
+    assert job["event_link"].endswith(job_id)
+    assert len(calendar_server.calendar.list_events('primary')) == 1
+
+
+@pytest.fixture
+def service_outbox(outbox, monkeypatch):
+    # The process-wide outbox, as the routes use it
+    import calendar_mirror
+    monkeypatch.setattr(calendar_outbox, "ENABLED", True)
+    monkeypatch.setattr(calendar_outbox, "outbox", outbox)
+    monkeypatch.setattr(calendar_mirror, "ENABLED", False)
+    return outbox
+
+
+def test_job_status_endpoint(service_outbox, calendar_server):
+    from service import app
+    job_id = service_outbox.enqueue(EVENT)
+    client = app.test_client()
+
+    response = client.get(calendar_outbox.status_url(job_id))
+    assert response.status_code == 200 and response.get_json()["status"] == "pending"
+    service_outbox.drain()
+    job = client.get(calendar_outbox.status_url(job_id)).get_json()
+    assert job["status"] == "done" and job["title"] == "Standup"
+    assert client.get(calendar_outbox.status_url("missing")).status_code == 404
+
+
+@pytest.mark.parametrize("payload, headers", [
+    ({"message": "schedule meeting tomorrow at 5", "session_id": "double-submit"}, {}),
+    ({"message": "schedule meeting tomorrow at 5"}, {"Idempotency-Key": "form-42"}),
+])
+def test_double_submit_creates_one_event(service_outbox, calendar_server, payload, headers):
+    from service import app
+    client = app.test_client()
+    first = client.post('/assistant', json=payload, headers=headers).get_json()
+    second = client.post('/assistant', json=payload, headers=headers).get_json()
+
+    assert first["response"] == "Event queued."
+    assert first["job_id"] == second["job_id"]
+    service_outbox.drain()
+    assert service_outbox.stats() == {"done": 1}
+    assert len(calendar_server.calendar.list_events('primary')) == 1
+
+
+def test_submits_without_a_scope_are_separate_jobs(service_outbox, calendar_server):
+    from service import app
+    client = app.test_client()
+    payload = {"message": "schedule meeting tomorrow at 5"}
+    first = client.post('/assistant', json=payload).get_json()
+    second = client.post('/assistant', json=payload).get_json()
+    assert first["job_id"] != second["job_id"]
+
+
+def move(job_id, start, end):
+    import assistant
+    return assistant.move_event({"event_id": job_id, "title": "Meeting", "start": start, "end": end})
+
+
+def test_same_session_asking_again_later_is_a_new_event(service_outbox, calendar_server, monkeypatch):
+    # A double submit is merged within the window; after it, the same request is meant again
+    from service import app
+    monkeypatch.setattr(calendar_outbox, "SESSION_DEDUP_SECONDS", 0.05)
+    client = app.test_client()
+    payload = {"message": "schedule meeting tomorrow at 5", "session_id": "reschedule"}
+    first = client.post('/assistant', json=payload).get_json()
+    service_outbox.drain()
+    # The user moves it, then wants one at 5 again
+    assert move(first["job_id"], "2030-01-01 18:00", "2030-01-01 19:00")["response"] == "Event updated."
+    time.sleep(0.06)
+    second = client.post('/assistant', json=payload).get_json()
+
+    assert second["response"] == "Event queued." and second["job_id"] != first["job_id"]
+    service_outbox.drain()
+    assert service_outbox.stats() == {"done": 2}
+    assert len(calendar_server.calendar.list_events('primary')) == 2
+
+
+def test_moving_a_queued_event_changes_what_is_sent(service_outbox, calendar_server):
+    job_id = service_outbox.enqueue(EVENT)
+    response = move(job_id, "2025-06-02 18:00", "2025-06-02 19:00")
+    assert response["response"] == "Event updated." and response["job_id"] == job_id
+    assert calendar_server.calendar.stats["patches"] == 0
+
+    service_outbox.drain()
+    [event] = calendar_server.calendar.list_events('primary')
+    assert event["id"] == job_id and event["summary"] == "Meeting"
+    assert event["start"]["dateTime"] == "2025-06-02T18:00:00"
+
+
+def test_moving_a_failed_event_says_so(service_outbox, calendar_server):
+    calendar_server.calendar.fail_summaries.add("Standup")
+    job_id = service_outbox.enqueue(EVENT)
+    service_outbox.drain()
+    response = move(job_id, "2025-06-02 18:00", "2025-06-02 19:00")
+    assert response["response"].startswith("That event was never created")
+    assert calendar_server.calendar.stats["patches"] == 0
@@ -0,0 +1,126 @@
+import time
+
+import conversation_store
+import notes_store
+from conversation_store import Conversation, ConversationStore, estimate_tokens
+from notes_store import NotesStore
+
+
+def make_store(tmp_path, **kwargs):
+    return ConversationStore(db_path=str(tmp_path / 'conversations.db'), **kwargs)
+
+
+def say(store, session_id, count, start=0, words=8):
+    # Records count turns of about words * 2 tokens each
+    for index in range(start, start + count):
+        store.record_turn(session_id, f"message {index} " + "word " * words, f"reply {index} " + "word " * words)
+
+
+def test_turns_and_entities_are_remembered_per_session(tmp_path):
+    store = make_store(tmp_path)
+    store.record_turn("a", "show me my groceries note", "milk; bread", {"last_topic": "groceries"})
+    store.record_turn("b", "hello", "hi there")
+    conversation = store.load("a")
+    assert conversation.turns == [("show me my groceries note", "milk; bread")]
+    assert conversation.entities == {"last_topic": "groceries"}
+    assert store.load("b").entities == {}
+    assert not store.load("nobody")
+
+
+def test_entities_merge_and_none_removes_one(tmp_path):
+    store = make_store(tmp_path)
+    event = {"id": "evt1", "title": "Dentist", "start": "2026-10-19T17:00:00", "end": "2026-10-19T18:00:00"}
+    store.record_turn("a", "add milk to groceries", "Added.", {"last_topic": "groceries"})
+    store.record_turn("a", "dentist at 5pm tomorrow", "Event created.", {"last_event": event})
+    assert store.load("a").entities == {"last_topic": "groceries", "last_event": event}
+    store.record_turn("a", "cancel it", "Event deleted.", {"last_event": None})
+    assert store.load("a").entities == {"last_topic": "groceries"}
+
+
+def test_session_is_over_after_the_ttl(tmp_path):
+    store = make_store(tmp_path, ttl=0.2)
+    store.record_turn("a", "hello", "hi there", {"last_topic": "groceries"})
+    assert store.load("a")
+    time.sleep(0.25)
+    # Expired but not yet pruned: loads as a new session
+    assert not store.load("a")
+
+    # The next turn starts over instead of folding the stale turn in
+    store.record_turn("a", "show me my reading list", "Dune", {"last_topic": "reading list"})
+    conversation = store.load("a")
+    assert conversation.turns == [("show me my reading list", "Dune")]
+    assert (conversation.summary, conversation.entities) == ("", {"last_topic": "reading list"})
+
+
+def test_expired_sessions_are_pruned(tmp_path, monkeypatch):
+    monkeypatch.setattr(conversation_store, "PRUNE_EVERY", 1)
+    store = make_store(tmp_path, ttl=0.2)
+    store.record_turn("old", "hello", "hi there")
+    time.sleep(0.25)
+    store.record_turn("new", "hello", "hi there")
+    conn = store._conn()
+    assert [row[0] for row in conn.execute("SELECT session_id FROM conversation_sessions")] == ["new"]
+    assert conn.execute("SELECT COUNT(*) FROM conversation_turns WHERE session_id = 'old'").fetchone()[0] == 0
+
+
+def test_turns_past_the_history_budget_are_folded_into_the_summary(tmp_path):
+    store = make_store(tmp_path, history_tokens=50, summary_tokens=1000)
+    say(store, "a", 10)
+    conversation = store.load("a")
+    kept = sum(estimate_tokens(message + reply) for message, reply in conversation.turns)
+    assert kept <= 50 and conversation.turns[-1][0].startswith("message 9 ")
+    # Every turn is either kept verbatim or has one summary line, oldest first
+    lines = conversation.summary.splitlines()
+    assert len(lines) + len(conversation.turns) == 10
+    assert lines[0].startswith("- message 0 ") and conversation.compacted == len(lines)
+    assert store.stats["turns"] == 10
+    assert store.stats["compacted_turns"] == len(lines) and 0 < store.stats["compactions"] <= len(lines)
+
+
+def test_summary_keeps_its_newest_lines(tmp_path):
+    store = make_store(tmp_path, history_tokens=20, summary_tokens=40)
+    say(store, "a", 30)
+    conversation = store.load("a")
+    assert estimate_tokens(conversation.summary) <= 40
+    # The oldest turns are gone entirely; the context stays bounded
+    assert "message 0 " not in conversation.summary and "message 28 " in conversation.summary
+    assert conversation.compacted == 29
+    assert len(conversation.render()) < 1000
+
+
+def test_latest_turn_is_kept_even_over_budget(tmp_path):
+    store = make_store(tmp_path, history_tokens=5)
+    say(store, "a", 2, words=40)
+    conversation = store.load("a")
+    assert [message.split()[:2] for message, _ in conversation.turns] == [["message", "1"]]
+    assert conversation.compacted == 1
+
+
+def test_resolve_fills_references_from_the_session():
+    conversation = Conversation("a", entities={"last_topic": "groceries",
+                                               "last_event": {"id": "evt1", "title": "Dentist"}})
+    decision, resolved = conversation.resolve({"action": "note", "note_action": "append", "topic": "that"})
+    assert resolved and decision["topic"] == "groceries"
+    decision, resolved = conversation.resolve({"action": "calendar", "event_action": "update",
+                                               "events": [{"start": "2026-10-19T18:00:00"}]})
+    assert resolved and decision["event_id"] == "evt1" and decision["events"][0]["title"] == "Dentist"
+    _, resolved = Conversation("b").resolve({"action": "note", "note_action": "append", "topic": "it"})
+    assert not resolved
+
+
+def test_assistant_records_turns_only_for_sessions(tmp_path, monkeypatch):
+    from service import app
+    store = make_store(tmp_path)
+    notes = NotesStore(db_path=str(tmp_path / 'notes.db'), cache_size=0)
+    notes.insert_or_update_notes("groceries", ["milk", "bread"])
+    monkeypatch.setattr(conversation_store, "conversation_store", store)
+    monkeypatch.setattr(notes_store, "store", notes)
+    client = app.test_client()
+
+    client.post('/assistant', json={"message": "show me my groceries note"})
+    assert store.stats["turns"] == 0
+    client.post('/assistant', json={"message": "show me my groceries note", "session_id": "s1"})
+    conversation = store.load("s1")
+    assert conversation.turns == [("show me my groceries note", "milk; bread")]
+    assert conversation.entities == {"last_topic": "groceries"}
+    notes.close()
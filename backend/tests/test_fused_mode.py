@@ -0,0 +1,39 @@
+import pytest
+
+import assistant
+from fake_llm import FakeChatModel
+from llm_cache import CachedChatModel
+from resilient_llm import ResilientChatModel
+
+MESSAGE = "I love functional programming"
+
+
+def ask(content, monkeypatch):
+    # /assistant in fused mode, with every model call answered by `content`
+    fake = FakeChatModel(latency=0.0, default_response=content)
+    model = ResilientChatModel([("pro", fake)], hedge=False)
+    monkeypatch.setattr(assistant, "ASSISTANT_MODE", "fused")
+    monkeypatch.setattr(assistant, "model", model)
+    monkeypatch.setattr(assistant, "cached_model", CachedChatModel(model, db_path=None))
+    response = assistant.app.test_client().post('/assistant', json={"message": MESSAGE}).get_json()
+    return response, fake.calls
+
+
+def test_chat_is_answered_by_the_classification_call(monkeypatch):
+    response, calls = ask('{"action": "chat", "answer": "Me too."}', monkeypatch)
+    assert response == {"response": "Me too."}
+    assert calls == 1
+
+
+@pytest.mark.parametrize("content", ['{"action": "chat", "answer": "Me too."', 'Me too.'])
+def test_invalid_json_is_not_asked_again(monkeypatch, content):
+    # Reported as a parse failure rather than paying for a second, chat-only call
+    response, calls = ask(content, monkeypatch)
+    assert response["response"].startswith("LLM parsing error")
+    assert calls == 1
+
+
+def test_fused_decision_without_an_answer_falls_back_to_a_chat_call(monkeypatch):
+    response, calls = ask('{"action": "chat"}', monkeypatch)
+    assert response == {"response": '{"action": "chat"}'}
+    assert calls == 2
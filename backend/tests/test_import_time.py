@@ -0,0 +1,22 @@
+import os
+
+import pytest
+
+from check_import_time import BUDGETS_MS, LAZY_MODULES, measure
+
+# Same budgets as check_import_time.py; slower runners can scale them, e.g.
+#   IMPORT_TIME_SCALE=2 python -m pytest tests/test_import_time.py
+SCALE = float(os.getenv("IMPORT_TIME_SCALE", "1.0"))
+RUNS = int(os.getenv("IMPORT_TIME_RUNS", "3"))
+
+
+@pytest.mark.parametrize("module", list(BUDGETS_MS))
+def test_import_stays_within_budget_and_lazy(module):
+    runs = [measure(module) for _ in range(RUNS)]
+    best = min(ms for ms, _, _ in runs)
+    budget = BUDGETS_MS[module] * SCALE
+    assert best <= budget, f"{module} imports in {best:.0f} ms, budget is {budget:.0f} ms"
+
+    _, imported, stdout = runs[0]
+    assert [name for name in LAZY_MODULES if name in imported] == []
+    assert stdout.strip() == ""
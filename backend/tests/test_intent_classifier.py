@@ -0,0 +1,92 @@
+from datetime import datetime
+
+import pytest
+
+from intent_classifier import IntentClassifier
+from time_parser import parse_events
+
+NOW = datetime(2025, 6, 2, 10, 0)
+
+
+@pytest.fixture
+def classifier():
+    return IntentClassifier()
+
+
+def test_note_add(classifier):
+    decision = classifier.classify("add note on machine learning", now=NOW)
+    assert decision["action"] == "note" and decision["note_action"] == "add"
+    assert decision["topic"] == "machine learning"
+
+
+def test_note_retrieve(classifier):
+    decision = classifier.classify("show my notes for grocery shopping", now=NOW)
+    assert decision["action"] == "note" and decision["note_action"] == "retrieve"
+    assert decision["topic"] == "grocery shopping"
+
+
+def test_schedule_with_verb_and_noun(classifier):
+    decision = classifier.classify("schedule meeting tomorrow at 5", now=NOW)
+    assert decision["action"] == "calendar"
+    assert decision["title"] == "Meeting"
+    assert decision["start"] == "2025-06-03 17:00"
+
+
+@pytest.mark.parametrize("message", [
+    "how do I schedule a meeting at 5pm in outlook?",
+    "what should i plan for dinner at 8pm",
+    "can you add a meeting tomorrow at 5pm",
+    "add a meeting tomorrow at 5pm?",
+    "when is the review tomorrow at 5",
+])
+def test_questions_never_book_an_event(classifier, message):
+    # Left to the LLM, or answered as chat; either way nothing is scheduled locally
+    decision = classifier.classify(message, now=NOW)
+    assert decision is None or decision["action"] == "chat"
+
+
+@pytest.mark.parametrize("message", [
+    "don't schedule a meeting tomorrow at 5",
+    "do not book a call tomorrow at 9am",
+    "never schedule a review on friday at 5pm",
+    "cancel the meeting tomorrow at 5",
+    "not the meeting tomorrow at 5, schedule lunch",
+])
+def test_negated_requests_never_book_an_event(classifier, message):
+    decision = classifier.classify(message, now=NOW)
+    assert decision is None or decision["action"] != "calendar"
+
+
+def test_add_to_calendar_is_not_a_note(classifier):
+    assert classifier.classify("add this to my calendar", now=NOW) is None
+
+
+@pytest.mark.parametrize("message", ["show me the notes", "add note on the"])
+def test_article_topic_is_not_a_topic(classifier, message):
+    assert classifier.classify(message, now=NOW) is None
+
+
+def test_pronoun_topic_is_a_reference_below_threshold(classifier):
+    decision = classifier.predict("add another point to that", now=NOW)
+    assert decision["reference"] and decision["confidence"] < classifier.threshold
+
+
+def test_noun_without_verb_is_not_booked(classifier):
+    assert classifier.classify("a review of my essay at 5pm", now=NOW) is None
+
+
+def test_plain_questions_are_chat(classifier):
+    assert classifier.classify("what is the capital of france", now=NOW)["action"] == "chat"
+
+
+def test_unknown_words_go_to_the_model(classifier):
+    assert classifier.predict("monads?", now=NOW) == {"action": "chat", "confidence": 0.0}
+    assert classifier.classify("monads?", now=NOW) is None
+
+
+@pytest.mark.parametrize("message", [
+    "can you schedule a meeting tomorrow at 5pm",
+    "please could you book a call tomorrow at 5pm",
+])
+def test_event_titles_drop_polite_openers(message):
+    assert [event["title"] for event in parse_events(message, now=NOW)] == [message.split()[-4].capitalize()]
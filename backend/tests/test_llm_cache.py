@@ -0,0 +1,144 @@
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+import llm_cache
+from fake_llm import FakeChatModel
+from llm_cache import CachedChatModel
+
+INTENT_PROMPT = "classify: book the dentist at 5pm"
+NOTE_PROMPT = "decide: add milk to the groceries note"
+
+
+class Today:
+    # Stands in for llm_cache.datetime so a test can move the date on (expiry still runs on
+    # the real clock, so it starts at the real local time)
+    day = None
+
+    @classmethod
+    def now(cls, tz=None):
+        return tz.localize(cls.day) if tz else cls.day
+
+    combine = datetime.combine
+    min = datetime.min
+
+
+@pytest.fixture
+def fake():
+    return FakeChatModel(latency=0.0, default_response="answer")
+
+
+@pytest.fixture
+def today(monkeypatch):
+    monkeypatch.setattr(llm_cache, "datetime", Today)
+    monkeypatch.setattr(Today, "day", datetime.now(llm_cache.india_tz).replace(tzinfo=None))
+    return Today
+
+
+def next_day(today, monkeypatch):
+    monkeypatch.setattr(today, "day", today.day + timedelta(days=1))
+
+
+def test_date_keyed_prompts_are_not_reused_the_next_day(fake, today, monkeypatch):
+    cache = CachedChatModel(fake, db_path=None)
+    cache.invoke(INTENT_PROMPT, prompt_type="intent")
+    cache.invoke(NOTE_PROMPT, prompt_type="note_decision")
+    assert cache.invoke(INTENT_PROMPT, prompt_type="intent").cached
+    assert fake.calls == 2
+
+    next_day(today, monkeypatch)
+    # "at 5pm" meant yesterday; the note decision does not depend on the date
+    assert not getattr(cache.invoke(INTENT_PROMPT, prompt_type="intent"), "cached", False)
+    assert cache.invoke(NOTE_PROMPT, prompt_type="note_decision").cached
+    assert fake.calls == 3
+
+
+def test_time_relative_wording_is_date_keyed_for_any_prompt_type(fake, today, monkeypatch):
+    cache = CachedChatModel(fake, db_path=None)
+    keys = [cache.make_key("what is on tomorrow"), cache.make_key("what is a monad")]
+    next_day(today, monkeypatch)
+    assert cache.make_key("what is on tomorrow") != keys[0]
+    assert cache.make_key("what is a monad") == keys[1]
+    assert CachedChatModel(fake, db_path=None, time_relative="bypass").make_key("what is on tomorrow") is None
+
+
+def test_time_of_day_prompts_are_never_cached(fake, today, monkeypatch):
+    cache = CachedChatModel(fake, db_path=None)
+    prompts = ["meeting in 2 hours", "call mom tonight", "meeting tomorrow at 5pm"]
+    monkeypatch.setattr(today, "day", datetime(2025, 6, 2, 9, 0))
+    morning = [cache.make_key(prompt, prompt_type="intent") for prompt in prompts]
+    monkeypatch.setattr(today, "day", datetime(2025, 6, 2, 15, 0))
+    afternoon = [cache.make_key(prompt, prompt_type="intent") for prompt in prompts]
+    # "in 2 hours" at 15:00 is not what it was at 09:00; "tomorrow at 5pm" is, all day
+    assert morning[:2] == afternoon[:2] == [None, None]
+    assert morning[2] is not None and morning[2] == afternoon[2]
+
+    cache.invoke(prompts[0], prompt_type="intent")
+    cache.invoke(prompts[0], prompt_type="intent")
+    assert fake.calls == 2 and cache.stats()["bypassed"] == 2
+
+
+def test_undated_clock_times_are_not_reused_once_they_pass(fake, today, monkeypatch):
+    cache = CachedChatModel(fake, db_path=None)
+    # Expiry runs on the real clock, so stay on today's date
+    monkeypatch.setattr(today, "day", today.day.replace(hour=16, minute=0))
+    cache.invoke(INTENT_PROMPT, prompt_type="intent")
+    monkeypatch.setattr(today, "day", today.day.replace(hour=16, minute=59))
+    assert cache.invoke(INTENT_PROMPT, prompt_type="intent").cached
+    # "at 5pm" now means tomorrow, not the today 17:00 cached an hour ago
+    monkeypatch.setattr(today, "day", today.day.replace(hour=17, minute=0))
+    assert not getattr(cache.invoke(INTENT_PROMPT, prompt_type="intent"), "cached", False)
+    assert fake.calls == 2
+
+    # A bare "at 5" could be 05:00 or 17:00; the key moves on at either
+    keys = []
+    for hour in (4, 6, 18):
+        monkeypatch.setattr(today, "day", datetime(2025, 6, 2, hour, 0))
+        keys.append(cache.make_key("meeting at 5", prompt_type="intent"))
+    assert len(set(keys)) == 3
+
+
+def test_entries_expire_after_their_ttl(fake, tmp_path):
+    cache = CachedChatModel(fake, db_path=str(tmp_path / 'cache.db'), ttls={"default": 0.2})
+    cache.invoke("what is a monad")
+    assert cache.invoke("what is a monad").cached
+    time.sleep(0.25)
+    # Gone from both tiers
+    assert not getattr(cache.invoke("what is a monad"), "cached", False)
+    assert fake.calls == 2
+
+
+def test_memory_tier_evicts_the_least_recently_used(fake):
+    cache = CachedChatModel(fake, db_path=None, max_entries=2)
+    cache.invoke("first")
+    cache.invoke("second")
+    cache.invoke("first")  # now the most recently used
+    cache.invoke("third")
+    assert fake.calls == 3
+    assert cache.invoke("first").cached and cache.invoke("third").cached
+    assert not getattr(cache.invoke("second"), "cached", False)
+    assert fake.calls == 4 and cache.stats()["memory_entries"] == 2
+
+
+def test_sqlite_tier_survives_a_restart(fake, tmp_path):
+    path = str(tmp_path / 'cache.db')
+    CachedChatModel(fake, db_path=path).invoke("what is a monad")
+
+    restarted = FakeChatModel(latency=0.0, default_response="not called")
+    cache = CachedChatModel(restarted, db_path=path)
+    response = cache.invoke("what is a monad")
+    assert response.cached and response.content == "answer"
+    assert restarted.calls == 0
+    stats = cache.stats()
+    assert (stats["disk_hits"], stats["memory_hits"]) == (1, 0)
+    # Promoted to the memory tier
+    cache.invoke("what is a monad")
+    assert cache.stats()["memory_hits"] == 1
+
+
+def test_invalid_responses_are_not_cached(fake):
+    cache = CachedChatModel(fake, db_path=None)
+    cache.invoke("what is a monad", validate=llm_cache.has_json_object)
+    cache.invoke("what is a monad", validate=llm_cache.has_json_object)
+    assert fake.calls == 2
@@ -0,0 +1,75 @@
+import asyncio
+
+from flask import Flask, Response
+
+import metrics
+from metrics import Counter, Histogram, init_app, set_intent, stage
+
+
+def test_counter_renders_escaped_labels():
+    counter = Counter("test_events_total", "Events.", ["path"])
+    counter.inc(path='a "quoted"\\path\nline')
+    counter.inc(2, path="plain")
+    assert counter.render() == [
+        "# HELP test_events_total Events.",
+        "# TYPE test_events_total counter",
+        'test_events_total{path="a \\"quoted\\"\\\\path\\nline"} 1.0',
+        'test_events_total{path="plain"} 2.0',
+    ]
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("test_seconds", "Latency.", ["stage"], buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 5.0):
+        histogram.observe(value, stage="parse")
+    assert histogram.render()[2:] == [
+        'test_seconds_bucket{stage="parse",le="0.1"} 1',
+        'test_seconds_bucket{stage="parse",le="1.0"} 3',
+        'test_seconds_bucket{stage="parse",le="+Inf"} 4',
+        'test_seconds_sum{stage="parse"} 6.05',
+        'test_seconds_count{stage="parse"} 4',
+    ]
+
+
+def test_metrics_route_serves_the_prometheus_text_format():
+    from service import app
+    response = app.test_client().get('/metrics')
+    assert response.status_code == 200
+    assert response.content_type == "text/plain; version=0.0.4; charset=utf-8"
+    assert "# TYPE assistant_request_seconds histogram" in response.get_data(as_text=True)
+
+
+def test_async_metrics_route_serves_the_same_format():
+    import assistant_asgi
+
+    async def scrape():
+        response = await assistant_asgi.app.test_client().get('/metrics')
+        return response.status_code, response.content_type
+    assert asyncio.run(scrape()) == (200, "text/plain; version=0.0.4; charset=utf-8")
+
+
+def request_count(endpoint, intent):
+    line = f'assistant_request_seconds_count{{endpoint="{endpoint}",intent="{intent}",status="200"}} '
+    found = [row for row in metrics.registry.render().splitlines() if row.startswith(line)]
+    return int(found[0].rsplit(" ", 1)[1]) if found else 0
+
+
+def test_streamed_request_is_traced_when_the_body_closes():
+    app = init_app(Flask(__name__))
+
+    @app.route('/test/stream')
+    def stream():
+        def generate():
+            with stage("test_stream_stage"):
+                set_intent("chat")
+                yield "data: one\n\n"
+        return Response(generate(), mimetype='text/event-stream')
+
+    response = app.test_client().get('/test/stream')
+    # The body has not been sent yet, so neither has the request finished
+    assert request_count("/test/stream", "chat") == 0
+    assert response.get_data(as_text=True) == "data: one\n\n"
+    response.close()
+    # Finished once, with the intent the stream set and the stage inside it
+    assert request_count("/test/stream", "chat") == 1
+    assert 'assistant_stage_seconds_count{stage="test_stream_stage",intent="chat"} 1' in metrics.registry.render()
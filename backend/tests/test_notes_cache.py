@@ -0,0 +1,115 @@
+import os
+import sys
+import subprocess
+
+import pytest
+
+import notes_store
+from notes_cache import NotesCache, MISSING
+from notes_store import NotesStore
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'notes.db')
+
+
+@pytest.fixture
+def store(path):
+    store = NotesStore(db_path=path)
+    store.insert_or_update_notes("groceries", ["milk"])
+    store.insert_or_update_notes("garden", ["plant tomatoes"])
+    yield store
+    store.close()
+
+
+def write_in_another_process(path, topic, points):
+    script = ("import sys; from notes_store import NotesStore; "
+              "NotesStore(db_path=sys.argv[1]).insert_or_update_notes(sys.argv[2], sys.argv[3:])")
+    subprocess.run([sys.executable, "-c", script, path, topic, *points], cwd=BACKEND_DIR, check=True)
+
+
+def cache_stats(store):
+    return store.stats()["cache"]
+
+
+def test_repeat_lookups_are_served_from_the_cache(store):
+    assert store.get_notes("groceries") == ["milk"]
+    assert store.get_notes("groceries") == ["milk"]
+    assert store.get_notes("nothing here") is None
+    assert store.get_notes("nothing here") is None
+    assert (cache_stats(store)["hits"], cache_stats(store)["misses"]) == (2, 2)
+
+
+def test_callers_cannot_change_the_cached_value(store):
+    store.get_notes("groceries").append("not saved")
+    assert store.get_notes("groceries") == ["milk"]
+
+
+def test_own_writes_are_seen(store):
+    store.get_notes("groceries")
+    store.insert_or_update_notes("groceries", ["eggs"])
+    assert store.get_notes("groceries") == ["eggs"]
+    store.append_note_points("groceries", ["bread"])
+    assert store.get_notes("groceries") == ["eggs", "bread"]
+
+
+def test_writes_from_another_process_drop_only_their_topics(store, path):
+    store.get_notes("groceries")
+    store.get_notes("garden")
+    write_in_another_process(path, "groceries", ["oat milk", "rye bread"])
+
+    assert store.get_notes("groceries") == ["oat milk", "rye bread"]
+    hits = cache_stats(store)["hits"]
+    assert store.get_notes("garden") == ["plant tomatoes"]
+    assert cache_stats(store)["hits"] == hits + 1
+
+
+def test_writes_from_another_store_in_this_process(store, path):
+    store.get_notes("garden")
+    other = NotesStore(db_path=path)
+    other.insert_or_update_notes("garden", ["water the beans"])
+    assert store.get_notes("garden") == ["water the beans"]
+    other.close()
+
+
+def test_pruned_change_log_clears_the_cache(store, path, monkeypatch):
+    store.get_notes("groceries")
+    store.get_notes("garden")
+    # The other writer prunes the log past what this store has seen
+    monkeypatch.setattr(notes_store, "CHANGE_LOG_KEEP", 1)
+    monkeypatch.setattr(notes_store, "CHANGE_LOG_PRUNE_EVERY", 1)
+    other = NotesStore(db_path=path, cache_size=0)
+    for index in range(5):
+        other.insert_or_update_notes(f"topic {index}", ["point"])
+    other.close()
+
+    misses = cache_stats(store)["misses"]
+    assert store.get_notes("garden") == ["plant tomatoes"]
+    assert cache_stats(store)["misses"] == misses + 1
+
+
+def test_read_that_raced_an_invalidation_is_not_stored():
+    cache = NotesCache(max_entries=4)
+    generation = cache.generation
+    cache.invalidate(["groceries"])
+    cache.put("groceries", ["stale"], generation)
+    assert cache.get("groceries") is MISSING
+
+
+def test_cache_is_bounded_by_entries_and_bytes():
+    cache = NotesCache(max_entries=2, max_bytes=10 ** 6)
+    for topic in ("a", "b", "c"):
+        cache.put(topic, [topic])
+    assert cache.get("a") is MISSING and cache.get("c") == ["c"]
+
+    cache = NotesCache(max_entries=100, max_bytes=2000)
+    for index in range(10):
+        cache.put(f"topic {index}", ["x" * 300])
+    stats = cache.stats()
+    assert stats["bytes"] <= 2000 and stats["evictions"] > 0
+    # Too big to cache at all
+    cache.put("huge", ["x" * 5000])
+    assert cache.get("huge") is MISSING
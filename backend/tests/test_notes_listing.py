@@ -0,0 +1,66 @@
+import json
+
+import pytest
+
+import notes_store
+from notes_store import NotesStore
+
+NOTES = {f"topic {index:02d}": [f"point {index}", {"index": index}] for index in range(23)}
+NOTES["scalar"] = "just one"
+NOTES["empty"] = []
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    # Also the process-wide store, for the routes
+    store = NotesStore(db_path=str(tmp_path / 'notes.db'), pool_size=1, cache_size=0)
+    store.import_notes(NOTES.items())
+    monkeypatch.setattr(notes_store, "store", store)
+    yield store
+    store.close()
+
+
+def test_chunks_cover_every_note_in_topic_order(store):
+    assert list(store.iter_notes(chunk_size=4)) == sorted(NOTES.items())
+    assert dict(store.iter_notes(chunk_size=1000)) == NOTES
+
+
+@pytest.mark.parametrize("after_topic, limit", [
+    (None, 5), ("topic 03", 4), ("topic 03", 7), ("topic 20", 10), ("zzz", 3), (None, 0),
+])
+def test_keyset_pages_match_a_full_listing(store, after_topic, limit):
+    listing = sorted(NOTES.items())
+    expected = [item for item in listing if after_topic is None or item[0] > after_topic][:limit]
+    assert list(store.iter_notes(after_topic, limit, chunk_size=4)) == expected
+
+
+def test_connection_is_back_in_the_pool_between_notes(store):
+    notes = store.iter_notes(chunk_size=3)
+    next(notes)
+    # With a pool of one, this write would wait forever on a connection held by the listing
+    assert store._pool.qsize() == 1
+    store.insert_or_update_notes("aaa written meanwhile", ["sorts before the listing's position"])
+    assert len(list(notes)) == len(NOTES) - 1
+
+
+def test_view_all_notes_pages(store):
+    from service import app
+    client = app.test_client()
+    topics, after_topic = [], None
+    while True:
+        query = {"limit": 10} if after_topic is None else {"limit": 10, "after_topic": after_topic}
+        page = client.get('/view_all_notes', query_string=query).get_json()
+        topics.extend(page["notes"])
+        after_topic = page["next_after_topic"]
+        if after_topic is None:
+            break
+    assert topics == sorted(NOTES)
+
+
+def test_view_all_notes_streams_ndjson(store):
+    from service import app
+    response = app.test_client().get('/view_all_notes', query_string={"format": "ndjson", "after_topic": "scalar"})
+    assert response.mimetype == 'application/x-ndjson'
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [(line["topic"], line["points"]) for line in lines] == [item for item in sorted(NOTES.items())
+                                                                     if item[0] > "scalar"]
@@ -0,0 +1,60 @@
+import json
+import sqlite3
+
+import notes_store
+from notes_store import NotesStore
+
+# A notes.db from before any migration: one JSON blob per topic
+BASELINE_NOTES = {
+    "groceries": ["milk", "bread"],
+    "reminder": "call the bank",
+    "mixed": ["text", 3, {"done": True}, ["nested"]],
+    "empty": [],
+}
+
+
+def make_baseline(path):
+    conn = sqlite3.connect(path)
+    conn.execute('''CREATE TABLE IF NOT EXISTS notes (topic TEXT PRIMARY KEY, points TEXT)''')
+    conn.executemany("INSERT INTO notes (topic, points) VALUES (?, ?)",
+                     [(topic, json.dumps(points)) for topic, points in BASELINE_NOTES.items()])
+    conn.commit()
+    conn.close()
+
+
+def test_baseline_database_reads_back_unchanged(tmp_path):
+    path = str(tmp_path / 'notes.db')
+    make_baseline(path)
+    store = NotesStore(db_path=path, cache_size=0)
+    # Blobs are readable before and after the online migration explodes them
+    assert {topic: store.get_notes(topic) for topic in BASELINE_NOTES} == BASELINE_NOTES
+    store.create_table(migrate_in_background=False)
+    assert {topic: store.get_notes(topic) for topic in BASELINE_NOTES} == BASELINE_NOTES
+    assert store.get_all_notes() == BASELINE_NOTES
+    assert [result["topic"] for result in store.search_notes("bread")] == ["groceries"]
+    store.close()
+
+    conn = sqlite3.connect(path)
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == notes_store.SCHEMA_VERSION
+    # The search index was built once, on the current layout
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(notes_fts)")]
+    assert columns == ["topic", "point"]
+
+
+def test_search_survives_vacuum(tmp_path):
+    path = str(tmp_path / 'notes.db')
+    store = NotesStore(db_path=path, cache_size=0)
+    for index in range(50):
+        store.insert_or_update_notes(f"topic {index}", [f"point {index} alpha", f"point {index} beta"])
+    # Deleting from the middle leaves gaps that a VACUUM would close for implicit rowids
+    for index in range(0, 50, 3):
+        store.insert_or_update_notes(f"topic {index}", [f"replaced {index} gamma"])
+    with store.connection() as conn:
+        conn.execute("VACUUM")
+    assert store.get_notes("topic 10") == ["point 10 alpha", "point 10 beta"]
+    results = store.search_notes("gamma", limit=50)
+    assert len(results) == 17
+    assert all(result["matched_points"] == [f"replaced {result['topic'][6:]} gamma"] for result in results)
+    with store.connection() as conn:
+        assert conn.execute("INSERT INTO notes_fts(notes_fts, rank) VALUES ('integrity-check', 1)") is not None
+    store.close()
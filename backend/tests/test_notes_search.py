@@ -0,0 +1,95 @@
+import pytest
+
+import notes_store
+from notes_store import NotesStore, build_match_query
+
+NOTES = {
+    "groceries": ["milk", "brown bread", "oat milk"],
+    "garden project": ["plant tomatoes in march", "buy a watering can"],
+    "reading list": ["The Milkman by Anna Burns", {"title": "Dune", "done": False}],
+    "bread recipes": "sourdough starter needs feeding daily",
+}
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    # Also the process-wide store, for the routes and the assistant
+    store = NotesStore(db_path=str(tmp_path / 'notes.db'), cache_size=0)
+    for topic, points in NOTES.items():
+        store.insert_or_update_notes(topic, points)
+    monkeypatch.setattr(notes_store, "store", store)
+    yield store
+    store.close()
+
+
+def topics(results):
+    return [result["topic"] for result in results]
+
+
+def test_match_query_is_prefix_terms_or_a_phrase():
+    assert build_match_query("oat mil") == '"oat"* "mil"*'
+    assert build_match_query('"brown bread"') == '"brown bread"'
+    assert build_match_query("  ?! ") is None
+
+
+def test_terms_match_by_prefix_and_all_must_match(store):
+    assert set(topics(store.search_notes("milk"))) == {"groceries", "reading list"}
+    assert topics(store.search_notes("oat mil")) == ["groceries"]
+    assert store.search_notes("oat tomatoes") == []
+
+
+def test_phrase_search(store):
+    assert topics(store.search_notes('"brown bread"')) == ["groceries"]
+    assert store.search_notes('"bread brown"') == []
+
+
+def test_topic_matches_rank_first(store):
+    # "bread" is the topic of one note and a point of another
+    results = store.search_notes("bread")
+    assert topics(results) == ["bread recipes", "groceries"]
+    assert results[0]["score"] > results[1]["score"]
+
+
+def test_results_carry_the_note_and_the_matching_points(store):
+    result = store.search_notes("milk")[0]
+    assert result["points"] == NOTES[result["topic"]]
+    assert all("milk" in point.lower() for point in result["matched_points"])
+    assert "[" in result["snippet"] and "]" in result["snippet"]
+    # JSON points are indexed by their text too
+    assert topics(store.search_notes("dune")) == ["reading list"]
+
+
+def test_index_follows_writes(store):
+    store.insert_or_update_notes("groceries", ["eggs"])
+    assert topics(store.search_notes("milk")) == ["reading list"]
+    store.append_note_points("groceries", ["rye bread"])
+    assert "groceries" in topics(store.search_notes("rye"))
+    assert store.search_notes("eggs")[0]["points"] == ["eggs", "rye bread"]
+
+
+def test_limit(store):
+    for index in range(15):
+        store.insert_or_update_notes(f"trip {index}", ["pack the passport"])
+    assert len(store.search_notes("passport")) == 10
+    assert len(store.search_notes("passport", limit=3)) == 3
+
+
+def test_search_route(store):
+    from service import app
+    client = app.test_client()
+    body = client.get('/search_notes', query_string={"q": "water"}).get_json()
+    assert topics(body["results"]) == ["garden project"]
+    assert client.get('/search_notes', query_string={"q": "zebra"}).get_json()["results"] == []
+    assert client.get('/search_notes').get_json()["results"] == []
+
+
+def test_retrieve_falls_back_to_the_best_search_match(store):
+    import assistant
+    decision = {"action": "note", "note_action": "retrieve", "topic": "garden"}
+    assert assistant.respond_to_decision(decision, {}) == {"response": NOTES["garden project"],
+                                                           "topic": "garden project"}
+    # An exact topic wins over the search
+    decision["topic"] = "groceries"
+    assert assistant.respond_to_decision(decision, {}) == {"response": NOTES["groceries"]}
+    decision["topic"] = "holiday plans"
+    assert assistant.respond_to_decision(decision, {}) == {"response": "No note found for 'holiday plans'."}
@@ -0,0 +1,134 @@
+import io
+import json
+
+import pytest
+
+import notes_store
+from notes_jsonl import export_jsonl, parse_jsonl, new_error_log
+from notes_store import NotesStore
+
+NOTES = {
+    "groceries": ["milk", "bread"],
+    "reminder": "call the bank",
+    "reading list": ["Dune", {"title": "Piranesi", "done": True}],
+    "empty": [],
+}
+
+
+def make_store(tmp_path, name='notes.db'):
+    return NotesStore(db_path=str(tmp_path / name), cache_size=0)
+
+
+def jsonl(notes):
+    return "".join(json.dumps({"topic": topic, "points": points}) + "\n" for topic, points in notes)
+
+
+def check_index(store):
+    # Fails if notes_fts disagrees with the points it indexes
+    with store.connection() as conn:
+        conn.execute("INSERT INTO notes_fts (notes_fts, rank) VALUES ('integrity-check', 1)")
+        assert conn.execute("SELECT COUNT(*) FROM notes_fts_suspended").fetchone()[0] == 0
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = make_store(tmp_path)
+    yield store
+    store.close()
+
+
+def test_export_then_import_round_trips(store, tmp_path):
+    store.import_notes(NOTES.items())
+    exported = "".join(export_jsonl(store.iter_notes()))
+    assert len(exported.splitlines()) == len(NOTES)
+
+    copy = make_store(tmp_path, 'copy.db')
+    errors = new_error_log()
+    totals = copy.import_notes(parse_jsonl(io.StringIO(exported), errors), chunk_size=2)
+    assert copy.get_all_notes() == NOTES
+    assert (totals["notes"], totals["chunks"], errors["count"]) == (4, 2, 0)
+    copy.close()
+
+
+def test_upsert_replaces_points(store):
+    store.import_notes(NOTES.items())
+    store.import_notes([("groceries", ["eggs"]), ("reminder", ["pay rent", "call the bank"])])
+    assert store.get_notes("groceries") == ["eggs"]
+    assert store.get_notes("reminder") == ["pay rent", "call the bank"]
+    assert [result["topic"] for result in store.search_notes("milk")] == []
+    check_index(store)
+
+
+def test_merge_adds_only_new_points_and_is_idempotent(store):
+    store.import_notes(NOTES.items())
+    incoming = [("groceries", ["bread", "eggs"]), ("reminder", ["pay rent"]), ("new topic", ["first"]),
+                ("groceries", ["eggs", "butter"])]
+    assert store.import_notes(incoming, mode="merge")["points"] == 4
+    assert store.get_notes("groceries") == ["milk", "bread", "eggs", "butter"]
+    # A scalar note that gained points becomes a list
+    assert store.get_notes("reminder") == ["call the bank", "pay rent"]
+    assert store.get_notes("new topic") == ["first"]
+
+    assert store.import_notes(incoming, mode="merge")["points"] == 0
+    assert store.get_notes("groceries") == ["milk", "bread", "eggs", "butter"]
+    check_index(store)
+
+
+def test_unknown_mode_is_rejected(store):
+    with pytest.raises(ValueError):
+        store.import_notes(NOTES.items(), mode="replace")
+
+
+def test_bad_lines_are_skipped_and_reported():
+    lines = ['{"topic": "ok", "points": ["a"]}', 'not json', '', '{"topic": "", "points": []}',
+             '{"points": ["no topic"]}', '{"topic": "null points", "points": null}']
+    errors = new_error_log()
+    assert list(parse_jsonl(lines, errors)) == [("ok", ["a"])]
+    assert errors["count"] == 4
+    assert [error["line"] for error in errors["first"]] == [2, 4, 5, 6]
+
+
+def test_bulk_import_indexes_points_once(store):
+    # Points go in with the per-row FTS trigger suspended and are indexed in one pass after
+    store.insert_or_update_notes("before", ["written one at a time"])
+    store.import_notes((f"topic {index}", [f"alpha {index}", f"beta {index}"]) for index in range(50))
+    check_index(store)
+    assert len(store.search_notes("alpha", limit=100)) == 50
+    assert store.search_notes("alpha 7")[0]["matched_points"] == ["alpha 7"]
+
+    # The trigger is back on for ordinary writes
+    store.append_note_points("topic 7", ["gamma"])
+    assert [result["topic"] for result in store.search_notes("gamma")] == ["topic 7"]
+    check_index(store)
+
+
+def test_reimport_after_deletes_keeps_the_index_in_step(store):
+    # Replacing points frees ids that the next batch may reuse
+    for batch in range(3):
+        store.import_notes((f"topic {index}", [f"round{batch} {index}"]) for index in range(20))
+        check_index(store)
+    assert store.search_notes("round0") == [] and store.search_notes("round1") == []
+    assert len(store.search_notes("round2", limit=50)) == 20
+
+
+def test_export_and_import_routes(store, monkeypatch):
+    from service import app
+    monkeypatch.setattr(notes_store, "store", store)
+    client = app.test_client()
+
+    body = jsonl(NOTES.items()) + "oops\n"
+    result = client.post('/notes/import', data=body, query_string={"chunk_size": 3}).get_json()
+    assert (result["notes"], result["chunks"], result["skipped"]) == (4, 2, 1)
+    assert result["errors"] == [{"line": 5, "error": result["errors"][0]["error"]}]
+
+    merged = client.post('/notes/import', data=jsonl([("groceries", ["eggs"])]),
+                         query_string={"mode": "merge"}).get_json()
+    assert merged["points"] == 1
+    assert client.post('/notes/import', data="", query_string={"mode": "bogus"}).status_code == 400
+
+    response = client.get('/notes/export')
+    assert response.headers["Content-Disposition"] == 'attachment; filename="notes.jsonl"'
+    exported = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert {line["topic"]: line["points"] for line in exported} == dict(NOTES, groceries=["milk", "bread", "eggs"])
+    resumed = client.get('/notes/export', query_string={"after_topic": "groceries"}).get_data(as_text=True)
+    assert [json.loads(line)["topic"] for line in resumed.splitlines()] == ["reading list", "reminder"]
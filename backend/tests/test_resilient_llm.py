@@ -0,0 +1,240 @@
+import time
+import asyncio
+import itertools
+import threading
+
+import pytest
+
+from fake_llm import FakeChatModel, FakeResponse
+from resilient_llm import LLMTimeout, LLMUnavailable, ResilientChatModel
+
+
+def slow_first(seconds, content="answer"):
+    # A response for FakeChatModel whose first call takes `seconds` longer than the rest
+    calls = itertools.count()
+
+    def respond(prompt):
+        if next(calls) == 0:
+            time.sleep(seconds)
+        return content
+    return respond
+
+
+def stream_text(model, prompt, use_async=False, **kwargs):
+    if not use_async:
+        return "".join(chunk.content for chunk in model.stream(prompt, **kwargs))
+
+    async def collect():
+        return "".join([chunk.content async for chunk in model.astream(prompt, **kwargs)])
+    return asyncio.run(collect())
+
+
+def test_deadline_raises_without_waiting_for_the_model():
+    slow = FakeChatModel(latency=1.0)
+    model = ResilientChatModel([("pro", slow)], deadlines={"intent": 0.1}, hedge=False)
+    start = time.perf_counter()
+    with pytest.raises(LLMTimeout):
+        model.invoke("hi", prompt_type="intent")
+    assert time.perf_counter() - start < 0.5
+    assert model.stats()["timeouts"] == 1
+
+
+def test_hedge_answers_when_the_first_attempt_is_slow():
+    fake = FakeChatModel(latency=0.0, responses=[(r".*", slow_first(1.0))])
+    model = ResilientChatModel([("pro", fake)], default_hedge_delay=0.05)
+    start = time.perf_counter()
+    assert model.invoke("hi", prompt_type="chat").content == "answer"
+    assert time.perf_counter() - start < 0.5
+    stats = model.stats()
+    assert (stats["hedges_fired"], stats["hedges_won"]) == (1, 1)
+
+
+def test_attempts_still_queued_at_the_deadline_never_reach_the_model():
+    # One worker: the hedge waits behind the slow first attempt until the deadline passes
+    slow = FakeChatModel(latency=0.4)
+    model = ResilientChatModel([("pro", slow)], deadlines={"intent": 0.15}, default_hedge_delay=0.05, pool_size=1)
+    with pytest.raises(LLMTimeout):
+        model.invoke("hi", prompt_type="intent")
+    assert model.stats()["hedges_fired"] == 1
+    time.sleep(0.6)
+    assert slow.calls == 1
+    # The dropped hedge is not a timeout against the tier; the attempt that ran is
+    assert model.tiers[0].breaker._outcomes.count(False) == 1
+
+
+def test_hedges_are_capped_by_ratio():
+    fake = FakeChatModel(latency=0.1)
+    model = ResilientChatModel([("pro", fake)], default_hedge_delay=0.01, max_hedge_ratio=0.25)
+    for _ in range(8):
+        model.invoke("hi", prompt_type="chat")
+    assert model.stats()["hedges_fired"] == 2
+
+
+def test_breaker_opens_falls_back_and_closes_after_a_trial():
+    pro = FakeChatModel(latency=0.0, failure_rate=1.0, default_response="pro")
+    flash = FakeChatModel(latency=0.0, default_response="flash")
+    model = ResilientChatModel([("pro", pro), ("flash", flash)], hedge=False,
+                               breaker_options={"min_calls": 2, "cooldown": 0.1})
+    breaker = model.tiers[0].breaker
+
+    assert [model.invoke("hi").content for _ in range(2)] == ["flash", "flash"]
+    assert breaker.state == "open"
+    # While open, pro is skipped altogether
+    model.invoke("hi")
+    assert pro.calls == 2
+
+    # After the cooldown one trial call goes through; a failure opens the breaker again
+    time.sleep(0.15)
+    assert model.invoke("hi").content == "flash"
+    assert pro.calls == 3 and breaker.state == "open"
+
+    time.sleep(0.15)
+    pro.failure_rate = 0.0
+    assert model.invoke("hi").content == "pro"
+    assert breaker.state == "closed"
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_timeout_fails_over_with_the_time_left(use_async):
+    slow = FakeChatModel(latency=1.0, default_response="pro")
+    fast = FakeChatModel(latency=0.0, default_response="flash")
+    model = ResilientChatModel([("pro", slow), ("flash", fast)], deadlines={"intent": 0.3}, hedge=False,
+                               breaker_options={"min_calls": 2, "cooldown": 60})
+    invoke = (lambda: asyncio.run(model.ainvoke("hi", prompt_type="intent"))) if use_async else \
+        (lambda: model.invoke("hi", prompt_type="intent"))
+    for _ in range(2):
+        start = time.perf_counter()
+        assert invoke().content == "flash"
+        assert time.perf_counter() - start < 0.5
+    # Both timeouts counted as they fired, while the abandoned pro calls are still running
+    assert model.tiers[0].breaker.state == "open"
+    assert model.stats()["timeouts"] == 2 and model.stats()["unavailable"] == 0
+    invoke()
+    assert slow.calls == 2
+
+
+def test_last_tier_timing_out_raises_llm_timeout():
+    slow = FakeChatModel(latency=1.0)
+    model = ResilientChatModel([("pro", slow), ("flash", slow)], deadlines={"intent": 0.2}, hedge=False)
+    start = time.perf_counter()
+    with pytest.raises(LLMTimeout):
+        model.invoke("hi", prompt_type="intent")
+    assert time.perf_counter() - start < 0.4
+    assert model.stats()["timeouts"] == 2 and model.stats()["unavailable"] == 1
+
+
+def test_every_tier_failing_is_unavailable():
+    broken = FakeChatModel(latency=0.0, failure_rate=1.0)
+    model = ResilientChatModel([("pro", broken), ("flash", broken)], hedge=False)
+    with pytest.raises(LLMUnavailable):
+        model.invoke("hi")
+    assert model.stats()["unavailable"] == 1
+
+
+class StallingModel:
+    # Streams `chunks`, then never sends another until release() (or the test ends)
+    def __init__(self, chunks=()):
+        self.chunks = list(chunks)
+        self.calls = 0
+        self._released = threading.Event()
+
+    def release(self):
+        self._released.set()
+
+    def stream(self, prompt, **kwargs):
+        self.calls += 1
+        yield from (FakeResponse(text) for text in self.chunks)
+        self._released.wait(5)
+
+    async def astream(self, prompt, **kwargs):
+        self.calls += 1
+        for text in self.chunks:
+            yield FakeResponse(text)
+        while not self._released.is_set():
+            await asyncio.sleep(0.01)
+
+
+@pytest.fixture
+def stalled():
+    model = StallingModel()
+    yield model
+    model.release()
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_stream_without_a_first_chunk_fails_over_and_opens_the_breaker(stalled, use_async):
+    fast = FakeChatModel(latency=0.0, default_response="a streamed answer")
+    model = ResilientChatModel([("pro", stalled), ("flash", fast)], deadlines={"chat": 0.5},
+                               breaker_options={"min_calls": 2, "cooldown": 60})
+    for _ in range(2):
+        assert stream_text(model, "hi", use_async) == "a streamed answer"
+    # Both timeouts counted against pro, so the next stream skips it
+    assert model.tiers[0].breaker.state == "open"
+    assert model.stats()["timeouts"] == 2 and model.stats()["unavailable"] == 0
+    assert stream_text(model, "hi", use_async) == "a streamed answer"
+    assert stalled.calls == 2
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_stream_without_any_first_chunk_raises_llm_timeout(stalled, use_async):
+    model = ResilientChatModel([("pro", stalled)], deadlines={"chat": 0.1})
+    with pytest.raises(LLMTimeout):
+        stream_text(model, "hi", use_async)
+    assert model.stats()["unavailable"] == 1
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_slow_reader_gets_the_whole_stream_past_the_deadline(use_async):
+    fast = FakeChatModel(latency=0.0, default_response="a long streamed answer", stream_chunk_size=4)
+    model = ResilientChatModel([("pro", fast)], deadlines={"chat": 0.05}, stream_idle_timeout=0.05,
+                               breaker_options={"min_calls": 1})
+
+    def read_slowly(chunks):
+        for chunk in chunks:
+            time.sleep(0.03)  # waiting at yield counts toward neither the deadline nor the idle timeout
+            yield chunk.content
+
+    if use_async:
+        async def collect():
+            text = []
+            async for chunk in model.astream("hi"):
+                await asyncio.sleep(0.03)
+                text.append(chunk.content)
+            return "".join(text)
+        text = asyncio.run(collect())
+    else:
+        text = "".join(read_slowly(model.stream("hi")))
+    assert text == "a long streamed answer"
+    assert model.stats()["timeouts"] == 0 and model.tiers[0].breaker.state == "closed"
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_stall_after_the_first_chunk_is_not_held_against_the_tier(use_async):
+    stalling = StallingModel(["partial "])
+    model = ResilientChatModel([("pro", stalling)], stream_idle_timeout=0.1, breaker_options={"min_calls": 1})
+    received = []
+
+    async def acollect():
+        async for chunk in model.astream("hi"):
+            received.append(chunk.content)
+
+    try:
+        with pytest.raises(LLMTimeout):
+            if use_async:
+                asyncio.run(acollect())
+            else:
+                received.extend(chunk.content for chunk in model.stream("hi"))
+    finally:
+        stalling.release()
+    assert received == ["partial "]
+    assert model.tiers[0].breaker.state == "closed"
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_stream_falls_through_before_the_first_chunk(use_async):
+    broken = FakeChatModel(latency=0.0, failure_rate=1.0)
+    fast = FakeChatModel(latency=0.0, default_response="from flash")
+    model = ResilientChatModel([("pro", broken), ("flash", fast)], breaker_options={"min_calls": 1})
+    assert stream_text(model, "hi", use_async) == "from flash"
+    assert model.tiers[0].breaker.state == "open"
+    assert model.tiers[1].breaker.state == "closed"
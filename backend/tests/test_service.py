@@ -0,0 +1,27 @@
+from flask import Flask
+
+import service
+from assistant import assistant_api
+from calendar_api import calendar_api
+from notes_api import notes_api
+from schedule_api import schedule_api
+
+
+def rules(app):
+    return {(rule.rule, method) for rule in app.url_map.iter_rules() if rule.endpoint != 'static'
+            for method in rule.methods - {"HEAD", "OPTIONS"}}
+
+
+def test_create_app_mounts_every_blueprint_route():
+    app = service.create_app()
+    served = rules(app)
+    for blueprint in (notes_api, schedule_api, calendar_api, assistant_api):
+        alone = Flask(__name__)
+        alone.register_blueprint(blueprint)
+        assert rules(alone) <= served, blueprint.name
+    assert {("/assistant/stream", "POST"), ("/assistant/stats", "GET"), ("/metrics", "GET")} <= served
+
+
+def test_create_app_answers_the_stats_route():
+    response = service.create_app().test_client().get('/assistant/stats')
+    assert response.status_code == 200 and "llm_cache" in response.get_json()
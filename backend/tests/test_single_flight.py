@@ -0,0 +1,183 @@
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from fake_llm import FakeChatModel
+from single_flight import SingleFlight
+
+CALLERS = 16
+# Misses the local fast path, so classification needs the model
+MESSAGE = "remind me what we decided about the garden project"
+ANALYSIS = '{"action": "note", "note_action": "retrieve", "topic": "garden project"}'
+
+
+def concurrently(n, fn):
+    barrier = threading.Barrier(n)
+
+    def run(index):
+        barrier.wait()
+        try:
+            return fn(index)
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=n) as executor:
+        return list(executor.map(run, range(n)))
+
+
+def test_identical_calls_share_one_run():
+    flight = SingleFlight("test")
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.1)
+        return "answer"
+
+    results = concurrently(CALLERS, lambda _: flight.do("key", fetch))
+    assert len(calls) == 1
+    assert {result for result, _ in results} == {"answer"}
+    assert sum(shared for _, shared in results) == CALLERS - 1
+
+
+def test_different_keys_run_separately():
+    flight = SingleFlight("test")
+    calls = []
+
+    def fetch(key):
+        calls.append(key)
+        time.sleep(0.05)
+        return key
+
+    results = concurrently(4, lambda index: flight.do(index % 2, lambda: fetch(index % 2)))
+    assert sorted(set(calls)) == [0, 1] and len(calls) == 2
+    assert [result for result, _ in results] == [0, 1, 0, 1]
+
+
+def test_error_reaches_every_waiter_and_is_not_kept():
+    flight = SingleFlight("test")
+    calls = []
+    error = ValueError("boom")
+
+    def fail():
+        calls.append(1)
+        time.sleep(0.1)
+        raise error
+
+    results = concurrently(CALLERS, lambda _: flight.do("key", fail))
+    assert len(calls) == 1 and all(result is error for result in results)
+    assert flight.do("key", lambda: "fresh") == ("fresh", False)
+
+
+def test_async_callers_share_one_run():
+    flight = SingleFlight("test")
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        return "answer"
+
+    async def run():
+        return await asyncio.gather(*(flight.ado("key", fetch) for _ in range(CALLERS)))
+
+    results = asyncio.run(run())
+    assert len(calls) == 1 and {result for result, _ in results} == {"answer"}
+
+
+def test_followers_get_the_result_when_the_leader_is_cancelled():
+    flight = SingleFlight("test")
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        return "answer"
+
+    async def run():
+        leader = asyncio.ensure_future(flight.ado("key", fetch))
+        await asyncio.sleep(0)
+        followers = [asyncio.ensure_future(flight.ado("key", fetch)) for _ in range(3)]
+        await asyncio.sleep(0.02)
+        # The leader's client goes away
+        leader.cancel()
+        results = await asyncio.gather(*followers)
+        return leader, results
+
+    leader, results = asyncio.run(run())
+    assert leader.cancelled()
+    assert len(calls) == 1 and results == [("answer", True)] * 3
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_async_error_reaches_every_caller():
+    flight = SingleFlight("test")
+    error = ValueError("boom")
+
+    async def fail():
+        await asyncio.sleep(0.05)
+        raise error
+
+    async def run():
+        return await asyncio.gather(*(flight.ado("key", fail) for _ in range(4)), return_exceptions=True)
+
+    assert all(result is error for result in asyncio.run(run()))
+
+
+def test_identical_assistant_requests_make_one_model_call(monkeypatch):
+    import assistant
+    import llm_client
+    from service import app
+    assert assistant.intent_classifier.classify(MESSAGE) is None, "message must miss the fast path"
+    fake = FakeChatModel(latency=0.2, responses=[(r"Analyze the user's message", ANALYSIS)])
+    monkeypatch.setattr(assistant, "model", fake)
+    monkeypatch.setattr(llm_client.cached_model, "model", fake)
+    llm_client.cached_model.clear()
+
+    responses = concurrently(CALLERS, lambda _: app.test_client().post('/assistant', json={"message": MESSAGE}).get_json())
+    assert fake.calls == 1
+    assert all(response == responses[0] for response in responses)
+
+
+def test_identical_note_lookups_make_one_read(tmp_path):
+    from notes_store import NotesStore
+    # Without the read cache, so every lookup reaches the read being coalesced
+    store = NotesStore(db_path=str(tmp_path / 'notes.db'), cache_size=0)
+    store.insert_or_update_notes("garden project", ["plant tomatoes"])
+    read = store._read_notes
+    reads = []
+
+    def slow_read(topic):
+        reads.append(topic)
+        time.sleep(0.1)
+        return read(topic)
+
+    store._read_notes = slow_read
+    results = concurrently(CALLERS, lambda _: store.get_notes("garden project"))
+    assert len(reads) == 1 and all(result == ["plant tomatoes"] for result in results)
+
+
+def test_lookup_after_a_write_does_not_share_an_older_read(tmp_path):
+    from notes_store import NotesStore
+    store = NotesStore(db_path=str(tmp_path / 'notes.db'), cache_size=0)
+    store.insert_or_update_notes("garden project", ["plant tomatoes"])
+    read = store._read_notes
+    started, release = threading.Event(), threading.Event()
+
+    def blocked_read(topic):
+        value = read(topic)
+        if not started.is_set():
+            started.set()
+            release.wait()
+        return value
+
+    store._read_notes = blocked_read
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        before = executor.submit(store.get_notes, "garden project")
+        started.wait()
+        store.insert_or_update_notes("garden project", ["plant peppers"])
+        after = store.get_notes("garden project")
+        release.set()
+        assert before.result() == ["plant tomatoes"]
+        assert after == ["plant peppers"]
@@ -0,0 +1,117 @@
+import numpy as np
+import pytest
+
+from speech_pipeline import EnergyVAD, Resampler, RingBuffer, SpeechPipeline, UtteranceSegmenter, SAMPLE_RATE
+
+
+def tone(seconds, rate, frequency=440.0, amplitude=0.5):
+    return amplitude * np.sin(2 * np.pi * frequency * np.arange(int(seconds * rate)) / rate)
+
+
+def test_ring_buffer_wraps_around():
+    ring = RingBuffer(8)
+    ring.write(np.arange(6, dtype=np.int16))
+    assert ring.read(4).tolist() == [0, 1, 2, 3]
+    # 2 left at the end, then 5 more written across the wrap
+    ring.write(np.arange(6, 11, dtype=np.int16))
+    assert ring.read(8) is None
+    assert ring.read(7).tolist() == [4, 5, 6, 7, 8, 9, 10]
+    assert ring.size == 0 and ring.overwritten == 0
+
+
+def test_ring_buffer_overwrites_the_oldest_samples():
+    ring = RingBuffer(8)
+    ring.write(np.arange(6, dtype=np.int16))
+    ring.write(np.arange(6, 10, dtype=np.int16))
+    assert ring.overwritten == 2
+    assert ring.drain().tolist() == [2, 3, 4, 5, 6, 7, 8, 9]
+    # One write bigger than the whole ring keeps its newest samples
+    ring.write(np.arange(20, dtype=np.int16))
+    assert ring.overwritten == 2 + 12
+    assert ring.drain().tolist() == list(range(12, 20))
+
+
+def test_resampler_keeps_a_sine_across_chunks():
+    # 48 kHz in 20 ms WebRTC frames down to 16 kHz
+    samples = tone(1.0, 48000).astype(np.float32)
+    resampler = Resampler()
+    out = np.concatenate([resampler.process(samples[start:start + 960], 48000)
+                          for start in range(0, len(samples), 960)])
+    assert abs(len(out) - SAMPLE_RATE) <= 1
+    # Output sample i is input sample 3i, delayed by the box filter's one-sample centre
+    expected = 0.5 * np.sin(2 * np.pi * 440.0 * (3 * np.arange(len(out)) + 1) / 48000)
+    assert np.abs(out - expected).max() < 0.005
+
+
+def test_resampler_passes_the_target_rate_through():
+    samples = np.ones(160, dtype=np.float32)
+    assert Resampler().process(samples, SAMPLE_RATE) is samples
+
+
+class LoudVAD:
+    # Any non-zero frame is speech
+    def is_speech(self, frame):
+        return bool(frame.any())
+
+
+def frames(kind, count, size=480):
+    return [np.full(size, 1000 if kind == "speech" else 0, dtype=np.int16) for _ in range(count)]
+
+
+@pytest.fixture
+def segmenter():
+    # 30 ms frames: speech starts after 3 speech frames and ends after 20 silent ones
+    return UtteranceSegmenter(LoudVAD(), frame_ms=30, pre_roll_ms=300, start_ms=90, hangover_ms=600,
+                              min_speech_ms=250)
+
+
+def push_all(segmenter, stream):
+    return [utterance for utterance in map(segmenter.push, stream) if utterance is not None]
+
+
+def test_segmenter_starts_after_the_start_frames_with_pre_roll(segmenter):
+    assert push_all(segmenter, frames("silence", 5) + frames("speech", 2)) == []
+    assert segmenter.frames is None
+    segmenter.push(frames("speech", 1)[0])
+    # The pre-roll keeps the silence just before the speech too
+    assert len(segmenter.frames) == 8
+
+
+def test_segmenter_ends_after_the_hangover(segmenter):
+    push_all(segmenter, frames("silence", 5) + frames("speech", 12))
+    assert push_all(segmenter, frames("silence", 19)) == []
+    [utterance] = push_all(segmenter, frames("silence", 1))
+    # The 5 silent frames came in with the pre-roll; the speech, then the whole hangover
+    assert len(utterance) == (5 + 12 + 20) * 480
+    assert segmenter.frames is None
+
+
+def test_segmenter_drops_bursts_shorter_than_min_speech(segmenter):
+    assert push_all(segmenter, frames("speech", 4) + frames("silence", 20)) == []
+
+
+class FakeRecognizer:
+    def __init__(self):
+        self.utterances = []
+
+    def transcribe(self, pcm, sample_rate=SAMPLE_RATE):
+        self.utterances.append(len(pcm) // 2)
+        return "hello"
+
+
+def test_pipeline_turns_one_tone_into_one_utterance():
+    recognizer = FakeRecognizer()
+    pipeline = SpeechPipeline(recognizer, vad=EnergyVAD()).start()
+    audio = np.concatenate([np.zeros(24000), tone(1.0, 48000), np.zeros(48000)])
+    pcm = (audio * 32767).astype(np.int16)
+    # 20 ms stereo frames at 48 kHz, packed (1, n * channels) like av delivers them
+    stereo = np.repeat(pcm, 2)
+    for start in range(0, len(stereo), 1920):
+        pipeline.feed(stereo[start:start + 1920].reshape(1, -1), 48000, channels=2)
+    pipeline.stop(timeout=10)
+
+    [transcript] = pipeline.get_transcripts()
+    assert transcript["text"] == "hello"
+    # The tone plus pre-roll and hangover, well under the 2.5 s fed in
+    assert 1.0 <= transcript["duration"] < 2.0
+    assert pipeline.stats["utterances"] == 1 and pipeline.stats["dropped_frames"] == 0
@@ -0,0 +1,35 @@
+import json
+from datetime import datetime
+
+import pytest
+
+from bench_time_parser import CORPUS, simplify
+from time_parser import MAX_DURATION_MINUTES, parse_events
+
+# The labeled corpus behind bench_time_parser.py: every case must come back exactly as labeled,
+# and a message labeled null must be left to the LLM
+with open(CORPUS) as f:
+    corpus = json.load(f)
+NOW = datetime.fromisoformat(corpus["now"])
+
+
+@pytest.mark.parametrize("case", corpus["cases"], ids=[case["message"] for case in corpus["cases"]])
+def test_corpus_case(case):
+    assert simplify(parse_events(case["message"], now=NOW)) == case["events"]
+
+
+@pytest.mark.parametrize("duration, resolved", [
+    ("for 0 minutes", False),
+    (f"for {MAX_DURATION_MINUTES} minutes", True),
+    (f"for {MAX_DURATION_MINUTES + 1} minutes", False),
+    ("for a week", False),
+    ("for 45 seconds", False),
+])
+def test_durations_outside_one_day_go_to_the_llm(duration, resolved):
+    events = parse_events(f"review tomorrow at 9am {duration}", now=NOW)
+    assert (events is not None) == resolved
+
+
+@pytest.mark.parametrize("message", ["meeting tomorrow at 13pm", "meeting tomorrow at 0am", "meeting tomorrow 3-13pm"])
+def test_hours_past_twelve_with_am_pm_go_to_the_llm(message):
+    assert parse_events(message, now=NOW) is None
@@ -0,0 +1,473 @@
+import re
+from datetime import datetime, date, timedelta
+import pytz
+
+from metrics import registry
+
+# Rule-based parser for the date/time part of scheduling messages ("meeting with Raj tomorrow
+# 5pm for 30 min", "standup 9am, review 2-3pm on friday"). It resolves relative days, weekdays,
+# calendar dates, clock times, ranges and durations against the current time in Asia/Kolkata
+# and returns naive local datetimes.
+#
+# It only answers when it can resolve the whole message: anything vague ("next week",
+# "sometime", recurring events), a missing time of day, two competing dates/times, a bare
+# 8-11 that could be morning or evening, or a date word or duration it could not place
+# ("the 3rd", "last friday", "for a week") returns None, and the caller falls back to the LLM.
+# Events listed in one message all go on the same day.
+
+india_tz = pytz.timezone('Asia/Kolkata')
+DEFAULT_DURATION_MINUTES = 60
+# Longer than this is an all-day or multi-day event, which the LLM handles
+MAX_DURATION_MINUTES = 12 * 60
+# Hour used when the message names a part of the day but no clock time
+PART_OF_DAY_HOURS = {"morning": 9, "afternoon": 14, "evening": 18, "night": 20}
+
+WEEKDAYS = {"monday": 0, "tuesday": 1, "wednesday": 2, "thursday": 3, "friday": 4, "saturday": 5, "sunday": 6}
+WEEKDAY_ABBREVIATIONS = {"mon": 0, "tue": 1, "tues": 1, "wed": 2, "thu": 3, "thur": 3, "thurs": 3, "fri": 4,
+                         "sat": 5, "sun": 6}
+MONTHS = {"january": 1, "jan": 1, "february": 2, "feb": 2, "march": 3, "mar": 3, "april": 4, "apr": 4, "may": 5,
+          "june": 6, "jun": 6, "july": 7, "jul": 7, "august": 8, "aug": 8, "september": 9, "sept": 9, "sep": 9,
+          "october": 10, "oct": 10, "november": 11, "nov": 11, "december": 12, "dec": 12}
+NUMBER_WORDS = {"a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7,
+                "eight": 8, "nine": 9, "ten": 10}
+
+PARSES = registry.counter("time_parser_total", "Scheduling messages by time parser outcome.", ["outcome"])
+
+# ---------- Grammar ----------
+def _alternation(words):
+    return "|".join(sorted(words, key=len, reverse=True))
+
+AMPM = r"(?P<{0}>a\.?m\.?|p\.?m\.?)"
+NUMBER = rf"(?:\d+(?:\.\d+)?|{_alternation(NUMBER_WORDS)})"
+END = r"(?![\w:])"
+
+# Dates and times the parser will not guess at
+VAGUE_PATTERN = re.compile(r"\b(?:(?:next|this|coming)\s+(?:week|month|year)|weekends?|sometime|someday|later|soon|"
+                           r"asap|eod|eow|end\s+of|every|each|daily|weekly|monthly|fortnight(?:ly)?|"
+                           r"biweekly|morning\s+or|or\s+(?:the\s+)?(?:morning|afternoon|evening)|tbd)\b"
+                           # Another time zone: the LLM can convert, the parser cannot
+                           r"|\b(?:pst|pdt|est|edt|cst|cdt|mst|gmt|utc|bst|cet|cest|aest|jst|sgt)\b")
+
+RELATIVE_DAY_PATTERN = re.compile(r"\b(?:on\s+)?(?P<day>(?:the\s+)?day\s+after\s+(?:tomorrow|tmrw|tmr)|tomorrow|tmrw|tmr|"
+                                  r"today|tonight)\b")
+RELATIVE_DAYS = {"tomorrow": 1, "tmrw": 1, "tmr": 1, "today": 0, "tonight": 0}
+IN_DAYS_PATTERN = re.compile(rf"\b(?:in\s+)(?P<count>{NUMBER})\s+(?P<unit>days?|weeks?)\b")
+WEEKDAY_PATTERN = re.compile(rf"\b(?:(?:on\s+)?(?P<rel>this|next|coming)\s+|on\s+)?(?P<weekday>{_alternation(WEEKDAYS)})\b"
+                             rf"|\b(?:(?:on\s+)?(?P<rel2>this|next|coming)\s+|on\s+)(?P<abbr>{_alternation(WEEKDAY_ABBREVIATIONS)})\b")
+ISO_DATE_PATTERN = re.compile(r"\b(?:on\s+)?(?P<year>\d{4})-(?P<month>\d{1,2})-(?P<day>\d{1,2})\b")
+NUMERIC_DATE_PATTERN = re.compile(r"\b(?:on\s+)?(?P<day>\d{1,2})/(?P<month>\d{1,2})(?:/(?P<year>\d{2}|\d{4}))?\b"
+                                  r"(?!\s*(?:hours?|hrs?))")
+DAY_MONTH_PATTERN = re.compile(rf"\b(?:on\s+)?(?:the\s+)?(?P<day>\d{{1,2}})(?:st|nd|rd|th)?\s+(?:of\s+)?"
+                               rf"(?P<month>{_alternation(MONTHS)})\b(?:,?\s+(?P<year>\d{{4}}))?")
+MONTH_DAY_PATTERN = re.compile(rf"\b(?:on\s+)?(?P<month>{_alternation(MONTHS)})\s+(?P<day>\d{{1,2}})(?:st|nd|rd|th)?"
+                               rf"(?!\s*(?:am|pm|a\.m|p\.m|:|\.\d|o'?\s*clock))\b(?:,?\s+(?P<year>\d{{4}}))?")
+
+RELATIVE_TIME_PATTERN = re.compile(rf"\bin\s+(?:(?P<half>half\s+an?\s+hour)|(?P<count>{NUMBER})\s*"
+                                   rf"(?P<unit>minutes?|mins?|hours?|hrs?))\b")
+RANGE_PATTERN = re.compile(r"\b(?P<prefix>from\s+|between\s+)?(?P<hour1>\d{1,2})(?:[:.](?P<minute1>\d{2}))?\s*"
+                           + AMPM.format("ampm1") + r"?\s*(?P<sep>-|–|to|till|until|and)\s*"
+                           r"(?P<hour2>\d{1,2})(?:[:.](?P<minute2>\d{2}))?\s*" + AMPM.format("ampm2") + r"?" + END)
+CLOCK_PATTERN = re.compile(r"(?:(?P<at>\bat|@|\bby)\s*)?\b(?P<hour>\d{1,2})(?:[:.](?P<minute>\d{2}))?\s*"
+                           r"(?:" + AMPM.format("ampm") + r"|(?P<oclock>o'?\s*clock))?(?:\s+ist)?" + END)
+WORD_TIME_PATTERN = re.compile(r"\b(?:at\s+)?(?:(?P<noon>noon|midday|midnight)|(?P<part>half|quarter)\s+(?P<rel>past|to)\s+"
+                               r"(?P<hour>\d{1,2})(?:\s*" + AMPM.format("ampm") + r")?)" + END)
+PART_OF_DAY_PATTERN = re.compile(r"\b(?P<prefix>in\s+the\s+|this\s+|at\s+)?(?P<part>morning|afternoon|evening|night)\b")
+
+DURATION_PATTERN = re.compile(rf"\bfor\s+(?:(?P<half>half\s+an?\s+hour)|(?P<count>{NUMBER})\s*"
+                              r"(?P<unit>minutes?|mins?|m|hours?|hrs?|hr|h)"
+                              r"(?:\s*(?:and\s+)?(?P<count2>\d+)\s*(?:minutes?|mins?|m))?)\b")
+LENGTH_PATTERN = re.compile(r"\b(?P<count>\d+(?:\.\d+)?)[\s-]?(?P<unit>minutes?|mins?|hours?|hrs?|hr)\b")
+
+SEPARATOR_PATTERN = re.compile(r"\s*(?:[,;]|\bthen\b|\band\b|\balso\b)\s*")
+TONIGHT_PATTERN = re.compile(r"\btonight\b")
+# Words that settle whether a bare "at 8" is morning or evening
+PM_HINT_PATTERN = re.compile(r"\b(?:dinner|supper|drinks|party|movie|concert|date\s+night|pub|bar)\b")
+AM_HINT_PATTERN = re.compile(r"\b(?:breakfast|brunch|standup|stand-up|morning)\b")
+# A clock time, or a number left next to a separator, still in a title once the parsed times
+# are taken out ("meeting at 5 and 6"); words like "night" can be part of a title
+STRAY_TIME_PATTERN = re.compile(r"\d\s*(?:a\.?m|p\.?m)\b|\d[:.]\d{2}\b|\bat\s+\d|"
+                                r"(?:[,;]|\b(?:and|or|then|also)\b)\s*\d{1,2}\s*(?:[,;]|\b(?:and|or)\b|$)")
+# A date, a date modifier or a duration still in the text once the parsed ones are taken out
+# ("on the 3rd", "last", "in july", "for a week"): the parse would book the wrong day
+STRAY_DATE_PATTERN = re.compile(rf"\b\d{{1,2}}(?:st|nd|rd|th)\b|\b(?:on|the|by|until|till|before|after)\s+\d{{1,2}}\b|"
+                                rf"\b(?:{_alternation(set(MONTHS) - {'may'})}|{_alternation(WEEKDAYS)}|"
+                                rf"{_alternation(WEEKDAY_ABBREVIATIONS)}|yesterday|last|next|previous|weeks?)\b|"
+                                rf"\b(?:in|of|on|by|until|till|early|late|mid)\s+may\b|"
+                                rf"\b(?:{NUMBER}|few|several|couple\s+of)\s*(?:seconds?|secs?|minutes?|mins?|"
+                                rf"hours?|hrs?|days?|nights?|weeks?|months?|years?)\b")
+HAS_TIME_PATTERN = re.compile(r"\d\s*(?:a\.?m|p\.?m)\b|\d[:.]\d{2}\b|\bat\s+\d|\bnoon\b|\bmidday\b|\bmidnight\b|"
+                              r"o'?\s*clock|\b(?:half|quarter)\s+(?:past|to)\b|\bmorning\b|\bafternoon\b|\bevening\b|"
+                              r"\bnight\b|\btonight\b|\bin\s+\S+\s+(?:minutes?|mins?|hours?|hrs?)\b")
+
+
+def _number(value):
+    return NUMBER_WORDS[value] if value in NUMBER_WORDS else float(value)
+
+
+def _minutes(count, unit):
+    return round(_number(count) * (60 if unit.startswith('h') else 1))
+
+
+def _mask(text, span):
+    # Blank out a match so later patterns cannot claim the same words; offsets stay put
+    start, end = span
+    return text[:start] + " " * (end - start) + text[end:]
+
+
+def local_now(now=None):
+    now = now or datetime.now(india_tz)
+    if now.tzinfo is not None:
+        now = now.astimezone(india_tz).replace(tzinfo=None)
+    return now.replace(second=0, microsecond=0)
+
+
+def resolve_hour(hour, ampm=None, part=None):
+    if ampm:
+        if ampm.startswith('p') and hour < 12:
+            hour += 12
+        elif ampm.startswith('a') and hour == 12:
+            hour = 0
+    elif part in ("afternoon", "evening", "night"):
+        if hour < 12:
+            hour += 12
+    elif part is None and 1 <= hour <= 7:
+        # "at 5" almost always means the afternoon
+        hour += 12
+    return hour
+
+
+def _guess_ampm(hour, minute, text, after=None):
+    # am/pm for a bare 8-11, None when nothing in the message settles it. after is the
+    # previous event's start on the same day; a list of events reads in order.
+    if PM_HINT_PATTERN.search(text):
+        return "pm"
+    if AM_HINT_PATTERN.search(text):
+        return "am"
+    if after is not None:
+        for ampm, candidate in (("am", hour), ("pm", hour + 12)):
+            if (candidate, minute) > (after.hour, after.minute):
+                return ampm
+    return None
+
+
+# ---------- Dates ----------
+def _find_date(text, today):
+    # (date, span, text) for the single date expression in text, None if there is none, or
+    # raises ValueError when there are several or the date does not exist
+    found = []
+    match = RELATIVE_DAY_PATTERN.search(text)
+    if match:
+        day = match.group('day')
+        offset = 2 if 'after' in day else RELATIVE_DAYS[day]
+        found.append((today + timedelta(days=offset), match.span()))
+        text = _mask(text, match.span())
+
+    match = IN_DAYS_PATTERN.search(text)
+    if match:
+        days = _number(match.group('count')) * (7 if match.group('unit').startswith('w') else 1)
+        found.append((today + timedelta(days=int(days)), match.span()))
+        text = _mask(text, match.span())
+
+    match = WEEKDAY_PATTERN.search(text)
+    if match:
+        if match.group('weekday'):
+            weekday, rel = WEEKDAYS[match.group('weekday')], match.group('rel')
+        else:
+            weekday, rel = WEEKDAY_ABBREVIATIONS[match.group('abbr')], match.group('rel2')
+        if rel == "next":
+            # The named day in the following calendar week (weeks start on Monday)
+            resolved = today + timedelta(days=7 - today.weekday() + weekday)
+        else:
+            ahead = (weekday - today.weekday()) % 7
+            # A bare "friday" said on a Friday means next week; "this friday" means today
+            resolved = today + timedelta(days=ahead or (0 if rel == "this" else 7))
+        found.append((resolved, match.span()))
+        text = _mask(text, match.span())
+
+    for pattern in (ISO_DATE_PATTERN, NUMERIC_DATE_PATTERN, DAY_MONTH_PATTERN, MONTH_DAY_PATTERN):
+        match = pattern.search(text)
+        if not match:
+            continue
+        month = match.group('month')
+        month = MONTHS[month] if month in MONTHS else int(month)
+        year = match.group('year')
+        resolved = date(int(year) + (2000 if len(year) == 2 else 0) if year else today.year, month, int(match.group('day')))
+        if not year and resolved < today:
+            # No year given and the date has passed: the next one
+            resolved = resolved.replace(year=today.year + 1)
+        found.append((resolved, match.span()))
+        text = _mask(text, match.span())
+
+    if len(found) > 1:
+        raise ValueError("more than one date")
+    return (found[0][0], found[0][1], text) if found else (None, None, text)
+
+
+# ---------- Times ----------
+def _find_times(text):
+    # [(hour, minute, ampm, span)] for every clock time, plus an optional range end
+    times, range_end = [], None
+    match = RANGE_PATTERN.search(text)
+    if match and (match.group('ampm1') or match.group('ampm2') or match.group('minute1') or match.group('minute2')
+                  or match.group('prefix')) and (match.group('sep') != "and" or match.group('prefix') == "between "):
+        times.append((int(match.group('hour1')), int(match.group('minute1') or 0), match.group('ampm1'), match.span()))
+        range_end = (int(match.group('hour2')), int(match.group('minute2') or 0), match.group('ampm2'))
+        text = _mask(text, match.span())
+
+    for match in WORD_TIME_PATTERN.finditer(text):
+        if match.group('noon') == "midnight":
+            times.append((0, 0, "am", match.span()))
+        elif match.group('noon'):
+            times.append((12, 0, "pm", match.span()))
+        else:
+            minute = 30 if match.group('part') == "half" else 15
+            hour = int(match.group('hour'))
+            if match.group('rel') == "to":
+                hour, minute = (hour - 1) % 12 or 12, 60 - minute
+            times.append((hour, minute, match.group('ampm'), match.span()))
+        text = _mask(text, match.span())
+
+    for match in CLOCK_PATTERN.finditer(text):
+        # A bare number is only a time with a minute part, am/pm, o'clock or a leading "at"
+        if not (match.group('minute') or match.group('ampm') or match.group('oclock') or match.group('at')):
+            continue
+        times.append((int(match.group('hour')), int(match.group('minute') or 0), match.group('ampm'), match.span()))
+        text = _mask(text, match.span())
+    return times, range_end, text
+
+
+def _find_duration(text):
+    match = DURATION_PATTERN.search(text) or LENGTH_PATTERN.search(text)
+    if not match:
+        return None, None, text
+    if match.groupdict().get('half'):
+        minutes = 30
+    else:
+        minutes = _minutes(match.group('count'), match.group('unit'))
+        if match.groupdict().get('count2'):
+            minutes += int(match.group('count2'))
+    return minutes, match.span(), _mask(text, match.span())
+
+
+def parse_when(text, now=None, default_date=None, after=None):
+    # Resolves the date/time in one event's text. Returns {"start", "end", "spans", "date"}
+    # ("date" is the explicitly mentioned day, if any) or None when the LLM should decide.
+    # after: the previous event's start, when this one is part of a list
+    text = text.lower()
+    if VAGUE_PATTERN.search(text):
+        return None
+    now = local_now(now)
+    spans = []
+    tonight = TONIGHT_PATTERN.search(text)
+
+    match = RELATIVE_TIME_PATTERN.search(text)
+    if match:
+        minutes = 30 if match.group('half') else _minutes(match.group('count'), match.group('unit'))
+        start = now + timedelta(minutes=minutes)
+        spans.append(match.span())
+        text = _mask(text, match.span())
+        mentioned_date = None
+    else:
+        try:
+            mentioned_date, span, text = _find_date(text, now.date())
+        except ValueError:
+            return None
+        if span:
+            spans.append(span)
+        start = None
+
+    times, range_end, text = _find_times(text)
+    part_match = PART_OF_DAY_PATTERN.search(text)
+    if (part_match and part_match.group('part') == "night" and not part_match.group('prefix')
+            and not (spans and spans[0][1] <= part_match.start() and not text[spans[0][1]:part_match.start()].strip())):
+        # "night" alone is usually part of a title ("game night"); "at night" and
+        # "friday night" are times
+        part_match = None
+    part = part_match.group('part') if part_match else ("night" if tonight else None)
+    if part_match:
+        spans.append(part_match.span())
+        text = _mask(text, part_match.span())
+    duration, duration_span, text = _find_duration(text)
+    if duration_span:
+        spans.append(duration_span)
+    if duration is not None and not 0 < duration <= MAX_DURATION_MINUTES:
+        return None
+    if STRAY_DATE_PATTERN.search(text):
+        return None
+
+    if len(times) > 1 or (start is not None and times):
+        return None
+    if start is None:
+        if times:
+            hour, minute, ampm, span = times[0]
+            spans.append(span)
+            ampm = ampm and ampm.replace('.', '')
+            if ampm and not 1 <= hour <= 12:
+                # "13pm"
+                return None
+            if not ampm and not part and 8 <= hour <= 11 and not (range_end and range_end[2]):
+                day = mentioned_date or default_date
+                ampm = _guess_ampm(hour, minute, text, after if after and after.date() == day else None)
+                if ampm is None:
+                    return None
+            hour = resolve_hour(hour, ampm, part)
+        elif part:
+            hour, minute = PART_OF_DAY_HOURS[part], 0
+        else:
+            return None
+        if hour > 23 or minute > 59:
+            return None
+        day = mentioned_date or default_date
+        if day is None:
+            # Only a time: the next time the clock shows it
+            start = now.replace(hour=hour, minute=minute)
+            if start <= now:
+                start += timedelta(days=1)
+        else:
+            start = datetime(day.year, day.month, day.day, hour, minute)
+
+    if range_end:
+        end_hour, end_minute, end_ampm = range_end
+        end_ampm = end_ampm and end_ampm.replace('.', '')
+        if end_hour > 23 or end_minute > 59 or (end_ampm and not 1 <= end_hour <= 12):
+            return None
+        if not times[0][2] and end_ampm:
+            # "3-4pm": the start takes the end's am/pm unless that puts it after the end
+            start_hour = resolve_hour(times[0][0], end_ampm)
+            if (start_hour, times[0][1]) > (resolve_hour(end_hour, end_ampm), end_minute):
+                start_hour = resolve_hour(times[0][0], "pm" if end_ampm.startswith('a') else "am")
+            start = start.replace(hour=start_hour)
+        end_hour = resolve_hour(end_hour, end_ampm, part) if end_ampm or part else end_hour
+        end = start.replace(hour=end_hour % 24, minute=end_minute)
+        if end <= start and not end_ampm:
+            # "from 11 to 1": the end is in the afternoon
+            end += timedelta(hours=12)
+        if end <= start:
+            return None
+    else:
+        end = start + timedelta(minutes=DEFAULT_DURATION_MINUTES if duration is None else duration)
+    return {"start": start, "end": end, "spans": spans, "date": mentioned_date}
+
+
+# ---------- Titles ----------
+def strip_spans(text, spans):
+    for start, end in sorted(spans, reverse=True):
+        text = text[:start] + text[end:]
+    return text
+
+
+def extract_event_title(text, spans):
+    title = strip_spans(text, spans)
+    title = re.sub(r"^(?:(?:please|kindly|can\s+you|could\s+you|would\s+you|will\s+you)\s+)*", "", title.strip(), flags=re.I)
+    title = re.sub(r"^(?:schedule|book|set\s+up|arrange|plan|add|create|put|remind\s+me\s+(?:about|of|to)?)\s+", "", title.strip(), flags=re.I)
+    title = re.sub(r"^(?:a|an|the|my)\s+", "", title.strip(), flags=re.I)
+    title = re.sub(r"\s+(?:on|in|to)\s+(?:my\s+)?calendar\b", "", title, flags=re.I)
+    title = re.sub(r"(?:\s+(?:on|at|for|from|by|in|between|the))+\s*$", "", title.strip(), flags=re.I)
+    title = re.sub(r"\s+", " ", title).strip(" ,.:-")
+    return title[:1].upper() + title[1:] if title else None
+
+
+# ---------- Events ----------
+def _group_date(text, today):
+    try:
+        return _find_date(text, today)[0]
+    except ValueError:
+        return None
+
+
+def _parse_groups(text, groups, now, days):
+    parsed, previous = [], None
+    for (start, end), day in zip(groups, days):
+        result = parse_when(text[start:end], now, default_date=day, after=previous)
+        parsed.append(result)
+        previous = result and result["start"]
+    return parsed
+
+
+def _segments(text):
+    # Splits a message listing several events into groups that each carry one time
+    pieces, start = [], 0
+    for match in SEPARATOR_PATTERN.finditer(text):
+        pieces.append((start, match.start()))
+        start = match.end()
+    pieces.append((start, len(text)))
+
+    groups, current = [], None
+    for piece_start, piece_end in pieces:
+        current = (current[0], piece_end) if current else (piece_start, piece_end)
+        if HAS_TIME_PATTERN.search(text[piece_start:piece_end]):
+            groups.append(current)
+            current = None
+    if current and groups:
+        groups[-1] = (groups[-1][0], current[1])
+    return groups
+
+
+def _leftover_time(title):
+    # Another time still in a title means the message listed times the parse did not account for
+    return bool(STRAY_TIME_PATTERN.search((title or "").lower()))
+
+
+def parse_events(message, now=None):
+    # [{"title", "start", "end"}] for every event in the message, or None when any part of it
+    # needs the LLM. The title is None when nothing but the date/time was given.
+    text = message.lower()
+    if len(text) != len(message):
+        message = text
+    now = local_now(now)
+
+    whole = parse_when(text, now)
+    if whole:
+        title = extract_event_title(message, whole["spans"])
+        if _leftover_time(title):
+            # "meeting at 5 and 6" is not one event called "Meeting and 6"
+            PARSES.inc(outcome="deferred")
+            return None
+        PARSES.inc(outcome="resolved")
+        return [{"title": title, "start": whole["start"], "end": whole["end"]}]
+
+    groups = _segments(text)
+    if len(groups) < 2 or VAGUE_PATTERN.search(text):
+        PARSES.inc(outcome="deferred")
+        return None
+    today = now.date()
+    dates = [_group_date(text[start:end], today) for start, end in groups]
+    if any(dates):
+        # A day mentioned for one event applies to the events after it (or, before the
+        # first mention, to the ones leading up to it)
+        first = next(day for day in dates if day)
+        carried = []
+        for day in dates:
+            first = day or first
+            carried.append(first)
+        parsed = _parse_groups(text, groups, now, carried)
+    else:
+        # No day named: every event goes on one day, today unless one of the times has passed
+        parsed = _parse_groups(text, groups, now, [today] * len(groups))
+        if any(result and result["start"] <= now for result in parsed):
+            parsed = _parse_groups(text, groups, now, [today + timedelta(days=1)] * len(groups))
+    if not all(parsed):
+        PARSES.inc(outcome="deferred")
+        return None
+    titles = [extract_event_title(message[start:end], result["spans"]) for (start, end), result in zip(groups, parsed)]
+    if not any(titles) or any(map(_leftover_time, titles)):
+        # Several times and nothing saying what any of them is for, or more times than events
+        PARSES.inc(outcome="deferred")
+        return None
+    # A time listed on its own ("meet at 3 and 4pm") is another of the event before it
+    first = next(title for title in titles if title)
+    for index, title in enumerate(titles):
+        first = titles[index] = title or first
+    PARSES.inc(outcome="resolved")
+    return [{"title": title, "start": result["start"], "end": result["end"]} for title, result in zip(titles, parsed)]
+
+
+def parse_event_details(message, now=None):
+    # Same shape as the LLM event extraction in app.py: title, start_time, duration_minutes
+    events = parse_events(message, now)
+    if not events:
+        return None
+    return [{"title": event["title"] or message.strip(),
+             "start_time": event["start"].isoformat(),
+             "duration_minutes": int((event["end"] - event["start"]).total_seconds() // 60)}
+            for event in events]